@@ -0,0 +1,358 @@
+import os
+import json
+import getpass
+from PyQt6.QtCore import QObject, QUrl, QTimer, pyqtSignal
+from PyQt6.QtGui import QFontDatabase
+from PyQt6.QtNetwork import QLocalServer, QLocalSocket
+from PyQt6.QtWidgets import QApplication, QFileDialog, QMessageBox
+from PyQt6.QtWebEngineCore import QWebEngineProfile, QWebEngineDownloadRequest
+from praterich_scheduler import PraterichScheduler
+from praterich_ai import router as praterich_router
+from praterich_trace import Tracer, DEFAULT_TRACE_PATH
+from history_store import HistoryStore, DEFAULT_HISTORY_PATH
+from download_manager import DownloadManager, DEFAULT_DOWNLOADS_PATH
+from session_store import SessionJournal, DEFAULT_SESSION_PATH
+from newtab_scheme import NewTabSchemeHandler, NEW_TAB_SCHEME
+from page_context import ContextCache
+from task_manager import TabMetrics
+from tab_search import TabSearchIndexer
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ringzauber_config.json')
+FONT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Roboto.ttf')
+INSTANCE_NAME = f"ringzauber-{getpass.getuser()}"
+
+SEARCH_URLS = {
+    "google": "https://www.google.com/search?q=",
+    "duckduckgo": "https://duckduckgo.com/?q=",
+    "yahoo": "https://search.yahoo.com/search?p=",
+    "ecosia": "https://www.ecosia.org/search?q=",
+}
+
+
+class BrowserCore(QObject):
+    """
+    Everything one Ringzauber process shares between its windows.
+
+    The core owns the config, the web profile, the Praterich scheduler (and with it the
+    model client), tracing, history, downloads and the saved session. Windows are views
+    over it and are created through `new_window`.
+
+    The services the first tab does not need to paint are built idle and started by
+    `start_services` once the first window has painted.
+    """
+    def __init__(self, window_class, parent=None):
+        super().__init__(parent)
+        self.window_class = window_class
+        self.windows = []
+        self.services_started = False
+        self.config_problem = None
+        self.load_config()
+        self.font_family = self.load_custom_font()
+        self.profile = QWebEngineProfile.defaultProfile()
+
+        # Latency spans for every Praterich command, one trace per query.
+        self.tracer = Tracer(self.config.get("trace_file", DEFAULT_TRACE_PATH))
+
+        # Model tiers, hedging, deadlines and the circuit breaker for every Praterich call.
+        praterich_router.configure(self.config)
+        # All model requests run on one shared asyncio loop with a single client.
+        self.scheduler = PraterichScheduler(
+            max_concurrency=self.config.get("max_concurrent_requests", 4),
+            timeout=self.config.get("request_timeout", 30.0),
+            tracer=self.tracer,
+            parent=self,
+            start=False
+        )
+
+        # Visits and page text are written to disk in batches by the store's own thread.
+        self.history = HistoryStore(self.config.get("history_file", DEFAULT_HISTORY_PATH), start=False)
+
+        # Downloads are tracked by id, queued beyond the active limit and kept across restarts.
+        self.download_manager = DownloadManager(
+            self.config.get("downloads_file", DEFAULT_DOWNLOADS_PATH),
+            max_active=self.config.get("max_active_downloads", 3),
+            restart=lambda url, path: self.active_window().tabs.currentWidget().page().download(url, path),
+            parent=self
+        )
+        self.profile.downloadRequested.connect(self.on_download_requested)
+
+        # Extracted page content, shared so any window asking about a page reuses it.
+        self.page_contexts = ContextCache(self.config.get("page_context_cache_entries", 32))
+
+        # Only one window at a time is saved to disk; later windows keep their session in memory.
+        self.session = None
+        self.session_claimed = False
+
+        # The new-tab page is served from memory and shows a snapshot refreshed in the background.
+        self.newtab_handler = NewTabSchemeHandler(self)
+        self.profile.installUrlSchemeHandler(NEW_TAB_SCHEME, self.newtab_handler)
+
+        # Ads and trackers are blocked for every tab once the services start.
+        self.content_blocker = None
+        self.newtab_timer = QTimer(self)
+        self.newtab_timer.setInterval(self.config.get("newtab_refresh_ms", 30000))
+        self.newtab_timer.timeout.connect(self.refresh_newtab)
+
+        # Per-tab renderer memory, CPU and network use, sampled only while shown or exported.
+        self.tab_metrics = TabMetrics(
+            self,
+            interval=self.config.get("task_manager_interval_ms", 2000),
+            export_path=self.config.get("metrics_export_file"),
+            export_interval=self.config.get("metrics_export_interval_ms", 60000),
+            parent=self
+        )
+
+        # The text of every open tab, searchable from any window and kept current as pages change.
+        self.tab_search = TabSearchIndexer(
+            self,
+            max_chars=self.config.get("tab_search_max_chars", 20000),
+            poll_interval=self.config.get("tab_search_poll_ms", 3000),
+            parent=self
+        )
+
+        # One microphone pipeline per process, built on first use and aimed at the window that asked.
+        self._voice = None
+        self.voice_window = None
+
+        QApplication.instance().aboutToQuit.connect(self.shutdown)
+
+    def start_services(self):
+        """
+        Starts the model loop, the history writer, content blocking, tab metrics export, tab
+        search and the new-tab snapshot. Only the first call does anything.
+        """
+        if self.services_started:
+            return
+        self.services_started = True
+        self.scheduler.start()
+        self.history.start()
+        self.start_content_blocker()
+        self.tab_metrics.start()
+        self.tab_search.start()
+        self.newtab_timer.start()
+        self.refresh_newtab()
+
+    def start_content_blocker(self):
+        """Blocks ads and trackers for every tab. Filter lists are compiled once and cached on disk."""
+        from content_filter import load_matcher, filter_list_paths, DEFAULT_FILTER_DIR, DEFAULT_FILTER_CACHE_PATH
+        from content_blocker import ContentBlocker
+        filter_lists = filter_list_paths(self.config.get("filter_lists", DEFAULT_FILTER_DIR))
+        if filter_lists and self.config.get("content_blocking", True):
+            matcher = load_matcher(filter_lists, self.config.get("filter_cache_file", DEFAULT_FILTER_CACHE_PATH))
+            self.content_blocker = ContentBlocker(matcher, parent=self)
+            self.profile.setUrlRequestInterceptor(self.content_blocker)
+
+    def load_config(self):
+        """Reads the config file and the default search engine URL from it."""
+        self.config = {}
+        self.default_search_url = SEARCH_URLS["google"]
+        if not os.path.exists(CONFIG_PATH):
+            self.config_problem = ("Setup Incomplete", "Please run ringzauber_intro.py to set your preferences.")
+            return
+        try:
+            with open(CONFIG_PATH, 'r') as f:
+                self.config = json.load(f)
+            search_engine = self.config.get("default_search_engine", "google").lower()
+            self.default_search_url = SEARCH_URLS.get(search_engine, SEARCH_URLS["google"])
+            self.config_problem = None
+        except Exception as e:
+            print(f"Error reading configuration file: {e}")
+            self.config_problem = ("Configuration Error", "Could not load default search engine. Using Google.")
+
+    def load_custom_font(self):
+        """Registers the browser font once per process and returns its family, or None."""
+        if not os.path.exists(FONT_PATH):
+            print(f"Error: Font file not found at path: {FONT_PATH}")
+            return None
+        font_id = QFontDatabase.addApplicationFont(FONT_PATH)
+        if font_id == -1:
+            print(f"Error: Failed to load font from path: {FONT_PATH}")
+            return None
+        font_family = QFontDatabase.applicationFontFamilies(font_id)[0]
+        print(f"Font '{font_family}' loaded successfully.")
+        return font_family
+
+    def claim_session(self, persistent):
+        """Returns the session journal for a new window."""
+        if persistent and not self.session_claimed:
+            self.session_claimed = True
+            self.session = SessionJournal(self.config.get("session_file", DEFAULT_SESSION_PATH))
+            return self.session
+        return SessionJournal(None)
+
+    def refresh_newtab(self):
+        """Updates the top sites and recently closed tabs shown on new tabs opened from now on."""
+        if not self.services_started:
+            return
+        recent_tabs = self.session.recently_closed() if self.session is not None else []
+        self.newtab_handler.set_snapshot(self.history.top_sites(), recent_tabs)
+
+    @property
+    def voice(self):
+        if self._voice is None:
+            from voice_input import VoicePipeline
+            self._voice = VoicePipeline(self.config, parent=self)
+            self._voice.partial.connect(lambda text: self.voice_window_call("on_voice_partial", text))
+            self._voice.final.connect(lambda text: self.voice_window_call("on_voice_final", text))
+            self._voice.error.connect(lambda message: self.voice_window_call("on_voice_error", message))
+        return self._voice
+
+    def start_voice_command(self, window):
+        self.voice_window = window
+        self.voice.listen()
+
+    def voice_window_call(self, method, text):
+        if self.voice_window in self.windows:
+            getattr(self.voice_window, method)(text)
+
+    def new_window(self, restore_session=False):
+        window = self.window_class(self, restore_session=restore_session)
+        self.windows.append(window)
+        window.show()
+        # Off the first paint; the window's first tab already has the page it needs.
+        QTimer.singleShot(0, self.refresh_newtab)
+        if self.config_problem is not None:
+            # Shown once the window is up, so the message does not hold back the first paint.
+            title, text = self.config_problem
+            self.config_problem = None
+            QTimer.singleShot(0, lambda: QMessageBox.information(window, title, text))
+        return window
+
+    def window_closed(self, window):
+        if window in self.windows:
+            self.windows.remove(window)
+
+    def active_window(self):
+        active = QApplication.activeWindow()
+        if active in self.windows:
+            return active
+        return self.windows[-1] if self.windows else self.new_window()
+
+    def on_download_requested(self, download: QWebEngineDownloadRequest):
+        # Restarted downloads already know where they are going.
+        if not self.download_manager.is_restart(download.url().toString()):
+            directory = self.config.get("download_directory")
+            if directory:
+                download.setDownloadDirectory(directory)
+            else:
+                suggested_path = os.path.join(download.downloadDirectory(), download.downloadFileName())
+                file_path, _ = QFileDialog.getSaveFileName(self.active_window(), "Save File", suggested_path)
+                if not file_path:
+                    download.cancel()
+                    return
+                download.setDownloadDirectory(os.path.dirname(file_path))
+                download.setDownloadFileName(os.path.basename(file_path))
+        download.accept()
+        self.download_manager.add(download)
+
+    def handle_message(self, message):
+        """
+        Acts on a launch handed over by another process: opens its URLs, runs its Praterich
+        query, or opens a new window when it asked for neither.
+        """
+        # The launch may follow ringzauber_intro.py writing a new config.
+        self.load_config()
+        self.config_problem = None
+        urls = message.get("urls") or []
+        query = message.get("query")
+        if not urls and not query:
+            self.new_window()
+            return
+
+        window = self.active_window()
+        for url in urls:
+            window.add_new_tab(QUrl(url))
+        if query:
+            window.on_praterich_command(query, source="launch")
+        window.show()
+        window.raise_()
+        window.activateWindow()
+
+    def shutdown(self):
+        if self._voice is not None:
+            self._voice.stop()
+        if self.session is not None:
+            self.session.close()
+        self.history.close()
+        self.download_manager.save()
+        self.scheduler.shutdown()
+        self.tracer.close()
+
+
+def launch_message(argv, cwd=None):
+    """Turns command-line arguments into a launch message: URLs to open and a Praterich query."""
+    cwd = cwd or os.getcwd()
+    message = {"urls": [], "query": None}
+    arguments = iter(argv)
+    for argument in arguments:
+        if argument == "--praterich":
+            message["query"] = next(arguments, None)
+        elif not argument.startswith("-"):
+            message["urls"].append(QUrl.fromUserInput(argument, cwd).toString())
+    return message
+
+
+def send_to_running_instance(message, timeout_ms=1000, name=INSTANCE_NAME):
+    """Hands a launch message to the instance already running for this user. Returns False if there is none."""
+    socket = QLocalSocket()
+    socket.connectToServer(name)
+    if not socket.waitForConnected(timeout_ms):
+        return False
+    socket.write((json.dumps(message) + "\n").encode("utf-8"))
+    socket.flush()
+    # Wait for the acknowledgement, so the message is not lost if this process exits first.
+    acknowledged = socket.waitForReadyRead(timeout_ms) and bytes(socket.readLine()).strip() == b"ok"
+    socket.disconnectFromServer()
+    return acknowledged
+
+
+def instance_socket_is_stale(name=INSTANCE_NAME, timeout_ms=1000):
+    """
+    True if a fresh connection to `name` is refused or finds no server, so its socket was
+    left behind by a crashed instance. One that is only slow to answer is still alive.
+    """
+    socket = QLocalSocket()
+    socket.connectToServer(name)
+    if socket.waitForConnected(timeout_ms):
+        socket.disconnectFromServer()
+        return False
+    return socket.error() in (QLocalSocket.LocalSocketError.ServerNotFoundError,
+                              QLocalSocket.LocalSocketError.ConnectionRefusedError)
+
+
+class InstanceServer(QObject):
+    """Listens for launch messages from later `ringzauber.py` processes."""
+    message_received = pyqtSignal(dict)
+
+    def __init__(self, parent=None, name=INSTANCE_NAME):
+        super().__init__(parent)
+        self.server = QLocalServer(self)
+        # Only this user's later launches may connect.
+        self.server.setSocketOptions(QLocalServer.SocketOption.UserAccessOption)
+        if not self.server.listen(name):
+            # Another instance may only have been too busy to acknowledge this launch, so the
+            # name is only taken over when nothing is listening on it any more.
+            if instance_socket_is_stale(name):
+                QLocalServer.removeServer(name)
+                self.server.listen(name)
+            if not self.server.isListening():
+                print(f"Could not listen for other Ringzauber launches: {self.server.errorString()}")
+        self.server.newConnection.connect(self.on_new_connection)
+
+    def on_new_connection(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            socket.readyRead.connect(lambda socket=socket: self.on_ready_read(socket))
+            socket.disconnected.connect(socket.deleteLater)
+
+    def on_ready_read(self, socket):
+        while socket.canReadLine():
+            line = bytes(socket.readLine()).decode("utf-8", errors="replace")
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            socket.write(b"ok\n")
+            socket.flush()
+            if isinstance(message, dict):
+                self.message_received.emit(message)
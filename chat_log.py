@@ -0,0 +1,252 @@
+import sys
+import json
+import math
+import time
+import random
+from collections import OrderedDict
+from ringzauber_stats import percentile
+
+
+class HeightIndex:
+    """
+    The heights of a list of rows in a Fenwick tree, so the offset of a row, the row at an
+    offset and changing one row's height all cost O(log n) however long the list is.
+    """
+    def __init__(self):
+        self.heights = []
+        self.tree = [0]
+
+    def __len__(self):
+        return len(self.heights)
+
+    def __getitem__(self, row):
+        return self.heights[row]
+
+    def append(self, height):
+        self.heights.append(height)
+        node = len(self.heights)
+        total = height
+        # The new node covers itself plus the nodes just below it in its range.
+        child = node - 1
+        lowest = node - (node & -node)
+        while child > lowest:
+            total += self.tree[child]
+            child -= child & -child
+        self.tree.append(total)
+
+    def set(self, row, height):
+        delta = height - self.heights[row]
+        if not delta:
+            return
+        self.heights[row] = height
+        node = row + 1
+        while node < len(self.tree):
+            self.tree[node] += delta
+            node += node & -node
+
+    def offset(self, row):
+        """The total height of the rows before `row`."""
+        total = 0
+        while row > 0:
+            total += self.tree[row]
+            row -= row & -row
+        return total
+
+    def total(self):
+        return self.offset(len(self.heights))
+
+    def find(self, offset):
+        """The row that contains `offset`, clamped to the last row; -1 if there are none."""
+        count = len(self.heights)
+        if not count:
+            return -1
+        position = 0
+        step = 1 << (count.bit_length() - 1)
+        while step:
+            node = position + step
+            if node <= count and self.tree[node] <= offset:
+                position = node
+                offset -= self.tree[node]
+            step >>= 1
+        return min(position, count - 1)
+
+    def rebuild(self, heights):
+        """Replaces every height at once, in linear time."""
+        self.heights = list(heights)
+        self.tree = [0] + self.heights
+        for node in range(1, len(self.tree)):
+            parent = node + (node & -node)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[node]
+
+    def clear(self):
+        self.heights = []
+        self.tree = [0]
+
+
+class LayoutCache:
+    """A least-recently-used cache of rendered message layouts."""
+    def __init__(self, capacity=200):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        layout = self.entries.get(key)
+        if layout is not None:
+            self.entries.move_to_end(key)
+        return layout
+
+    def put(self, key, layout):
+        self.entries[key] = layout
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+
+class ChatLog:
+    """
+    The messages of a chat and the height each one takes, for a view that only lays out
+    the messages it shows.
+
+    Text given to a message is revealed by `reveal`, called once per frame: each call shows
+    a share of the text still hidden, at least `min_step` characters and enough to catch
+    up within `reveal_frames` frames of the last text arriving, so a long answer appears
+    over a few frames instead of one character per tick. Until a message has been measured its height is estimated from
+    its length at the current `width`.
+    """
+    def __init__(self, reveal_frames=6, min_step=24, char_width=7, line_height=18, padding=24):
+        self.reveal_frames = reveal_frames
+        self.min_step = min_step
+        self.char_width = char_width
+        self.line_height = line_height
+        self.padding = padding
+        self.width = 400
+        self.messages = []
+        self.heights = HeightIndex()
+        self.revealing = set()
+
+    def __len__(self):
+        return len(self.messages)
+
+    def estimate(self, text):
+        per_line = max(1, self.width // self.char_width)
+        lines = sum(max(1, math.ceil(len(line) / per_line)) for line in text.split("\n"))
+        return lines * self.line_height + self.padding
+
+    def add(self, role, text="", open=False):
+        """Adds a message and returns its index. An open message can still be appended to."""
+        self.messages.append({"role": role, "text": text, "shown": 0, "open": open, "frames": self.reveal_frames})
+        self.heights.append(self.estimate(""))
+        if text:
+            self.revealing.add(len(self.messages) - 1)
+        return len(self.messages) - 1
+
+    def append(self, index, text):
+        self.messages[index]["text"] += text
+        self.messages[index]["frames"] = self.reveal_frames
+        self.revealing.add(index)
+
+    def close(self, index):
+        self.messages[index]["open"] = False
+
+    def visible_text(self, index):
+        message = self.messages[index]
+        return message["text"][:message["shown"]]
+
+    def is_settled(self, index):
+        """True once a message is closed and fully shown, so its text will not change again."""
+        message = self.messages[index]
+        return not message["open"] and message["shown"] == len(message["text"])
+
+    def reveal(self):
+        """Shows the next batch of hidden text and returns the indices of the messages that changed."""
+        changed = []
+        for index in list(self.revealing):
+            message = self.messages[index]
+            hidden = len(message["text"]) - message["shown"]
+            # Spread what is hidden over the frames left, so the last of them shows the rest.
+            step = max(self.min_step, math.ceil(hidden / message["frames"]))
+            message["frames"] = max(1, message["frames"] - 1)
+            message["shown"] = min(len(message["text"]), message["shown"] + step)
+            if message["shown"] == len(message["text"]):
+                self.revealing.discard(index)
+            changed.append(index)
+        return changed
+
+    def reveal_all(self):
+        for index in self.revealing:
+            self.messages[index]["shown"] = len(self.messages[index]["text"])
+        changed = list(self.revealing)
+        self.revealing.clear()
+        return changed
+
+    def set_metrics(self, width, char_width=None, line_height=None):
+        """Changes the width messages wrap at and re-estimates every height, in linear time."""
+        self.width = width
+        self.char_width = char_width or self.char_width
+        self.line_height = line_height or self.line_height
+        self.heights.rebuild(self.estimate(self.visible_text(index)) for index in range(len(self.messages)))
+
+    def clear(self):
+        self.messages = []
+        self.heights.clear()
+        self.revealing.clear()
+
+
+def run_benchmark(sizes=(100, 1000, 10000), operations=2000):
+    """
+    Times the per-frame work of a chat view against the length of its history: appending a
+    message, revealing streamed text, measuring a message and finding the rows to show at a
+    scroll offset. The times should stay flat as the history grows.
+    """
+    rng = random.Random(5)
+    words = ["indeed", "the", "page", "rather", "splendid", "search", "result", "tab", "of", "a", "British", "tone"]
+    results = {}
+    for size in sizes:
+        log = ChatLog()
+        for number in range(size):
+            log.add("user" if number % 2 else "praterich", " ".join(rng.choice(words) for _ in range(rng.randint(5, 120))))
+        log.reveal_all()
+
+        samples = {"append_us": [], "reveal_frame_us": [], "measure_us": [], "scroll_lookup_us": []}
+        for _ in range(operations):
+            started = time.perf_counter()
+            index = log.add("praterich", open=True)
+            samples["append_us"].append(time.perf_counter() - started)
+
+            log.append(index, " ".join(rng.choice(words) for _ in range(40)))
+            started = time.perf_counter()
+            log.reveal()
+            samples["reveal_frame_us"].append(time.perf_counter() - started)
+            log.reveal_all()
+            log.close(index)
+
+            started = time.perf_counter()
+            log.heights.set(rng.randrange(len(log)), rng.randint(40, 400))
+            samples["measure_us"].append(time.perf_counter() - started)
+
+            # A paint finds the first visible row and walks the few rows below it.
+            offset = rng.randrange(max(1, log.heights.total()))
+            started = time.perf_counter()
+            row = log.heights.find(offset)
+            y = log.heights.offset(row)
+            while row < len(log) and y < offset + 800:
+                y += log.heights[row]
+                row += 1
+            samples["scroll_lookup_us"].append(time.perf_counter() - started)
+
+        results[size] = {}
+        for name, values in samples.items():
+            results[size][name] = {"p50": percentile(values, 0.5) * 1e6, "p95": percentile(values, 0.95) * 1e6}
+    return results
+
+
+if __name__ == "__main__":
+    sizes = tuple(int(size) for size in sys.argv[1:]) or (100, 1000, 10000)
+    print(json.dumps(run_benchmark(sizes), indent=2))
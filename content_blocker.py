@@ -0,0 +1,70 @@
+from PyQt6.QtCore import QUrl, pyqtSignal
+from PyQt6.QtWebEngineCore import QWebEngineUrlRequestInterceptor, QWebEngineUrlRequestInfo
+
+ResourceType = QWebEngineUrlRequestInfo.ResourceType
+RESOURCE_TYPE_NAMES = {
+    ResourceType.ResourceTypeScript: "script",
+    ResourceType.ResourceTypeImage: "image",
+    ResourceType.ResourceTypeFavicon: "image",
+    ResourceType.ResourceTypeStylesheet: "stylesheet",
+    ResourceType.ResourceTypeFontResource: "font",
+    ResourceType.ResourceTypeMedia: "media",
+    ResourceType.ResourceTypeObject: "object",
+    ResourceType.ResourceTypePluginResource: "object",
+    ResourceType.ResourceTypeSubFrame: "subdocument",
+    ResourceType.ResourceTypeXhr: "xmlhttprequest",
+    ResourceType.ResourceTypePing: "ping",
+    ResourceType.ResourceTypeCspReport: "ping",
+}
+
+
+def page_key(qurl):
+    return qurl.adjusted(QUrl.UrlFormattingOption.RemoveFragment).toString()
+
+
+class ContentBlocker(QWebEngineUrlRequestInterceptor):
+    """
+    Blocks ads and trackers for every tab of the profile it is installed on.
+
+    Blocked requests are counted per page, keyed by the URL of the page that made them; a
+    page's count starts again each time it is navigated to. Two tabs showing the same URL
+    share a count. Only the `max_pages` most recently counted pages are kept. `blocked` is
+    emitted with the page URL and its new count.
+    """
+    blocked = pyqtSignal(str, int)
+
+    def __init__(self, matcher, max_pages=256, parent=None):
+        super().__init__(parent)
+        self.matcher = matcher
+        self.max_pages = max_pages
+        self.counts = {}
+        self.total = 0
+
+    def interceptRequest(self, info):
+        resource_type = info.resourceType()
+        if resource_type == ResourceType.ResourceTypeMainFrame:
+            self.counts.pop(page_key(info.requestUrl()), None)
+            return
+        url = info.requestUrl()
+        if url.scheme() not in ("http", "https", "ws", "wss"):
+            return
+        first_party = info.firstPartyUrl()
+        if url.scheme() in ("ws", "wss"):
+            type_name = "websocket"
+        else:
+            type_name = RESOURCE_TYPE_NAMES.get(resource_type, "other")
+        rule = self.matcher.match(url.toString(), first_party.host(), type_name, host=url.host())
+        if rule is None:
+            return
+        info.block(True)
+        key = page_key(first_party)
+        count = self.counts.pop(key, 0) + 1
+        self.counts[key] = count
+        if len(self.counts) > self.max_pages:
+            del self.counts[next(iter(self.counts))]
+        self.total += 1
+        self.blocked.emit(key, count)
+
+    def blocked_count(self, qurl):
+        """Returns how many requests were blocked on the page at `qurl` since it was last loaded."""
+        return self.counts.get(page_key(qurl), 0)
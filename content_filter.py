@@ -0,0 +1,508 @@
+import os
+import re
+import sys
+import json
+import time
+import gc
+import marshal
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from ringzauber_paths import data_path
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FILTER_DIR = os.path.join(BASE_DIR, 'filters')
+DEFAULT_FILTER_CACHE_PATH = data_path('ringzauber_filters.cache')
+# Bumped whenever the compiled form changes, so stale caches are rebuilt.
+CACHE_VERSION = 1
+
+RESOURCE_TYPES = {
+    "script": 1, "image": 2, "stylesheet": 4, "font": 8, "media": 16, "object": 32,
+    "subdocument": 64, "xmlhttprequest": 128, "websocket": 256, "ping": 512, "other": 1024,
+}
+TYPE_ALIASES = {"xhr": "xmlhttprequest", "frame": "subdocument", "css": "stylesheet", "beacon": "ping"}
+ALL_TYPES = sum(RESOURCE_TYPES.values())
+OTHER_TYPE = RESOURCE_TYPES["other"]
+TOKEN_RE = re.compile(r"[a-z0-9%]{2,}")
+HOST_RE = re.compile(r"^[a-z][a-z0-9+.\-]*://(?:[^@/?#]*@)?([^:/?#]*)", re.IGNORECASE)
+PLAIN_DOMAIN_RE = re.compile(r"^[a-z0-9.\-]+\^$")
+# Second-level labels under which sites register their own names, as in example.co.uk.
+SHARED_SECOND_LEVEL = {"co", "com", "org", "net", "gov", "ac", "edu", "ne", "or", "go"}
+
+
+def site_of(labels):
+    """Returns the registrable labels of a host name, close enough to tell first from third parties."""
+    if len(labels) > 2 and len(labels[-1]) == 2 and labels[-2] in SHARED_SECOND_LEVEL:
+        return labels[-3:]
+    return labels[-2:]
+
+
+def pattern_to_regex(pattern):
+    """Translates an EasyList pattern into a regular expression."""
+    if len(pattern) > 1 and pattern.startswith("/") and pattern.endswith("/"):
+        return pattern[1:-1]
+    start = ""
+    if pattern.startswith("||"):
+        start = r"^[a-z][a-z0-9+.\-]*://(?:[^/?#]*\.)?"
+        pattern = pattern[2:]
+    elif pattern.startswith("|"):
+        start = "^"
+        pattern = pattern[1:]
+    end = ""
+    if pattern.endswith("|"):
+        end = "$"
+        pattern = pattern[:-1]
+    body = re.escape(pattern).replace(r"\*", ".*").replace(r"\^", r"(?:[^\w\-.%]|$)")
+    return start + body + end
+
+
+def pattern_tokens(pattern):
+    """
+    Returns the tokens that every URL matched by `pattern` contains whole. A token next to a
+    wildcard, or at an unanchored end of the pattern, may be part of a longer URL token and
+    is left out.
+    """
+    if len(pattern) > 1 and pattern.startswith("/") and pattern.endswith("/"):
+        return []
+    anchored_start = pattern.startswith("|")
+    anchored_end = pattern.endswith("|")
+    body = pattern.lstrip("|").rstrip("|").lower()
+    tokens = []
+    for match in TOKEN_RE.finditer(body):
+        before = body[match.start() - 1] if match.start() > 0 else None
+        after = body[match.end()] if match.end() < len(body) else None
+        if before == "*" or after == "*":
+            continue
+        if (before is None and not anchored_start) or (after is None and not anchored_end):
+            continue
+        tokens.append(match.group())
+    return tokens
+
+
+# A compiled rule is a plain tuple, which keeps the disk cache quick to load.
+TEXT, REGEX, TYPES, PARTY, DOMAINS, EXCLUDED, MATCH_CASE, DOCUMENT = range(8)
+
+
+def rule_applies(rule, type_bit, third_party, first_party_suffixes):
+    """Checks a rule's options against a request, without looking at its URL."""
+    if not rule[TYPES] & type_bit:
+        return False
+    if rule[PARTY] is not None and rule[PARTY] != third_party:
+        return False
+    if rule[EXCLUDED] and any(suffix in rule[EXCLUDED] for suffix in first_party_suffixes):
+        return False
+    if rule[DOMAINS] and not any(suffix in rule[DOMAINS] for suffix in first_party_suffixes):
+        return False
+    return True
+
+
+def parse_rule(line):
+    """
+    Parses one line of an EasyList-style list into (rule, is_exception, domain, tokens),
+    where domain is set for "||example.com^" rules and the rule's regex is None. Returns None for comments, cosmetic
+    filters and rules with options the blocker does not support, such as $popup or $csp.
+    """
+    line = line.strip()
+    if not line or line.startswith(("!", "[")) or "##" in line or "#@#" in line or "#?#" in line or "#$#" in line:
+        return None
+    exception = line.startswith("@@")
+    if exception:
+        line = line[2:]
+    pattern, options = line, ""
+    if "$" in line and not (line.startswith("/") and line.endswith("/")):
+        pattern, options = line.rsplit("$", 1)
+
+    types, excluded_types = 0, 0
+    party = None
+    domains, excluded = [], []
+    match_case = False
+    document = False
+    for option in filter(None, options.lower().split(",")):
+        negated = option.startswith("~")
+        name = option.lstrip("~")
+        name = TYPE_ALIASES.get(name, name)
+        if name in RESOURCE_TYPES:
+            if negated:
+                excluded_types |= RESOURCE_TYPES[name]
+            else:
+                types |= RESOURCE_TYPES[name]
+        elif name in ("third-party", "3p"):
+            party = not negated
+        elif name in ("first-party", "1p"):
+            party = negated
+        elif name.startswith("domain="):
+            for domain in name[len("domain="):].split("|"):
+                (excluded if domain.startswith("~") else domains).append(domain.lstrip("~"))
+        elif name == "match-case":
+            match_case = True
+        elif name == "document" and exception:
+            document = True
+        elif name in ("important", "all"):
+            continue
+        else:
+            return None
+    types = (types or ALL_TYPES) & ~excluded_types
+    if not pattern or pattern in ("*", "|", "||"):
+        # A rule without a pattern applies to every request, so it needs domains to limit it.
+        if not domains:
+            return None
+        pattern = "*"
+
+    domain = None
+    if pattern.startswith("||") and PLAIN_DOMAIN_RE.match(pattern[2:]) and not match_case:
+        domain = pattern[2:].rstrip("^")
+    regex = None if domain else pattern_to_regex(pattern)
+    rule = (line, regex, types, party, frozenset(domains) or None, frozenset(excluded) or None, match_case, document)
+    return rule, exception, domain, [] if domain else pattern_tokens(pattern)
+
+
+class FilterMatcher:
+    """
+    Decides whether a request should be blocked, from compiled filter lists.
+
+    Rules that only name a domain sit in a trie keyed by reversed host labels, so a host is
+    checked against all of them in one walk. Every other rule is indexed by the rarest token
+    its pattern is known to contain, and only the rules indexed by the tokens of a URL are
+    tested against it. Exception rules are kept apart and checked only once a block matched.
+    Tries and indexes hold positions in `rules`.
+    """
+    def __init__(self):
+        self.rules = []
+        self.domains = {False: {}, True: {}}
+        self.tokens = {False: {}, True: {}}
+        self.untokened = {False: [], True: []}
+        self.allowed_sites = {}
+        self.regexes = {}
+
+    def state(self):
+        """Returns everything but the compiled regexes, as built-in types that marshal can store."""
+        return {name: value for name, value in self.__dict__.items() if name != "regexes"}
+
+    @classmethod
+    def from_state(cls, state):
+        matcher = cls.__new__(cls)
+        matcher.__dict__.update(state)
+        matcher.regexes = {}
+        return matcher
+
+    @property
+    def rule_count(self):
+        return len(self.rules)
+
+    @classmethod
+    def compile(cls, lines):
+        matcher = cls()
+        parsed = []
+        frequency = {}
+        for line in lines:
+            result = parse_rule(line)
+            if result is None:
+                continue
+            parsed.append(result)
+            for token in set(result[3]):
+                frequency[token] = frequency.get(token, 0) + 1
+        for rule, exception, domain, tokens in parsed:
+            token = min(tokens, key=lambda token: (frequency[token], -len(token))) if tokens else None
+            matcher.add(rule, exception, domain, token)
+        return matcher
+
+    def add(self, rule, exception, domain, token):
+        index = len(self.rules)
+        self.rules.append(rule)
+        if exception and rule[DOCUMENT]:
+            for site in rule[DOMAINS] or ([domain] if domain else []):
+                self.insert_domain(self.allowed_sites, site, index)
+        elif domain:
+            self.insert_domain(self.domains[exception], domain, index)
+        elif token:
+            self.tokens[exception].setdefault(token, []).append(index)
+        else:
+            self.untokened[exception].append(index)
+
+    @staticmethod
+    def insert_domain(trie, domain, index):
+        node = trie
+        for label in reversed(domain.split(".")):
+            node = node.setdefault(label, {})
+        node.setdefault(None, []).append(index)
+
+    @staticmethod
+    def domain_rules(trie, labels):
+        node = trie
+        found = []
+        for label in reversed(labels):
+            node = node.get(label)
+            if node is None:
+                break
+            if None in node:
+                found.extend(node[None])
+        return found
+
+    def matches_url(self, index, url):
+        """Tests a rule's pattern, compiling its regex the first time it is needed."""
+        rule = self.rules[index]
+        compiled = self.regexes.get(index)
+        if compiled is None:
+            try:
+                compiled = re.compile(rule[REGEX], 0 if rule[MATCH_CASE] else re.IGNORECASE)
+            except re.error:
+                compiled = re.compile("(?!)")
+            self.regexes[index] = compiled
+        return compiled.search(url) is not None
+
+    def find(self, exception, url, url_tokens, labels, type_bit, third_party, first_party_suffixes):
+        rules = self.rules
+        for index in self.domain_rules(self.domains[exception], labels):
+            if rule_applies(rules[index], type_bit, third_party, first_party_suffixes):
+                return rules[index]
+        token_index = self.tokens[exception]
+        for token in url_tokens:
+            for index in token_index.get(token, ()):
+                if rule_applies(rules[index], type_bit, third_party, first_party_suffixes) and self.matches_url(index, url):
+                    return rules[index]
+        for index in self.untokened[exception]:
+            if rule_applies(rules[index], type_bit, third_party, first_party_suffixes) and self.matches_url(index, url):
+                return rules[index]
+        return None
+
+    def match(self, url, first_party_host="", resource_type="other", host=None):
+        """
+        Returns the text of the rule that blocks `url`, or None if it may load. Callers that
+        already have the URL's host can pass it to skip parsing the URL.
+        """
+        if host is None:
+            found = HOST_RE.match(url)
+            host = found.group(1) if found else ""
+        host = host.lower()
+        if not host:
+            return None
+        first_party_host = (first_party_host or "").lower()
+        first_party_labels = first_party_host.split(".") if first_party_host else []
+        if first_party_labels and self.domain_rules(self.allowed_sites, first_party_labels):
+            return None
+        labels = host.split(".")
+        type_bit = RESOURCE_TYPES.get(resource_type, OTHER_TYPE)
+        third_party = bool(first_party_labels) and site_of(labels) != site_of(first_party_labels)
+        first_party_suffixes = [".".join(first_party_labels[index:]) for index in range(len(first_party_labels))]
+        url_tokens = set(TOKEN_RE.findall(url.lower()))
+        rule = self.find(False, url, url_tokens, labels, type_bit, third_party, first_party_suffixes)
+        if rule is None:
+            return None
+        if self.find(True, url, url_tokens, labels, type_bit, third_party, first_party_suffixes):
+            return None
+        return rule[TEXT]
+
+
+def filter_list_paths(location=DEFAULT_FILTER_DIR):
+    """Returns the filter list files in a directory, or the given list of paths that exist."""
+    if isinstance(location, str):
+        if not os.path.isdir(location):
+            return [location] if os.path.isfile(location) else []
+        return sorted(os.path.join(location, name) for name in os.listdir(location) if name.endswith(".txt"))
+    return [path for path in location if os.path.isfile(path)]
+
+
+def list_signature(paths):
+    signature = [CACHE_VERSION, marshal.version, list(sys.version_info[:2])]
+    for path in paths:
+        stat = os.stat(path)
+        signature.append((os.path.abspath(path), stat.st_size, stat.st_mtime_ns))
+    return signature
+
+
+def load_matcher(paths, cache_path=DEFAULT_FILTER_CACHE_PATH):
+    """
+    Returns a matcher for the filter lists at `paths`. The compiled matcher is kept in
+    `cache_path` and reused until a list changes, so lists are only parsed after an update.
+    """
+    signature = list_signature(paths)
+    if cache_path and os.path.exists(cache_path):
+        # The cache is one marshalled object holding only built-in types, the quickest form
+        # Python can load. Loading creates no cycles, so the collector is paused meanwhile.
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            with open(cache_path, 'rb') as f:
+                cached_signature, state = marshal.loads(f.read())
+            if cached_signature == signature:
+                return FilterMatcher.from_state(state)
+        except Exception as e:
+            print(f"Error reading filter cache: {e}")
+        finally:
+            if collecting:
+                gc.enable()
+
+    lines = []
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                lines.extend(f)
+        except OSError as e:
+            print(f"Error reading filter list {path}: {e}")
+    matcher = FilterMatcher.compile(lines)
+    if cache_path:
+        temporary_path = f"{cache_path}.tmp"
+        try:
+            with open(temporary_path, 'wb') as f:
+                marshal.dump((signature, matcher.state()), f)
+            os.replace(temporary_path, cache_path)
+        except (OSError, ValueError) as e:
+            print(f"Error writing filter cache: {e}")
+    return matcher
+
+
+# A small site in the shape of a news article page: its own assets plus ads and trackers.
+FIXTURE_RESOURCES = [
+    ("http://news.example/static/app.js", "script", 120_000),
+    ("http://news.example/static/site.css", "stylesheet", 40_000),
+    ("http://news.example/images/lead.jpg", "image", 180_000),
+    ("http://news.example/images/thumb-1.jpg", "image", 25_000),
+    ("http://news.example/images/thumb-2.jpg", "image", 25_000),
+    ("http://cdn.jsdelivr.example/npm/framework.min.js", "script", 90_000),
+    ("http://news.example/ads/banner-728x90.js", "script", 30_000),
+    ("http://pagead.adnetwork.example/pagead/show_ads.js", "script", 150_000),
+    ("http://pagead.adnetwork.example/pagead/creative/300x250.jpg", "image", 60_000),
+    ("http://securepubads.adnetwork.example/tag/js/gpt.js", "script", 110_000),
+    ("http://www.tracker-analytics.example/analytics.js", "script", 50_000),
+    ("http://www.tracker-analytics.example/collect?v=1&t=pageview", "ping", 100),
+    ("http://pixel.socialnet.example/tr?id=123&ev=PageView", "image", 50),
+    ("http://connect.socialnet.example/en_US/sdk.js", "script", 200_000),
+    ("http://widgets.recommend.example/loader.js?publisher=news", "script", 80_000),
+    ("http://widgets.recommend.example/frame.html", "subdocument", 70_000),
+    ("http://news.example/api/comments?article=42", "xmlhttprequest", 15_000),
+]
+
+FIXTURE_FILTERS = """! Fixture filter list in EasyList syntax
+||adnetwork.example^
+||tracker-analytics.example^$third-party
+||socialnet.example^$third-party,~subdocument
+/ads/banner-
+&ev=PageView
+||recommend.example/loader.js
+@@||news.example/api/$xmlhttprequest
+##.ad-slot
+news.example##.sponsored
+"""
+
+
+def synthetic_rules(count):
+    """Returns `count` rules shaped like EasyList's, none of which match the fixture site."""
+    rules = []
+    for index in range(count):
+        kind = index % 4
+        if kind == 0:
+            rules.append(f"||ads{index}.adhost{index % 97}.test^")
+        elif kind == 1:
+            rules.append(f"/banner{index}/*$image,third-party")
+        elif kind == 2:
+            rules.append(f"||cdn{index % 211}.test/track{index}.js$script")
+        else:
+            rules.append(f"-adunit{index}-$domain=site{index % 53}.test|~shop.site{index % 53}.test")
+    return rules
+
+
+class FixtureProxy:
+    """
+    Serves the fixture site's resources under their own host names by acting as an HTTP
+    proxy, so third-party requests really are made to other hosts.
+    """
+    def __init__(self, resources=FIXTURE_RESOURCES):
+        sizes = {url: size for url, kind, size in resources}
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                size = sizes.get(self.path)
+                if size is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Length", str(size))
+                self.end_headers()
+                self.wfile.write(b"x" * size)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def proxy_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def fetch_bytes(opener, url):
+    with opener.open(url) as response:
+        return len(response.read())
+
+
+def run_benchmark(paths=None, rule_count=50_000, iterations=20_000):
+    """
+    Loads the fixture site with and without blocking to measure bytes saved, and times
+    `match` over the site's requests plus unrelated URLs. Without `paths`, the fixture list
+    is padded with `rule_count` synthetic rules to the size of EasyList.
+    """
+    import tempfile
+    with tempfile.TemporaryDirectory() as directory:
+        if not paths:
+            list_path = os.path.join(directory, "fixture.txt")
+            with open(list_path, 'w') as f:
+                f.write(FIXTURE_FILTERS + "\n".join(synthetic_rules(rule_count)) + "\n")
+            paths = [list_path]
+        cache_path = os.path.join(directory, "filters.cache")
+        started = time.perf_counter()
+        matcher = load_matcher(paths, cache_path)
+        compile_ms = (time.perf_counter() - started) * 1e3
+        started = time.perf_counter()
+        load_matcher(paths, cache_path)
+        cached_load_ms = (time.perf_counter() - started) * 1e3
+
+    proxy = FixtureProxy().start()
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({"http": proxy.proxy_url}))
+    total_bytes = 0
+    loaded_bytes = 0
+    blocked = []
+    for url, kind, size in FIXTURE_RESOURCES:
+        received = fetch_bytes(opener, url)
+        total_bytes += received
+        rule = matcher.match(url, "news.example", kind)
+        if rule is None:
+            loaded_bytes += fetch_bytes(opener, url)
+        else:
+            blocked.append({"url": url, "rule": rule})
+    proxy.stop()
+
+    requests = [(url, "news.example", kind) for url, kind, size in FIXTURE_RESOURCES]
+    requests += [(f"https://static{index % 50}.site{index % 53}.test/assets/{index}/bundle-adunit{index}-x.js",
+                  f"site{index % 53}.test", "script") for index in range(200)]
+    started = time.perf_counter()
+    for index in range(iterations):
+        url, first_party, kind = requests[index % len(requests)]
+        matcher.match(url, first_party, kind)
+    elapsed = time.perf_counter() - started
+    return {
+        "rules": matcher.rule_count,
+        "compile_ms": compile_ms,
+        "cached_load_ms": cached_load_ms,
+        "matches_per_s": iterations / elapsed,
+        "us_per_match": elapsed / iterations * 1e6,
+        "requests": len(FIXTURE_RESOURCES),
+        "blocked": blocked,
+        "bytes_total": total_bytes,
+        "bytes_loaded": loaded_bytes,
+        "bytes_saved_ratio": 1 - loaded_bytes / total_bytes,
+    }
+
+
+if __name__ == "__main__":
+    # python content_filter.py [LIST ...]  (defaults to the fixture list padded with synthetic rules)
+    print(json.dumps(run_benchmark(sys.argv[1:]), indent=2))
@@ -0,0 +1,404 @@
+import os
+import sys
+import json
+import time
+import tempfile
+from PyQt6.QtCore import Qt, QObject, QTimer, QUrl, pyqtSignal
+from PyQt6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QListWidget, QListWidgetItem, QPushButton
+from PyQt6.QtWebEngineCore import QWebEngineDownloadRequest
+from ringzauber_paths import data_path
+from ringzauber_stats import percentile
+
+DEFAULT_DOWNLOADS_PATH = data_path('ringzauber_downloads.json')
+
+DownloadState = QWebEngineDownloadRequest.DownloadState
+STATE_NAMES = {
+    DownloadState.DownloadRequested: "Requested",
+    DownloadState.DownloadInProgress: "Downloading",
+    DownloadState.DownloadCompleted: "Completed",
+    DownloadState.DownloadCancelled: "Cancelled",
+    DownloadState.DownloadInterrupted: "Interrupted",
+}
+FINISHED_STATES = ("Completed", "Cancelled")
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+class DownloadManager(QObject):
+    """
+    Tracks downloads by id, runs at most `max_active` at once and remembers them across restarts.
+
+    Downloads beyond the limit are accepted paused and queued, since Qt cancels a request that
+    is not accepted inside `downloadRequested`. Progress signals only mark a download as changed;
+    the list is redrawn for changed downloads every `refresh_interval` ms, and the records are
+    saved at most once per `save_interval` ms. Interrupted downloads are retried up to
+    `max_retries` times with a growing delay. `restart(url, path)` is called to request a
+    download from an earlier session again.
+
+    `changed` carries the ids of the downloads whose records changed, or None when records
+    were removed and the whole list needs redrawing.
+    """
+    changed = pyqtSignal(object)
+
+    def __init__(self, path=DEFAULT_DOWNLOADS_PATH, max_active=3, refresh_interval=250, save_interval=1000, max_retries=3,
+                 restart=None, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.restart = restart
+        self.max_active = max_active
+        self.max_retries = max_retries
+        self.records = {}
+        self.downloads = {}
+        self.active = set()
+        # Used as an ordered set: the oldest waiting download starts first.
+        self.waiting = {}
+        self.retries = {}
+        self.dirty = set()
+        self.restarts = {}
+        self.next_restored_id = -1
+        self.load()
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(refresh_interval)
+        self.refresh_timer.timeout.connect(self.flush_changes)
+        self.refresh_timer.start()
+
+        self.save_timer = QTimer(self)
+        self.save_timer.setSingleShot(True)
+        self.save_timer.setInterval(save_interval)
+        self.save_timer.timeout.connect(self.save)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                records = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error reading download records: {e}")
+            return
+        for record in records:
+            # Downloads that were running when the browser closed are resumable, not running.
+            if record["state"] not in FINISHED_STATES:
+                record["state"] = "Interrupted"
+            record["id"] = self.next_restored_id
+            self.next_restored_id -= 1
+            self.records[record["id"]] = record
+
+    def save(self):
+        records = [{key: value for key, value in record.items() if key != "id"} for record in self.records.values()]
+        temporary_path = f"{self.path}.tmp"
+        try:
+            with open(temporary_path, 'w') as f:
+                json.dump(records, f)
+            os.replace(temporary_path, self.path)
+        except OSError as e:
+            print(f"Error saving download records: {e}")
+
+    def schedule_save(self):
+        if not self.save_timer.isActive():
+            self.save_timer.start()
+
+    def is_restart(self, url):
+        return url in self.restarts
+
+    def add(self, download):
+        """Takes ownership of an accepted download request."""
+        download_id = download.id()
+        record = {
+            "id": download_id,
+            "url": download.url().toString(),
+            "directory": download.downloadDirectory(),
+            "file_name": download.downloadFileName(),
+            "received": 0,
+            "total": download.totalBytes(),
+            "state": "Queued",
+            "started": time.time(),
+        }
+        # A restarted download replaces the record it was restarted from.
+        replaced_id = self.restarts.pop(record["url"], None)
+        if replaced_id is not None:
+            self.records.pop(replaced_id, None)
+        self.records[download_id] = record
+        self.downloads[download_id] = download
+
+        download.receivedBytesChanged.connect(lambda download_id=download_id: self.dirty.add(download_id))
+        download.totalBytesChanged.connect(lambda download_id=download_id: self.dirty.add(download_id))
+        download.stateChanged.connect(lambda state, download_id=download_id: self.on_state_changed(download_id, state))
+        download.isPausedChanged.connect(lambda paused, download_id=download_id: self.dirty.add(download_id))
+
+        if len(self.active) < self.max_active:
+            self.active.add(download_id)
+        else:
+            download.pause()
+            self.waiting[download_id] = None
+        self.dirty.add(download_id)
+        self.schedule_save()
+
+    def on_state_changed(self, download_id, state):
+        record = self.records.get(download_id)
+        if record is None:
+            return
+        self.dirty.add(download_id)
+        if state in (DownloadState.DownloadCompleted, DownloadState.DownloadCancelled, DownloadState.DownloadInterrupted):
+            self.active.discard(download_id)
+            self.start_waiting()
+        if state == DownloadState.DownloadInterrupted and not self.downloads[download_id].isFinished():
+            retries = self.retries.get(download_id, 0)
+            if retries < self.max_retries:
+                self.retries[download_id] = retries + 1
+                QTimer.singleShot(2000 * (retries + 1), lambda download_id=download_id: self.resume(download_id))
+        self.schedule_save()
+
+    def start_waiting(self):
+        while self.waiting and len(self.active) < self.max_active:
+            download_id = next(iter(self.waiting))
+            del self.waiting[download_id]
+            download = self.downloads.get(download_id)
+            if download is None or download.isFinished():
+                continue
+            self.active.add(download_id)
+            download.resume()
+            self.dirty.add(download_id)
+
+    def flush_changes(self):
+        """Copies the latest progress of every changed download into its record."""
+        if not self.dirty:
+            return
+        changed = self.dirty
+        self.dirty = set()
+        for download_id in changed:
+            download = self.downloads.get(download_id)
+            record = self.records.get(download_id)
+            if download is None or record is None:
+                continue
+            record["received"] = download.receivedBytes()
+            record["total"] = download.totalBytes()
+            record["file_name"] = download.downloadFileName()
+            state = STATE_NAMES.get(download.state(), "Unknown")
+            if state == "Downloading" and download.isPaused():
+                state = "Queued" if download_id in self.waiting else "Paused"
+            record["state"] = state
+        self.changed.emit(changed)
+
+    def cancel(self, download_id):
+        download = self.downloads.get(download_id)
+        if download is not None:
+            download.cancel()
+
+    def pause(self, download_id):
+        download = self.downloads.get(download_id)
+        if download is not None and not download.isFinished():
+            download.pause()
+            self.waiting.pop(download_id, None)
+            self.active.discard(download_id)
+            self.start_waiting()
+
+    def resume(self, download_id):
+        """Resumes a paused or interrupted download, restarting it if it is from an earlier session."""
+        download = self.downloads.get(download_id)
+        record = self.records.get(download_id)
+        if record is None:
+            return
+        if download is not None:
+            if not download.isFinished() and download_id not in self.active:
+                self.waiting[download_id] = None
+                self.start_waiting()
+        elif download is None and record["state"] == "Interrupted" and self.restart is not None:
+            # Chromium's partial-download state does not survive a restart, so the
+            # download is requested again and replaces this record when it arrives.
+            self.restarts[record["url"]] = download_id
+            self.restart(QUrl(record["url"]), os.path.join(record["directory"], record["file_name"]))
+        self.dirty.add(download_id)
+
+    def clear_finished(self):
+        for download_id, record in list(self.records.items()):
+            if record["state"] in FINISHED_STATES:
+                del self.records[download_id]
+                self.downloads.pop(download_id, None)
+                self.retries.pop(download_id, None)
+        self.changed.emit(None)
+        self.schedule_save()
+
+
+class DownloadsDialog(QDialog):
+    """Lists every download. Rows are looked up by download id, so an update touches only its own row."""
+    def __init__(self, manager, parent=None):
+        super().__init__(parent)
+        self.manager = manager
+        self.items = {}
+        self.setWindowTitle("Downloads")
+        self.resize(520, 360)
+
+        layout = QVBoxLayout(self)
+        self.list_widget = QListWidget()
+        layout.addWidget(self.list_widget)
+
+        buttons = QHBoxLayout()
+        for label, handler in (("Pause", self.pause_selected), ("Resume", self.resume_selected),
+                               ("Cancel", self.cancel_selected), ("Clear Finished", self.manager.clear_finished)):
+            button = QPushButton(label)
+            button.clicked.connect(handler)
+            buttons.addWidget(button)
+        layout.addLayout(buttons)
+
+        self.manager.changed.connect(self.refresh)
+
+    def refresh(self, download_ids=None):
+        """Redraws the rows of `download_ids`, or every row if it is None."""
+        if not self.isVisible():
+            return
+        records = self.manager.records
+        if download_ids is None:
+            for download_id in [download_id for download_id in self.items if download_id not in records]:
+                self.list_widget.takeItem(self.list_widget.row(self.items.pop(download_id)))
+            download_ids = records
+        for download_id in download_ids:
+            record = records.get(download_id)
+            if record is None:
+                continue
+            item = self.items.get(download_id)
+            if item is None:
+                item = self.items[download_id] = QListWidgetItem()
+                item.setData(Qt.ItemDataRole.UserRole, download_id)
+                self.list_widget.addItem(item)
+            text = self.describe(record)
+            if item.text() != text:
+                item.setText(text)
+
+    def describe(self, record):
+        progress = format_size(record["received"])
+        if record["total"] > 0:
+            progress += f" of {format_size(record['total'])} ({record['received'] * 100 // record['total']}%)"
+        return f"{record['state']}: {record['file_name']} - {progress}"
+
+    def selected_id(self):
+        item = self.list_widget.currentItem()
+        return item.data(Qt.ItemDataRole.UserRole) if item is not None else None
+
+    def pause_selected(self):
+        download_id = self.selected_id()
+        if download_id is not None:
+            self.manager.pause(download_id)
+
+    def resume_selected(self):
+        download_id = self.selected_id()
+        if download_id is not None:
+            self.manager.resume(download_id)
+
+    def cancel_selected(self):
+        download_id = self.selected_id()
+        if download_id is not None:
+            self.manager.cancel(download_id)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+
+
+class SimulatedDownload(QObject):
+    """Stands in for a QWebEngineDownloadRequest, which only WebEngine can create; `advance` makes progress."""
+    receivedBytesChanged = pyqtSignal()
+    totalBytesChanged = pyqtSignal()
+    stateChanged = pyqtSignal(object)
+    isPausedChanged = pyqtSignal(bool)
+
+    def __init__(self, download_id, total, parent=None):
+        super().__init__(parent)
+        self.download_id = download_id
+        self.total = total
+        self.received = 0
+        self.current_state = DownloadState.DownloadInProgress
+        self.paused = False
+
+    def id(self):
+        return self.download_id
+
+    def url(self):
+        return QUrl(f"http://downloads.test/file-{self.download_id}.bin")
+
+    def downloadDirectory(self):
+        return tempfile.gettempdir()
+
+    def downloadFileName(self):
+        return f"file-{self.download_id}.bin"
+
+    def totalBytes(self):
+        return self.total
+
+    def receivedBytes(self):
+        return self.received
+
+    def state(self):
+        return self.current_state
+
+    def isPaused(self):
+        return self.paused
+
+    def isFinished(self):
+        return self.current_state in (DownloadState.DownloadCompleted, DownloadState.DownloadCancelled)
+
+    def pause(self):
+        self.paused = True
+        self.isPausedChanged.emit(True)
+
+    def resume(self):
+        self.paused = False
+        self.isPausedChanged.emit(False)
+
+    def cancel(self):
+        self.set_state(DownloadState.DownloadCancelled)
+
+    def set_state(self, state):
+        self.current_state = state
+        self.stateChanged.emit(state)
+
+    def advance(self, size):
+        self.received = min(self.total, self.received + size)
+        self.receivedBytesChanged.emit()
+        if self.received == self.total:
+            self.set_state(DownloadState.DownloadCompleted)
+
+
+def run_benchmark(downloads=500, ticks=40, few=5):
+    """
+    Runs `downloads` simulated downloads at once with the downloads list open, and times a
+    refresh tick after `few` of them made progress and after all of them did.
+    """
+    from PyQt6.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv)
+    results = {"downloads": downloads}
+    with tempfile.TemporaryDirectory() as directory:
+        manager = DownloadManager(os.path.join(directory, "downloads.json"), max_active=downloads)
+        manager.refresh_timer.stop()
+        dialog = DownloadsDialog(manager)
+        dialog.show()
+        simulated = [SimulatedDownload(number, 1 << 40) for number in range(1, downloads + 1)]
+        for download in simulated:
+            manager.add(download)
+        manager.flush_changes()
+        app.processEvents()
+
+        for name, count in (("few_changed", few), ("all_changed", downloads)):
+            samples = []
+            for tick in range(ticks):
+                for offset in range(count):
+                    simulated[(tick * count + offset) % downloads].advance(65536)
+                started = time.perf_counter()
+                manager.flush_changes()
+                samples.append((time.perf_counter() - started) * 1e3)
+            results[f"{name}_tick_p50_ms"] = percentile(samples, 0.5)
+            results[f"{name}_tick_p95_ms"] = percentile(samples, 0.95)
+        dialog.close()
+        manager.save_timer.stop()
+    results["rows"] = len(dialog.items)
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 500), indent=2))
@@ -0,0 +1,177 @@
+import os
+import sys
+import json
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = json.dumps({"command": "NONE", "query": "", "message": "Good day! How may I be of assistance?"})
+
+
+class FakeModelServer:
+    """
+    A local stand-in for the Gemini REST API.
+
+    Replies are looked up in `script` by the text of the last user message, falling back to
+    `default_reply`. `latency` is the delay before the first byte and `chunk_delay` the delay
+    between streamed chunks of `chunk_size` characters. Point praterich_ai at it by setting
+    PRATERICH_BASE_URL to `base_url` before the module is imported.
+
+    Context caches can be created; their bodies are kept in `caches`. A request that refers
+    to a cache the server does not have fails with 404, as an expired one would.
+
+    Faults can be injected: a request fails with `error_status` with probability
+    `error_rate`, and waits `slow_latency` instead of `latency` with probability `slow_rate`,
+    which gives the latency a long tail. Both are drawn from a generator seeded with `seed`.
+    """
+    def __init__(self, script=None, default_reply=DEFAULT_REPLY, latency=0.0, chunk_delay=0.0, chunk_size=16,
+                 host="127.0.0.1", port=0, error_rate=0.0, error_status=503, slow_rate=0.0, slow_latency=0.0,
+                 seed=1):
+        self.script = script or {}
+        self.default_reply = default_reply
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.chunk_delay = chunk_delay
+        self.chunk_size = chunk_size
+        self.requests = []
+        self.caches = {}
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reply_for(self, body, path=""):
+        contents = body.get("contents") or []
+        text = ""
+        if contents:
+            parts = contents[-1].get("parts") or []
+            text = "".join(part.get("text", "") for part in parts)
+        self.requests.append({"text": text, "body": body, "path": path})
+        reply = self.script.get(text, self.default_reply)
+        return reply(text) if callable(reply) else reply
+
+    def draw_fault(self):
+        """Returns (fails, delay before the first byte) for the next request."""
+        with self.random_lock:
+            fails = self.random.random() < self.error_rate
+            slow = self.random.random() < self.slow_rate
+        return fails, self.slow_latency if slow else self.latency
+
+    def _make_handler(self):
+        server = self
+
+        def send_json(handler, status, value):
+            payload = json.dumps(value).encode("utf-8")
+            handler.send_response(status)
+            handler.send_header("Content-Type", "application/json")
+            handler.send_header("Content-Length", str(len(payload)))
+            handler.end_headers()
+            handler.wfile.write(payload)
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if self.path.split("?", 1)[0].endswith("/cachedContents"):
+                    name = f"cachedContents/fake-{len(server.caches) + 1}"
+                    server.caches[name] = body
+                    send_json(self, 200, {"name": name, "model": body.get("model", ""),
+                                          "expireTime": "2099-01-01T00:00:00Z"})
+                    return
+                cached = server.caches.get(body.get("cachedContent")) if body.get("cachedContent") else {}
+                if cached is None:
+                    send_json(self, 404, {"error": {"code": 404, "message": "Cached content not found.",
+                                                    "status": "NOT_FOUND"}})
+                    return
+                reply = server.reply_for(body, self.path)
+                fails, delay = server.draw_fault()
+                time.sleep(delay)
+                if fails:
+                    send_json(self, server.error_status, {"error": {"code": server.error_status,
+                                                                    "message": "Injected failure.",
+                                                                    "status": "UNAVAILABLE"}})
+                    return
+
+                if ":streamGenerateContent" in self.path:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.end_headers()
+                    for start in range(0, len(reply), server.chunk_size):
+                        event = _response_json(reply[start:start + server.chunk_size], body, cached, finished=False)
+                        self.wfile.write(f"data: {json.dumps(event)}\r\n\r\n".encode("utf-8"))
+                        self.wfile.flush()
+                        time.sleep(server.chunk_delay)
+                    self.wfile.write(f"data: {json.dumps(_response_json('', body, cached, finished=True))}\r\n\r\n".encode("utf-8"))
+                else:
+                    send_json(self, 200, _response_json(reply, body, cached, finished=True))
+
+        return Handler
+
+
+def _response_json(text, body, cached, finished):
+    prompt_chars = len(json.dumps(body.get("contents", ""))) + len(json.dumps(body.get("systemInstruction", "")))
+    cached_chars = len(json.dumps(cached.get("systemInstruction", ""))) if cached else 0
+    response = {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}],
+        "usageMetadata": {"promptTokenCount": (prompt_chars + cached_chars) // 4, "candidatesTokenCount": len(text) // 4},
+    }
+    if cached_chars:
+        response["usageMetadata"]["cachedContentTokenCount"] = cached_chars // 4
+    if finished:
+        response["candidates"][0]["finishReason"] = "STOP"
+    return response
+
+
+def measure_time_to_first_token(reply, latency=0.2, chunk_delay=0.05):
+    """Compares time-to-first-token of the streaming path with the blocking path."""
+    server = FakeModelServer(default_reply=reply, latency=latency, chunk_delay=chunk_delay).start()
+    os.environ["PRATERICH_BASE_URL"] = server.base_url
+    os.environ.setdefault("PRATERICH_API_KEY", "fake-key")
+    try:
+        import praterich_ai
+
+        start = time.perf_counter()
+        praterich_ai.get_praterich_response_text("blocking", use_cache=False)
+        blocking = time.perf_counter() - start
+
+        start = time.perf_counter()
+        first_token = None
+        for _ in praterich_ai.stream_praterich_response_text("streaming", use_cache=False):
+            if first_token is None:
+                first_token = time.perf_counter() - start
+        streaming_total = time.perf_counter() - start
+    finally:
+        server.stop()
+
+    return {
+        "blocking_ms": blocking * 1e3,
+        "streaming_first_token_ms": first_token * 1e3 if first_token is not None else None,
+        "streaming_total_ms": streaming_total * 1e3,
+    }
+
+
+if __name__ == "__main__":
+    reply = sys.argv[1] if len(sys.argv) > 1 else "Indeed, " + "a rather long and considered answer. " * 20
+    print(json.dumps(measure_time_to_first_token(reply), indent=2))
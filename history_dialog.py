@@ -0,0 +1,55 @@
+import time
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
+from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLineEdit, QListWidget, QListWidgetItem
+
+
+class HistoryDialog(QDialog):
+    """Lists recent pages, or the pages matching the search box as the user types."""
+    open_url = pyqtSignal(str)
+
+    def __init__(self, history, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.setWindowTitle("History")
+        self.resize(640, 480)
+
+        layout = QVBoxLayout(self)
+        self.search_bar = QLineEdit()
+        self.search_bar.setPlaceholderText("Search history")
+        layout.addWidget(self.search_bar)
+        self.results = QListWidget()
+        self.results.setWordWrap(True)
+        layout.addWidget(self.results)
+
+        # Wait for a pause in typing rather than querying on every keystroke.
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.refresh)
+        self.search_bar.textChanged.connect(self.search_timer.start)
+        self.search_bar.returnPressed.connect(self.refresh)
+        self.results.itemActivated.connect(self.on_item_activated)
+
+    def refresh(self):
+        text = self.search_bar.text().strip()
+        self.results.clear()
+        if text:
+            for row in self.history.search(text, limit=50):
+                self._add_row(row["title"], row["url"], row["snippet"])
+        else:
+            for row in self.history.recent(limit=100):
+                visited = time.strftime("%d %b %H:%M", time.localtime(row["visited_at"]))
+                self._add_row(row["title"], row["url"], visited)
+
+    def _add_row(self, title, url, detail):
+        item = QListWidgetItem(f"{title or url}\n{url}\n{detail}")
+        item.setData(Qt.ItemDataRole.UserRole, url)
+        self.results.addItem(item)
+
+    def on_item_activated(self, item):
+        self.open_url.emit(item.data(Qt.ItemDataRole.UserRole))
+
+    def showEvent(self, event):
+        self.refresh()
+        self.search_bar.setFocus()
+        super().showEvent(event)
@@ -0,0 +1,365 @@
+import os
+import re
+import sys
+import json
+import time
+import queue
+import random
+import sqlite3
+import tempfile
+import threading
+from ringzauber_paths import data_path
+from ringzauber_stats import percentile
+
+DEFAULT_HISTORY_PATH = data_path('ringzauber_history.sqlite3')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL DEFAULT '',
+    text TEXT NOT NULL DEFAULT '',
+    visit_count INTEGER NOT NULL DEFAULT 0,
+    last_visit REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS visits (
+    id INTEGER PRIMARY KEY,
+    page_id INTEGER NOT NULL REFERENCES pages(id),
+    visited_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS visits_visited_at ON visits(visited_at);
+CREATE INDEX IF NOT EXISTS pages_last_visit ON pages(last_visit);
+CREATE INDEX IF NOT EXISTS pages_visit_count ON pages(visit_count);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(
+    url, title, text, content='pages', content_rowid='id', tokenize='unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS pages_fts_insert AFTER INSERT ON pages BEGIN
+    INSERT INTO pages_fts(rowid, url, title, text) VALUES (new.id, new.url, new.title, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS pages_fts_update AFTER UPDATE OF title, text ON pages BEGIN
+    INSERT INTO pages_fts(pages_fts, rowid, url, title, text) VALUES ('delete', old.id, old.url, old.title, old.text);
+    INSERT INTO pages_fts(rowid, url, title, text) VALUES (new.id, new.url, new.title, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS pages_fts_delete AFTER DELETE ON pages BEGIN
+    INSERT INTO pages_fts(pages_fts, rowid, url, title, text) VALUES ('delete', old.id, old.url, old.title, old.text);
+END;
+"""
+
+
+def fts_query(text):
+    """Turns free text into an FTS5 query that matches every word, the last one as a prefix."""
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words[:-1]] + [f'"{words[-1]}"*']
+    return " ".join(terms)
+
+
+def make_snippet(text, words, width=120):
+    """Returns the part of `text` around the first occurrence of any of `words`, with the words bracketed."""
+    pattern = re.compile(r"\b(" + "|".join(re.escape(word) for word in words) + r")\w*", re.IGNORECASE)
+    found = pattern.search(text)
+    if found is None:
+        return text[:width]
+    start = max(0, found.start() - width // 3)
+    excerpt = " ".join(text[start:start + width].split())
+    excerpt = pattern.sub(lambda m: f"[{m.group(0)}]", excerpt)
+    return ("..." if start else "") + excerpt + ("..." if start + width < len(text) else "")
+
+
+class HistoryStore:
+    """
+    Browsing history in SQLite with a full-text index over URL, title and page text.
+
+    Writes are queued and committed in batches by a background thread, so recording a
+    visit never waits on disk. Queries use a separate read connection and only see
+    committed writes, so they never wait for the writer either.
+
+    Nothing touches the disk until `start`; visits recorded before then are queued and
+    queries find nothing.
+    """
+    def __init__(self, path=DEFAULT_HISTORY_PATH, batch_size=500, flush_interval=0.5, max_text_chars=20000,
+                 exact_limit=1000, start=True):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_text_chars = max_text_chars
+        self.exact_limit = exact_limit
+        self.queue = queue.Queue()
+        # Words on more than `exact_limit` pages, with their page counts, recounted in the
+        # background as pages are added; see `search`.
+        self.common_words = {}
+        self.counting = threading.Lock()
+        self.texts_since_count = 0
+        self.counted_pages = 0
+
+        self.reader = None
+        self.thread = None
+        self.read_lock = threading.Lock()
+        self.flushed = threading.Condition()
+        self.pending = 0
+        if start:
+            self.start()
+
+    def start(self):
+        """Opens the database and starts the writer."""
+        if self.thread is not None:
+            return
+        writer = self._connect()
+        writer.executescript(SCHEMA)
+        writer.commit()
+        self.reader = self._connect()
+
+        self.thread = threading.Thread(target=self._write_loop, args=(writer,), name="history-writer", daemon=True)
+        self.thread.start()
+        self._count_words_later()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def record_visit(self, url, title="", visited_at=None):
+        self._enqueue(("visit", url, title, visited_at or time.time()))
+
+    def record_page_text(self, url, title, text):
+        self._enqueue(("text", url, title, text[:self.max_text_chars]))
+
+    def _enqueue(self, item):
+        with self.flushed:
+            self.pending += 1
+        self.queue.put(item)
+
+    def flush(self, timeout=5.0):
+        """Blocks until every queued write has been committed."""
+        with self.flushed:
+            self.flushed.wait_for(lambda: self.pending == 0, timeout)
+
+    def close(self):
+        # Started here if need be, so that visits recorded before `start` are not lost.
+        self.start()
+        self.queue.put(None)
+        self.thread.join(timeout=5.0)
+
+    def _write_loop(self, connection):
+        running = True
+        while running:
+            batch = []
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.flush_interval
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if item is None:
+                running = False
+
+            try:
+                self._write_batch(connection, batch)
+            except sqlite3.Error as e:
+                print(f"Error writing browsing history: {e}")
+            with self.flushed:
+                self.pending -= len(batch)
+                self.flushed.notify_all()
+            self.texts_since_count += sum(1 for item in batch if item and item[0] == "text")
+            if self.texts_since_count > max(500, self.counted_pages // 10):
+                self._count_words_later()
+        connection.close()
+
+    def _count_words_later(self):
+        """Recounts the common words on a thread of its own; it reads the whole index."""
+        if self.counting.acquire(blocking=False):
+            self.texts_since_count = 0
+            threading.Thread(target=self._count_words, name="history-word-counts", daemon=True).start()
+
+    def count_words(self):
+        """Recounts the common words now, waiting for a recount already running."""
+        self.counting.acquire()
+        self._count_words()
+
+    def _count_words(self):
+        # Called with `counting` held, which it releases.
+        try:
+            connection = self._connect()
+            try:
+                connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp.pages_vocab USING fts5vocab(main, pages_fts, row)")
+                common = dict(connection.execute(
+                    "SELECT term, doc FROM temp.pages_vocab WHERE doc > ?", (self.exact_limit,)
+                ).fetchall())
+                self.counted_pages = connection.execute("SELECT count(*) FROM pages").fetchone()[0]
+            finally:
+                connection.close()
+            self.common_words = common
+        except sqlite3.Error as e:
+            print(f"Error counting history words: {e}")
+        finally:
+            self.counting.release()
+
+    def scoring_terms(self, words):
+        """
+        Returns the FTS5 terms of the words in a query that are on at most `exact_limit` pages,
+        the last word as a prefix, which bm25 scores the query by.
+        """
+        common = self.common_words
+        terms = [f'"{word}"' for word in words[:-1] if word not in common]
+        last = words[-1]
+        # A prefix is only known to be rare once it is long enough that few words share it.
+        if len(last) >= 3 and not any(term.startswith(last) for term in common):
+            terms.append(f'"{last}"*')
+        return terms
+
+    def _write_batch(self, connection, batch):
+        visits = [item for item in batch if item[0] == "visit"]
+        texts = [item for item in batch if item[0] == "text"]
+        with connection:
+            connection.executemany(
+                "INSERT INTO pages (url, title) VALUES (?, ?) ON CONFLICT(url) DO NOTHING",
+                [(url, title) for _, url, title, _ in visits + texts]
+            )
+            connection.executemany(
+                "UPDATE pages SET visit_count = visit_count + 1, last_visit = max(last_visit, ?) WHERE url = ?",
+                [(visited_at, url) for _, url, _, visited_at in visits]
+            )
+            connection.executemany(
+                "INSERT INTO visits (page_id, visited_at) SELECT id, ? FROM pages WHERE url = ?",
+                [(visited_at, url) for _, url, _, visited_at in visits]
+            )
+            connection.executemany(
+                "UPDATE pages SET title = ?, text = ? WHERE url = ? AND (title != ? OR text != ?)",
+                [(title, text, url, title, text) for _, url, title, text in texts]
+            )
+            connection.executemany(
+                "UPDATE pages SET title = ? WHERE url = ? AND title = '' AND ? != ''",
+                [(title, url, title) for _, url, title, _ in visits]
+            )
+
+    def _rows(self, sql, params):
+        if self.reader is None:
+            return []
+        with self.read_lock:
+            cursor = self.reader.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def search(self, text, limit=20):
+        """
+        Returns the pages best matching `text`, most relevant first.
+
+        Every page containing all the words is ranked by bm25, but only the words on at most
+        `exact_limit` pages are scored: FTS5 reads every page a scored word is on, and the
+        words on more pages than that, which bm25 weighs least, only filter the matches. A
+        query made only of such words returns its most visited recently added matches.
+        This keeps queries within a few milliseconds on a large history.
+        """
+        match = fts_query(text)
+        if match is None or self.reader is None:
+            return []
+        words = re.findall(r"\w+", text.lower())
+        terms = self.scoring_terms(words)
+        with self.read_lock:
+            if not terms:
+                ids = [rowid for rowid, in self.reader.execute(
+                    "SELECT rowid FROM pages_fts WHERE pages_fts MATCH ? ORDER BY rowid DESC LIMIT ?",
+                    (match, limit)
+                )]
+            elif len(terms) == len(words):
+                ids = [rowid for rowid, in self.reader.execute(
+                    "SELECT rowid FROM pages_fts WHERE pages_fts MATCH ? ORDER BY bm25(pages_fts, 2.0, 4.0, 1.0) LIMIT ?",
+                    (match, limit)
+                )]
+            else:
+                matching = {rowid for rowid, in self.reader.execute(
+                    "SELECT rowid FROM pages_fts WHERE pages_fts MATCH ?", (match,)
+                )}
+                scored = self.reader.execute(
+                    "SELECT rowid FROM pages_fts WHERE pages_fts MATCH ? ORDER BY bm25(pages_fts, 2.0, 4.0, 1.0)",
+                    (" ".join(terms),)
+                )
+                ids = [rowid for rowid, in scored if rowid in matching][:limit]
+        order = {rowid: index for index, rowid in enumerate(ids)}
+        rows = self._rows(
+            "SELECT id, url, title, text, visit_count, last_visit FROM pages WHERE id IN "
+            f"({', '.join('?' * len(ids))})", ids
+        )
+        if terms:
+            rows.sort(key=lambda row: order[row["id"]])
+        else:
+            rows.sort(key=lambda row: -row["visit_count"])
+        # FTS5's snippet() re-tokenizes the whole page, so snippets are cut here instead.
+        for row in rows:
+            del row["id"]
+            row["snippet"] = make_snippet(row.pop("text"), words)
+        return rows
+
+    def recent(self, limit=50):
+        return self._rows(
+            "SELECT p.url, p.title, v.visited_at FROM visits v JOIN pages p ON p.id = v.page_id "
+            "ORDER BY v.visited_at DESC LIMIT ?",
+            (limit,)
+        )
+
+    def most_visited_with_prefix(self, prefix):
+        """Returns the most visited URL starting with `prefix`, or None. Uses the index on url."""
+        rows = self._rows(
+            "SELECT url FROM pages WHERE url >= ? AND url < ? ORDER BY visit_count DESC LIMIT 1",
+            (prefix, prefix + "\uffff")
+        )
+        return rows[0]["url"] if rows else None
+
+    def top_sites(self, limit=8):
+        return self._rows(
+            "SELECT url, title, visit_count, last_visit FROM pages ORDER BY visit_count DESC LIMIT ?",
+            (limit,)
+        )
+
+
+def run_benchmark(visits=500000, pages=50000, queries=200):
+    """Fills a temporary store with synthetic visits and reports write and query performance."""
+    random.seed(1)
+    # A Zipf-like vocabulary, so a few words are very common and most are rare.
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    vocabulary = ["".join(random.choices(letters, k=random.randint(3, 10))) for _ in range(20000)]
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    words = random.choices(vocabulary, weights, k=200000)
+    with tempfile.TemporaryDirectory() as directory:
+        store = HistoryStore(os.path.join(directory, "history.sqlite3"), batch_size=5000)
+        urls = [f"https://site{index % 2000}.example/{'/'.join(random.sample(words, 2))}/{index}" for index in range(pages)]
+
+        start = time.perf_counter()
+        for url in urls:
+            store.record_page_text(url, " ".join(random.sample(words, 4)).title(), " ".join(random.sample(words, 200)))
+        now = time.time()
+        for index in range(visits):
+            store.record_visit(urls[random.randrange(pages)], visited_at=now - index)
+        store.flush(timeout=None)
+        insert_seconds = time.perf_counter() - start
+        store.count_words()
+
+        latencies = []
+        for _ in range(queries):
+            text = " ".join(random.sample(words, 2))
+            start = time.perf_counter()
+            store.search(text)
+            latencies.append(time.perf_counter() - start)
+        store.close()
+
+    return {
+        "visits": visits,
+        "pages": pages,
+        "writes_per_second": (visits + pages) / insert_seconds,
+        "query_p50_ms": percentile(latencies, 0.5) * 1e3,
+        "query_p99_ms": percentile(latencies, 0.99) * 1e3,
+    }
+
+
+if __name__ == "__main__":
+    visits = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    print(json.dumps(run_benchmark(visits=visits), indent=2))
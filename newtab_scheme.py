@@ -0,0 +1,200 @@
+import os
+import sys
+import json
+import html
+import time
+from PyQt6.QtCore import Qt, QBuffer, QByteArray, QIODevice, QUrl, QSize
+from PyQt6.QtGui import QImage
+from PyQt6.QtWebEngineCore import QWebEngineUrlScheme, QWebEngineUrlSchemeHandler, QWebEngineUrlRequestJob
+
+NEW_TAB_SCHEME = b"ringzauber"
+NEW_TAB_URL = "ringzauber://newtab/"
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_PATH = os.path.join(BASE_DIR, 'new_tab.html')
+LOGO_PATH = os.path.join(BASE_DIR, 'praterich_icon.png')
+BACKGROUND_PATH = os.path.join(BASE_DIR, 'Screenshot_2024-06-24-18-38-08.png')
+FONT_PATH = os.path.join(BASE_DIR, 'Roboto.ttf')
+
+FONT_FACE = """@font-face {
+            font-family: 'Roboto';
+            src: url('Roboto.ttf') format('truetype');
+            font-weight: normal;
+            font-style: normal;
+            font-display: swap;
+        }"""
+
+
+def register_scheme():
+    """Registers the ringzauber:// scheme. Must be called before the QApplication is created."""
+    scheme = QWebEngineUrlScheme(NEW_TAB_SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    scheme.setFlags(QWebEngineUrlScheme.Flag.SecureScheme | QWebEngineUrlScheme.Flag.LocalAccessAllowed)
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+
+def resized_image(path, width, fmt, quality=-1):
+    """Returns the image at `path` scaled down to `width` pixels wide and encoded as `fmt`, or None."""
+    image = QImage(path)
+    if image.isNull():
+        print(f"Error: Could not load image for the new tab page: {path}")
+        return None
+    if image.width() > width:
+        image = image.scaledToWidth(width, Qt.TransformationMode.SmoothTransformation)
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    image.save(buffer, fmt, quality)
+    buffer.close()
+    return bytes(data)
+
+
+def render_shortcuts(top_sites, recent_tabs):
+    """Builds the top sites and recently closed tabs markup from a snapshot."""
+    sections = []
+    for title, entries in (("Top sites", top_sites), ("Recently closed", recent_tabs)):
+        links = "".join(
+            f'<a href="{html.escape(entry["url"])}" title="{html.escape(entry["url"])}">'
+            f'{html.escape(entry.get("title") or entry["url"])}</a>'
+            for entry in entries if entry.get("url")
+        )
+        if links:
+            sections.append(f'<div class="shortcuts-title">{title}</div><div class="shortcuts">{links}</div>')
+    return "\n        ".join(sections)
+
+
+class NewTabSchemeHandler(QWebEngineUrlSchemeHandler):
+    """
+    Serves ringzauber://newtab/ from memory.
+
+    The page is rendered from `new_tab.html` and the latest snapshot of top sites and
+    recently closed tabs whenever `set_snapshot` changes it, so a request only copies bytes.
+    The logo and background are scaled down once, on first request, and kept.
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        try:
+            with open(TEMPLATE_PATH, 'r', encoding='utf-8') as f:
+                self.template = f.read()
+        except OSError as e:
+            print(f"Error reading new tab page: {e}")
+            self.template = "<!DOCTYPE html><title>New Tab</title>"
+        font_face = FONT_FACE if os.path.exists(FONT_PATH) else ""
+        self.template = self.template.replace("/*FONT_FACE*/", font_face)
+        self.snapshot = None
+        self.page = b""
+        self.set_snapshot([], [])
+
+        # path -> (mime type, function building the bytes); results are cached in `assets`.
+        self.builders = {
+            "/logo.png": (b"image/png", lambda: resized_image(LOGO_PATH, 300, "PNG")),
+            "/background.jpg": (b"image/jpeg", lambda: resized_image(BACKGROUND_PATH, 960, "JPG", 75)),
+        }
+        if font_face:
+            self.builders["/Roboto.ttf"] = (b"font/ttf", lambda: open(FONT_PATH, 'rb').read())
+        self.assets = {}
+
+    def set_snapshot(self, top_sites, recent_tabs):
+        """Re-renders the page if the top sites or recently closed tabs changed."""
+        snapshot = [[{"url": entry["url"], "title": entry.get("title", "")} for entry in entries]
+                    for entries in (top_sites, recent_tabs)]
+        if snapshot == self.snapshot:
+            return
+        self.snapshot = snapshot
+        self.page = self.template.replace("<!--SHORTCUTS-->", render_shortcuts(*snapshot)).encode("utf-8")
+
+    def asset(self, path):
+        if path in ("", "/"):
+            return b"text/html", self.page
+        if path not in self.builders:
+            return None, None
+        mime, build = self.builders[path]
+        if path not in self.assets:
+            self.assets[path] = build()
+        return mime, self.assets[path]
+
+    def requestStarted(self, job):
+        url = job.requestUrl()
+        mime, data = self.asset(url.path()) if url.host() == "newtab" else (None, None)
+        if data is None:
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            return
+        # The buffer belongs to the job, so it lives exactly as long as the reply.
+        buffer = QBuffer(job)
+        buffer.setData(data)
+        buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+        job.reply(mime, buffer)
+
+
+def run_benchmark(runs=20, budget_ms=50.0):
+    """
+    Loads ringzauber://newtab/ into fresh offscreen views and reports the page's own
+    first-contentful-paint time against `budget_ms`.
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    register_scheme()
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtWebEngineCore import QWebEngineProfile
+    from PyQt6.QtWebEngineWidgets import QWebEngineView
+    from view_pool import render_offscreen
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    handler = NewTabSchemeHandler()
+    handler.set_snapshot(
+        [{"url": f"https://site{index}.example/", "title": f"Site {index}"} for index in range(8)],
+        [{"url": f"https://closed{index}.example/", "title": f"Closed {index}"} for index in range(5)],
+    )
+    QWebEngineProfile.defaultProfile().installUrlSchemeHandler(NEW_TAB_SCHEME, handler)
+
+    def wait_until(predicate, timeout=10.0):
+        deadline = time.perf_counter() + timeout
+        while not predicate() and time.perf_counter() < deadline:
+            app.processEvents()
+            time.sleep(0.001)
+
+    paint_script = ("(performance.getEntriesByName('first-contentful-paint')[0]"
+                    " || performance.getEntriesByName('first-paint')[0] || {startTime: -1}).startTime")
+
+    def first_paint():
+        view = QWebEngineView()
+        render_offscreen(view, QSize(1024, 768))
+        loaded = []
+        view.loadFinished.connect(lambda ok: loaded.append(ok))
+        start = time.perf_counter()
+        view.setUrl(QUrl(NEW_TAB_URL))
+        wait_until(lambda: loaded)
+        load_ms = (time.perf_counter() - start) * 1e3
+        # Paint entries are recorded once the first frame is presented, which can follow loadFinished.
+        paint = -1
+        deadline = time.perf_counter() + 2.0
+        while paint < 0 and time.perf_counter() < deadline:
+            answered = []
+            view.page().runJavaScript(paint_script, lambda value: answered.append(value))
+            wait_until(lambda: answered)
+            paint = answered[0] if answered and answered[0] is not None else -1
+        view.deleteLater()
+        return paint, load_ms
+
+    # The first load also starts the renderer process; it is reported but not counted.
+    warmup_paint, _ = first_paint()
+    samples = [first_paint() for _ in range(runs)]
+    paints = sorted(paint for paint, _ in samples if paint >= 0)
+    loads = sorted(load for _, load in samples)
+    if not paints:
+        raise RuntimeError("No first paint was recorded.")
+    median = paints[len(paints) // 2]
+    return {
+        "runs": runs,
+        "first_paint_p50_ms": median,
+        "first_paint_max_ms": paints[-1],
+        "load_finished_p50_ms": loads[len(loads) // 2],
+        "first_load_paint_ms": warmup_paint,
+        "budget_ms": budget_ms,
+        "within_budget": median <= budget_ms,
+    }
+
+
+if __name__ == "__main__":
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else 50.0
+    result = run_benchmark(budget_ms=budget)
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result["within_budget"] else 1)
@@ -0,0 +1,211 @@
+import sys
+import asyncio
+import hashlib
+import urllib.request
+import urllib.robotparser
+from urllib.parse import urljoin, urldefrag, urlparse
+from page_context import ContentExtractor
+
+USER_AGENT = "Oodles/1.0 (+https://stenoip.github.io)"
+
+
+def fetch_page(url, timeout=10, max_bytes=2 * 1024 * 1024, chunk_size=16384):
+    """Fetches a page, feeding the HTML to a main-content extractor chunk by chunk as it downloads."""
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        content_type = response.headers.get_content_type()
+        if content_type not in ("text/html", "application/xhtml+xml", "text/plain"):
+            return response.geturl(), None
+        charset = response.headers.get_content_charset() or "utf-8"
+
+        extractor = ContentExtractor()
+        received = 0
+        while received < max_bytes:
+            chunk = response.read(chunk_size)
+            if not chunk:
+                break
+            received += len(chunk)
+            if content_type == "text/plain":
+                extractor.add_text(chunk.decode(charset, errors="replace"))
+            else:
+                extractor.feed(chunk.decode(charset, errors="replace"))
+        extractor.close()
+        return response.geturl(), extractor
+
+
+class OodlesCrawler:
+    """
+    Crawls a site breadth-first and summarises it, with all network work done concurrently.
+
+    At most `concurrency` pages are fetched at once and at most `per_host` from any one host.
+    Pages deeper than `max_depth` links from the start URL, or beyond `max_pages`, are skipped,
+    and pages with identical text are only kept once. `progress` is called with a short
+    status message as the crawl advances.
+    """
+    def __init__(self, max_pages=20, max_depth=2, concurrency=8, per_host=2, timeout=10,
+                 same_site=True, summary_concurrency=3, chunk_chars=6000, progress=None, summarize=None):
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.same_site = same_site
+        self.summary_concurrency = summary_concurrency
+        self.chunk_chars = chunk_chars
+        self.progress = progress or (lambda message: None)
+        if summarize is None:
+            from praterich_ai import aget_praterich_response_text as summarize
+        self.summarize_text = summarize
+
+        self.host_limits = {}
+        self.robots = {}
+
+    def report(self, message):
+        self.progress(message)
+
+    async def crawl(self, start_url):
+        """Returns a list of {"url", "title", "text"} dicts for the unique pages found."""
+        start_url = urldefrag(start_url)[0]
+        start_host = urlparse(start_url).netloc
+        queue = asyncio.Queue()
+        queue.put_nowait((start_url, 0))
+        seen_urls = {start_url}
+        seen_content = set()
+        pages = []
+        global_limit = asyncio.Semaphore(self.concurrency)
+
+        async def worker():
+            while True:
+                url, depth = await queue.get()
+                try:
+                    if len(pages) >= self.max_pages:
+                        continue
+                    result = await self.fetch(url, global_limit)
+                    if result is None:
+                        continue
+                    final_url, extractor = result
+                    text = extractor.text()
+                    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+                    if not text or digest in seen_content or len(pages) >= self.max_pages:
+                        continue
+                    seen_content.add(digest)
+                    pages.append({"url": final_url, "title": extractor.title.strip(), "text": text})
+                    self.report(f"Oodles has read {len(pages)} of up to {self.max_pages} pages.")
+
+                    if depth < self.max_depth:
+                        for href in extractor.links:
+                            link = urldefrag(urljoin(final_url, href))[0]
+                            parsed = urlparse(link)
+                            if parsed.scheme not in ("http", "https") or link in seen_urls:
+                                continue
+                            if self.same_site and parsed.netloc != start_host:
+                                continue
+                            seen_urls.add(link)
+                            queue.put_nowait((link, depth + 1))
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        try:
+            await queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        return pages
+
+    async def fetch(self, url, global_limit):
+        host = urlparse(url).netloc
+        host_limit = self.host_limits.setdefault(host, asyncio.Semaphore(self.per_host))
+        async with global_limit, host_limit:
+            if not await self.allowed(url):
+                return None
+            try:
+                final_url, extractor = await asyncio.to_thread(fetch_page, url, self.timeout)
+            except Exception as e:
+                print(f"Oodles could not fetch {url}: {e}")
+                return None
+        if extractor is None:
+            return None
+        return final_url, extractor
+
+    async def allowed(self, url):
+        parsed = urlparse(url)
+        root = f"{parsed.scheme}://{parsed.netloc}"
+        if root not in self.robots:
+            parser = urllib.robotparser.RobotFileParser(f"{root}/robots.txt")
+            try:
+                await asyncio.to_thread(parser.read)
+            except Exception:
+                parser = None
+            self.robots[root] = parser
+        parser = self.robots[root]
+        return parser is None or parser.can_fetch(USER_AGENT, url)
+
+    def chunk_pages(self, pages):
+        """Packs page text into chunks of at most `chunk_chars` characters."""
+        chunks = []
+        current = ""
+        for page in pages:
+            block = f"URL: {page['url']}\nTitle: {page['title']}\n{page['text']}\n\n"
+            while block:
+                room = self.chunk_chars - len(current)
+                if room <= 0:
+                    chunks.append(current)
+                    current = ""
+                    room = self.chunk_chars
+                current += block[:room]
+                block = block[room:]
+        if current:
+            chunks.append(current)
+        return chunks
+
+    async def summarize(self, start_url, pages):
+        """Summarises chunks in parallel, then merges the partial summaries into one."""
+        if not pages:
+            return f"I'm afraid Oodles could not read any pages from {start_url}."
+
+        chunks = self.chunk_pages(pages)
+        if len(chunks) == 1:
+            return await self.summarize_text(
+                f"Oodles has crawled {len(pages)} pages from {start_url}. Please summarize what you see, "
+                f"and describe the website's purpose. The page text is:\n\n{chunks[0]}"
+            )
+
+        limit = asyncio.Semaphore(self.summary_concurrency)
+        done = 0
+
+        async def summarize_chunk(chunk):
+            nonlocal done
+            async with limit:
+                summary = await self.summarize_text(
+                    f"This is part of the text Oodles crawled from {start_url}. Summarize the key content "
+                    f"in a few sentences, without any preamble:\n\n{chunk}"
+                )
+            done += 1
+            self.report(f"Oodles has summarised {done} of {len(chunks)} sections.")
+            return summary
+
+        partials = await asyncio.gather(*(summarize_chunk(chunk) for chunk in chunks))
+        merged = "\n\n".join(f"Section {index + 1}: {summary}" for index, summary in enumerate(partials))
+        return await self.summarize_text(
+            f"Oodles has crawled {len(pages)} pages from {start_url}. These are summaries of its sections. "
+            f"Combine them into one summary of the website and describe its purpose:\n\n{merged}"
+        )
+
+    async def run(self, start_url):
+        self.report(f"Oodles is crawling {start_url}...")
+        pages = await self.crawl(start_url)
+        self.report(f"Oodles read {len(pages)} pages. Summarising...")
+        return await self.summarize(start_url, pages)
+
+
+if __name__ == "__main__":
+    async def _print_pages(url):
+        for page in await OodlesCrawler(progress=print).crawl(url):
+            print(f"{page['url']} ({len(page['text'])} chars): {page['title']}")
+
+    if len(sys.argv) > 1:
+        asyncio.run(_print_pages(sys.argv[1]))
+    else:
+        print("Usage: oodles_crawler.py <start url>")
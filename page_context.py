@@ -0,0 +1,476 @@
+import os
+import re
+import sys
+import json
+import time
+from collections import OrderedDict
+from html.parser import HTMLParser
+
+# Elements whose text is never part of the readable page.
+SKIPPED_TAGS = {"script", "style", "noscript", "template", "svg", "head", "iframe", "canvas", "select", "button"}
+# Page furniture; kept out of the main content wherever it appears.
+FURNITURE_TAGS = {"nav", "aside", "footer", "form", "menu", "dialog"}
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "li", "ul", "ol", "dl", "dt", "dd", "tr", "td", "th", "table",
+    "blockquote", "pre", "figure", "figcaption", "header", "h1", "h2", "h3", "h4", "h5", "h6", "body",
+} | FURNITURE_TAGS
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+UNLIKELY = re.compile(r"comment|cookie|banner|sidebar|footer|nav|menu|share|social|related|promo|advert|\bads?\b|subscribe|popup|breadcrumb", re.I)
+LIKELY = re.compile(r"article|body|content|main|post|entry|story|text", re.I)
+WORD = re.compile(r"\w+")
+# A full stop after these ends a word, not a sentence.
+ABBREVIATION = re.compile(
+    r"(?:^|\s)(?:[A-Z]|Mr|Mrs|Ms|Dr|Prof|Sr|Jr|St|Mt|No|Fig|vs|Jan|Feb|Mar|Apr|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec"
+    r"|e\.g|i\.e|a\.m|p\.m)\.$"
+)
+SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s+")
+
+
+def estimate_tokens(text):
+    """A cheap token estimate: about four characters per token for English text."""
+    return (len(text) + 3) // 4
+
+
+class ContentExtractor(HTMLParser):
+    """
+    Finds the main content of a page, readability-style, as its HTML is fed in.
+
+    Text is collected into blocks, one per paragraph, heading or list item. Every
+    paragraph scores its parent element and, at half weight, its grandparent, by its
+    length and commas. Scores are scaled down by link density and nudged by class and id
+    names, and the best element is taken as the main content. Navigation, asides,
+    footers and elements named like them are left out. Also collects the title and links.
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.links = []
+        # Parallel lists indexed by element id: parent, tag, class/id weight.
+        self.parents = [None]
+        self.tags = ["#root"]
+        self.weights = [0]
+        self.stack = [0]
+        self.blocks = []
+        self.current = []
+        self.current_links = 0
+        self.skip_depth = 0
+        self.furniture_depth = 0
+        self.link_depth = 0
+        self.in_title = False
+
+    def element_weight(self, attrs):
+        names = " ".join(value for key, value in attrs if key in ("class", "id") and value)
+        if not names:
+            return 0
+        weight = 0
+        if UNLIKELY.search(names):
+            weight -= 25
+        if LIKELY.search(names):
+            weight += 25
+        return weight
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title":
+            self.in_title = True
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+        if tag == "a":
+            href = dict(attrs).get("href")
+            if href:
+                self.links.append(href)
+            self.link_depth += 1
+        if tag in BLOCK_TAGS or tag == "br":
+            self.end_block()
+        if tag in VOID_TAGS:
+            return
+        if tag in BLOCK_TAGS and self.tags[self.stack[-1]] == "p" or tag == "li" and self.tags[self.stack[-1]] == "li":
+            # An unclosed <p> or <li> ends where the next block starts.
+            self.handle_endtag(self.tags[self.stack[-1]])
+        weight = self.element_weight(attrs)
+        if tag in FURNITURE_TAGS or weight < 0 and tag not in ("body", "main", "article"):
+            self.furniture_depth += 1
+            weight = None
+        self.parents.append(self.stack[-1])
+        self.tags.append(tag)
+        self.weights.append(weight)
+        self.stack.append(len(self.tags) - 1)
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self.in_title = False
+        if tag in SKIPPED_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+        if tag == "a" and self.link_depth:
+            self.link_depth -= 1
+        if tag in BLOCK_TAGS:
+            self.end_block()
+        if tag in VOID_TAGS:
+            return
+        # Close the nearest open element with this tag, and any left open inside it.
+        for position in range(len(self.stack) - 1, 0, -1):
+            if self.tags[self.stack[position]] == tag:
+                for element in self.stack[position:]:
+                    if self.weights[element] is None:
+                        self.furniture_depth -= 1
+                del self.stack[position:]
+                break
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title += data
+        elif not self.skip_depth and not self.furniture_depth:
+            self.current.append(data)
+            if self.link_depth:
+                self.current_links += len(data.strip())
+
+    def add_text(self, text):
+        """Adds plain text, for documents that are not HTML."""
+        for paragraph in re.split(r"\n\s*\n", text):
+            self.current.append(paragraph)
+            self.end_block()
+
+    def end_block(self):
+        text = " ".join("".join(self.current).split())
+        if text:
+            element = self.stack[-1]
+            kind = self.tags[element] if self.tags[element] in HEADING_TAGS else "p"
+            self.blocks.append({"kind": kind, "text": text, "element": element, "links": self.current_links})
+        self.current = []
+        self.current_links = 0
+
+    def close(self):
+        super().close()
+        self.end_block()
+
+    def main_element(self):
+        """Returns the element holding the main content, or the root if there is no clear one."""
+        scores = {}
+        text_chars = {}
+        link_chars = {}
+        for block in self.blocks:
+            element = block["element"]
+            while element is not None:
+                text_chars[element] = text_chars.get(element, 0) + len(block["text"])
+                link_chars[element] = link_chars.get(element, 0) + block["links"]
+                element = self.parents[element]
+            if block["kind"] != "p" or len(block["text"]) < 25:
+                continue
+            score = 1 + block["text"].count(",") + min(len(block["text"]) // 100, 3)
+            parent = self.parents[block["element"]] if self.tags[block["element"]] == "p" else block["element"]
+            for element, share in ((parent, 1.0), (self.parents[parent] if parent else None, 0.5)):
+                if element is not None:
+                    scores[element] = scores.get(element, 0) + score * share
+        best, best_score = 0, 0.0
+        for element, score in scores.items():
+            link_density = link_chars[element] / max(1, text_chars[element])
+            score = (score + (self.weights[element] or 0)) * (1 - link_density)
+            if score > best_score:
+                best, best_score = element, score
+        return best
+
+    def is_inside(self, element, ancestor):
+        while element is not None:
+            if element == ancestor:
+                return True
+            element = self.parents[element]
+        return False
+
+    def content_blocks(self):
+        """Returns the main content as a list of {"kind", "text"} blocks, in page order."""
+        main = self.main_element()
+        content = []
+        for block in self.blocks:
+            if not self.is_inside(block["element"], main):
+                continue
+            if block["kind"] == "p" and block["links"] > len(block["text"]) / 2:
+                # Link lists inside the content, such as "related articles".
+                continue
+            content.append({"kind": block["kind"], "text": block["text"]})
+        return content
+
+    def text(self):
+        return "\n".join(block["text"] for block in self.content_blocks())
+
+
+def extract_page_context(html, url=""):
+    """Extracts the title, outline and main content blocks of a page."""
+    extractor = ContentExtractor()
+    extractor.feed(html)
+    extractor.close()
+    blocks = extractor.content_blocks()
+    return {
+        "url": url,
+        "title": " ".join(extractor.title.split()),
+        "outline": [block["text"] for block in blocks if block["kind"] != "p"],
+        "blocks": blocks,
+    }
+
+
+def split_sentences(text):
+    """Splits text into sentences, without breaking after abbreviations or before a lowercase word."""
+    sentences = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        end = match.end()
+        if text[end:end + 1].islower() or ABBREVIATION.search(text[start:match.start() + 1]):
+            continue
+        sentences.append(text[start:end].strip())
+        start = end
+    if text[start:].strip():
+        sentences.append(text[start:].strip())
+    return sentences
+
+
+def split_text(text, max_tokens):
+    """Splits text into its sentences, cutting any sentence longer than `max_tokens` between words."""
+    pieces = []
+    for sentence in split_sentences(text):
+        while estimate_tokens(sentence) > max_tokens:
+            cut = sentence.rfind(" ", 0, max_tokens * 4)
+            cut = cut if cut > 0 else max_tokens * 4
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].strip()
+        if sentence:
+            pieces.append(sentence)
+    return pieces
+
+
+def chunk_blocks(blocks, max_tokens):
+    """
+    Packs content blocks into chunks of at most `max_tokens` tokens.
+
+    Chunks break between blocks, or between the sentences of a block that does not fit in
+    one; only a sentence longer than a whole chunk is cut between words. A heading is
+    always followed by its section's text in the same chunk, and a chunk that starts
+    part-way through a section begins with that section's heading.
+    """
+    chunks = []
+    lines = []
+    used = 0
+    heading = None
+    # Headings not yet followed by any text.
+    leading = []
+
+    def next_chunk(tokens):
+        # Starts a new chunk with the section heading, if `tokens` more still fit after it.
+        nonlocal lines, used
+        chunks.append("\n".join(lines))
+        lines, used = [], 0
+        if heading and not leading and estimate_tokens(heading) + 1 + tokens <= max_tokens:
+            lines.append(heading)
+            used = estimate_tokens(heading) + 1
+
+    for block in blocks:
+        if block["kind"] != "p":
+            heading = block["text"]
+            leading.append(heading)
+            continue
+        leading_tokens = sum(estimate_tokens(line) + 1 for line in leading)
+        block_tokens = leading_tokens + estimate_tokens(block["text"]) + 1
+        # A block that fits in a chunk of its own is not split across two.
+        if lines and used + block_tokens > max_tokens and block_tokens <= max_tokens:
+            next_chunk(block_tokens)
+        line = None
+        for sentence in split_text(block["text"], max_tokens):
+            tokens = estimate_tokens(sentence) + 1
+            extra = leading_tokens if line is None else 0
+            if lines and used + extra + tokens > max_tokens:
+                next_chunk(tokens)
+                line = None
+            if line is None:
+                if not lines and leading and extra + tokens > max_tokens:
+                    chunks.append("\n".join(leading))
+                    leading, leading_tokens = [], 0
+                lines.extend(leading)
+                used += leading_tokens
+                leading, leading_tokens = [], 0
+                lines.append(sentence)
+                line = len(lines) - 1
+            else:
+                lines[line] += " " + sentence
+            used += tokens
+    if leading:
+        leading_tokens = sum(estimate_tokens(line) + 1 for line in leading)
+        if lines and used + leading_tokens > max_tokens:
+            chunks.append("\n".join(lines))
+            lines = []
+        lines.extend(leading)
+    if lines:
+        chunks.append("\n".join(lines))
+    return chunks
+
+
+def build_page_prompt(context, question, max_tokens=2000, chunk_tokens=400):
+    """
+    Builds a prompt about a page that fits in `max_tokens`: the title, the outline and the
+    chunks that share the most words with `question`, kept in page order.
+    """
+    header = f"Page: {context['title']}\nURL: {context['url']}\n"
+    outline = context["outline"]
+    while outline and estimate_tokens(header + "\n".join(outline)) > max_tokens // 4:
+        outline = outline[:len(outline) // 2]
+    if outline:
+        header += "Outline:\n" + "\n".join(f"- {heading}" for heading in outline) + "\n"
+    footer = f"\nQuestion about this page: {question}"
+    budget = max_tokens - estimate_tokens(header) - estimate_tokens(footer)
+
+    chunks = chunk_blocks(context["blocks"], chunk_tokens)
+    words = {word for word in WORD.findall(question.lower()) if len(word) > 2}
+    # Earlier chunks win ties, so a page with no matching words is read from the top.
+    ranked = sorted(range(len(chunks)), key=lambda i: (-len(words & set(WORD.findall(chunks[i].lower()))), i))
+    chosen = []
+    for index in ranked:
+        tokens = estimate_tokens(chunks[index]) + 1
+        if tokens <= budget:
+            chosen.append(index)
+            budget -= tokens
+    parts = []
+    for index in sorted(chosen):
+        chunk = chunks[index]
+        if index - 1 in chosen:
+            # The section heading a chunk starts with was already given by the one before it.
+            first, _, rest = chunk.partition("\n")
+            if rest and first in context["outline"] and first in chunks[index - 1].split("\n"):
+                chunk = rest
+        parts.append(chunk)
+    content = "\n\n".join(parts)
+    return f"{header}Content:\n{content}\n{footer}"
+
+
+class ContextCache:
+    """
+    Extracted page contexts keyed by URL, each stored with the fingerprint of the content
+    it came from, so an unchanged page is never extracted twice. Keeps `max_entries` pages.
+    """
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url, fingerprint):
+        entry = self.entries.get(url)
+        if entry is None or entry[0] != fingerprint:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(url)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, url, fingerprint, context):
+        self.entries[url] = (fingerprint, context)
+        self.entries.move_to_end(url)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+# Runs in the page. A hash of the text content, which unlike innerText needs no layout.
+FINGERPRINT_SCRIPT = """
+(function () {
+    var text = document.body ? document.body.textContent : '';
+    var hash = 2166136261;
+    for (var i = 0; i < text.length; i++) {
+        hash = Math.imul(hash ^ text.charCodeAt(i), 16777619);
+    }
+    return text.length + ':' + (hash >>> 0).toString(16);
+})()
+"""
+
+
+class VisibleTextExtractor(HTMLParser):
+    """Collects all of a page's visible text, furniture included; what the benchmark compares against."""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+        if tag in BLOCK_TAGS or tag == "br":
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.parts.append(data)
+
+    def text(self):
+        lines = (" ".join(line.split()) for line in "".join(self.parts).splitlines())
+        return "\n".join(line for line in lines if line)
+
+
+def run_benchmark(fixture_dir, max_tokens=2000):
+    """
+    Compares the extracted context with the page's whole visible text on saved pages.
+
+    Every .html file in `fixture_dir` is a saved page. A .txt file of the same name may hold
+    the text of its main content, which is used to measure how much of it each approach
+    keeps (recall) and how much of what it keeps is main content (precision).
+    """
+    def words_of(text):
+        return set(WORD.findall(text.lower()))
+
+    results = []
+    for name in sorted(os.listdir(fixture_dir)):
+        if not name.endswith((".html", ".htm")):
+            continue
+        path = os.path.join(fixture_dir, name)
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            html = f.read()
+        visible = VisibleTextExtractor()
+        visible.feed(html)
+        visible.close()
+        visible_text = visible.text()
+
+        started = time.perf_counter()
+        context = extract_page_context(html, name)
+        extract_ms = (time.perf_counter() - started) * 1e3
+        content_text = "\n".join(block["text"] for block in context["blocks"])
+        prompt = build_page_prompt(context, "What is this page about?", max_tokens)
+        entry = {
+            "file": name,
+            "html_tokens": estimate_tokens(html),
+            "visible_text_tokens": estimate_tokens(visible_text),
+            "content_tokens": estimate_tokens(content_text),
+            "prompt_tokens": estimate_tokens(prompt),
+            "extract_ms": extract_ms,
+        }
+        reference_path = os.path.splitext(path)[0] + ".txt"
+        if os.path.exists(reference_path):
+            with open(reference_path, 'r', encoding='utf-8', errors='replace') as f:
+                reference = words_of(f.read())
+            for label, text in (("visible_text", visible_text), ("content", content_text)):
+                found = words_of(text)
+                entry[f"{label}_recall"] = len(found & reference) / max(1, len(reference))
+                entry[f"{label}_precision"] = len(found & reference) / max(1, len(found))
+        results.append(entry)
+
+    def mean(key):
+        values = [entry[key] for entry in results if key in entry]
+        return sum(values) / len(values) if values else None
+
+    return {
+        "pages": len(results),
+        "mean_html_tokens": mean("html_tokens"),
+        "mean_visible_text_tokens": mean("visible_text_tokens"),
+        "mean_content_tokens": mean("content_tokens"),
+        "mean_prompt_tokens": mean("prompt_tokens"),
+        "mean_visible_text_precision": mean("visible_text_precision"),
+        "mean_content_precision": mean("content_precision"),
+        "mean_visible_text_recall": mean("visible_text_recall"),
+        "mean_content_recall": mean("content_recall"),
+        "mean_extract_ms": mean("extract_ms"),
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python page_context.py FIXTURE_DIR [max_tokens]")
+        sys.exit(2)
+    print(json.dumps(run_benchmark(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 2000), indent=2))
@@ -1,13 +1,135 @@
+import os
+import re
 import sys
 import json
-from google import genai
-from google.genai import types
 
-# Create a client object to handle the API key
-client = genai.Client(api_key="")
+if __name__ == "__main__":
+    # Deliberately above the imports below, and it never falls through. Run as a script, this
+    # file is only the command line: a thin client of the Praterich daemon (praterich_daemon.py)
+    # that loads nothing but praterich_client. With no daemon running, praterich_client imports
+    # this file again as the module "praterich_ai" to answer in-process, while sys.exit keeps
+    # the rest of this "__main__" copy from ever being defined. Keep this block first.
+    from praterich_client import main
+    sys.exit(main(sys.argv[1:]))
+
+import time
+import threading
+from praterich_cache import ResponseCache, make_cache_key
+from praterich_router import ModelRouter, BackendUnavailable
+
+_client = None
+
+def get_client():
+    """
+    Returns the shared client, creating it on first use so importing this module stays cheap.
+
+    PRATERICH_BASE_URL points the client at another endpoint, such as a local fake model
+    server used for measurements. Every HTTP request gives up after the router's deadline.
+    """
+    global _client
+    if _client is None:
+        from google import genai
+        from google.genai import types
+        http_options = types.HttpOptions(timeout=int(router.deadline * 1000))
+        if os.environ.get("PRATERICH_BASE_URL"):
+            http_options.base_url = os.environ["PRATERICH_BASE_URL"]
+        _client = genai.Client(api_key=require_api_key(), http_options=http_options)
+    return _client
+
+def api_key():
+    return os.environ.get("PRATERICH_API_KEY") or os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY") or ""
+
+def require_api_key():
+    """Returns the API key, or fails fast with a message for the panel if none is set."""
+    key = api_key()
+    if not key:
+        raise BackendUnavailable("No API key is set for Praterich. Set PRATERICH_API_KEY and restart Ringzauber.")
+    return key
+
+def generation_config(system_instruction, cached_content=None):
+    """Names the cached instruction when there is one, otherwise sends it inline."""
+    from google.genai import types
+    if cached_content:
+        return types.GenerateContentConfig(cached_content=cached_content)
+    return types.GenerateContentConfig(system_instruction=system_instruction)
+
+class InstructionCache:
+    """
+    Keeps long system instructions in the model's context cache, so requests name the cache
+    instead of uploading the instruction every time.
+
+    A cache is created in the background the first time an instruction is used. Until it is
+    ready, and for `retry_after` seconds after creating one failed, the instruction is sent
+    inline. Instructions shorter than `min_chars` are below the model's caching minimum and
+    always go inline. A cache is replaced shortly before its `ttl` seconds run out.
+    """
+    def __init__(self, ttl=3600, min_chars=4096, retry_after=300, enabled=True):
+        self.ttl = ttl
+        self.min_chars = min_chars
+        self.retry_after = retry_after
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.names = {}
+        self.pending = set()
+        self.failed = {}
+
+    def name_for(self, system_instruction, model):
+        """Returns the name of the instruction's cache for a model, or None if it has to be sent inline."""
+        if not self.enabled or len(system_instruction) < self.min_chars:
+            return None
+        key = (model, system_instruction)
+        now = time.monotonic()
+        with self.lock:
+            name, expires = self.names.get(key, (None, 0))
+            if name is not None and now < expires - 60:
+                return name
+            if key in self.pending or now < self.failed.get(key, 0):
+                return name if now < expires else None
+            self.pending.add(key)
+        threading.Thread(target=self.create, args=(system_instruction, model), name="praterich-instruction-cache",
+                         daemon=True).start()
+        return name if now < expires else None
+
+    def create(self, system_instruction, model):
+        """Caches an instruction for a model, blocking until it has it. Returns the cache name or None."""
+        from google.genai import types
+        key = (model, system_instruction)
+        started = time.monotonic()
+        try:
+            cached = get_client().caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(system_instruction=system_instruction, ttl=f"{self.ttl}s")
+            )
+        except Exception as e:
+            print(f"Error caching the system instruction, sending it inline instead: {e}")
+            with self.lock:
+                self.failed[key] = time.monotonic() + self.retry_after
+                self.pending.discard(key)
+            return None
+        with self.lock:
+            self.names[key] = (cached.name, started + self.ttl)
+            self.pending.discard(key)
+        return cached.name
+
+    def invalidate(self, system_instruction, model):
+        """Forgets an instruction's cache, such as one the model dropped before it expired."""
+        with self.lock:
+            self.names.pop((model, system_instruction), None)
+
+MODEL_NAME = 'gemini-2.5-flash'
+FAST_MODEL_NAME = 'gemini-2.5-flash-lite'
+
+# Chooses the model tier, hedges slow calls and stops calling a failing backend. The models
+# can be overridden with PRATERICH_MODEL and PRATERICH_FAST_MODEL, or from the config.
+router = ModelRouter(
+    fast_model=os.environ.get("PRATERICH_FAST_MODEL", FAST_MODEL_NAME),
+    full_model=os.environ.get("PRATERICH_MODEL", MODEL_NAME),
+)
 
-def get_praterich_response(user_query):
-    system_instruction = """
+# PRATERICH_CONTEXT_CACHE=0 always sends the system instruction inline.
+instruction_cache = InstructionCache(enabled=os.environ.get("PRATERICH_CONTEXT_CACHE", "1") != "0")
+
+SYSTEM_INSTRUCTION = """
    You are Praterich, a diligent and helpful AI assistant from Stenoip Company. designed to act as a web browser. You are made by Stenoip Company(official website:stenoip.github.io)
     Your responses must be in a JSON format. Do not use Markdown or any other formatting.
     The JSON should contain three keys:
@@ -46,11 +168,15 @@ def get_praterich_response(user_query):
         - "SWITCH_TAB": Use this when the user wants to switch between tabs. The "query" can be the tab number or title.
         - "RESIZE_WINDOW": Use this when the user wants to resize the window. The "query" should be the new dimensions (e.g., "800x600").
         - "NEW_CHAT": Use this when the user wants to start a new conversation. The "query" can be an empty string.
+        - "ASK_PAGE": Use this when the user asks a question about the page they are viewing, or asks for it to be summarised or explained. The "query" should be the user's question.
         - "CRAWL_SITE": Use this when the user wants to crawl a website. The "query" should be the URL of the site to crawl.
+        - "SEARCH_HISTORY": Use this when the user wants to find a page they visited before. The "query" should be the words to look for in their browsing history.
+        - "FIND_IN_TABS": Use this when the user wants to find which of their open tabs shows something. The "query" should be the words to look for.
         - "TAB_FORMAT_VERTICAL": Use this to change the tabs to a vertical (trail) format. The "query" can be an empty string.
         - "TAB_FORMAT_HORIZONTAL_MULTIROWE": Use this to change the tabs to a horizontal multirow format. The "query" can be an empty string.
         - "OPEN_NOTES": Use this to open the notes panel. The "query" can be an empty string.
         - "PROMPT_DISPLAY": Use this when the user provides a prompt and is on the new tab page. The "query" should be a JSON string with "user_query" and "praterich_response".
+        - "BATCH": Use this when the user asks for more than one action at once. The "query" should be an empty string, and the response must also contain "actions", placed before "message": an array of {"command": ..., "query": ...} objects, in the order they should happen. Inside a batch, a "SWITCH_TAB" query of "opened:N" means the Nth tab opened by this batch.
     
     2. "query": A string containing the URL for "NAVIGATE", search terms for "SEARCH", or a JavaScript command for "EDIT_PAGE". For "EDIT_CODE", this should be a JSON string.
     3. "message": A brief, friendly, and helpful message to the user confirming the action.
@@ -62,48 +188,382 @@ def get_praterich_response(user_query):
       Response: {"command": "TAB_FORMAT_VERTICAL", "query": "", "message": "Changing tabs to a vertical arrangement."}
     - User: "Crawl this site with Oodles."
       Response: {"command": "CRAWL_SITE", "query": "https://www.example.com", "message": "My crawler, Oodles, is now analysing the website for you. Please hold on a moment."}
+    - User: "Open Hacker News and the Python docs, then switch to the first one."
+      Response: {"command": "BATCH", "query": "", "actions": [{"command": "NAVIGATE", "query": "https://news.ycombinator.com"}, {"command": "NAVIGATE", "query": "https://docs.python.org"}, {"command": "SWITCH_TAB", "query": "opened:1"}], "message": "Opening both for you and returning to Hacker News."}
     - User: "What is the capital of France?" (while on the new tab page)
       Response: {"command": "PROMPT_DISPLAY", "query": "{\"user_query\":\"What is the capital of France?\",\"praterich_response\":\"The capital of France is Paris.\"}", "message": ""}
     """
-    
+
+TEXT_SYSTEM_INSTRUCTION = "You are Praterich, a diligent and helpful AI assistant from Stenoip Company. When the user provides you with highlighted text and a question, you are to respond with a helpful answer in a friendly, British-like tone. Your response should be a simple message, not a JSON. For example, if the user asks 'What is this text?', you should respond with an answer based on the provided text."
+
+# Responses to these commands depend on the page, the conversation or the moment they are
+# asked, so they are never served from the cache.
+VOLATILE_COMMANDS = {
+    "NONE", "PROMPT", "PROMPT_DISPLAY", "PROCESS_TEXT", "CRAWL_SITE", "ASK_PAGE",
+    "EDIT_PAGE", "EDIT_CODE", "UPLOAD_FILE", "TRANSLATE_PAGE", "FIND_ON_PAGE", "FIND_IN_TABS"
+}
+
+# A plain-text answer can go out of date however it is worded, so it is kept for an hour
+# rather than the cache's week, and one about the moment it is asked is not kept at all.
+TEXT_CACHE_TTL = 3600
+TIME_SENSITIVE_RE = re.compile(
+    r"\b(today|tonight|tomorrow|yesterday|now|currently|current|latest|recent|news|weather|"
+    r"this (?:week|month|year)|scores?|prices?)\b", re.IGNORECASE
+)
+
+response_cache = ResponseCache()
+
+def clean_response_text(text):
+    """Strips the Markdown code fence the model sometimes wraps its JSON in."""
+    cleaned_text = text.strip()
+
+    if cleaned_text.startswith("```json"):
+        cleaned_text = cleaned_text[len("```json"):].strip()
+    if cleaned_text.endswith("```"):
+        cleaned_text = cleaned_text[:-len("```")].strip()
+    return cleaned_text
+
+def build_contents(user_query, history=None):
+    """The request contents: the earlier turns of a conversation, if any, then the query."""
+    if not history:
+        return user_query
+    return list(history) + [{"role": "user", "parts": [{"text": user_query}]}]
+
+def response_cache_key(user_query, system_instruction, history=None, model=MODEL_NAME):
+    """A response cache key; a reply given in the middle of a conversation is keyed by its history too."""
+    if history:
+        system_instruction = f"{system_instruction}\0{json.dumps(history, sort_keys=True)}"
+    return make_cache_key(user_query, system_instruction, model)
+
+def _generate(contents, system_instruction, model):
+    """
+    Generates a complete response, naming the cached instruction when there is one. If the
+    request fails while naming a cache, it is sent once more with the instruction inline.
+    """
+    cached_content = instruction_cache.name_for(system_instruction, model)
     try:
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=user_query,
-            config=types.GenerateContentConfig(
-                system_instruction=system_instruction
-            )
+        return get_client().models.generate_content(
+            model=model, contents=contents, config=generation_config(system_instruction, cached_content)
+        )
+    except Exception:
+        if cached_content is None:
+            raise
+        instruction_cache.invalidate(system_instruction, model)
+    return get_client().models.generate_content(
+        model=model, contents=contents, config=generation_config(system_instruction)
+    )
+
+def _generate_stream(contents, system_instruction, model):
+    """Yields response chunks like `_generate`, retrying inline only if nothing was received yet."""
+    cached_content = instruction_cache.name_for(system_instruction, model)
+    received = False
+    try:
+        for chunk in get_client().models.generate_content_stream(
+            model=model, contents=contents, config=generation_config(system_instruction, cached_content)
+        ):
+            received = True
+            yield chunk
+        return
+    except Exception:
+        if cached_content is None or received:
+            raise
+        instruction_cache.invalidate(system_instruction, model)
+    yield from get_client().models.generate_content_stream(
+        model=model, contents=contents, config=generation_config(system_instruction)
+    )
+
+async def _agenerate_stream(contents, system_instruction, model):
+    """The asynchronous `_generate_stream`."""
+    cached_content = instruction_cache.name_for(system_instruction, model)
+    received = False
+    try:
+        stream = await get_client().aio.models.generate_content_stream(
+            model=model, contents=contents, config=generation_config(system_instruction, cached_content)
         )
+        async for chunk in stream:
+            received = True
+            yield chunk
+        return
+    except Exception:
+        if cached_content is None or received:
+            raise
+        instruction_cache.invalidate(system_instruction, model)
+    stream = await get_client().aio.models.generate_content_stream(
+        model=model, contents=contents, config=generation_config(system_instruction)
+    )
+    async for chunk in stream:
+        yield chunk
+
+def is_cacheable_response(cleaned_text):
+    try:
+        response = json.loads(cleaned_text)
+        commands = [response.get("command")] + [action.get("command") for action in response.get("actions") or []]
+        return not any(command in VOLATILE_COMMANDS for command in commands)
+    except (ValueError, AttributeError):
+        return False
+
+def get_praterich_response(user_query, use_cache=True):
+    tier, model = router.route(user_query)
+    cache_key = response_cache_key(user_query, SYSTEM_INSTRUCTION, model=model)
+    if use_cache:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            print(cached)
+            return
+
+    try:
+        require_api_key()
+        response = router.call(tier, lambda model: _generate(user_query, SYSTEM_INSTRUCTION, model))
     
-        cleaned_text = response.text.strip()
-        
-        if cleaned_text.startswith("```json"):
-            cleaned_text = cleaned_text[len("```json"):].strip()
-        if cleaned_text.endswith("```"):
-            cleaned_text = cleaned_text[:-len("```")].strip()
-            
+        cleaned_text = clean_response_text(response.text)
         print(cleaned_text)
 
+        if use_cache and is_cacheable_response(cleaned_text):
+            response_cache.put(cache_key, cleaned_text)
+
     except Exception as e:
         print(json.dumps({"command": "NONE", "query": "", "message": f"I'm sorry, an error occurred: {e}"}))
 
-def get_praterich_response_text(user_query):
+def cache_allowed(user_query, mode):
+    """False for a plain-text question whose answer depends on when it is asked."""
+    return mode != "text" or not TIME_SENSITIVE_RE.search(user_query)
+
+def get_praterich_response_text(user_query, use_cache=True):
     """A direct function call to get a response without using a subprocess."""
+    use_cache = use_cache and cache_allowed(user_query, "text")
+    tier, model = router.route(user_query, "text")
+    cache_key = response_cache_key(user_query, TEXT_SYSTEM_INSTRUCTION, model=model)
+    if use_cache:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
     try:
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=user_query,
-            config=types.GenerateContentConfig(
-                system_instruction="You are Praterich, a diligent and helpful AI assistant from Stenoip Company. When the user provides you with highlighted text and a question, you are to respond with a helpful answer in a friendly, British-like tone. Your response should be a simple message, not a JSON. For example, if the user asks 'What is this text?', you should respond with an answer based on the provided text."
-            )
-        )
-        return response.text.strip()
+        require_api_key()
+        response = router.call(tier, lambda model: _generate(user_query, TEXT_SYSTEM_INSTRUCTION, model))
+        text = response.text.strip()
+        if use_cache:
+            response_cache.put(cache_key, text, TEXT_CACHE_TTL)
+        return text
     except Exception as e:
         return f"I'm sorry, an error occurred while processing your text: {e}"
 
-if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        user_query = sys.argv[1]
-        get_praterich_response(user_query)
-    else:
-        print(json.dumps({"command": "NONE", "query": "", "message": "No query provided."}))
\ No newline at end of file
+def _cacheable_command(text):
+    cleaned_text = clean_response_text(text)
+    return cleaned_text if is_cacheable_response(cleaned_text) else None
+
+def _cacheable_text(text):
+    return text or None
+
+STREAM_MODES = {
+    # mode: (system instruction, returns the value to cache for a full response or None, cache lifetime)
+    "command": (SYSTEM_INSTRUCTION, _cacheable_command, None),
+    "text": (TEXT_SYSTEM_INSTRUCTION, _cacheable_text, TEXT_CACHE_TTL),
+}
+
+def _stream(user_query, mode, use_cache, history=None):
+    system_instruction, cacheable, ttl = STREAM_MODES[mode]
+    use_cache = use_cache and cache_allowed(user_query, mode)
+    tier, model = router.route(user_query, mode)
+    cache_key = response_cache_key(user_query, system_instruction, history, model)
+    if use_cache:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    require_api_key()
+    contents = build_contents(user_query, history)
+    parts = []
+    for chunk in router.iterate(tier, lambda model: _generate_stream(contents, system_instruction, model)):
+        if chunk.text:
+            parts.append(chunk.text)
+            yield chunk.text
+
+    value = cacheable("".join(parts).strip())
+    if use_cache and value is not None:
+        response_cache.put(cache_key, value, ttl)
+
+def stream_praterich_response(user_query, use_cache=True, history=None):
+    """
+    Yields the raw text of a command response as the model generates it.
+
+    `history` holds the earlier turns of the conversation, as `ConversationSession.history` returns them.
+    """
+    return _stream(user_query, "command", use_cache, history)
+
+def stream_praterich_response_text(user_query, use_cache=True):
+    """Yields a plain-text answer chunk by chunk as the model generates it."""
+    return _stream(user_query, "text", use_cache)
+
+async def astream_praterich_response(user_query, mode="command", use_cache=True, history=None):
+    """
+    Asynchronously yields a response as the model generates it, using the shared client.
+
+    `mode` is "command" for the JSON command protocol or "text" for a plain-text answer.
+    `history` holds the earlier turns of the conversation, if any. The call is routed, hedged
+    and held to the deadlines of `router`; BackendUnavailable is raised without calling the
+    model when no API key is set or the backend keeps failing.
+    """
+    system_instruction, cacheable, ttl = STREAM_MODES[mode]
+    use_cache = use_cache and cache_allowed(user_query, mode)
+    tier, model = router.route(user_query, mode)
+    cache_key = response_cache_key(user_query, system_instruction, history, model)
+    if use_cache:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    require_api_key()
+    contents = build_contents(user_query, history)
+    parts = []
+    async for chunk in router.stream(tier, lambda model: _agenerate_stream(contents, system_instruction, model)):
+        if chunk.text:
+            parts.append(chunk.text)
+            yield chunk.text
+
+    value = cacheable("".join(parts).strip())
+    if use_cache and value is not None:
+        response_cache.put(cache_key, value, ttl)
+
+async def aget_praterich_response_text(user_query, use_cache=True):
+    """Asynchronously returns a complete plain-text answer."""
+    parts = [text async for text in astream_praterich_response(user_query, "text", use_cache)]
+    return "".join(parts).strip()
+
+class CommandStreamParser:
+    """
+    Incrementally parses a streamed command response.
+
+    `feed` returns the fields whose string values have been fully received since the
+    last call, so a command can be acted upon before the rest of the JSON arrives.
+    `partial_message` holds as much of the "message" field as has been received.
+    The actions of a "BATCH" response are parsed one by one as each object completes,
+    and `take_actions` returns those not yet taken.
+    """
+    FIELD_PATTERNS = {
+        key: re.compile(r'"%s"\s*:\s*"((?:[^"\\]|\\.)*)"' % key) for key in ("command", "query", "message")
+    }
+    PARTIAL_MESSAGE = re.compile(r'"message"\s*:\s*"((?:[^"\\]|\\.)*)')
+    ACTIONS_START = re.compile(r'"actions"\s*:\s*\[')
+    ACTION_SEPARATOR = re.compile(r'\s*,?\s*')
+    ACTIONS_END = re.compile(r'\s*,?\s*\]')
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields = {}
+        self.partial_message = ""
+        self.actions = []
+        self.actions_taken = 0
+        self.actions_start = None
+        self.actions_end = None
+        self.scan_position = None
+        # Set when the actions array holds something other than objects; `result` then parses it whole.
+        self.actions_malformed = False
+
+    def object_end(self, start):
+        """Returns the index just past the JSON object starting at `start`, or None until all of it has arrived."""
+        depth = 0
+        in_string = False
+        escaped = False
+        for index in range(start, len(self.buffer)):
+            char = self.buffer[index]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == "{":
+                depth += 1
+            elif char == "}":
+                depth -= 1
+                if depth == 0:
+                    return index + 1
+        return None
+
+    def scan_actions(self):
+        if self.actions_start is None:
+            match = self.ACTIONS_START.search(self.buffer)
+            if not match:
+                return
+            self.actions_start = match.start()
+            self.scan_position = match.end()
+        while self.actions_end is None and not self.actions_malformed:
+            match = self.ACTIONS_END.match(self.buffer, self.scan_position)
+            if match:
+                self.actions_end = match.end()
+                return
+            start = self.ACTION_SEPARATOR.match(self.buffer, self.scan_position).end()
+            if start == len(self.buffer):
+                return
+            if self.buffer[start] != "{":
+                self.actions_malformed = True
+                return
+            end = self.object_end(start)
+            if end is None:
+                return
+            try:
+                action = json.loads(self.buffer[start:end])
+            except ValueError:
+                action = None
+            if isinstance(action, dict) and action.get("command"):
+                self.actions.append({"command": action["command"], "query": str(action.get("query") or "")})
+            self.scan_position = end
+
+    def top_level(self):
+        """The buffer without the actions array, so their fields are not mistaken for the response's own."""
+        if self.actions_start is None:
+            return self.buffer
+        if self.actions_end is None:
+            return self.buffer[:self.actions_start]
+        return self.buffer[:self.actions_start] + self.buffer[self.actions_end:]
+
+    def take_actions(self):
+        actions = self.actions[self.actions_taken:]
+        self.actions_taken = len(self.actions)
+        return actions
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        self.scan_actions()
+        text = self.top_level()
+        completed = {}
+        for key, pattern in self.FIELD_PATTERNS.items():
+            if key in self.fields:
+                continue
+            match = pattern.search(text)
+            if match:
+                self.fields[key] = completed[key] = json.loads(f'"{match.group(1)}"')
+
+        if "message" in self.fields:
+            self.partial_message = self.fields["message"]
+        else:
+            match = self.PARTIAL_MESSAGE.search(text)
+            if match:
+                try:
+                    self.partial_message = json.loads(f'"{match.group(1)}"')
+                except ValueError:
+                    # The fragment ends part-way through an escape sequence.
+                    pass
+        return completed
+
+    def command_ready(self):
+        return "command" in self.fields and "query" in self.fields
+
+    def result(self):
+        """
+        Returns the full response, parsing the whole buffer if the fields were not found.
+        Raises ValueError if it is not valid JSON or its actions are not all objects.
+        """
+        if self.command_ready() and (self.fields["command"] != "BATCH" or self.actions_end is not None):
+            return {"command": self.fields["command"], "query": self.fields["query"],
+                    "message": self.fields.get("message", ""), "actions": list(self.actions)}
+        result = json.loads(clean_response_text(self.buffer))
+        if self.actions_malformed:
+            raise ValueError("The response's actions are not all JSON objects")
+        return result
@@ -0,0 +1,115 @@
+import time
+from collections import deque
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+# Commands that start loading a page in the current tab, or in a tab they open.
+LOADING_COMMANDS = {"NAVIGATE", "SEARCH", "RELOAD", "GO_BACK", "GO_FORWARD"}
+# Commands that open a tab of their own.
+OPENING_COMMANDS = {"NAVIGATE", "SEARCH", "NEW_TAB"}
+# Commands that act on the content of the current page, so they wait until it has loaded.
+PAGE_COMMANDS = {"FIND_ON_PAGE", "EDIT_PAGE", "TRANSLATE_PAGE", "ASK_PAGE", "PRINT_TO_PDF", "BOOKMARK_PAGE", "CRAWL_SITE"}
+
+
+class ActionBatch(QObject):
+    """
+    Runs the actions of one "BATCH" response in order, as they stream in.
+
+    Actions run back to back, so tabs opened by the batch all load at the same time. An
+    action that needs the page, such as FIND_ON_PAGE, waits until the current tab has
+    finished any load the batch started in it, or `load_timeout` ms have passed.
+    `finished` is emitted once the response is complete and every action has run.
+    """
+    finished = pyqtSignal()
+
+    def __init__(self, browser, trace_id=None, load_timeout=15000, parent=None):
+        super().__init__(parent)
+        self.browser = browser
+        self.trace_id = trace_id
+        self.queue = deque()
+        self.opened = []
+        self.loading = set()
+        self.closed = False
+        self.done = False
+
+        self.load_timer = QTimer(self)
+        self.load_timer.setSingleShot(True)
+        self.load_timer.setInterval(load_timeout)
+        self.load_timer.timeout.connect(self.on_load_timeout)
+
+    def add(self, actions):
+        self.queue.extend(actions)
+        self.run()
+
+    def close(self):
+        """No more actions will be added."""
+        self.closed = True
+        self.run()
+
+    def current_view(self):
+        return self.browser.tabs.currentWidget()
+
+    def tab_views(self):
+        tabs = self.browser.tabs
+        return [tabs.widget(i) for i in range(tabs.count())]
+
+    def run(self):
+        while self.queue:
+            action = self.queue[0]
+            if action["command"] in PAGE_COMMANDS and self.current_view() in self.loading:
+                if not self.load_timer.isActive():
+                    self.load_timer.start()
+                return
+            self.queue.popleft()
+            self.perform(action)
+        if self.closed and not self.done:
+            self.done = True
+            self.load_timer.stop()
+            self.finished.emit()
+
+    def perform(self, action):
+        command = action["command"]
+        query = action.get("query") or ""
+        if command == "SWITCH_TAB" and query.startswith("opened:"):
+            self.switch_to_opened(query[len("opened:"):])
+            return
+        before = set(self.tab_views())
+        started = time.perf_counter_ns()
+        try:
+            self.browser.perform_praterich_action({"command": command, "query": query})
+        except Exception as e:
+            print(f"Error performing {command} in a batch: {e}")
+        self.browser.tracer.record(self.trace_id, f"action:{command}", started)
+
+        # NEW_TAB may open several tabs; each one gets its own "opened:N" number.
+        if command in OPENING_COMMANDS:
+            self.opened.extend(view for view in self.tab_views() if view not in before)
+        view = self.current_view()
+        if command in LOADING_COMMANDS and view is not None:
+            self.watch_load(view)
+
+    def switch_to_opened(self, number):
+        try:
+            view = self.opened[int(number) - 1]
+        except (ValueError, IndexError):
+            print(f"Batch asked for opened tab {number}, but it opened {len(self.opened)}.")
+            return
+        index = self.browser.tabs.indexOf(view)
+        if index >= 0:
+            self.browser.tabs.setCurrentIndex(index)
+
+    def watch_load(self, view):
+        if view in self.loading:
+            return
+        self.loading.add(view)
+
+        def on_load_finished(ok):
+            view.loadFinished.disconnect(on_load_finished)
+            self.loading.discard(view)
+            self.run()
+
+        view.loadFinished.connect(on_load_finished)
+
+    def on_load_timeout(self):
+        # A page that never finishes loading should not hold up the rest of the batch.
+        self.loading.discard(self.current_view())
+        self.run()
@@ -0,0 +1,128 @@
+import re
+import time
+import json
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from ringzauber_paths import data_path
+
+DEFAULT_CACHE_PATH = data_path('praterich_cache.sqlite3')
+
+
+def normalize_query(query):
+    """Lower-cases a query and collapses whitespace and trailing punctuation."""
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.rstrip(" .!?")
+
+
+def make_cache_key(query, system_instruction, model):
+    """Builds a cache key from the normalized query plus a hash of the instruction and model."""
+    digest = hashlib.sha256(f"{model}\0{system_instruction}".encode("utf-8")).hexdigest()[:16]
+    return f"{digest}:{normalize_query(query)}"
+
+
+class ResponseCache:
+    """
+    A two-tier cache for Praterich responses: an in-memory LRU in front of a SQLite store.
+
+    Entries expire after `ttl` seconds, or after the `ttl` given to `put` for that entry. The
+    memory tier holds at most `memory_entries` values and the disk tier at most `disk_entries`;
+    the oldest entries are evicted first.
+    """
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=7 * 24 * 3600, memory_entries=256, disk_entries=5000):
+        self.path = path
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+        self.db = None
+
+        if path:
+            try:
+                self.db = sqlite3.connect(path, check_same_thread=False)
+                columns = [row[1] for row in self.db.execute("PRAGMA table_info(responses)")]
+                if columns and "expires" not in columns:
+                    # Written before entries had their own lifetime; it is only a cache, so start over.
+                    self.db.execute("DROP TABLE responses")
+                self.db.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, expires REAL NOT NULL)"
+                )
+                self.db.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses(created)")
+                self.db.commit()
+            except sqlite3.Error as e:
+                print(f"Praterich cache disabled on disk: {e}")
+                self.db = None
+
+    def get(self, key):
+        """Returns the cached value for `key`, or None on a miss or an expired entry."""
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                value, expires = entry
+                if now < expires:
+                    self.memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return value
+                del self.memory[key]
+
+            if self.db is not None:
+                row = self.db.execute(
+                    "SELECT value, expires FROM responses WHERE key = ? AND expires > ?", (key, now)
+                ).fetchone()
+                if row:
+                    value = json.loads(row[0])
+                    self._remember(key, value, row[1])
+                    self.stats["disk_hits"] += 1
+                    return value
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key, value, ttl=None):
+        """Stores a value for `ttl` seconds, or the cache's default lifetime."""
+        now = time.time()
+        expires = now + (self.ttl if ttl is None else ttl)
+        with self.lock:
+            self._remember(key, value, expires)
+            self.stats["stores"] += 1
+            if self.db is not None:
+                try:
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO responses (key, value, created, expires) VALUES (?, ?, ?, ?)",
+                        (key, json.dumps(value), now, expires)
+                    )
+                    self._evict_disk(now)
+                    self.db.commit()
+                except sqlite3.Error as e:
+                    print(f"Error writing to the Praterich cache: {e}")
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM responses")
+                self.db.commit()
+
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def _remember(self, key, value, expires):
+        self.memory[key] = (value, expires)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def _evict_disk(self, now):
+        self.db.execute("DELETE FROM responses WHERE expires <= ?", (now,))
+        self.db.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.disk_entries,)
+        )
@@ -0,0 +1,262 @@
+import time
+from PyQt6.QtCore import Qt, QTimer, QRectF
+from PyQt6.QtGui import QPainter, QTextDocument, QTextCursor, QFontMetrics
+from PyQt6.QtWidgets import QAbstractScrollArea
+from chat_log import ChatLog, LayoutCache
+
+
+class ChatView(QAbstractScrollArea):
+    """
+    The Praterich conversation, painted straight onto a scroll area.
+
+    Messages live in a `ChatLog`, and only the messages inside the viewport are laid out
+    and painted, so scrolling and appending cost the same with ten thousand messages as
+    with ten. A finished message is rendered once as rich text and its layout kept in a
+    `LayoutCache`; a message that is still arriving grows a plain-text layout at its end.
+    New text is revealed every `frame_ms` in batches, and laying it out stops for the frame
+    once `frame_budget_ms` is spent.
+    """
+    MARGIN = 8
+    PADDING = 8
+    SPACING = 8
+
+    def __init__(self, frame_ms=16, frame_budget_ms=4, reveal_frames=6, cache_size=200, parent=None):
+        super().__init__(parent)
+        self.log = ChatLog(reveal_frames=reveal_frames, padding=2 * self.PADDING + self.SPACING)
+        self.layouts = LayoutCache(cache_size)
+        # Layouts of messages whose text is still changing: index -> [document, characters laid out].
+        self.live = {}
+        self.stale = set()
+        self.open_index = None
+        self.starting = False
+        self.thinking = ""
+        self.follow = True
+        self.frame_budget = frame_budget_ms / 1e3
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.verticalScrollBar().setSingleStep(24)
+        self.verticalScrollBar().valueChanged.connect(self.on_scrolled)
+
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setInterval(frame_ms)
+        self.frame_timer.timeout.connect(self.on_frame)
+        self.update_metrics()
+
+    # Messages
+
+    def add_message(self, role, text):
+        """Adds a complete message, "user" or "praterich", revealed over the next few frames."""
+        self.end()
+        self.log.add(role, text)
+        self.changed()
+
+    def say(self, text):
+        self.add_message("praterich", text)
+
+    def begin(self):
+        """Starts a streamed answer; its message is created by the first chunk."""
+        self.end()
+        self.starting = True
+
+    def append_chunk(self, text):
+        if self.starting or self.open_index is None:
+            self.open_index = self.log.add("praterich", open=True)
+            self.starting = False
+        self.log.append(self.open_index, text)
+        self.changed()
+
+    def end(self):
+        """Marks the streamed answer as complete, so it can be rendered as rich text."""
+        if self.open_index is not None:
+            self.log.close(self.open_index)
+            self.stale.add(self.open_index)
+            self.changed()
+        self.open_index = None
+        self.starting = False
+
+    def show_thinking(self, text="Thinking..."):
+        self.thinking = text
+        self.update_scroll_range()
+        self.viewport().update()
+
+    def hide_thinking(self):
+        if self.thinking:
+            self.thinking = ""
+            self.update_scroll_range()
+            self.viewport().update()
+
+    def clear(self):
+        self.log.clear()
+        self.layouts.clear()
+        self.live.clear()
+        self.stale.clear()
+        self.open_index = None
+        self.starting = False
+        self.thinking = ""
+        self.follow = True
+        self.frame_timer.stop()
+        self.update_scroll_range()
+        self.viewport().update()
+
+    reset = clear
+
+    def changed(self):
+        if not self.frame_timer.isActive():
+            self.frame_timer.start()
+
+    # Layout
+
+    def text_width(self):
+        return max(60, self.viewport().width() - 2 * (self.MARGIN + self.PADDING))
+
+    def update_metrics(self):
+        metrics = QFontMetrics(self.font())
+        self.log.set_metrics(self.text_width(), max(1, metrics.averageCharWidth()), metrics.lineSpacing())
+        for document, laid_out in self.live.values():
+            document.setTextWidth(self.text_width())
+        self.update_scroll_range()
+
+    def new_document(self):
+        document = QTextDocument()
+        document.setDocumentMargin(0)
+        document.setDefaultFont(self.font())
+        document.setTextWidth(self.text_width())
+        return document
+
+    def document_for(self, index):
+        """The layout of a message: its live layout while it changes, else a cached rich-text one."""
+        live = self.live.get(index)
+        if live is not None:
+            return live[0]
+        if not self.log.is_settled(index):
+            self.live[index] = [self.new_document(), 0]
+            self.grow(index)
+            return self.live[index][0]
+        key = (index, self.text_width())
+        document = self.layouts.get(key)
+        if document is None:
+            document = self.new_document()
+            message = self.log.messages[index]
+            if message["role"] == "praterich":
+                document.setMarkdown(message["text"])
+            else:
+                document.setPlainText(message["text"])
+            self.layouts.put(key, document)
+        return document
+
+    def grow(self, index):
+        """Lays out the newly revealed text of a live message by appending at its end."""
+        live = self.live.get(index)
+        if live is None:
+            return
+        if self.log.is_settled(index):
+            del self.live[index]
+            self.measure(index, self.document_for(index))
+            return
+        document, laid_out = live
+        text = self.log.visible_text(index)
+        if len(text) > laid_out:
+            cursor = QTextCursor(document)
+            cursor.movePosition(QTextCursor.MoveOperation.End)
+            cursor.insertText(text[laid_out:])
+            live[1] = len(text)
+        self.measure(index, document)
+
+    def row_height(self, document):
+        return int(document.size().height()) + 2 * self.PADDING + self.SPACING
+
+    def measure(self, index, document):
+        """Replaces a message's estimated height with its laid-out one."""
+        self.set_height(index, self.row_height(document))
+
+    def set_height(self, index, height):
+        """Changes a message's height, keeping the view still if the message is above it."""
+        old_height = self.log.heights[index]
+        if height == old_height:
+            return
+        above = self.log.heights.offset(index) + old_height <= self.verticalScrollBar().value()
+        self.log.heights.set(index, height)
+        self.update_scroll_range()
+        if above and not self.follow:
+            bar = self.verticalScrollBar()
+            bar.setValue(bar.value() + height - old_height)
+
+    def thinking_height(self):
+        return QFontMetrics(self.font()).lineSpacing() + 2 * self.PADDING if self.thinking else 0
+
+    def update_scroll_range(self):
+        bar = self.verticalScrollBar()
+        follow = self.follow
+        total = self.log.heights.total() + self.thinking_height() + self.MARGIN
+        bar.setPageStep(self.viewport().height())
+        bar.setRange(0, max(0, total - self.viewport().height()))
+        if follow:
+            bar.setValue(bar.maximum())
+        self.follow = follow
+
+    def on_scrolled(self, value):
+        self.follow = value >= self.verticalScrollBar().maximum() - 4
+
+    def on_frame(self):
+        started = time.perf_counter()
+        self.stale.update(self.log.reveal())
+        for index in sorted(self.stale):
+            if time.perf_counter() - started > self.frame_budget:
+                break
+            self.stale.discard(index)
+            if index in self.live:
+                self.grow(index)
+            elif self.log.is_settled(index):
+                self.measure(index, self.document_for(index))
+            else:
+                # Not laid out until it is scrolled into view; until then its height is estimated.
+                self.set_height(index, self.log.estimate(self.log.visible_text(index)))
+        if not self.log.revealing and not self.stale:
+            self.frame_timer.stop()
+        self.viewport().update()
+
+    # Painting
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        palette = self.palette()
+        top = self.verticalScrollBar().value()
+        bottom = top + self.viewport().height()
+        width = self.viewport().width() - 2 * self.MARGIN
+        row = self.log.heights.find(top)
+        y = self.log.heights.offset(row) if row >= 0 else 0
+        while 0 <= row < len(self.log) and y < bottom:
+            document = self.document_for(row)
+            # A message laid out for the first time replaces its estimated height.
+            self.measure(row, document)
+            height = self.log.heights[row]
+            rect = QRectF(self.MARGIN, y - top, width, height - self.SPACING)
+            if self.log.messages[row]["role"] == "user":
+                painter.setBrush(palette.alternateBase())
+            else:
+                painter.setBrush(palette.base())
+            painter.setPen(palette.mid().color())
+            painter.drawRoundedRect(rect, 6, 6)
+            painter.save()
+            painter.translate(self.MARGIN + self.PADDING, y - top + self.PADDING)
+            document.drawContents(painter, QRectF(0, 0, self.text_width(), height))
+            painter.restore()
+            y += height
+            row += 1
+        if self.thinking and y < bottom:
+            painter.setPen(palette.placeholderText().color())
+            painter.drawText(QRectF(self.MARGIN + self.PADDING, y - top, width, self.thinking_height()),
+                             Qt.AlignmentFlag.AlignVCenter, self.thinking)
+        painter.end()
+        if self.verticalScrollBar().value() != top:
+            self.viewport().update()
+
+    def scrollContentsBy(self, dx, dy):
+        self.viewport().update()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.text_width() != self.log.width:
+            self.update_metrics()
+        else:
+            self.update_scroll_range()
@@ -0,0 +1,157 @@
+import os
+import sys
+import json
+import stat
+import socket
+
+# Kept free of heavy imports: this is what a script or hotkey loads on every call.
+UID = os.getuid() if hasattr(os, "getuid") else None
+# XDG_RUNTIME_DIR is already private to the user. Without it the socket goes in a directory of
+# its own under /tmp, which make_socket_directory creates for this user alone.
+DEFAULT_SOCKET_PATH = os.environ.get("PRATERICH_SOCKET") or (
+    os.path.join(os.environ["XDG_RUNTIME_DIR"], f"praterich-{UID}.sock") if os.environ.get("XDG_RUNTIME_DIR")
+    else os.path.join(os.environ.get("TMPDIR") or "/tmp", f"praterich-{UID}", "praterich.sock")
+)
+
+USAGE = """usage: praterich_ai.py [--text] [--stream] [--no-daemon] QUERY
+       praterich_ai.py --stats
+       praterich_ai.py --daemon"""
+
+
+def make_socket_directory(path):
+    """
+    Creates the directory of the socket at `path` with mode 0700 if it is missing. Raises
+    PermissionError if it is not a real directory owned by this user, or others can write to
+    it, since whoever can would be able to put their own socket in the daemon's place.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if UID is not None and (not stat.S_ISDIR(info.st_mode) or info.st_uid != UID or info.st_mode & 0o022):
+        raise PermissionError(f"{directory} must be a directory of yours that no one else can write to.")
+
+
+def check_socket_owner(path):
+    """Raises PermissionError unless the socket at `path` was created by this user."""
+    if UID is not None and os.stat(path).st_uid != UID:
+        raise PermissionError(f"{path} belongs to another user.")
+
+
+class PraterichClient:
+    """
+    A connection to a running Praterich daemon.
+
+    Requests may be pipelined: `send` several, then read their replies from `replies`,
+    which arrive in the order they finish, each tagged with its request's id.
+    """
+    def __init__(self, path=DEFAULT_SOCKET_PATH, timeout=60.0):
+        # Queries are only sent to a daemon of the same user.
+        check_socket_owner(path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(path)
+        except OSError:
+            self.sock.close()
+            raise
+        self.file = self.sock.makefile("rb")
+        self.next_id = 1
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def send(self, op, query="", stream=False, use_cache=True):
+        """Sends a "command", "text" or "stats" request and returns its id."""
+        request_id = self.next_id
+        self.next_id += 1
+        request = {"id": request_id, "op": op, "query": query, "stream": stream, "use_cache": use_cache}
+        self.sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        return request_id
+
+    def replies(self):
+        """Yields reply objects until the daemon closes the connection."""
+        for line in self.file:
+            yield json.loads(line)
+
+    def request(self, op, query="", stream=False, use_cache=True):
+        """Sends one request and yields its replies: chunks if streaming, then the result or error."""
+        request_id = self.send(op, query, stream, use_cache)
+        for reply in self.replies():
+            if reply.get("id") != request_id:
+                continue
+            yield reply
+            if "result" in reply or "error" in reply:
+                return
+        raise ConnectionError("The Praterich daemon closed the connection.")
+
+
+def print_reply(op, reply):
+    """Prints a final reply the way the one-shot CLI printed its response."""
+    if op == "command":
+        if "error" in reply:
+            print(json.dumps({"command": "NONE", "query": "", "message": f"I'm sorry, an error occurred: {reply['error']}"}))
+        else:
+            print(json.dumps(reply["result"]))
+    elif op == "text":
+        print(reply["result"] if "error" not in reply else f"I'm sorry, an error occurred while processing your text: {reply['error']}")
+    else:
+        print(json.dumps(reply.get("result", reply), indent=2))
+
+
+def run_in_process(op, query):
+    import praterich_ai
+    if op == "command":
+        praterich_ai.get_praterich_response(query)
+    else:
+        print(praterich_ai.get_praterich_response_text(query))
+
+
+def main(argv):
+    flags = {arg for arg in argv if arg.startswith("--")}
+    query = " ".join(arg for arg in argv if not arg.startswith("--"))
+    if "--help" in flags:
+        print(USAGE)
+        return 0
+    if "--daemon" in flags:
+        from praterich_daemon import main as run_daemon
+        return run_daemon()
+
+    op = "stats" if "--stats" in flags else "text" if "--text" in flags else "command"
+    if op != "stats" and not query:
+        print(json.dumps({"command": "NONE", "query": "", "message": "No query provided."}))
+        return 0
+
+    client = None
+    if "--no-daemon" not in flags and hasattr(socket, "AF_UNIX"):
+        try:
+            client = PraterichClient()
+        except OSError:
+            client = None
+    if client is None:
+        if op == "stats":
+            print("The Praterich daemon is not running. Start it with: praterich_ai.py --daemon", file=sys.stderr)
+            return 1
+        run_in_process(op, query)
+        return 0
+
+    with client:
+        for reply in client.request(op, query, stream="--stream" in flags):
+            if "chunk" in reply:
+                sys.stdout.write(reply["chunk"])
+                sys.stdout.flush()
+            elif "--stream" in flags and "result" in reply:
+                sys.stdout.write("\n")
+            else:
+                print_reply(op, reply)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,183 @@
+import os
+import sys
+import json
+from page_context import estimate_tokens
+
+SUMMARY_PREFIX = "Summary of our conversation so far, oldest first:\n"
+SUMMARY_REPLY = json.dumps({"command": "NONE", "query": "", "message": "Noted."})
+
+
+def clip(text, limit):
+    text = " ".join(str(text or "").split())
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+
+def summarize_turn(turn):
+    """One line for a compacted turn: what was asked and what Praterich did, without its message."""
+    done = [f"{action.get('command')} {clip(action.get('query'), 40)}".strip() for action in turn["actions"]]
+    if not done:
+        done = [f"{turn['command']} {clip(turn['query'], 80)}".strip()]
+    return f"- {clip(turn['user'], 100)} -> {'; '.join(done)}"
+
+
+class ConversationSession:
+    """
+    The running conversation of a Praterich panel, sent along with each query.
+
+    Each exchange is a turn: what the user asked and what Praterich did in reply. Once the
+    turns add up to more than `token_budget` estimated tokens, or there are more than
+    `max_turns` of them, the oldest are folded into one-line summaries until the budget is
+    met again, always keeping the `keep_recent` newest turns in full. The summaries are
+    themselves trimmed from the oldest to `summary_budget` tokens. Compaction is local, so it
+    costs no model call.
+    """
+    def __init__(self, max_turns=12, token_budget=1500, keep_recent=4, summary_budget=300):
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.summary_budget = summary_budget
+        self.generation = 0
+        self.compactions = 0
+        self.reset()
+
+    def reset(self):
+        self.turns = []
+        self.summary = []
+        self.summary_tokens = 0
+        self.generation += 1
+        self._history = []
+
+    def __len__(self):
+        return len(self.turns)
+
+    def begin(self, user_query):
+        """Starts a turn. Fill in what Praterich did as the reply arrives, then `commit` it."""
+        return {"user": user_query, "command": "NONE", "query": "", "actions": [], "message": "",
+                "generation": self.generation}
+
+    def record(self, user_query, response):
+        """Records a turn answered without the model, such as a command matched locally."""
+        turn = self.begin(user_query)
+        turn["command"] = response.get("command") or "NONE"
+        turn["query"] = response.get("query") or ""
+        self.commit(turn)
+
+    def commit(self, turn):
+        """Adds a finished turn. A turn begun before the last `reset` is dropped."""
+        if turn["generation"] != self.generation:
+            return False
+        reply = {"command": turn["command"], "query": turn["query"]}
+        if turn["actions"]:
+            reply["actions"] = [{"command": action.get("command"), "query": action.get("query", "")}
+                                for action in turn["actions"]]
+        reply["message"] = clip(turn["message"], 400)
+        reply = json.dumps(reply)
+        self.turns.append({
+            "user": turn["user"],
+            "reply": reply,
+            "summary": summarize_turn(turn),
+            "tokens": estimate_tokens(turn["user"]) + estimate_tokens(reply),
+        })
+        self.compact()
+        self._history = None
+        return True
+
+    def tokens(self):
+        """The estimated tokens of the history as it is sent."""
+        return sum(turn["tokens"] for turn in self.turns) + self.summary_tokens
+
+    def compact(self):
+        while len(self.turns) > self.keep_recent and (len(self.turns) > self.max_turns or self.tokens() > self.token_budget):
+            line = self.turns.pop(0)["summary"]
+            self.summary.append(line)
+            self.summary_tokens += estimate_tokens(line)
+            self.compactions += 1
+        while self.summary and self.summary_tokens > self.summary_budget:
+            self.summary_tokens -= estimate_tokens(self.summary.pop(0))
+
+    def history(self):
+        """
+        Returns the conversation as model contents: the summary, if any, as a first exchange,
+        then each turn. The list is rebuilt rather than changed when a turn is added, so one
+        that was handed to another thread stays as it was.
+        """
+        if self._history is None:
+            history = []
+            if self.summary:
+                history.append({"role": "user", "parts": [{"text": SUMMARY_PREFIX + "\n".join(self.summary)}]})
+                history.append({"role": "model", "parts": [{"text": SUMMARY_REPLY}]})
+            for turn in self.turns:
+                history.append({"role": "user", "parts": [{"text": turn["user"]}]})
+                history.append({"role": "model", "parts": [{"text": turn["reply"]}]})
+            self._history = history
+        return self._history
+
+
+FOLLOW_UPS = [
+    "search for python tutorials", "open the second one", "now find the docs for asyncio",
+    "bookmark this page", "go back", "search for the same thing on youtube", "open the first video",
+    "what was I looking for before the videos?", "translate this page to french", "close this tab",
+]
+
+
+def request_tokens(body):
+    """The estimated tokens a request uploads: its contents plus any inline system instruction."""
+    texts = [part.get("text", "") for content in body.get("contents") or [] for part in content.get("parts") or []]
+    instruction = body.get("systemInstruction") or {}
+    texts += [part.get("text", "") for part in instruction.get("parts") or []]
+    return sum(estimate_tokens(text) for text in texts)
+
+
+def run_benchmark(turns=30):
+    """
+    Sends `turns` follow-up commands to a fake model server three ways: stateless with the
+    instruction inline, as before; with conversation history and the instruction inline;
+    and with history and the instruction in the context cache. Reports tokens sent per turn.
+    """
+    from fake_model_server import FakeModelServer
+
+    def reply(text):
+        return json.dumps({"command": "SEARCH", "query": text,
+                           "message": f"Certainly, here is what I found for \"{text}\". Do let me know if you need anything else."})
+
+    server = FakeModelServer(default_reply=reply).start()
+    os.environ["PRATERICH_BASE_URL"] = server.base_url
+    os.environ.setdefault("PRATERICH_API_KEY", "fake-key")
+    results = {}
+    try:
+        import praterich_ai
+
+        for name, with_history, cached in (("stateless", False, False), ("history_inline", True, False),
+                                           ("history_cached", True, True)):
+            praterich_ai.instruction_cache.enabled = cached
+            if cached:
+                for model in praterich_ai.router.tiers.values():
+                    praterich_ai.instruction_cache.create(praterich_ai.SYSTEM_INSTRUCTION, model)
+            session = ConversationSession()
+            sent = []
+            for number in range(turns):
+                query = FOLLOW_UPS[number % len(FOLLOW_UPS)]
+                turn = session.begin(query)
+                start = len(server.requests)
+                text = "".join(praterich_ai.stream_praterich_response(
+                    query, use_cache=False, history=session.history() if with_history else None))
+                sent.append(sum(request_tokens(request["body"]) for request in server.requests[start:]))
+                response = json.loads(praterich_ai.clean_response_text(text))
+                turn.update(command=response["command"], query=response["query"], message=response["message"])
+                session.commit(turn)
+            results[name] = {
+                "tokens_per_turn_mean": sum(sent) / len(sent),
+                "tokens_first_turn": sent[0],
+                "tokens_last_turn": sent[-1],
+                "tokens_max_turn": max(sent),
+                "history_tokens_at_end": session.tokens() if with_history else 0,
+                "compactions": session.compactions if with_history else 0,
+            }
+        results["instruction_tokens"] = estimate_tokens(praterich_ai.SYSTEM_INSTRUCTION)
+    finally:
+        server.stop()
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 30), indent=2))
@@ -0,0 +1,269 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import signal
+import asyncio
+import tempfile
+import subprocess
+from collections import defaultdict, deque
+from praterich_client import DEFAULT_SOCKET_PATH, PraterichClient, make_socket_directory
+from ringzauber_stats import percentile
+import praterich_ai
+
+OPS = ("command", "text")
+# The start of a request line as PraterichClient writes it, to answer one too long to parse.
+REQUEST_ID_RE = re.compile(rb'^\s*\{\s*"id"\s*:\s*(-?\d+)')
+
+
+class PraterichDaemon:
+    """
+    Serves Praterich over a Unix domain socket, so scripts skip the interpreter start,
+    the SDK import and the client setup on every query.
+
+    The protocol is JSON lines. A request is
+    {"id": ..., "op": "command" | "text" | "stats", "query": str, "stream": bool, "use_cache": bool}.
+    Replies carry the request's id: {"id", "chunk"} for each streamed piece, then exactly one
+    {"id", "result"} or {"id", "error"}. A command's result is its parsed JSON, a text
+    answer's is a string. Requests on one connection run concurrently, so they can be
+    pipelined and their replies may arrive out of order; at most `max_concurrency` model
+    calls run at once across all connections. A request line longer than `max_request_bytes`
+    is skipped and answered with an error.
+    """
+    def __init__(self, path=DEFAULT_SOCKET_PATH, max_concurrency=8, max_request_bytes=16 * 1024 * 1024):
+        self.path = path
+        self.max_concurrency = max_concurrency
+        self.max_request_bytes = max_request_bytes
+        self.started = time.time()
+        self.counts = {"connections": 0, "open_connections": 0, "requests": 0, "active": 0, "errors": 0}
+        self.latency = defaultdict(lambda: deque(maxlen=500))
+        self.semaphore = None
+        self.stopping = None
+
+    def claim_socket(self):
+        """Removes a socket left behind by a daemon that died; fails if one is still serving."""
+        make_socket_directory(self.path)
+        if not os.path.exists(self.path):
+            return
+        try:
+            PraterichClient(self.path, timeout=1.0).close()
+        except OSError:
+            os.unlink(self.path)
+            return
+        raise RuntimeError(f"A Praterich daemon is already serving {self.path}.")
+
+    async def serve(self, ready=None):
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.stopping = asyncio.Event()
+        self.claim_socket()
+        # The socket is created with no access for others, rather than chmod-ed once it is bound.
+        umask = os.umask(0o077)
+        try:
+            server = await asyncio.start_unix_server(self.handle, path=self.path, limit=self.max_request_bytes)
+        finally:
+            os.umask(umask)
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, self.stopping.set)
+            except (ValueError, RuntimeError):
+                pass
+        if ready is not None:
+            ready()
+        try:
+            async with server:
+                await self.stopping.wait()
+        finally:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def stop(self):
+        if self.stopping is not None:
+            self.stopping.set()
+
+    async def handle(self, reader, writer):
+        self.counts["connections"] += 1
+        self.counts["open_connections"] += 1
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        async def send(reply):
+            async with write_lock:
+                writer.write(json.dumps(reply).encode("utf-8") + b"\n")
+                await writer.drain()
+
+        try:
+            while True:
+                try:
+                    line = await reader.readuntil(b"\n")
+                except asyncio.IncompleteReadError as e:
+                    line = e.partial
+                except asyncio.LimitOverrunError as e:
+                    request_id = await self.skip_line(reader, e.consumed)
+                    await send({"id": request_id, "error": f"The request is longer than {self.max_request_bytes} bytes."})
+                    continue
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("a request must be a JSON object")
+                except ValueError as e:
+                    await send({"id": None, "error": f"Invalid request: {e}"})
+                    continue
+                task = asyncio.create_task(self.run_request(request, send))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            # The client may close its side as soon as it has sent everything; still answer it.
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.counts["open_connections"] -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def skip_line(self, reader, buffered):
+        """Discards the rest of an overlong request line; returns its id if the start names one."""
+        head = await reader.readexactly(buffered)
+        found = REQUEST_ID_RE.match(head)
+        while True:
+            try:
+                await reader.readuntil(b"\n")
+                break
+            except asyncio.LimitOverrunError as e:
+                await reader.readexactly(e.consumed)
+            except asyncio.IncompleteReadError:
+                break
+        return int(found.group(1)) if found else None
+
+    async def run_request(self, request, send):
+        request_id = request.get("id")
+        op = request.get("op", "command")
+        if op == "stats":
+            await send({"id": request_id, "result": self.stats()})
+            return
+        query = request.get("query")
+        if op not in OPS:
+            await send({"id": request_id, "error": f"Unknown op {op!r}; expected one of {', '.join(OPS + ('stats',))}."})
+            return
+        if not isinstance(query, str) or not query.strip():
+            await send({"id": request_id, "error": "No query provided."})
+            return
+
+        self.counts["requests"] += 1
+        self.counts["active"] += 1
+        started = time.perf_counter()
+        try:
+            parts = []
+            async with self.semaphore:
+                async for text in praterich_ai.astream_praterich_response(query, op, request.get("use_cache", True)):
+                    parts.append(text)
+                    if request.get("stream"):
+                        await send({"id": request_id, "chunk": text})
+            result = "".join(parts).strip()
+            if op == "command":
+                try:
+                    result = json.loads(praterich_ai.clean_response_text(result))
+                except ValueError:
+                    raise ValueError("Praterich returned a response that could not be understood.")
+        except ConnectionError:
+            raise
+        except Exception as e:
+            self.counts["errors"] += 1
+            await send({"id": request_id, "error": str(e)})
+            return
+        finally:
+            self.counts["active"] -= 1
+            self.latency[op].append(time.perf_counter() - started)
+        await send({"id": request_id, "result": result})
+
+    def stats(self):
+        return {
+            "pid": os.getpid(),
+            "uptime_s": round(time.time() - self.started, 1),
+            **self.counts,
+            "latency_ms": {op: {"count": len(samples), "p50": percentile(samples, 0.5, 0.0) * 1e3,
+                                "p95": percentile(samples, 0.95, 0.0) * 1e3}
+                           for op, samples in self.latency.items()},
+            "response_cache": dict(praterich_ai.response_cache.stats),
+            "router": dict(praterich_ai.router.stats, breaker=praterich_ai.router.breaker.state),
+        }
+
+
+def main(path=DEFAULT_SOCKET_PATH):
+    daemon = PraterichDaemon(path)
+    try:
+        asyncio.run(daemon.serve(ready=lambda: print(f"Praterich daemon listening on {path}", flush=True)))
+    except (RuntimeError, OSError) as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+
+def run_benchmark(queries=20, pipelined=50):
+    """
+    Compares the one-shot CLI with the thin client against a warm daemon, both talking to
+    a fake model server, then times `pipelined` requests sent at once on one connection
+    against the same requests sent one after another.
+    """
+    from fake_model_server import FakeModelServer
+
+    server = FakeModelServer(latency=0.05).start()
+    here = os.path.dirname(os.path.abspath(__file__))
+    path = os.path.join(tempfile.mkdtemp(prefix="praterich-benchmark-"), "praterich.sock")
+    env = dict(os.environ, PRATERICH_BASE_URL=server.base_url, PRATERICH_API_KEY="fake-key", PRATERICH_SOCKET=path)
+    cli = [sys.executable, os.path.join(here, "praterich_ai.py")]
+    daemon = subprocess.Popen(cli + ["--daemon"], env=env, stdout=subprocess.PIPE, text=True)
+    results = {}
+    try:
+        daemon.stdout.readline()
+
+        def time_cli(extra):
+            samples = []
+            for number in range(queries):
+                started = time.perf_counter()
+                subprocess.run(cli + extra + [f"open page {' '.join(extra) or 'via daemon'} {number}"], env=env, capture_output=True, check=True)
+                samples.append((time.perf_counter() - started) * 1e3)
+            return {"p50_ms": percentile(samples, 0.5), "p95_ms": percentile(samples, 0.95)}
+
+        results["one_shot_cli"] = time_cli(["--no-daemon"])
+        results["thin_client_warm_daemon"] = time_cli([])
+
+        with PraterichClient(path) as client:
+            started = time.perf_counter()
+            for number in range(pipelined):
+                list(client.request("command", f"sequential {number}", use_cache=False))
+            sequential = time.perf_counter() - started
+
+            started = time.perf_counter()
+            ids = {client.send("command", f"pipelined {number}", use_cache=False) for number in range(pipelined)}
+            for reply in client.replies():
+                ids.discard(reply["id"])
+                if not ids:
+                    break
+            pipelined_time = time.perf_counter() - started
+            results["sequential_ms"] = sequential * 1e3
+            results["pipelined_ms"] = pipelined_time * 1e3
+            results["stats"] = next(client.request("stats"))["result"]
+    finally:
+        daemon.send_signal(signal.SIGTERM)
+        daemon.wait(timeout=10)
+        server.stop()
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+    return results
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--benchmark"]:
+        print(json.dumps(run_benchmark(), indent=2))
+    else:
+        sys.exit(main())
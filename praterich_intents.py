@@ -0,0 +1,262 @@
+import re
+import sys
+import json
+import time
+from ringzauber_stats import percentile
+
+# Words that carry no meaning for matching, stripped from the start and end of an utterance.
+POLITE_PREFIX = re.compile(r"^(?:(?:hey |ok |okay )?praterich[,:]?\s+)?(?:(?:please|kindly|can you|could you|would you|will you)\s+)*")
+POLITE_SUFFIX = re.compile(r"(?:\s+(?:please|for me|thanks|thank you))+$")
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5,
+    "sixth": 6, "seventh": 7, "eighth": 8, "ninth": 9, "tenth": 10, "last": -1,
+}
+
+# More tabs than this at once is unusual enough that the model should decide what was meant.
+MAX_NEW_TABS = 20
+
+# Words around what to find that are not part of it, as in "find the word pricing".
+FIND_FILLER = re.compile(r"^(?:the )?(?:words?|phrase|text|term) ")
+# Things a web search is "for" that are no query at all, as in "search the web".
+EMPTY_SEARCHES = {"the web", "the internet", "online", "it", "this", "that", "something"}
+
+LANGUAGE_CODES = {
+    "english": "en", "french": "fr", "german": "de", "spanish": "es", "italian": "it",
+    "portuguese": "pt", "dutch": "nl", "japanese": "ja", "chinese": "zh-CN",
+    "korean": "ko", "russian": "ru", "arabic": "ar", "hindi": "hi",
+}
+
+
+def _number(text, default=1):
+    if not text:
+        return default
+    if text.isdigit():
+        return int(text)
+    return NUMBER_WORDS.get(text, default)
+
+
+def _count(match):
+    text = match.group("n") or match.group("n2")
+    count = _number(text, 0) if text else 1
+    return str(count) if 0 < count <= MAX_NEW_TABS else None
+
+
+def _tab_number(match):
+    count = _number(match.group("n") or match.group("n2"), 0)
+    return str(count) if count > 0 else None
+
+
+def _url(target):
+    return target if target.startswith(("http://", "https://")) else f"https://{target}"
+
+
+def _find_query(match):
+    query = FIND_FILLER.sub("", match.group("q") or match.group("q2")).strip("\"'")
+    return query or None
+
+
+def _search_query(match):
+    query = match.group("q")
+    return None if query in EMPTY_SEARCHES else query
+
+
+def _language(match):
+    name = match.group("lang")
+    if not name:
+        return "en"
+    return LANGUAGE_CODES.get(name, name if len(name) <= 5 else None)
+
+
+# (first words, command, pattern, query builder, message). The query builder receives the
+# match object and returns the query string, or None when the utterance should go to the model.
+INTENTS = [
+    (("new", "open", "a"), "NEW_TAB",
+     r"(?:open )?(?:a )?new (?:(?P<n>\d+|\w+) )?(?:new )?tabs?|open (?P<n2>\d+|\w+) (?:new )?tabs?",
+     _count, "Opening a fresh tab for you."),
+    (("new", "open"), "NEW_WINDOW", r"(?:open )?(?:a )?new window",
+     lambda m: "", "Opening a new window."),
+    (("new", "start", "clear"), "NEW_CHAT",
+     r"new (?:chat|conversation)|start (?:a )?new (?:chat|conversation)|clear (?:the )?chat",
+     lambda m: "", "Starting a fresh conversation."),
+    (("close",), "CLOSE_TAB", r"close (?:this |the |current |the current )?tab",
+     lambda m: "", "Closing the current tab."),
+    (("reload", "refresh"), "RELOAD", r"(?:reload|refresh)(?: (?:this|the))?(?: page| tab)?",
+     lambda m: "", "Reloading the page for you."),
+    (("go", "back", "previous"), "GO_BACK", r"(?:go )?back(?: a page)?|previous page",
+     lambda m: "", "Going back to the previous page."),
+    (("go", "forward", "next"), "GO_FORWARD", r"(?:go )?forward(?: a page)?|next page",
+     lambda m: "", "Going forward to the next page."),
+    (("zoom", "make"), "ZOOM_IN", r"zoom in|make (?:it|the page|text) (?:bigger|larger)",
+     lambda m: "", "Zooming in."),
+    (("zoom", "make"), "ZOOM_OUT", r"zoom out|make (?:it|the page|text) smaller",
+     lambda m: "", "Zooming out."),
+    (("switch", "go", "tab", "show"), "SWITCH_TAB",
+     r"(?:(?:switch|go) to |show )?(?:the )?(?:tab (?:number )?(?P<n>\d+|\w+)|(?P<n2>\w+) tab)",
+     _tab_number, "Switching tabs."),
+    (("go", "open", "navigate", "visit", "take", "load"), "NAVIGATE",
+     r"(?:go to|open|navigate to|visit|take me to|load) (?P<target>(?:https?://)?[\w-]+(?:\.[\w-]+)+(?:/\S*)?)",
+     lambda m: _url(m.group("target")), "Navigating there now."),
+    (("find", "search", "which", "look"), "FIND_IN_TABS",
+     r"(?:find|search for|look for) (?P<q>.+?) in (?:my |the |all )?(?:open )?tabs|(?:search|look through) (?:my |the |all )?(?:open )?tabs for (?P<q2>.+)"
+     r"|which tab (?:has|shows|mentions|is about) (?P<q3>.+)",
+     lambda m: m.group("q") or m.group("q2") or m.group("q3"), "Searching your open tabs."),
+    # Only wording that names the page; "find cheap flights" is a web search, for the model to decide.
+    (("find", "search", "look"), "FIND_ON_PAGE",
+     r"(?:find|search for|look for) (?P<q>.+?) (?:on|in) (?:this|the) page"
+     r"|(?:find (?:on|in) (?:this |the )?page|search (?:this|the) page for) (?P<q2>.+)",
+     _find_query, "Searching this page."),
+    (("search", "find", "look"), "SEARCH_HISTORY",
+     r"(?:search(?: for)?|find|look for) (?P<q>.+?) in (?:my |the )?history|(?:search|look through) (?:my |the )?history for (?P<q2>.+)",
+     lambda m: m.group("q") or m.group("q2"), "Searching your browsing history."),
+    (("search", "google", "look"), "SEARCH",
+     r"(?:search(?: the web| online)?(?: for)?|google|look up) (?P<q>.+)",
+     _search_query, "Searching the web for you."),
+    (("set", "change", "make"), "SET_COLOR",
+     r"(?:set|change|make) (?:the )?(?:browser |theme |toolbar )?colou?r (?:to )?(?P<colour>[a-z]+)",
+     lambda m: m.group("colour"), "Changing the colour for you."),
+    (("toggle", "show", "hide", "open", "close"), "TOGGLE_SIDEBAR",
+     r"(?:toggle|show|hide|open|close) (?:the )?side ?(?:bar|panel)",
+     lambda m: "", "Toggling the sidebar."),
+    (("translate",), "TRANSLATE_PAGE",
+     r"translate(?: this| the)?(?: page)?(?: (?:to|into) (?P<lang>[\w-]+))?",
+     _language, "Translating the page."),
+    (("open", "show", "inspect", "developer", "dev"), "DEVELOPER_TOOLS",
+     r"(?:(?:open|show) )?(?:the )?(?:developer|dev) ?tools|inspect(?: element| this page| the page)?",
+     lambda m: "", "Opening the developer tools."),
+    (("print", "save", "export"), "PRINT_TO_PDF",
+     r"(?:print|save|export)(?: this| the)?(?: page)? (?:to|as) (?:a )?pdf",
+     lambda m: "", "Let us save this page as a PDF."),
+    (("bookmark", "save"), "BOOKMARK_PAGE", r"bookmark(?: this| the)?(?: page)?|save (?:this |the )?page as a bookmark",
+     lambda m: "", "Bookmarking this page."),
+    (("resize", "set"), "RESIZE_WINDOW",
+     r"(?:resize|set) (?:the )?window(?: size)? to (?P<w>\d+) ?(?:x|by) ?(?P<h>\d+)",
+     lambda m: f"{m.group('w')}x{m.group('h')}", "Resizing the window."),
+    (("summarise", "summarize", "explain", "what"), "ASK_PAGE",
+     r"(?:summarise|summarize|explain) (?:this|the) (?:page|article)|what is (?:this|the) (?:page|article) about",
+     lambda m: m.string, "Reading the page for you."),
+    (("crawl", "summarise", "summarize"), "CRAWL_SITE",
+     r"crawl (?:this|the)? ?(?:site|website|page)(?: with oodles)?|(?:summarise|summarize) this (?:site|website)",
+     lambda m: "", "My crawler, Oodles, is now analysing the website for you. Please hold on a moment."),
+    (("vertical", "use", "switch", "change"), "TAB_FORMAT_VERTICAL",
+     r"(?:(?:use|switch to|change to|change tabs to) )?vertical tabs",
+     lambda m: "", "Changing tabs to a vertical arrangement."),
+    (("horizontal", "use", "switch", "change"), "TAB_FORMAT_HORIZONTAL_MULTIROWE",
+     r"(?:(?:use|switch to|change to|change tabs to) )?horizontal tabs",
+     lambda m: "", "Changing tabs to a horizontal arrangement."),
+    (("open", "show", "notes"), "OPEN_NOTES", r"(?:(?:open|show) )?(?:my |the )?notes",
+     lambda m: "", "Opening your notes."),
+    (("upload",), "UPLOAD_FILE", r"upload (?:a |the )?file",
+     lambda m: "", "Please choose the file you would like to upload."),
+    (("manage", "open", "show"), "MANAGE_EXTENSIONS", r"(?:manage|open|show) (?:my )?extensions",
+     lambda m: "", ""),
+    (("sync", "synchronise", "synchronize"), "SYNC_DATA", r"(?:sync|synchronise|synchronize) (?:my )?data",
+     lambda m: "", ""),
+    (("open", "change", "show"), "CHANGE_SETTINGS", r"(?:open|change|show) (?:the )?settings",
+     lambda m: "", ""),
+]
+
+
+class IntentMatcher:
+    """
+    Matches trivial browser commands locally so they never need a model round trip.
+
+    Patterns are compiled once and indexed by the first word they can start with, so
+    each utterance is only tried against the handful of patterns that could match it.
+    """
+    def __init__(self, intents=INTENTS):
+        self.by_first_word = {}
+        for first_words, command, pattern, build_query, message in intents:
+            entry = (command, re.compile(f"(?:{pattern})$"), build_query, message)
+            for word in first_words:
+                self.by_first_word.setdefault(word, []).append(entry)
+
+    def normalize(self, utterance):
+        text = " ".join(utterance.lower().split())
+        text = text.strip(" .!?")
+        text = POLITE_PREFIX.sub("", text)
+        return POLITE_SUFFIX.sub("", text)
+
+    def match(self, utterance):
+        """Returns a {"command", "query", "message"} dict, or None if the model should decide."""
+        text = self.normalize(utterance)
+        if not text:
+            return None
+
+        for command, pattern, build_query, message in self.by_first_word.get(text.split(" ", 1)[0], ()):
+            match = pattern.match(text)
+            if not match:
+                continue
+            query = build_query(match)
+            if query is None:
+                return None
+            return {"command": command, "query": query, "message": message}
+        return None
+
+
+default_matcher = IntentMatcher()
+
+
+def match_intent(utterance):
+    return default_matcher.match(utterance)
+
+
+def run_benchmark(corpus_path, repeat=200, network_samples=0):
+    """
+    Reports match rate, accuracy and latency of the local matcher over a labelled corpus.
+
+    Examples labelled with a null command must go to the model; matching one of them, or
+    matching any example as the wrong command, counts as a false positive.
+    """
+    with open(corpus_path, "r") as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+
+    matched = correct = false_positives = model_bound = 0
+    latencies = []
+    for example in corpus:
+        expected = example.get("command")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = match_intent(example["utterance"])
+            latencies.append(time.perf_counter() - start)
+        if expected is None:
+            model_bound += 1
+        if result is not None:
+            matched += 1
+            if result["command"] == expected and (
+                    "query" not in example or result["query"] == example["query"]):
+                correct += 1
+            else:
+                false_positives += 1
+        elif expected is None:
+            correct += 1
+
+    report = {
+        "examples": len(corpus),
+        "match_rate": matched / len(corpus),
+        "accuracy": correct / len(corpus),
+        "false_positives": false_positives,
+        "model_bound_examples": model_bound,
+        "local_p50_us": percentile(latencies, 0.50) * 1e6,
+        "local_p99_us": percentile(latencies, 0.99) * 1e6,
+    }
+
+    if network_samples:
+        from praterich_ai import get_praterich_response_text
+        network = []
+        for example in corpus[:network_samples]:
+            start = time.perf_counter()
+            get_praterich_response_text(example["utterance"], use_cache=False)
+            network.append(time.perf_counter() - start)
+        report["network_p50_ms"] = percentile(network, 0.50) * 1e3
+        report["network_p99_ms"] = percentile(network, 0.99) * 1e3
+
+    return report
+
+
+if __name__ == "__main__":
+    corpus_path = sys.argv[1] if len(sys.argv) > 1 else "intent_corpus.jsonl"
+    network_samples = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    print(json.dumps(run_benchmark(corpus_path, network_samples=network_samples), indent=2))
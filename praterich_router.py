@@ -0,0 +1,368 @@
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import threading
+from collections import deque
+from ringzauber_stats import percentile
+
+# Words that mark a command as more than a single simple step.
+COMPLEX_RE = re.compile(
+    r"\b(and|then|after|before|while|unless|compare|summari[sz]e|explain|why|how|each|every|all|"
+    r"translate|write|rewrite|edit|crawl|analy[sz]e|plan|list)\b|[,;:]"
+)
+
+
+class BackendUnavailable(Exception):
+    """Raised instead of waiting on the model when it cannot answer: no key, or it keeps failing."""
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the model did not answer within a request's deadline."""
+
+
+def classify(query, mode="command", max_words=8):
+    """
+    Returns "fast" for a short, single-step command and "full" for anything else. Plain-text
+    answers always go to the full model, since they carry page content or highlighted text.
+    """
+    if mode != "command":
+        return "full"
+    words = query.split()
+    if not words or len(words) > max_words or COMPLEX_RE.search(query.lower()):
+        return "full"
+    return "fast"
+
+
+class LatencyWindow:
+    """The first-token latencies of the last `size` responses, for a running percentile."""
+    def __init__(self, size=100):
+        self.samples = deque(maxlen=size)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, fraction):
+        return percentile(self.samples, fraction)
+
+
+class CircuitBreaker:
+    """
+    Fails requests fast while the backend keeps failing.
+
+    After `threshold` failures in a row the circuit opens and every request is refused for
+    `reset_after` seconds. Then one request is let through as a probe: if it succeeds the
+    circuit closes, if it fails the circuit opens again, and if it is cancelled the next
+    request probes instead.
+    """
+    def __init__(self, threshold=5, reset_after=30.0, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def state(self):
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half_open" if self.clock() - self.opened_at >= self.reset_after else "open"
+
+    def check(self):
+        """
+        Raises BackendUnavailable if the circuit is open, otherwise lets the request through.
+        Returns True if the request is the probe, which must end in record_success,
+        record_failure or release.
+        """
+        with self.lock:
+            if self.opened_at is None:
+                return False
+            remaining = self.opened_at + self.reset_after - self.clock()
+            if remaining <= 0 and not self.probing:
+                self.probing = True
+                return True
+        raise BackendUnavailable(
+            f"Praterich's model failed {self.failures} times in a row, so I have paused asking it. "
+            f"I will try again in {max(1, round(remaining))} seconds."
+        )
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.threshold:
+                self.opened_at = self.clock()
+            self.probing = False
+
+    def release(self):
+        """Ends a probe that was cancelled before it succeeded or failed; it counts as neither."""
+        with self.lock:
+            self.probing = False
+
+
+class ModelRouter:
+    """
+    Chooses a model tier for each query and runs streamed calls against it.
+
+    Short, single-step commands go to `fast_model`, everything else to `full_model`. A call
+    whose first chunk has not arrived after the tier's 95th-percentile first-token latency
+    (clamped to `min_hedge_delay`..`max_hedge_delay`, `initial_hedge_delay` until enough
+    samples are in) is hedged with a second, identical call, and whichever answers first is
+    kept. A call fails with DeadlineExceeded if it has no first chunk after
+    `first_token_deadline` seconds or is not complete after `deadline` seconds. Failures feed
+    a circuit breaker shared by both tiers.
+    """
+    def __init__(self, fast_model, full_model, first_token_deadline=10.0, deadline=30.0, hedge=True,
+                 initial_hedge_delay=2.0, min_hedge_delay=0.25, max_hedge_delay=5.0, routing=True,
+                 breaker=None):
+        self.tiers = {"fast": fast_model, "full": full_model}
+        self.first_token_deadline = first_token_deadline
+        self.deadline = deadline
+        self.hedge = hedge
+        self.initial_hedge_delay = initial_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.max_hedge_delay = max_hedge_delay
+        self.routing = routing
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = {tier: LatencyWindow() for tier in self.tiers}
+        self.stats = {"fast": 0, "full": 0, "hedged": 0, "hedge_wins": 0, "deadline_exceeded": 0, "failed": 0}
+
+    def configure(self, config):
+        """Applies the "praterich_*" settings of a Ringzauber config over the defaults."""
+        self.tiers["fast"] = config.get("praterich_fast_model", self.tiers["fast"])
+        self.tiers["full"] = config.get("praterich_model", self.tiers["full"])
+        self.routing = config.get("praterich_routing", self.routing)
+        self.hedge = config.get("praterich_hedging", self.hedge)
+        self.first_token_deadline = config.get("praterich_first_token_deadline", self.first_token_deadline)
+        self.deadline = config.get("request_timeout", self.deadline)
+        self.breaker.threshold = config.get("praterich_breaker_failures", self.breaker.threshold)
+        self.breaker.reset_after = config.get("praterich_breaker_reset", self.breaker.reset_after)
+
+    def route(self, query, mode="command"):
+        """Returns the tier and model for a query."""
+        tier = classify(query, mode) if self.routing else "full"
+        return tier, self.tiers[tier]
+
+    def hedge_delay(self, tier):
+        window = self.latency[tier]
+        if len(window) < 10:
+            return self.initial_hedge_delay
+        return min(self.max_hedge_delay, max(self.min_hedge_delay, window.percentile(0.95)))
+
+    def call(self, tier, run):
+        """Runs a blocking `run(model)` for the tier through the circuit breaker. It is not hedged."""
+        probe = self.breaker.check()
+        self.stats[tier] += 1
+        try:
+            result = run(self.tiers[tier])
+        except Exception:
+            self.stats["failed"] += 1
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            if probe:
+                self.breaker.release()
+            raise
+        self.breaker.record_success()
+        return result
+
+    def iterate(self, tier, start):
+        """Yields the chunks of a blocking `start(model)` through the circuit breaker. It is not hedged."""
+        probe = self.breaker.check()
+        self.stats[tier] += 1
+        try:
+            yield from start(self.tiers[tier])
+        except Exception:
+            self.stats["failed"] += 1
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Closed early by the caller (GeneratorExit) or interrupted.
+            if probe:
+                self.breaker.release()
+            raise
+        self.breaker.record_success()
+
+    async def stream(self, tier, start):
+        """Yields the chunks of `start(model)`, an async iterable, hedged and under the deadlines."""
+        probe = self.breaker.check()
+        self.stats[tier] += 1
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        hedge_at = started + self.hedge_delay(tier)
+        first_deadline = started + min(self.first_token_deadline, self.deadline)
+        attempts = []
+        failed = set()
+
+        def launch():
+            iterator = start(self.tiers[tier]).__aiter__()
+            attempts.append((iterator, asyncio.ensure_future(iterator.__anext__())))
+
+        winner = None
+        try:
+            launch()
+            while winner is None:
+                pending = [task for iterator, task in attempts if not task.done()]
+                can_hedge = self.hedge and len(attempts) < 2
+                if pending:
+                    wake_at = min(first_deadline, hedge_at) if can_hedge else first_deadline
+                    await asyncio.wait(pending, timeout=max(0.0, wake_at - loop.time()),
+                                       return_when=asyncio.FIRST_COMPLETED)
+                error = None
+                for number, (iterator, task) in enumerate(attempts):
+                    if not task.done() or number in failed:
+                        continue
+                    try:
+                        winner = (number, iterator, task.result())
+                        break
+                    except StopAsyncIteration:
+                        winner = (number, iterator, None)
+                        break
+                    except Exception as e:
+                        failed.add(number)
+                        error = e
+                if winner is not None:
+                    break
+                if len(failed) == len(attempts):
+                    if not can_hedge:
+                        raise error
+                    # The first attempt failed outright; the hedge doubles as one retry.
+                    launch()
+                elif loop.time() >= first_deadline:
+                    self.stats["deadline_exceeded"] += 1
+                    raise DeadlineExceeded(f"Praterich did not start answering within {first_deadline - started:g} seconds.")
+                elif can_hedge and loop.time() >= hedge_at:
+                    self.stats["hedged"] += 1
+                    launch()
+
+            number, iterator, chunk = winner
+            self.latency[tier].add(loop.time() - started)
+            if number > 0:
+                self.stats["hedge_wins"] += 1
+            await self._close_losers(attempts, number)
+            while chunk is not None:
+                yield chunk
+                remaining = started + self.deadline - loop.time()
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), max(0.0, remaining))
+                except StopAsyncIteration:
+                    chunk = None
+                except asyncio.TimeoutError:
+                    self.stats["deadline_exceeded"] += 1
+                    raise DeadlineExceeded(f"Praterich did not finish answering within {self.deadline:g} seconds.")
+        except BackendUnavailable:
+            if probe:
+                self.breaker.release()
+            raise
+        except Exception:
+            self.stats["failed"] += 1
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled (CancelledError) or closed early by the caller (GeneratorExit).
+            if probe:
+                self.breaker.release()
+            raise
+        finally:
+            await self._close_losers(attempts, winner[0] if winner is not None else None)
+        self.breaker.record_success()
+
+    async def _close_losers(self, attempts, keep):
+        for number, (iterator, task) in enumerate(attempts):
+            if number == keep:
+                continue
+            if not task.done():
+                task.cancel()
+                try:
+                    await task
+                except BaseException:
+                    pass
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                try:
+                    await aclose()
+                except Exception:
+                    pass
+
+
+def run_benchmark(requests=100, latency=0.05, slow_rate=0.03, slow_latency=2.0):
+    """
+    Sends `requests` commands to a fake model server whose responses are slow with
+    probability `slow_rate`, with and without hedging, then has it fail every request to
+    show how fast the open circuit refuses, and finally runs without an API key.
+    """
+    from fake_model_server import FakeModelServer
+
+    reply = json.dumps({"command": "NAVIGATE", "query": "https://example.com", "message": "Right away."})
+    server = FakeModelServer(default_reply=reply, latency=latency, slow_rate=slow_rate, slow_latency=slow_latency).start()
+    os.environ["PRATERICH_BASE_URL"] = server.base_url
+    os.environ["PRATERICH_API_KEY"] = "fake-key"
+    queries = ["open example.com", "search for train times to Leeds and then open the first result"]
+
+    async def time_command(praterich_ai, query):
+        started = time.perf_counter()
+        first = None
+        try:
+            async for _ in praterich_ai.astream_praterich_response(query, use_cache=False):
+                if first is None:
+                    first = time.perf_counter() - started
+        except Exception as e:
+            return None, time.perf_counter() - started, type(e).__name__
+        return first, time.perf_counter() - started, None
+
+    # One event loop throughout, since the client's async sessions belong to the loop that made them.
+    async def run():
+        import praterich_ai
+        router = praterich_ai.router
+        results = {}
+        for name, hedge in (("unhedged", False), ("hedged", True)):
+            router.hedge = hedge
+            router.latency = {tier: LatencyWindow() for tier in router.tiers}
+            router.stats = dict.fromkeys(router.stats, 0)
+            server.requests.clear()
+            timings = [await time_command(praterich_ai, queries[number % len(queries)]) for number in range(requests)]
+            firsts = [first for first, total, error in timings if first is not None]
+            results[name] = {
+                "first_token_p50_ms": percentile(firsts, 0.5) * 1e3,
+                "first_token_p95_ms": percentile(firsts, 0.95) * 1e3,
+                "first_token_p99_ms": percentile(firsts, 0.99) * 1e3,
+                "model_calls_per_request": len(server.requests) / requests,
+                "stats": dict(router.stats),
+            }
+
+        server.error_rate = 1.0
+        router.breaker.record_success()
+        timings = [await time_command(praterich_ai, queries[0]) for _ in range(router.breaker.threshold + 5)]
+        results["failing_backend"] = {
+            "errors": [error for first, total, error in timings],
+            "ms_before_circuit_opened": [total * 1e3 for first, total, error in timings[:router.breaker.threshold]],
+            "ms_while_circuit_open": [total * 1e3 for first, total, error in timings[router.breaker.threshold:]],
+        }
+
+        router.breaker.record_success()
+        os.environ["PRATERICH_API_KEY"] = ""
+        first, total, error = await time_command(praterich_ai, queries[0])
+        results["no_api_key"] = {"error": error, "ms": total * 1e3}
+        return results
+
+    try:
+        return asyncio.run(run())
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    print(json.dumps(run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100), indent=2))
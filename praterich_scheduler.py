@@ -0,0 +1,249 @@
+import json
+import time
+import asyncio
+import hashlib
+import itertools
+import threading
+from PyQt6.QtCore import QObject, pyqtSignal
+from praterich_ai import CommandStreamParser, astream_praterich_response
+from praterich_cache import normalize_query
+
+
+class _SharedRequest:
+    """One in-flight model call whose output is fanned out to every request waiting on it."""
+    def __init__(self):
+        self.events = []
+        self.subscribers = set()
+        self.task = None
+
+    def publish(self, event):
+        self.events.append(event)
+        for queue in self.subscribers:
+            queue.put_nowait(event)
+
+
+class PraterichScheduler(QObject):
+    """
+    Runs Praterich queries on one background asyncio loop with a single shared client.
+
+    Every query gets a request id. Submitting on a channel cancels the request previously
+    submitted on that channel, identical queries that are already in flight share a single
+    model call, at most `max_concurrency` model calls run at once and each request fails
+    after `timeout` seconds; queries only share a call when they carry the same conversation
+    history. Results are delivered through Qt signals tagged with the id.
+    The actions of a "BATCH" response are delivered through `actions_ready` as they stream in.
+    """
+    chunk = pyqtSignal(int, str)
+    command_ready = pyqtSignal(int, dict)
+    actions_ready = pyqtSignal(int, list)
+    finished = pyqtSignal(int, str)
+    error = pyqtSignal(int, str)
+    # Emitted on the loop thread once a request's task is over, after every other signal it emitted.
+    retired = pyqtSignal(int)
+
+    def __init__(self, max_concurrency=4, timeout=30.0, tracer=None, parent=None, start=True):
+        super().__init__(parent)
+        self.timeout = timeout
+        self.tracer = tracer
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.channels = {}
+        # Tasks by request id; only touched on the loop thread.
+        self.tasks = {}
+        # Requests cancelled or superseded whose late signals may still be on their way to the GUI thread.
+        self.cancelled = set()
+        self.inflight = {}
+        self.retired.connect(self._retire)
+
+        self.loop = asyncio.new_event_loop()
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.thread = threading.Thread(target=self._run_loop, name="praterich-scheduler", daemon=True)
+        if start:
+            self.start()
+
+    def start(self):
+        """Starts the loop thread. Requests submitted before then wait for it."""
+        if self.thread.ident is None:
+            self.thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, query, mode="command", channel=None, timeout=None, trace_id=None, history=None):
+        """
+        Queues a query and returns its request id. `trace_id` attributes its spans to a trace
+        and `history` is the conversation the query continues, which must not change afterwards.
+        """
+        submitted = time.perf_counter_ns()
+        return self.submit_coroutine(
+            lambda request_id: self._handle(request_id, query, mode, timeout or self.timeout, trace_id, submitted, history),
+            channel
+        )
+
+    def submit_coroutine(self, make_coroutine, channel=None):
+        """
+        Runs `make_coroutine(request_id)` on the scheduler loop and returns the request id.
+
+        The coroutine is cancelled like any query when its channel is superseded.
+        """
+        request_id = next(self.ids)
+        with self.lock:
+            superseded = self.channels.get(channel) if channel else None
+            if channel:
+                self.channels[channel] = request_id
+        if superseded is not None:
+            self.cancel(superseded)
+
+        self.loop.call_soon_threadsafe(self._start, request_id, make_coroutine)
+        return request_id
+
+    def cancel(self, request_id):
+        with self.lock:
+            self.cancelled.add(request_id)
+        # Runs after the request's `_start`, since the loop runs its callbacks in order.
+        self.loop.call_soon_threadsafe(self._cancel_task, request_id)
+
+    def cancel_channel(self, channel):
+        with self.lock:
+            request_id = self.channels.pop(channel, None)
+        if request_id is not None:
+            self.cancel(request_id)
+
+    def is_current(self, request_id):
+        """False once a request has been cancelled or superseded, so late signals can be dropped."""
+        with self.lock:
+            return request_id not in self.cancelled
+
+    def shutdown(self):
+        def cancel_all():
+            for task in self.tasks.values():
+                task.cancel()
+            self.loop.stop()
+        self.loop.call_soon_threadsafe(cancel_all)
+
+    def _start(self, request_id, make_coroutine):
+        if not self.is_current(request_id):
+            self._forget(request_id)
+            return
+        task = self.loop.create_task(make_coroutine(request_id))
+        self.tasks[request_id] = task
+        task.add_done_callback(lambda task, request_id=request_id: self._forget(request_id))
+
+    def _cancel_task(self, request_id):
+        task = self.tasks.get(request_id)
+        if task is not None:
+            task.cancel()
+
+    def _forget(self, request_id):
+        self.tasks.pop(request_id, None)
+        with self.lock:
+            for channel, current in list(self.channels.items()):
+                if current == request_id:
+                    del self.channels[channel]
+        # Queued signals reach the GUI thread in the order they were emitted, so by the time
+        # this one arrives none of the request's signals are left to drop.
+        self.retired.emit(request_id)
+
+    def _retire(self, request_id):
+        with self.lock:
+            self.cancelled.discard(request_id)
+
+    def _record(self, trace_id, stage, start_ns):
+        if self.tracer is not None:
+            self.tracer.record(trace_id, stage, start_ns)
+
+    async def _produce(self, key, shared, query, mode, trace_id, history=None):
+        try:
+            parts = []
+            async with self.semaphore:
+                started = time.perf_counter_ns()
+                async for text in astream_praterich_response(query, mode, history=history):
+                    if not parts:
+                        self._record(trace_id, "model_first_token", started)
+                    parts.append(text)
+                    shared.publish(("chunk", text))
+                self._record(trace_id, "model", started)
+            shared.publish(("done", "".join(parts).strip()))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            shared.publish(("error", str(e)))
+        finally:
+            if self.inflight.get(key) is shared:
+                del self.inflight[key]
+
+    async def _handle(self, request_id, query, mode, timeout, trace_id=None, submitted=None, history=None):
+        if submitted is not None:
+            self._record(trace_id, "queue", submitted)
+        history_key = hashlib.sha256(json.dumps(history).encode("utf-8")).hexdigest() if history else None
+        key = (mode, normalize_query(query), history_key)
+        shared = self.inflight.get(key)
+        if shared is None:
+            shared = self.inflight[key] = _SharedRequest()
+            shared.task = self.loop.create_task(self._produce(key, shared, query, mode, trace_id, history))
+
+        queue = asyncio.Queue()
+        for event in shared.events:
+            queue.put_nowait(event)
+        shared.subscribers.add(queue)
+        try:
+            await asyncio.wait_for(self._consume(request_id, queue, mode, trace_id), timeout)
+        except asyncio.TimeoutError:
+            self.error.emit(request_id, f"Praterich took longer than {timeout:g} seconds to respond.")
+        finally:
+            shared.subscribers.discard(queue)
+            if not shared.subscribers and not shared.task.done():
+                shared.task.cancel()
+
+    async def _consume(self, request_id, queue, mode, trace_id=None):
+        parser = CommandStreamParser() if mode == "command" else None
+        shown = ""
+        emitted = False
+        parse_ns = 0
+        while True:
+            kind, value = await queue.get()
+            if kind == "error":
+                self.error.emit(request_id, value)
+                return
+
+            if kind == "chunk":
+                if parser is None:
+                    self.chunk.emit(request_id, value)
+                    continue
+                parse_started = time.perf_counter_ns()
+                parser.feed(value)
+                parse_ns += time.perf_counter_ns() - parse_started
+                if not emitted and parser.command_ready():
+                    emitted = True
+                    self.command_ready.emit(request_id, {"command": parser.fields["command"], "query": parser.fields["query"]})
+                actions = parser.take_actions() if emitted else None
+                if actions:
+                    self.actions_ready.emit(request_id, actions)
+                if len(parser.partial_message) > len(shown):
+                    self.chunk.emit(request_id, parser.partial_message[len(shown):])
+                    shown = parser.partial_message
+                continue
+
+            if parser is not None and not emitted:
+                # The response did not follow the expected field layout; fall back to a full parse.
+                try:
+                    result = parser.result()
+                except ValueError:
+                    self.error.emit(request_id, "Praterich returned a response that could not be understood.")
+                    return
+                self.command_ready.emit(request_id, {"command": result.get("command"), "query": result.get("query")})
+                if result.get("actions"):
+                    self.actions_ready.emit(request_id, list(result["actions"]))
+                if result.get("message") and not shown:
+                    self.chunk.emit(request_id, result["message"])
+                    shown = result["message"]
+            elif parser is not None and parser.actions_malformed:
+                # The command already ran, but the rest of its actions cannot be read.
+                self.error.emit(request_id, "Praterich returned actions that could not be understood.")
+                return
+            if parser is not None:
+                # Parsing is interleaved with the stream, so it is reported as one span of its total cost.
+                self._record(trace_id, "parse", time.perf_counter_ns() - parse_ns)
+            self.finished.emit(request_id, shown if parser is not None else value)
+            return
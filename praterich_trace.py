@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import itertools
+import threading
+from collections import deque, defaultdict
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import QDialog, QVBoxLayout, QTableWidget, QTableWidgetItem, QHeaderView, QLabel
+from ringzauber_paths import data_path
+from ringzauber_stats import percentile
+
+DEFAULT_TRACE_PATH = data_path('praterich_traces.jsonl')
+
+
+class Tracer:
+    """
+    Records latency spans for Praterich commands, one correlation id per query.
+
+    Recording a span only appends a tuple to a deque; a background thread serialises
+    spans to a rotating JSONL file, so the collector is cheap enough to leave on. Without a
+    `path` there is nothing to write, and spans go straight into the statistics instead.
+    """
+    def __init__(self, path=DEFAULT_TRACE_PATH, max_bytes=5 * 1024 * 1024, backups=3,
+                 flush_interval=1.0, window=500, max_open_traces=1000):
+        self.path = path
+        self.max_open_traces = max_open_traces
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.ids = itertools.count(1)
+        self.prefix = f"{os.getpid():x}-{int(time.time()):x}"
+        self.traces = {}
+        self.pending = deque()
+        self.unwritten = []
+        self.totals = defaultdict(lambda: deque(maxlen=window))
+        self.stages = defaultdict(lambda: deque(maxlen=window))
+        self.lock = threading.Lock()
+
+        self.stop_event = threading.Event()
+        self.writer = threading.Thread(target=self._write_loop, args=(flush_interval,), name="praterich-trace", daemon=True)
+        if path:
+            self.writer.start()
+
+    def start_trace(self, source, query=""):
+        """Starts a trace for one query and returns its correlation id."""
+        trace_id = f"{self.prefix}-{next(self.ids)}"
+        # Traces that never end (superseded queries) are dropped oldest first.
+        while len(self.traces) >= self.max_open_traces:
+            self.traces.pop(next(iter(self.traces)))
+        self.traces[trace_id] = {"source": source, "command": None, "start": time.perf_counter_ns(), "query": query[:200]}
+        return trace_id
+
+    def set_command(self, trace_id, command):
+        trace = self.traces.get(trace_id)
+        if trace is not None:
+            trace["command"] = command
+
+    def record(self, trace_id, stage, start_ns, end_ns=None):
+        """Records a span that started at `start_ns` (from time.perf_counter_ns) and ends now or at `end_ns`."""
+        if trace_id is None:
+            return
+        if end_ns is None:
+            end_ns = time.perf_counter_ns()
+        self._add((trace_id, stage, start_ns, end_ns, time.time()))
+
+    def span(self, trace_id, stage):
+        return _Span(self, trace_id, stage)
+
+    def end_trace(self, trace_id):
+        """Closes a trace, recording the total time from the start of the query."""
+        trace = self.traces.pop(trace_id, None)
+        if trace is None:
+            return
+        end_ns = time.perf_counter_ns()
+        self._add((trace_id, "total", trace["start"], end_ns, time.time(), trace["source"], trace["command"], trace["query"]))
+
+    def _add(self, item):
+        if self.path:
+            self.pending.append(item)
+        else:
+            with self.lock:
+                self._apply(item)
+
+    def stats(self):
+        """Returns {command: {"count", "p50_ms", "p95_ms"}} plus per-stage percentiles under "stages"."""
+        self.flush()
+        with self.lock:
+            commands = {
+                command: {"count": len(samples), "p50_ms": percentile(samples, 0.5, 0.0), "p95_ms": percentile(samples, 0.95, 0.0)}
+                for command, samples in self.totals.items()
+            }
+            commands["stages"] = {
+                stage: {"count": len(samples), "p50_ms": percentile(samples, 0.5, 0.0), "p95_ms": percentile(samples, 0.95, 0.0)}
+                for stage, samples in self.stages.items()
+            }
+        return commands
+
+    def flush(self):
+        """Moves recorded spans into the statistics and the queue of records to write."""
+        with self.lock:
+            while self.pending:
+                self._apply(self.pending.popleft())
+
+    def _apply(self, item):
+        trace_id, stage, start_ns, end_ns, wall = item[:5]
+        duration_ms = (end_ns - start_ns) / 1e6
+        record = {"trace": trace_id, "stage": stage, "ms": round(duration_ms, 3), "ts": wall}
+        if stage == "total":
+            source, command, query = item[5:]
+            record.update({"source": source, "command": command, "query": query})
+            self.totals[command or "UNKNOWN"].append(duration_ms)
+        else:
+            self.stages[stage].append(duration_ms)
+        if self.path:
+            self.unwritten.append(record)
+
+    def close(self, timeout=2.0):
+        """Stops the writer once it has written the spans recorded so far."""
+        self.stop_event.set()
+        if self.writer.is_alive():
+            self.writer.join(timeout)
+
+    def _write_loop(self, interval):
+        while not self.stop_event.wait(interval):
+            self._write()
+        self._write()
+
+    def _write(self):
+        self.flush()
+        with self.lock:
+            records, self.unwritten = self.unwritten, []
+        if not records:
+            return
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                self._rotate()
+            with open(self.path, "a") as f:
+                f.write("".join(json.dumps(record) + "\n" for record in records))
+        except OSError as e:
+            print(f"Error writing Praterich traces: {e}")
+
+    def _rotate(self):
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+
+class _Span:
+    __slots__ = ("tracer", "trace_id", "stage", "start")
+
+    def __init__(self, tracer, trace_id, stage):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.trace_id, self.stage, self.start)
+        return False
+
+
+class TraceOverlay(QDialog):
+    """Shows p50/p95 command latency per command type and per stage."""
+    def __init__(self, tracer, parent=None):
+        super().__init__(parent)
+        self.tracer = tracer
+        self.setWindowTitle("Praterich Latency")
+        self.resize(480, 420)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("End-to-end latency by command"))
+        self.command_table = self._make_table(["Command", "Count", "p50 (ms)", "p95 (ms)"])
+        layout.addWidget(self.command_table)
+        layout.addWidget(QLabel("Latency by stage"))
+        self.stage_table = self._make_table(["Stage", "Count", "p50 (ms)", "p95 (ms)"])
+        layout.addWidget(self.stage_table)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(1000)
+        self.timer.timeout.connect(self.refresh)
+
+    def _make_table(self, headers):
+        table = QTableWidget(0, len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        table.verticalHeader().setVisible(False)
+        return table
+
+    def _fill(self, table, rows):
+        table.setRowCount(len(rows))
+        for row, (name, values) in enumerate(sorted(rows.items())):
+            cells = [name, str(values["count"]), f"{values['p50_ms']:.1f}", f"{values['p95_ms']:.1f}"]
+            for column, text in enumerate(cells):
+                table.setItem(row, column, QTableWidgetItem(text))
+
+    def refresh(self):
+        stats = self.tracer.stats()
+        stages = stats.pop("stages")
+        self._fill(self.command_table, stats)
+        self._fill(self.stage_table, stages)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
@@ -0,0 +1,351 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from fake_model_server import FakeModelServer, DEFAULT_REPLY
+from ringzauber_stats import percentile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_TRACE_PATH = os.path.join(BASE_DIR, 'replay_trace.jsonl')
+DEFAULT_BASELINE_PATH = os.path.join(BASE_DIR, 'replay_baseline.json')
+
+# Metrics where a larger value is better; every other metric is a duration or a size.
+HIGHER_IS_BETTER = {"tabs_opened_per_s", "tabs_closed_per_s"}
+
+
+class FixtureServer:
+    """
+    Serves synthetic pages at /page/<n> for replays, so no run depends on the network.
+
+    Each page has a title, a few paragraphs and links to its neighbours. `delay` is added
+    before every response.
+    """
+    def __init__(self, paragraphs=20, delay=0.0, host="127.0.0.1", port=0):
+        self.paragraphs = paragraphs
+        self.delay = delay
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def page(self, number):
+        paragraphs = "".join(
+            f"<p>Paragraph {index} of fixture page {number}, with enough words to lay out, "
+            f"wrap and search for the replay benchmark.</p>"
+            for index in range(self.paragraphs)
+        )
+        links = "".join(f'<li><a href="/page/{other}">Page {other}</a></li>' for other in (number - 1, number + 1) if other >= 0)
+        return (f"<!DOCTYPE html><html><head><title>Fixture {number}</title></head><body>"
+                f"<nav><ul>{links}</ul></nav><article><h1>Fixture page {number}</h1>{paragraphs}</article>"
+                f"</body></html>").encode("utf-8")
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                time.sleep(server.delay)
+                parts = self.path.strip("/").split("/")
+                if len(parts) != 2 or parts[0] != "page" or not parts[1].isdigit():
+                    self.send_error(404)
+                    return
+                payload = server.page(int(parts[1]))
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+
+def load_trace(path, fixtures_url):
+    """
+    Reads a replay trace. Each line is one step:
+
+        {"command": "<utterance>", "reply": {...}}   sent through on_praterich_command; the
+                                                     fake model answers with `reply`
+        {"navigate": "<url>"}                        typed into the URL bar
+
+    A command with a reply must reach the model and one without must be matched locally.
+    `"expect"` can name the `commands` the browser performs, the number of model `requests`
+    the step makes in all, the number of `tabs_added` and the `url` the current tab starts
+    with afterwards; see check_step. `"repeat": n` runs a
+    step n times and `"label"` names it in the report. "{fixtures}" in any string is
+    replaced by the fixture server's address.
+    """
+    steps = []
+    with open(path, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            step = json.loads(line.replace("{fixtures}", fixtures_url))
+            step.setdefault("label", step.get("command") or f"navigate {step.get('navigate')}")
+            steps.append(step)
+    return steps
+
+
+def check_step(step, requests, performed, tabs_added, url):
+    """
+    Returns what went wrong in one run of a command step. `requests` are the texts the fake
+    model was sent meanwhile, `performed` the commands the browser carried out, `tabs_added`
+    the change in the number of tabs and `url` the current tab's address afterwards.
+    """
+    problems = []
+    if "reply" in step and step["command"] not in requests:
+        problems.append("never reached the model")
+    elif "reply" not in step and step["command"] in requests:
+        problems.append("was sent to the model instead of being matched locally")
+    expect = step.get("expect", {})
+    if "requests" in expect and len(requests) != expect["requests"]:
+        problems.append(f"made {len(requests)} model requests instead of {expect['requests']}")
+    if "commands" in expect and performed != expect["commands"]:
+        problems.append(f"performed {performed} instead of {expect['commands']}")
+    if "tabs_added" in expect and tabs_added != expect["tabs_added"]:
+        problems.append(f"added {tabs_added} tabs instead of {expect['tabs_added']}")
+    if "url" in expect and not url.startswith(expect["url"]):
+        problems.append(f"ended on {url} instead of {expect['url']}")
+    return [f"{step['label']}: {problem}" for problem in problems]
+
+
+def run_replay(trace_path, tabs=20, model_latency=0.15, chunk_delay=0.01, timeout=30.0):
+    """
+    Runs one replay in this process and returns its metrics. Must run in a fresh process,
+    as it creates the QApplication and points praterich_ai at the fake model server.
+    """
+    process_started = time.perf_counter()
+    fixtures = FixtureServer().start()
+    steps = load_trace(trace_path, fixtures.base_url)
+    script = {step["command"]: json.dumps(step["reply"]) for step in steps if "reply" in step}
+    model = FakeModelServer(script=script, default_reply=DEFAULT_REPLY, latency=model_latency, chunk_delay=chunk_delay).start()
+    os.environ["PRATERICH_BASE_URL"] = model.base_url
+    os.environ.setdefault("PRATERICH_API_KEY", "fake-key")
+
+    directory = tempfile.mkdtemp(prefix="ringzauber-replay-")
+    config_path = os.path.join(directory, "config.json")
+    with open(config_path, 'w') as f:
+        json.dump({
+            "default_search_engine": "duckduckgo",
+            "history_file": os.path.join(directory, "history.sqlite3"),
+            "session_file": os.path.join(directory, "session.json"),
+            "downloads_file": os.path.join(directory, "downloads.json"),
+            "trace_file": os.path.join(directory, "traces.jsonl"),
+            "download_directory": directory,
+        }, f)
+
+    import browser_core
+    import praterich_ai
+    from praterich_cache import ResponseCache
+    from newtab_scheme import register_scheme
+    from tab_lifecycle import read_rss_bytes
+    # Every run starts with the same empty state and no cached responses.
+    browser_core.CONFIG_PATH = config_path
+    praterich_ai.response_cache = ResponseCache(os.path.join(directory, "cache.sqlite3"))
+
+    register_scheme()
+    from PyQt6.QtCore import QUrl
+    from PyQt6.QtWidgets import QApplication
+    app = QApplication(sys.argv[:1])
+    import ringzauber
+
+    def wait_until(predicate, limit=timeout):
+        deadline = time.perf_counter() + limit
+        while not predicate():
+            if time.perf_counter() > deadline:
+                return False
+            app.processEvents()
+            time.sleep(0.001)
+        return True
+
+    def page_complete(view, prefix=""):
+        """True once `view` shows a URL starting with `prefix` and its document has loaded."""
+        state = []
+        view.page().runJavaScript("document.readyState", lambda value: state.append(value))
+        wait_until(lambda: state, 5.0)
+        return bool(state) and state[0] == "complete" and view.url().toString().startswith(prefix)
+
+    core = browser_core.BrowserCore(ringzauber.PraterichBrowser)
+    window = core.new_window()
+    wait_until(lambda: page_complete(window.tabs.currentWidget()))
+    metrics = {"startup_ms": (time.perf_counter() - process_started) * 1e3}
+
+    def idle():
+        return not window.tracer.traces and not window.batches and not window.deferred_traces
+
+    # Every action the browser carries out, including those of a batch, is recorded.
+    performed = []
+    perform = window.perform_praterich_action
+
+    def record_action(response):
+        performed.append(response.get("command"))
+        perform(response)
+
+    window.perform_praterich_action = record_action
+
+    latencies = {}
+    failures = []
+    for step in steps:
+        for _ in range(step.get("repeat", 1)):
+            # A cached reply would skip the model round trip the step is there to measure.
+            praterich_ai.response_cache.clear()
+            del performed[:]
+            requests_before = len(model.requests)
+            tabs_before = window.tabs.count()
+            started = time.perf_counter()
+            if "command" in step:
+                window.on_praterich_command(step["command"], source="replay")
+                done = wait_until(idle)
+            else:
+                window.url_bar.setText(step["navigate"])
+                window.navigate_to_url()
+                done = wait_until(lambda: page_complete(window.tabs.currentWidget(), step["navigate"]))
+            latencies.setdefault(step["label"], []).append((time.perf_counter() - started) * 1e3)
+            if not done:
+                failures.append(f"{step['label']}: did not finish within {timeout} s")
+            elif "command" in step:
+                failures.extend(check_step(
+                    step, [request["text"] for request in model.requests[requests_before:]], list(performed),
+                    window.tabs.count() - tabs_before, window.tabs.currentWidget().url().toString()
+                ))
+    for label, samples in latencies.items():
+        metrics[f"{label} p50_ms"] = percentile(samples, 0.5)
+        metrics[f"{label} p95_ms"] = percentile(samples, 0.95)
+
+    def total_rss():
+        pids = {os.getpid()}
+        for index in range(window.tabs.count()):
+            pids.add(window.tabs.widget(index).page().renderProcessPid())
+        return sum(read_rss_bytes(pid) for pid in pids if pid > 0)
+
+    rss_before = total_rss()
+    first_new = window.tabs.count()
+    started = time.perf_counter()
+    for number in range(tabs):
+        window.add_new_tab(QUrl(f"{fixtures.base_url}/page/{number}"))
+    views = [window.tabs.widget(index) for index in range(first_new, window.tabs.count())]
+    wait_until(lambda: all(page_complete(view) for view in views), timeout * 2)
+    metrics["tabs_opened_per_s"] = tabs / (time.perf_counter() - started)
+    metrics["rss_per_tab_mb"] = (total_rss() - rss_before) / tabs / (1024 * 1024)
+
+    started = time.perf_counter()
+    for _ in range(tabs):
+        window.close_current_tab(window.tabs.currentIndex())
+        app.processEvents()
+    metrics["tabs_closed_per_s"] = tabs / (time.perf_counter() - started)
+
+    metrics["model_requests"] = len(model.requests)
+    metrics["failed_steps"] = failures
+    metrics["stages"] = window.tracer.stats().get("stages", {})
+    model.stop()
+    fixtures.stop()
+    return metrics
+
+
+def compare(metrics, baseline, tolerance=0.2, slack_ms=10.0):
+    """Returns a message for every metric more than `tolerance` worse than its baseline value."""
+    regressions = []
+    for name, expected in baseline.items():
+        value = metrics.get(name)
+        if not isinstance(expected, (int, float)) or not isinstance(value, (int, float)):
+            continue
+        if name in HIGHER_IS_BETTER:
+            if value < expected * (1 - tolerance):
+                regressions.append(f"{name}: {value:.1f} is below the baseline {expected:.1f}")
+        else:
+            slack = slack_ms if name.endswith("_ms") else 0.0
+            if value > expected * (1 + tolerance) + slack:
+                regressions.append(f"{name}: {value:.1f} is above the baseline {expected:.1f}")
+    return regressions
+
+
+def run_suite(trace_path=DEFAULT_TRACE_PATH, baseline_path=DEFAULT_BASELINE_PATH, runs=3, update_baseline=False,
+              tolerance=0.2, model_latency=0.15, timeout=300):
+    """
+    Replays the trace in `runs` fresh offscreen browser processes, takes the median of every
+    metric and compares it with the baseline. A missing baseline fails the suite;
+    `update_baseline` writes this run's metrics as the new one instead, unless a step failed.
+    `model_latency` is the fake model's delay in seconds before it starts answering.
+    """
+    if not update_baseline and not os.path.exists(baseline_path):
+        return {
+            "runs": 0,
+            "baseline": baseline_path,
+            "regressions": [f"There is no baseline at {baseline_path}; record one with --update-baseline."],
+            "passed": False,
+        }
+
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen", QTWEBENGINE_DISABLE_SANDBOX="1")
+    samples = []
+    with tempfile.TemporaryDirectory() as directory:
+        for run in range(runs):
+            result_path = os.path.join(directory, f"run-{run}.json")
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--child", trace_path, result_path,
+                            str(model_latency)],
+                           env=env, timeout=timeout, stdout=subprocess.DEVNULL, check=True)
+            with open(result_path, 'r') as f:
+                samples.append(json.load(f))
+
+    metrics = {}
+    for name, value in samples[0].items():
+        values = [sample.get(name) for sample in samples]
+        if all(isinstance(value, (int, float)) for value in values):
+            metrics[name] = percentile(values, 0.5)
+    failed_steps = sorted({failure for sample in samples for failure in sample["failed_steps"]})
+
+    regressions = []
+    if not update_baseline:
+        with open(baseline_path, 'r') as f:
+            regressions = compare(metrics, json.load(f), tolerance)
+    elif not failed_steps:
+        with open(baseline_path, 'w') as f:
+            json.dump(metrics, f, indent=2, sort_keys=True)
+    return {
+        "runs": runs,
+        "metrics": metrics,
+        "stages": samples[len(samples) // 2]["stages"],
+        "failed_steps": failed_steps,
+        "baseline": baseline_path if not update_baseline else
+                    f"written to {baseline_path}" if not failed_steps else "not written, as steps failed",
+        "regressions": regressions,
+        "passed": not regressions and not failed_steps,
+    }
+
+
+if __name__ == "__main__":
+    # python replay_benchmark.py [TRACE] [BASELINE] [--runs=3] [--tolerance=0.2] [--latency=0.15] [--update-baseline]
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        result = run_replay(sys.argv[2], model_latency=float(sys.argv[4]))
+        with open(sys.argv[3], 'w') as f:
+            json.dump(result, f)
+        os._exit(0)
+
+    arguments = [argument for argument in sys.argv[1:] if not argument.startswith("--")]
+    options = dict(argument[2:].split("=", 1) for argument in sys.argv[1:] if argument.startswith("--") and "=" in argument)
+    result = run_suite(
+        trace_path=arguments[0] if arguments else DEFAULT_TRACE_PATH,
+        baseline_path=arguments[1] if len(arguments) > 1 else DEFAULT_BASELINE_PATH,
+        runs=int(options.get("runs", 3)),
+        update_baseline="--update-baseline" in sys.argv,
+        tolerance=float(options.get("tolerance", 0.2)),
+        model_latency=float(options.get("latency", 0.15)),
+    )
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result["passed"] else 1)
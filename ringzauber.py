@@ -1,8 +1,13 @@
 import sys
 import os
 import json
+import time
+import asyncio
 import subprocess
-from PyQt6.QtCore import QUrl, QSize, QObject, pyqtSlot, QRunnable, QThreadPool, pyqtSignal, QTimer
+from startup_profile import StartupProfiler, profile_path_from_args
+# Created before the Qt imports so that they are part of the startup profile.
+startup = StartupProfiler()
+from PyQt6.QtCore import QUrl, QUrlQuery, QSize, QObject, pyqtSlot, QRunnable, QThreadPool, pyqtSignal, QTimer
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QToolBar, QLineEdit, QStatusBar,
     QWidget, QTabWidget, QLabel, QMenu, QFileDialog, QPushButton,
@@ -11,18 +16,28 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtGui import QAction, QIcon, QContextMenuEvent, QFontDatabase, QFont, QKeySequence
 from PyQt6.QtWebEngineWidgets import QWebEngineView
-from PyQt6.QtWebEngineCore import QWebEnginePage, QWebEngineProfile, QWebEngineDownloadRequest
-from PyQt6.QtWebChannel import QWebChannel
-from praterich_ai import get_praterich_response_text
-from ringzauber_ui import (
-    PraterichSidePanel, CustomWebEngineView, NotesDialog, PraterichRequestWorker, WebChannelHandler
-)
-# Import speech recognition library
-import speech_recognition as sr
+from PyQt6.QtWebEngineCore import QWebEnginePage
+from ringzauber_ui import PraterichSidePanel, CustomWebEngineView, NotesDialog
+from tab_lifecycle import TabLifecycleManager, save_history, restore_history
+from newtab_scheme import register_scheme, NEW_TAB_URL
+# Everything else is imported where it is first used, so it stays off the way to the first paint.
+startup.mark("imports")
 
 class PraterichBrowser(QMainWindow):
-    def __init__(self):
+    # Emitted from the scheduler loop while Oodles crawls; delivered on the GUI thread.
+    crawl_progress = pyqtSignal(str)
+    crawl_finished = pyqtSignal(int, str)
+    # Emitted from the scheduler loop when a page's content has been extracted.
+    page_context_ready = pyqtSignal(int, object)
+
+    def __init__(self, core, restore_session=False):
         super().__init__()
+        # Config, profile, model scheduler, history and downloads are shared by every window.
+        self.core = core
+        self.tracer = core.tracer
+        self.scheduler = core.scheduler
+        self.history = core.history
+        self.download_manager = core.download_manager
         
         self.main_widget = QWidget()
         self.setCentralWidget(self.main_widget)
@@ -36,48 +51,144 @@ class PraterichBrowser(QMainWindow):
         self.tabs.tabBarDoubleClicked.connect(self.tab_open_doubleclick)
         self.tabs.tabCloseRequested.connect(self.close_current_tab)
         
-        self.praterich_panel = PraterichSidePanel()
-        self.main_layout.addWidget(self.praterich_panel)
-        self.praterich_panel.setVisible(False)
-        
-        self.download_list_dialog = None
-        self.notes_dialog = NotesDialog(self)
-        self.closed_tabs = []
-
-        QWebEngineProfile.defaultProfile().downloadRequested.connect(self.on_download_requested)
+        # Most sessions never open the side panel or the notes, so both are built on first use.
+        self._praterich_panel = None
+        self._chat_view = None
+        self._notes_dialog = None
+        self.downloads_dialog = None
+        self.task_manager_dialog = None
+        self.tab_search_dialog = None
+        self.first_painted = False
+        self.tab_ids = {}
+        self.restoring = False
 
         self.setup_ui()
         self.setup_keyboard_shortcuts()
-        self.load_custom_font()
-        
-        # Load the user's default search engine from a configuration file.
-        self.load_default_search_engine()
+        if core.font_family:
+            self.setStyleSheet(f"""
+                * {{
+                    font-family: '{core.font_family}';
+                }}
+            """)
+        startup.mark("window")
 
-        self.home_url = QUrl.fromLocalFile(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'new_tab.html'))
-        self.add_new_tab(self.home_url)
+        # Freeze and discard background tabs to keep renderer memory bounded.
+        self.tab_lifecycle = TabLifecycleManager(
+            self.tabs,
+            max_live_tabs=self.config.get("max_live_tabs", 8),
+            memory_budget_mb=self.config.get("tab_memory_budget_mb", 1024),
+            parent=self
+        )
+        # A discarded tab has no page text left to search.
+        self.tab_lifecycle.tab_discarded.connect(lambda view: self.core.tab_search.remove(view))
 
-    def load_default_search_engine(self):
-        """Loads the default search engine URL from a configuration file."""
-        config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ringzauber_config.json')
-        self.default_search_url = "https://www.google.com/search?q="  # Fallback to Google
+        self.session = core.claim_session(restore_session)
+        self.tabs.currentChanged.connect(self.on_tab_selected)
+        self.tabs.tabBar().tabMoved.connect(self.on_tab_moved)
 
-        if os.path.exists(config_path):
-            try:
-                with open(config_path, 'r') as f:
-                    config = json.load(f)
-                    search_engine = config.get("default_search_engine", "google").lower()
-                    if search_engine == "duckduckgo":
-                        self.default_search_url = "https://duckduckgo.com/?q="
-                    elif search_engine == "yahoo":
-                        self.default_search_url = "https://search.yahoo.com/search?p="
-                    elif search_engine == "ecosia":
-                        self.default_search_url = "https://www.ecosia.org/search?q="
-                    # Google is the default if no match is found
-            except Exception as e:
-                print(f"Error reading configuration file: {e}")
-                QMessageBox.warning(self, "Configuration Error", "Could not load default search engine. Using Google.")
+        # The first tab starts loading before the remaining subsystems are built.
+        self.home_url = QUrl(NEW_TAB_URL)
+        # New tabs are taken from a pool of views that already show the new-tab page.
+        from view_pool import ViewPool
+        self.view_pool = ViewPool(
+            lambda: CustomWebEngineView(self, browser=self),
+            self.home_url,
+            size=self.config.get("view_pool_size", 2),
+            memory_cap_mb=self.config.get("view_pool_memory_mb", 256),
+            parent=self
+        )
+        # A view loading the URL typed into the URL bar, as (view, url), swapped in if it is committed.
+        self.prerender = None
+        self.prerender_loaded = False
+        self.prerender_timer = QTimer(self)
+        self.prerender_timer.setSingleShot(True)
+        self.prerender_timer.setInterval(400)
+        self.prerender_timer.timeout.connect(self.update_prerender)
+        if self.session.tabs():
+            self.restore_tabs()
         else:
-            QMessageBox.information(self, "Setup Incomplete", "Please run ringzauber_intro.py to set your preferences.")
+            self.add_new_tab(self.home_url)
+        startup.mark("first_tab")
+
+        self.trace_overlay = None
+        # Every request this window submitted; the shared scheduler's signals carry other windows' requests too.
+        self.request_traces = {}
+        self.deferred_traces = set()
+        self.current_trace_id = None
+
+        self.scheduler.command_ready.connect(self.on_praterich_command_ready)
+        self.scheduler.actions_ready.connect(self.on_praterich_actions_ready)
+        self.scheduler.chunk.connect(self.on_praterich_stream_chunk)
+        self.scheduler.finished.connect(self.on_praterich_request_finished)
+        self.scheduler.error.connect(self.on_praterich_request_error)
+        self.scheduler.retired.connect(self.on_praterich_request_retired)
+        self.new_tab_requests = {}
+        # Conversation turns waiting for their reply to finish, by request id.
+        self.pending_turns = {}
+        # Multi-action responses being run, by request id.
+        self.batches = {}
+        self.crawl_progress.connect(self.on_crawl_progress)
+        self.crawl_finished.connect(self.on_crawl_finished)
+        self.page_context_ready.connect(self.on_page_context_ready)
+        self.context_requests = {}
+
+        self.history_dialog = None
+        startup.mark("subsystems")
+
+    @property
+    def config(self):
+        return self.core.config
+
+    @property
+    def default_search_url(self):
+        return self.core.default_search_url
+
+    @property
+    def praterich_panel(self):
+        if self._praterich_panel is None:
+            self.build_praterich_panel()
+        return self._praterich_panel
+
+    @property
+    def chat_view(self):
+        if self._praterich_panel is None:
+            self.build_praterich_panel()
+        return self._chat_view
+
+    @property
+    def notes_dialog(self):
+        if self._notes_dialog is None:
+            self._notes_dialog = NotesDialog(self)
+        return self._notes_dialog
+
+    def build_praterich_panel(self):
+        from praterich_chat import ChatView
+        from praterich_conversation import ConversationSession
+        self._praterich_panel = PraterichSidePanel()
+        self.main_layout.addWidget(self._praterich_panel)
+        self._praterich_panel.setVisible(False)
+        # The panel's conversation, sent with each command so follow-ups have context.
+        self._praterich_panel.conversation = ConversationSession(
+            max_turns=self.config.get("conversation_max_turns", 12),
+            token_budget=self.config.get("conversation_token_budget", 1500),
+        )
+        # The conversation is painted here; only the messages in view are laid out.
+        self._chat_view = ChatView(frame_budget_ms=self.config.get("chat_frame_budget_ms", 4))
+        self._praterich_panel.layout().addWidget(self._chat_view, 1)
+
+        self._praterich_panel.command_bar.returnPressed.connect(self.on_praterich_command)
+        self._praterich_panel.upload_btn.clicked.connect(self.upload_file)
+        self._praterich_panel.new_chat_btn.clicked.connect(self._praterich_panel.clear_chat)
+        self._praterich_panel.new_chat_btn.clicked.connect(self._chat_view.clear)
+        self._praterich_panel.new_chat_btn.clicked.connect(self._praterich_panel.conversation.reset)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.first_painted:
+            self.first_painted = True
+            startup.mark("first_paint")
+            # History, the model loop, content blocking and tab search start once there is something on screen.
+            QTimer.singleShot(0, self.core.start_services)
 
     def setup_ui(self):
         navtb = QToolBar("Navigation")
@@ -102,6 +213,7 @@ class PraterichBrowser(QMainWindow):
 
         self.url_bar = QLineEdit()
         self.url_bar.returnPressed.connect(self.navigate_to_url)
+        self.url_bar.textEdited.connect(lambda text: self.prerender_timer.start())
         navtb.addWidget(self.url_bar)
         
         self.tabs.currentChanged.connect(self.update_url)
@@ -121,7 +233,7 @@ class PraterichBrowser(QMainWindow):
         
         notes_btn = QPushButton("Notes")
         notes_btn.setIcon(QIcon("notes.png"))
-        notes_btn.clicked.connect(self.notes_dialog.show)
+        notes_btn.clicked.connect(lambda: self.notes_dialog.show())
         self.status_bar.addPermanentWidget(notes_btn)
 
         terminal_btn = QPushButton("Terminal")
@@ -129,10 +241,6 @@ class PraterichBrowser(QMainWindow):
         terminal_btn.clicked.connect(self.open_terminal)
         self.status_bar.addPermanentWidget(terminal_btn)
         
-        self.praterich_panel.command_bar.returnPressed.connect(self.on_praterich_command)
-        self.praterich_panel.upload_btn.clicked.connect(self.upload_file)
-        self.praterich_panel.new_chat_btn.clicked.connect(self.praterich_panel.clear_chat)
-        
     def setup_keyboard_shortcuts(self):
         self.new_tab_action = QAction("New Tab", self, shortcut=QKeySequence("Ctrl+T"), triggered=lambda: self.add_new_tab())
         self.addAction(self.new_tab_action)
@@ -159,67 +267,187 @@ class PraterichBrowser(QMainWindow):
         self.close_window_action = QAction("Close Window", self, shortcut=QKeySequence("Ctrl+Shift+W"), triggered=self.close)
         self.addAction(self.close_window_action)
 
+        self.latency_overlay_action = QAction("Praterich Latency", self, shortcut=QKeySequence("Ctrl+Shift+L"), triggered=self.show_trace_overlay)
+        self.addAction(self.latency_overlay_action)
+
+        self.history_action = QAction("History", self, shortcut=QKeySequence("Ctrl+H"), triggered=self.show_history)
+        self.addAction(self.history_action)
+
+        self.voice_action = QAction("Voice Command", self, shortcut=QKeySequence("Ctrl+Shift+M"), triggered=self.start_voice_command)
+        self.addAction(self.voice_action)
+
+        self.task_manager_action = QAction("Task Manager", self, shortcut=QKeySequence("Shift+Esc"), triggered=self.show_task_manager)
+        self.addAction(self.task_manager_action)
+
+        self.tab_search_action = QAction("Search Tabs", self, shortcut=QKeySequence("Ctrl+Shift+F"), triggered=self.show_tab_search)
+        self.addAction(self.tab_search_action)
+
+    def restore_tabs(self):
+        """Recreates the saved tabs as unloaded placeholders. Only the selected tab loads now."""
+        self.restoring = True
+        current_id = self.session.current()
+        current_index = 0
+        for tab in self.session.tabs():
+            if tab["id"] == current_id:
+                current_index = self.tabs.count()
+            self.add_new_tab(QUrl(tab["url"]), lazy=True, history=tab["history"], title=tab["title"], tab_id=tab["id"])
+        self.restoring = False
+
+        if self.tabs.currentIndex() == current_index:
+            # currentChanged does not fire for a tab that is already current.
+            self.tab_lifecycle.on_current_changed(current_index)
+        else:
+            self.tabs.setCurrentIndex(current_index)
+
+    def record_navigation(self, browser):
+        tab_id = self.tab_ids.get(browser)
+        if tab_id is not None and not self.restoring:
+            self.session.record("navigate", id=tab_id, url=browser.url().toString(), title=browser.title(), history=save_history(browser))
+
+    def record_title(self, browser):
+        # A title change leaves the back/forward history as it was, so only the title is journaled.
+        tab_id = self.tab_ids.get(browser)
+        if tab_id is not None and not self.restoring:
+            self.session.record("title", id=tab_id, title=browser.title())
+
+    def on_tab_selected(self, index):
+        tab_id = self.tab_ids.get(self.tabs.widget(index))
+        if tab_id is not None and not self.restoring:
+            self.session.record("select", id=tab_id)
+
+    def on_tab_moved(self, from_index, to_index):
+        tab_id = self.tab_ids.get(self.tabs.widget(to_index))
+        if tab_id is not None:
+            self.session.record("move", id=tab_id, index=to_index)
+
     def reopen_last_closed_tab(self):
-        if self.closed_tabs:
-            last_tab_data = self.closed_tabs.pop()
-            url = last_tab_data.get('url')
-            self.add_new_tab(QUrl(url))
+        last_tab = self.session.last_closed()
+        if last_tab:
+            self.add_new_tab(QUrl(last_tab["url"]), history=last_tab["history"], reopened=True)
         else:
-            self.praterich_panel.start_typing_effect("There are no recently closed tabs to reopen.")
+            self.chat_view.say("There are no recently closed tabs to reopen.")
     
     def new_window(self):
-        new_browser = PraterichBrowser()
-        new_browser.show()
+        self.core.new_window()
 
     def show_downloads_list(self):
-        if not hasattr(self, 'download_list_widget') or not self.download_list_widget:
-            self.download_list_widget = QListWidget()
-            self.download_list_dialog = QDialog(self)
-            self.download_list_dialog.setWindowTitle("Downloads")
-            self.download_list_dialog.setFixedSize(400, 300)
-            
-            layout = QVBoxLayout(self.download_list_dialog)
-            layout.addWidget(self.download_list_widget)
-            
-        self.download_list_dialog.exec()
+        if self.downloads_dialog is None:
+            from download_manager import DownloadsDialog
+            self.downloads_dialog = DownloadsDialog(self.download_manager, self)
+        self.downloads_dialog.show()
+        self.downloads_dialog.raise_()
 
-    def on_download_requested(self, download: QWebEngineDownloadRequest):
-        file_path, _ = QFileDialog.getSaveFileName(self, "Save File", download.path())
-        if file_path:
-            download.setPath(file_path)
-            download.accept()
-            download.stateChanged.connect(lambda: self.update_download_status(download))
-            self.download_list_widget.addItem(f"Downloading: {os.path.basename(file_path)}")
-        else:
-            download.cancel()
-
-    def update_download_status(self, download):
-        for i in range(self.download_list_widget.count()):
-            item = self.download_list_widget.item(i)
-            if download.path() in item.text():
-                if download.state() == QWebEngineDownloadRequest.DownloadState.DownloadCompleted:
-                    item.setText(f"Completed: {os.path.basename(download.path())}")
-                elif download.state() == QWebEngineDownloadRequest.DownloadState.DownloadCancelled:
-                    item.setText(f"Cancelled: {os.path.basename(download.path())}")
-                elif download.state() == QWebEngineDownloadRequest.DownloadState.DownloadInterrupted:
-                    item.setText(f"Interrupted: {os.path.basename(download.path())}")
-                return
+    def show_tab_search(self):
+        if self.tab_search_dialog is None:
+            from tab_search import TabSearchDialog
+            self.tab_search_dialog = TabSearchDialog(self.core.tab_search, self)
+        self.tab_search_dialog.show()
+        self.tab_search_dialog.raise_()
+
+    def find_in_tabs(self, text):
+        """Jumps to the open tab that best matches `text` and lists any others in the Praterich panel."""
+        results = self.core.tab_search.search(text, limit=5)
+        if not results:
+            self.chat_view.say(f"I could not find \"{text}\" in any of your open tabs.")
+            return
+        self.core.tab_search.show_result(results[0])
+        if len(results) > 1:
+            self.chat_view.say("\n\n".join(f"{result['title'] or result['url']}\n{result['url']}\n{result['snippet']}" for result in results))
+
+    def show_task_manager(self):
+        if self.task_manager_dialog is None:
+            from task_manager import TaskManagerDialog
+            self.task_manager_dialog = TaskManagerDialog(self.core.tab_metrics, self)
+        self.task_manager_dialog.show()
+        self.task_manager_dialog.raise_()
 
     def toggle_praterich_panel(self):
         self.praterich_panel.setVisible(not self.praterich_panel.isVisible())
 
-    def add_new_tab(self, qurl=None):
+    def add_new_tab(self, qurl=None, lazy=False, history=None, title=None, tab_id=None, reopened=False):
+        """
+        Opens a tab. Lazy tabs stay unloaded placeholders until they are first shown.
+
+        `history` restores a saved back/forward history instead of loading `qurl`. Tabs restored
+        from the session pass their `tab_id`; any other tab is recorded as newly opened.
+        """
         if qurl is None:
             qurl = self.home_url
 
-        browser = CustomWebEngineView(self, browser=self)
-        browser.setUrl(qurl)
-        
-        i = self.tabs.addTab(browser, "New Tab")
-        self.tabs.setCurrentIndex(i)
-        
+        pooled = None if lazy else self.view_pool.take()
+        browser = pooled or CustomWebEngineView(self, browser=self)
+        restored = tab_id is not None
+        if not restored:
+            tab_id = self.session.new_tab_id()
+        self.tab_ids[browser] = tab_id
+        i = self.tabs.addTab(browser, title or "New Tab")
+        if not restored:
+            self.session.record("open", id=tab_id, index=i, url=qurl.toString(), history=history, reopened=reopened)
+
+        if lazy:
+            self.tab_lifecycle.add_lazy_tab(browser, qurl, history)
+        else:
+            if history:
+                restore_history(browser, history)
+            elif pooled is None or qurl != self.home_url:
+                browser.setUrl(qurl)
+            self.tab_lifecycle.register(browser)
+            self.tabs.setCurrentIndex(i)
+        self.connect_view(browser)
+        if pooled is not None:
+            self.update_title(browser)
+
+    def connect_view(self, browser):
         browser.urlChanged.connect(lambda qurl, browser=browser: self.update_url(qurl))
         browser.loadFinished.connect(lambda ok: self.update_title(browser))
+        browser.urlChanged.connect(self.record_visit)
+        browser.loadFinished.connect(lambda ok, browser=browser: self.record_page_text(browser, ok))
+        browser.urlChanged.connect(lambda qurl, browser=browser: self.record_navigation(browser))
+        browser.titleChanged.connect(lambda title, browser=browser: self.record_title(browser))
+        browser.loadFinished.connect(lambda ok, browser=browser: self.show_blocked_count(browser))
+
+    def record_visit(self, qurl):
+        # The title is not known yet; it is filled in when the page text is indexed.
+        if qurl.scheme() in ("http", "https"):
+            self.history.record_visit(qurl.toString())
+
+    def record_page_text(self, browser, ok):
+        """Indexes the visible text of a page once it has loaded, so history can be searched by content."""
+        url = browser.url()
+        if not ok or url.scheme() not in ("http", "https"):
+            return
+        browser.page().runJavaScript(
+            f"document.body ? document.body.innerText.slice(0, {self.history.max_text_chars}) : ''",
+            lambda text, url=url.toString(), browser=browser: self.on_page_text(browser, url, text or "")
+        )
+
+    def on_page_text(self, browser, url, text):
+        self.history.record_page_text(url, browser.title(), text)
+        self.core.tab_search.update(browser, text)
+
+    def show_history(self):
+        if self.history_dialog is None:
+            from history_dialog import HistoryDialog
+            self.history_dialog = HistoryDialog(self.history, self)
+            self.history_dialog.open_url.connect(lambda url: self.add_new_tab(QUrl(url)))
+        self.history_dialog.show()
+        self.history_dialog.raise_()
+
+    def search_history(self, text):
+        """Shows the history entries matching `text` in the Praterich panel."""
+        rows = self.history.search(text, limit=5)
+        if not rows:
+            self.chat_view.say(f"I could not find anything about \"{text}\" in your history.")
+            return
+        self.chat_view.say("\n\n".join(f"{row['title'] or row['url']}\n{row['url']}\n{row['snippet']}" for row in rows))
+
+    def closeEvent(self, event):
+        for channel in (f"panel-{id(self)}", f"crawl-{id(self)}", f"page-{id(self)}"):
+            self.scheduler.cancel_channel(channel)
+        for request_id in self.new_tab_requests:
+            self.scheduler.cancel(request_id)
+        self.core.window_closed(self)
+        super().closeEvent(event)
 
     def update_title(self, browser):
         if browser != self.tabs.currentWidget():
@@ -229,24 +457,103 @@ class PraterichBrowser(QMainWindow):
         index = self.tabs.indexOf(browser)
         self.tabs.setTabText(index, title)
 
+    def show_blocked_count(self, browser):
+        """Shows how many requests the content blocker stopped on a tab's page in its tooltip."""
+        if self.core.content_blocker is None:
+            return
+        index = self.tabs.indexOf(browser)
+        if index < 0:
+            return
+        count = self.core.content_blocker.blocked_count(browser.url())
+        self.tabs.setTabToolTip(index, f"{count} ads and trackers blocked" if count else "")
+
     def update_url(self, qurl):
         if self.tabs.currentWidget() and self.tabs.currentWidget().url() == qurl:
             self.url_bar.setText(qurl.toString())
     
+    def resolve_url_text(self, url_text):
+        """Turns URL bar text into a URL, searching for anything that does not look like an address."""
+        if "." not in url_text or " " in url_text:
+            return f"{self.default_search_url}{url_text}"
+        elif not url_text.startswith(("http://", "https://")):
+            return f"https://{url_text}"
+        return url_text
+
     def navigate_to_url(self):
         url_text = self.url_bar.text()
         if not url_text:
             return
         
-        if "." not in url_text or " " in url_text:
-            url = f"{self.default_search_url}{url_text}"
-        elif not url_text.startswith(("http://", "https://")):
-            url = f"https://{url_text}"
-        else:
-            url = url_text
-
-        self.tabs.currentWidget().setUrl(QUrl(url))
+        url = self.resolve_url_text(url_text)
+        self.prerender_timer.stop()
+        if not self.commit_prerender(url):
+            self.tabs.currentWidget().setUrl(QUrl(url))
         self.url_bar.setText(url)
+
+    def can_prerender_here(self):
+        """Prerendered pages replace the current view, so only a fresh new-tab view may be replaced."""
+        view = self.tabs.currentWidget()
+        return view is not None and view.url() == self.home_url and view.history().count() <= 1
+
+    def update_prerender(self):
+        """
+        Starts loading the address being typed in a hidden view when the user has visited it
+        before. Searches are never prerendered.
+        """
+        url_text = self.url_bar.text().strip()
+        url = self.resolve_url_text(url_text) if url_text else None
+        if self.prerender is not None and self.prerender[1] == url:
+            return
+        self.cancel_prerender()
+        if (not url or url.startswith(self.default_search_url) or not self.config.get("prerender_urls", True)
+                or not self.can_prerender_here() or self.history.most_visited_with_prefix(url) is None):
+            return
+        view = CustomWebEngineView(self, browser=self)
+        from view_pool import render_offscreen
+        render_offscreen(view, self.tabs.currentWidget().size())
+        self.prerender = (view, url)
+        self.prerender_loaded = False
+        view.loadFinished.connect(lambda ok, view=view: self.on_prerender_loaded(view, ok))
+        view.setUrl(QUrl(url))
+
+    def on_prerender_loaded(self, view, ok):
+        if self.prerender is not None and self.prerender[0] is view:
+            self.prerender_loaded = ok
+
+    def cancel_prerender(self):
+        if self.prerender is not None:
+            self.prerender[0].deleteLater()
+            self.prerender = None
+
+    def commit_prerender(self, url):
+        """Swaps the prerendered view in for the current tab if it is loading `url`."""
+        if self.prerender is None or self.prerender[1] != url or not self.can_prerender_here():
+            self.cancel_prerender()
+            return False
+        view = self.prerender[0]
+        self.prerender = None
+        from view_pool import detach_offscreen
+        detach_offscreen(view)
+
+        index = self.tabs.currentIndex()
+        old = self.tabs.widget(index)
+        self.tab_ids[view] = self.tab_ids.pop(old)
+        self.tab_lifecycle.unregister(old)
+        self.tab_lifecycle.register(view)
+        # The old view's text would otherwise stay searchable after it is deleted.
+        self.core.tab_search.remove(old)
+        self.connect_view(view)
+        self.tabs.insertTab(index, view, view.title() or "New Tab")
+        self.tabs.removeTab(index + 1)
+        old.deleteLater()
+        self.tabs.setCurrentIndex(index)
+
+        self.record_visit(view.url())
+        self.record_navigation(view)
+        if self.prerender_loaded:
+            self.update_title(view)
+            self.record_page_text(view, True)
+        return True
         
     def close_current_tab(self, index):
         if self.tabs.count() < 2:
@@ -255,9 +562,11 @@ class PraterichBrowser(QMainWindow):
             
         browser = self.tabs.widget(index)
         
-        tab_data = {'url': browser.url().toString()}
-        self.closed_tabs.append(tab_data)
+        # The session moves the tab, with its history, into the ring of closed tabs.
+        self.session.record("close", id=self.tab_ids.pop(browser))
         
+        self.tab_lifecycle.unregister(browser)
+        self.core.tab_search.remove(browser)
         browser.deleteLater()
         self.tabs.removeTab(index)
         
@@ -268,34 +577,313 @@ class PraterichBrowser(QMainWindow):
     def navigate_home(self):
         self.tabs.currentWidget().setUrl(self.home_url)
 
-    def on_praterich_command(self, user_query=None):
+    def on_praterich_command(self, user_query=None, source="command_bar"):
         if not user_query:
             user_query = self.praterich_panel.command_bar.text()
             self.praterich_panel.command_bar.clear()
+
+        trace_id = self.tracer.start_trace(source, user_query)
+        self.chat_view.add_message("user", user_query)
+
+        # Trivial commands are matched locally; only the rest need a model round trip.
+        from praterich_intents import match_intent
+        with self.tracer.span(trace_id, "intent"):
+            intent = match_intent(user_query)
+        conversation = self.praterich_panel.conversation
+        if intent is not None:
+            # Recorded first, so that a new chat started by this command is left empty.
+            conversation.record(user_query, intent)
+            self.dispatch_praterich_action(trace_id, intent)
+            self.finish_trace(trace_id)
+            return
         
-        self.praterich_panel.show_thinking_message("Thinking...")
+        self.chat_view.show_thinking("Thinking...")
+        self.chat_view.begin()
         
-        worker = PraterichRequestWorker(user_query)
-        worker.signals.result.connect(self.perform_praterich_action)
-        worker.signals.error.connect(self.handle_ai_error_on_command)
-        self.praterich_panel.thread_pool.start(worker)
+        # A newer command replaces one that is still waiting for the model.
+        request_id = self.scheduler.submit(user_query, channel=f"panel-{id(self)}", trace_id=trace_id,
+                                           history=conversation.history())
+        self.request_traces[request_id] = (trace_id, "command")
+        self.pending_turns[request_id] = conversation.begin(user_query)
+
+    def start_voice_command(self):
+        self.praterich_panel.setVisible(True)
+        self.praterich_panel.command_bar.clear()
+        self.status_bar.showMessage("Listening...", 5000)
+        self.core.start_voice_command(self)
+
+    def on_voice_partial(self, text):
+        self.praterich_panel.command_bar.setText(text)
+
+    def on_voice_final(self, text):
+        self.praterich_panel.command_bar.clear()
+        self.status_bar.clearMessage()
+        self.on_praterich_command(text, source="voice")
+
+    def on_voice_error(self, message):
+        self.status_bar.showMessage(message, 5000)
+
+    def process_new_tab_query(self, user_query, page):
+        """Handles a query typed into a new-tab page, replying on that page where possible."""
+        trace_id = self.tracer.start_trace("new_tab", user_query)
+        request_id = self.scheduler.submit(user_query, channel=f"new_tab-{id(page)}", trace_id=trace_id)
+        self.new_tab_requests[request_id] = page
+        self.request_traces[request_id] = (trace_id, "command")
+
+    def on_praterich_command_ready(self, request_id, response):
+        if request_id not in self.request_traces or not self.scheduler.is_current(request_id):
+            return
+        trace_id = self.request_traces.get(request_id, (None, None))[0]
+        turn = self.pending_turns.get(request_id)
+        if turn is not None:
+            turn["command"] = response.get("command") or "NONE"
+            turn["query"] = response.get("query") or ""
+        page = self.new_tab_requests.get(request_id)
+        if page is not None and response.get("command") == "PROMPT_DISPLAY":
+            self.tracer.set_command(trace_id, "PROMPT_DISPLAY")
+            page.runJavaScript(f"window.displayPraterichResponse({response.get('query') or '{}'});")
+            return
+        if response.get("command") == "BATCH":
+            self.start_batch(request_id, trace_id)
+        self.dispatch_praterich_action(trace_id, response)
+
+    def start_batch(self, request_id, trace_id):
+        """Prepares to run the actions of a multi-action response as they arrive."""
+        from praterich_batch import ActionBatch
+        batch = ActionBatch(self, trace_id, parent=self)
+        self.batches[request_id] = batch
+        if trace_id is not None:
+            self.deferred_traces.add(trace_id)
+        batch.finished.connect(lambda: self.on_batch_finished(request_id, trace_id))
+
+    def on_praterich_actions_ready(self, request_id, actions):
+        batch = self.batches.get(request_id)
+        if batch is not None and self.scheduler.is_current(request_id):
+            batch.add(actions)
+            if request_id in self.pending_turns:
+                self.pending_turns[request_id]["actions"].extend(actions)
+
+    def on_batch_finished(self, request_id, trace_id):
+        batch = self.batches.pop(request_id, None)
+        if batch is not None:
+            batch.deleteLater()
+        self.deferred_traces.discard(trace_id)
+        self.finish_trace(trace_id)
+
+    # Commands whose trace only ends once the current tab has finished loading.
+    PAGE_LOAD_COMMANDS = {"NAVIGATE", "SEARCH", "RELOAD", "GO_BACK", "GO_FORWARD"}
+
+    def dispatch_praterich_action(self, trace_id, response):
+        """Performs an action, attributing the dispatch and any resulting page load to a trace."""
+        command = response.get("command")
+        self.tracer.set_command(trace_id, command)
+        self.current_trace_id = trace_id
+        try:
+            with self.tracer.span(trace_id, "dispatch"):
+                self.perform_praterich_action(response)
+        finally:
+            self.current_trace_id = None
+
+        if trace_id is not None and command in self.PAGE_LOAD_COMMANDS and self.tabs.currentWidget():
+            self.deferred_traces.add(trace_id)
+            self.trace_page_load(trace_id, self.tabs.currentWidget())
+
+    def trace_page_load(self, trace_id, view):
+        started = time.perf_counter_ns()
+
+        def on_load_finished(ok):
+            view.loadFinished.disconnect(on_load_finished)
+            self.tracer.record(trace_id, "page_load", started)
+            self.deferred_traces.discard(trace_id)
+            self.tracer.end_trace(trace_id)
+
+        view.loadFinished.connect(on_load_finished)
+
+    def finish_trace(self, trace_id):
+        """Ends a trace unless it is still waiting on a page load or a crawl."""
+        if trace_id is not None and trace_id not in self.deferred_traces:
+            self.tracer.end_trace(trace_id)
+
+    def show_trace_overlay(self):
+        if self.trace_overlay is None:
+            from praterich_trace import TraceOverlay
+            self.trace_overlay = TraceOverlay(self.tracer, self)
+        self.trace_overlay.show()
+
+    def on_praterich_stream_chunk(self, request_id, text):
+        if request_id not in self.request_traces or not self.scheduler.is_current(request_id) or request_id in self.new_tab_requests:
+            return
+        self.chat_view.hide_thinking()
+        self.chat_view.append_chunk(text)
+
+    def on_praterich_request_finished(self, request_id, text):
+        if request_id not in self.request_traces:
+            return
+        if self.new_tab_requests.pop(request_id, None) is None and self.scheduler.is_current(request_id):
+            self.chat_view.end()
+        turn = self.pending_turns.pop(request_id, None)
+        if turn is not None and self.scheduler.is_current(request_id):
+            turn["message"] = text
+            self.praterich_panel.conversation.commit(turn)
+        if request_id in self.batches:
+            self.batches[request_id].close()
+        self.end_request_trace(request_id)
+
+    def on_praterich_request_error(self, request_id, error_message):
+        if request_id not in self.request_traces:
+            return
+        self.new_tab_requests.pop(request_id, None)
+        self.pending_turns.pop(request_id, None)
+        if request_id in self.batches:
+            # Actions already received still run; the rest of the response is lost.
+            self.batches[request_id].close()
+        self.end_request_trace(request_id)
+        if self.scheduler.is_current(request_id):
+            self.handle_ai_error_on_command(error_message)
+
+    def on_praterich_request_retired(self, request_id):
+        """Drops what was kept for a request that was cancelled before it finished or failed."""
+        if request_id not in self.request_traces:
+            return
+        self.new_tab_requests.pop(request_id, None)
+        self.pending_turns.pop(request_id, None)
+        batch = self.batches.pop(request_id, None)
+        if batch is not None:
+            batch.deleteLater()
+            self.deferred_traces.discard(self.request_traces[request_id][0])
+        self.end_request_trace(request_id)
+
+    def end_request_trace(self, request_id):
+        trace_id, kind = self.request_traces.pop(request_id, (None, None))
+        if kind in ("crawl", "page"):
+            self.deferred_traces.discard(trace_id)
+        self.finish_trace(trace_id)
+
+    def start_crawl(self, start_url, trace_id=None):
+        """Crawls and summarises a site in the background, reporting progress to the panel."""
+        from oodles_crawler import OodlesCrawler
+        crawler = OodlesCrawler(
+            max_pages=self.config.get("crawl_max_pages", 20),
+            max_depth=self.config.get("crawl_max_depth", 2),
+            progress=self.crawl_progress.emit
+        )
+        if trace_id is not None:
+            self.deferred_traces.add(trace_id)
+        started = time.perf_counter_ns()
+
+        async def crawl(request_id):
+            try:
+                summary = await crawler.run(start_url)
+            except Exception as e:
+                summary = f"I'm sorry, Oodles ran into a problem while crawling {start_url}: {e}"
+            self.tracer.record(trace_id, "crawl", started)
+            self.crawl_finished.emit(request_id, summary)
+
+        # Starting another crawl cancels the one in progress.
+        request_id = self.scheduler.submit_coroutine(crawl, channel=f"crawl-{id(self)}")
+        self.request_traces[request_id] = (trace_id, "crawl")
+
+    def with_page_context(self, view, callback):
+        """
+        Calls `callback(context)` with the extracted main content of the page in `view`.
+
+        The page is only extracted again when the fingerprint of its text changes, and the
+        extraction runs on the scheduler's thread pool rather than the GUI thread.
+        """
+        url = view.url().toString()
+
+        def on_fingerprint(fingerprint):
+            context = self.core.page_contexts.get(url, fingerprint)
+            if context is not None:
+                callback(context)
+            else:
+                view.page().toHtml(lambda html: self.start_page_extraction(url, fingerprint, html or "", callback))
+
+        from page_context import FINGERPRINT_SCRIPT
+        view.page().runJavaScript(FINGERPRINT_SCRIPT, on_fingerprint)
+
+    def start_page_extraction(self, url, fingerprint, html, callback):
+        from page_context import extract_page_context
+
+        async def extract(request_id):
+            context = await asyncio.to_thread(extract_page_context, html, url)
+            self.page_context_ready.emit(request_id, context)
+
+        request_id = self.scheduler.submit_coroutine(extract, channel=f"page-{id(self)}")
+        self.context_requests[request_id] = (url, fingerprint, callback)
+
+    def on_page_context_ready(self, request_id, context):
+        url, fingerprint, callback = self.context_requests.pop(request_id, (None, None, None))
+        if callback is None:
+            return
+        self.core.page_contexts.put(url, fingerprint, context)
+        if self.scheduler.is_current(request_id):
+            callback(context)
+
+    def ask_about_page(self, question, trace_id=None):
+        """Answers a question about the current page from its main content, cut to the token budget."""
+        view = self.tabs.currentWidget()
+        if view is None:
+            return
+        if trace_id is not None:
+            self.deferred_traces.add(trace_id)
+        started = time.perf_counter_ns()
+
+        def answer(context):
+            from page_context import build_page_prompt
+            self.tracer.record(trace_id, "page_context", started)
+            prompt = build_page_prompt(context, question, max_tokens=self.config.get("page_context_tokens", 2000))
+            self.chat_view.begin()
+            request_id = self.scheduler.submit(prompt, mode="text", channel=f"page-{id(self)}", trace_id=trace_id)
+            self.request_traces[request_id] = (trace_id, "page")
+
+        self.with_page_context(view, answer)
+
+    def translate_page(self, language):
+        """Opens the main content of the current page in Google Translate, as much as fits in the URL."""
+        view = self.tabs.currentWidget()
+        if view is None:
+            return
+
+        def open_translation(context):
+            from page_context import chunk_blocks
+            chunks = chunk_blocks(context["blocks"], self.config.get("translate_tokens", 1000))
+            query = QUrlQuery()
+            query.addQueryItem("sl", "auto")
+            query.addQueryItem("tl", language or "en")
+            query.addQueryItem("text", chunks[0] if chunks else context["title"])
+            url = QUrl("https://translate.google.com/")
+            url.setQuery(query)
+            self.add_new_tab(url)
+
+        self.with_page_context(view, open_translation)
+
+    def on_crawl_progress(self, message):
+        self.status_bar.showMessage(message, 5000)
+
+    def on_crawl_finished(self, request_id, summary):
+        if self.scheduler.is_current(request_id):
+            self.chat_view.say(summary)
+        self.end_request_trace(request_id)
 
     def handle_ai_error_on_command(self, error_message):
-        self.praterich_panel.start_typing_effect(f"Error: {error_message}")
-        self.praterich_panel.hide_thinking_message()
+        self.chat_view.hide_thinking()
+        self.chat_view.say(f"Error: {error_message}")
 
     def upload_file(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Upload File")
         if file_path:
-            self.praterich_panel.start_typing_effect(f"Understood. I will process the file located at: {file_path}")
+            self.chat_view.say(f"Understood. I will process the file located at: {file_path}")
 
     def perform_praterich_action(self, response):
         command = response.get("command")
         query = response.get("query")
         message = response.get("message")
         
-        self.praterich_panel.start_typing_effect(message)
-        self.praterich_panel.hide_thinking_message()
+        # Streamed responses render their message separately as it arrives.
+        if message:
+            self.chat_view.say(message)
+        self.chat_view.hide_thinking()
 
         if command == "NAVIGATE":
             self.add_new_tab(QUrl(query))
@@ -303,10 +891,15 @@ class PraterichBrowser(QMainWindow):
             # Use the default search engine URL
             search_url = f"{self.default_search_url}{query}"
             self.add_new_tab(QUrl(search_url))
+        elif command == "NEW_WINDOW":
+            self.new_window()
         elif command == "NEW_TAB":
-            num_tabs = int(query) if query else 1
+            # However many the model asks for, at most `max_new_tabs` are opened at once.
+            num_tabs = min(int(query) if query else 1, self.config.get("max_new_tabs", 20))
+            # Bulk tabs are placeholders; each one loads when the user first switches to it.
             for _ in range(num_tabs):
-                self.add_new_tab(self.home_url)
+                self.add_new_tab(self.home_url, lazy=True)
+            self.tabs.setCurrentIndex(self.tabs.count() - 1)
         elif command == "CLOSE_TAB":
             self.close_current_tab(self.tabs.currentIndex())
         elif command == "RELOAD":
@@ -327,18 +920,17 @@ class PraterichBrowser(QMainWindow):
             file_path, _ = QFileDialog.getOpenFileName(self, "Select a File to Upload")
             if file_path:
                 response_message = f"File selected: {file_path}. Processing with Praterich..."
-                self.praterich_panel.start_typing_effect(response_message)
+                self.chat_view.say(response_message)
         elif command == "TOGGLE_SIDEBAR":
             self.praterich_panel.setVisible(not self.praterich_panel.isVisible())
         elif command == "MANAGE_EXTENSIONS":
-            self.praterich_panel.start_typing_effect("I am afraid I cannot manage extensions at this moment, as this feature is still under development.")
+            self.chat_view.say("I am afraid I cannot manage extensions at this moment, as this feature is still under development.")
         elif command == "SYNC_DATA":
-            self.praterich_panel.start_typing_effect("Data synchronization is not yet implemented. Please check for a future update.")
+            self.chat_view.say("Data synchronization is not yet implemented. Please check for a future update.")
         elif command == "TRANSLATE_PAGE":
-            translate_js = f"window.open('https://translate.google.com/?sl=auto&tl={query}&text=' + encodeURIComponent(document.body.innerText), '_blank');"
-            self.tabs.currentWidget().page().runJavaScript(translate_js)
+            self.translate_page(query)
         elif command == "CHANGE_SETTINGS":
-            self.praterich_panel.start_typing_effect("Current settings cannot be changed via command. A settings menu will be implemented in a future update.")
+            self.chat_view.say("Current settings cannot be changed via command. A settings menu will be implemented in a future update.")
         elif command == "DEVELOPER_TOOLS":
             self.tabs.currentWidget().page().action(QWebEnginePage.WebAction.InspectElement).trigger()
         elif command == "ZOOM_IN":
@@ -354,27 +946,31 @@ class PraterichBrowser(QMainWindow):
             if file_path:
                 self.tabs.currentWidget().page().printToPdf(file_path)
         elif command == "BOOKMARK_PAGE":
-            self.praterich_panel.start_typing_effect("The bookmarking feature is not yet available, my apologies. I will remember this for a future update.")
+            self.chat_view.say("The bookmarking feature is not yet available, my apologies. I will remember this for a future update.")
         elif command == "SWITCH_TAB":
             try:
                 tab_index = int(query) - 1
                 if 0 <= tab_index < self.tabs.count():
                     self.tabs.setCurrentIndex(tab_index)
                 else:
-                    self.praterich_panel.start_typing_effect("I'm afraid that tab number is out of range.")
+                    self.chat_view.say("I'm afraid that tab number is out of range.")
             except (ValueError, IndexError):
-                self.praterich_panel.start_typing_effect("Please provide a valid tab number or name.")
+                self.chat_view.say("Please provide a valid tab number or name.")
         elif command == "RESIZE_WINDOW":
-            self.praterich_panel.start_typing_effect("I can't resize the window automatically just yet. You may do so by dragging the edges.")
+            self.chat_view.say("I can't resize the window automatically just yet. You may do so by dragging the edges.")
         elif command == "NEW_CHAT":
             self.praterich_panel.clear_chat()
+            self.chat_view.clear()
+            self.praterich_panel.conversation.reset()
         elif command == "CRAWL_SITE":
-            def handle_html(html_content):
-                prompt = f"Oodles has crawled the following HTML from {query}. Please summarize what you see, and describe the website's purpose. The HTML is:\n\n{html_content[:5000]}..."
-                response = get_praterich_response_text(prompt)
-                self.praterich_panel.start_typing_effect(response)
-            
-            self.tabs.currentWidget().page().toHtml(handle_html)
+            start_url = query or self.tabs.currentWidget().url().toString()
+            self.start_crawl(start_url, self.current_trace_id)
+        elif command == "ASK_PAGE":
+            self.ask_about_page(query or "Summarise this page.", self.current_trace_id)
+        elif command == "SEARCH_HISTORY":
+            self.search_history(query)
+        elif command == "FIND_IN_TABS":
+            self.find_in_tabs(query)
         elif command == "TAB_FORMAT_VERTICAL":
             self.tabs.setTabPosition(QTabWidget.TabPosition.West)
             self.tabs.setDocumentMode(True)
@@ -386,7 +982,7 @@ class PraterichBrowser(QMainWindow):
         elif command == "OPEN_NOTES":
             self.notes_dialog.show()
         elif command == "PROMPT_DISPLAY":
-            self.praterich_panel.start_typing_effect(query)
+            self.chat_view.say(query)
 
     def open_terminal(self):
         try:
@@ -399,29 +995,45 @@ class PraterichBrowser(QMainWindow):
         except FileNotFoundError:
             self.status_bar.showMessage("Error: Terminal application not found.")
             
-    def load_custom_font(self):
-        font_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Roboto.ttf")
-        
-        if not os.path.exists(font_path):
-            print(f"Error: Font file not found at path: {font_path}")
-            return
-            
-        font_id = QFontDatabase.addApplicationFont(font_path)
-        
-        if font_id != -1:
-            font_family = QFontDatabase.applicationFontFamilies(font_id)[0]
-            print(f"Font '{font_family}' loaded successfully.")
-            self.setStyleSheet(f"""
-                * {{
-                    font-family: '{font_family}';
-                }}
-            """)
-        else:
-            print(f"Error: Failed to load font from path: {font_path}")
-
 if __name__ == "__main__":
+    from browser_core import BrowserCore, InstanceServer, launch_message, send_to_running_instance
+    profile_path = profile_path_from_args(sys.argv)
+    # Custom schemes have to be known before the QApplication starts WebEngine.
+    register_scheme()
     app = QApplication(sys.argv)
     QApplication.setApplicationName("Ringzauber")
-    window = PraterichBrowser()
-    window.show()
+    startup.mark("application")
+
+    # A second launch hands its URLs or query to the running instance instead of starting
+    # another WebEngine process tree. Profiling always measures a fresh process.
+    message = launch_message(sys.argv[1:])
+    if not profile_path and send_to_running_instance(message):
+        sys.exit(0)
+
+    core = BrowserCore(PraterichBrowser)
+    startup.mark("core")
+    if not profile_path:
+        instance_server = InstanceServer(core)
+        instance_server.message_received.connect(core.handle_message)
+    window = core.new_window(restore_session=True)
+    startup.mark("show")
+    for url in message["urls"]:
+        window.add_new_tab(QUrl(url))
+    if message["query"]:
+        window.on_praterich_command(message["query"], source="launch")
+
+    if profile_path:
+        def finish_startup_profile(phase):
+            if startup.finished:
+                return
+            startup.mark(phase)
+            startup.finish()
+            startup.write(profile_path)
+            if "--exit-after-startup" in sys.argv:
+                app.quit()
+
+        window.tabs.currentWidget().loadFinished.connect(lambda ok: finish_startup_profile("first_tab_loaded"))
+        QTimer.singleShot(15000, lambda: finish_startup_profile("timed_out"))
+    else:
+        startup.finish()
     sys.exit(app.exec())
\ No newline at end of file
@@ -0,0 +1,27 @@
+import os
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+# History, the session, caches and traces live outside the source tree, one directory per user.
+DATA_DIR = os.environ.get("RINGZAUBER_DATA_DIR") or os.path.join(
+    os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share"), "ringzauber"
+)
+
+
+def data_path(name):
+    """
+    Returns the path of a runtime file in the data directory, creating the directory.
+
+    A file left next to the source by an earlier version is moved there the first time, along
+    with its SQLite journal files, so existing history and sessions carry over.
+    """
+    path = os.path.join(DATA_DIR, name)
+    try:
+        os.makedirs(DATA_DIR, mode=0o700, exist_ok=True)
+        legacy = os.path.join(SOURCE_DIR, name)
+        if os.path.exists(legacy) and not os.path.exists(path):
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(legacy + suffix):
+                    os.replace(legacy + suffix, path + suffix)
+    except OSError as e:
+        print(f"Error preparing the data directory {DATA_DIR}: {e}")
+    return path
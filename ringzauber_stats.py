@@ -0,0 +1,9 @@
+def percentile(samples, fraction, default=None):
+    """
+    Returns the sample at `fraction` of the way through the sorted `samples` (0.5 for the
+    median, 0.95 for the 95th percentile), or `default` if there are none.
+    """
+    ordered = sorted(samples)
+    if not ordered:
+        return default
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
@@ -0,0 +1,240 @@
+import os
+import sys
+import json
+import time
+import signal
+import random
+import tempfile
+import threading
+import subprocess
+from ringzauber_paths import data_path
+
+DEFAULT_SESSION_PATH = data_path('ringzauber_session.json')
+
+
+def empty_state():
+    return {"tabs": [], "current": None, "closed": [], "next_id": 1}
+
+
+def apply_event(state, event, closed_limit):
+    """
+    Applies one journal event to a session state.
+
+    Events are idempotent, so replaying a journal over a snapshot that already contains
+    some of its events gives the same state.
+    """
+    op = event["op"]
+    tabs = state["tabs"]
+    position = next((index for index, tab in enumerate(tabs) if tab["id"] == event.get("id")), None)
+
+    if op == "open":
+        if position is None:
+            tab = {"id": event["id"], "url": event["url"], "title": event.get("title", ""), "history": event.get("history")}
+            if event.get("reopened") and state["closed"]:
+                state["closed"].pop()
+        else:
+            tab = tabs.pop(position)
+        tabs.insert(min(event["index"], len(tabs)), tab)
+        state["next_id"] = max(state["next_id"], event["id"] + 1)
+    elif op == "close" and position is not None:
+        state["closed"].append(tabs.pop(position))
+        del state["closed"][:-closed_limit]
+    elif op == "navigate" and position is not None:
+        tabs[position].update({key: event[key] for key in ("url", "title", "history") if key in event})
+    elif op == "title" and position is not None:
+        tabs[position]["title"] = event["title"]
+    elif op == "move" and position is not None:
+        tabs.insert(min(event["index"], len(tabs) - 1), tabs.pop(position))
+    elif op == "select":
+        state["current"] = event["id"]
+
+
+def load_session(path, closed_limit=25):
+    """Rebuilds the last saved state from the snapshot at `path` and its journal."""
+    state = empty_state()
+    if path is None:
+        return state
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                state.update(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"Error reading session snapshot: {e}")
+    journal_path = f"{path}.journal"
+    if os.path.exists(journal_path):
+        with open(journal_path, 'r') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # A line torn by a crash can only be the last one.
+                    break
+                apply_event(state, event, closed_limit)
+    return state
+
+
+class SessionJournal:
+    """
+    Keeps the open tabs, their back/forward history and recently closed tabs on disk.
+
+    Every change is appended to a journal next to the snapshot at `path`, and a background
+    thread writes the journal out every `flush_interval` seconds, so a crash loses at most
+    that much. Only the last navigation or title change of each tab is written per flush.
+    After `compact_after` events the state is written as a new snapshot and the journal
+    starts again. Closed tabs are kept in a ring of `closed_limit` entries.
+    With `path` set to None the session is only kept in memory.
+    """
+    def __init__(self, path=DEFAULT_SESSION_PATH, flush_interval=0.5, compact_after=1000, closed_limit=25):
+        self.path = path
+        self.journal_path = f"{path}.journal" if path else None
+        self.flush_interval = flush_interval
+        self.compact_after = compact_after
+        self.closed_limit = closed_limit
+        self.lock = threading.Lock()
+        self.buffer = []
+        # The buffered navigate or title event of each tab, which later ones are folded into.
+        self.updates = {}
+        self.state = load_session(path, closed_limit)
+        self.journal_events = 0
+
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._write_loop, name="session-journal", daemon=True)
+        if path:
+            self.thread.start()
+
+    def new_tab_id(self):
+        with self.lock:
+            tab_id = self.state["next_id"]
+            self.state["next_id"] += 1
+            return tab_id
+
+    def record(self, op, **fields):
+        event = dict(fields, op=op)
+        with self.lock:
+            apply_event(self.state, event, self.closed_limit)
+            if not self.path:
+                return
+            tab_id = event.get("id")
+            if op in ("navigate", "title"):
+                pending = self.updates.get(tab_id)
+                if pending is None:
+                    self.updates[tab_id] = event
+                    self.buffer.append(event)
+                elif op == "title" and pending["op"] == "navigate":
+                    pending["title"] = event["title"]
+                else:
+                    pending.clear()
+                    pending.update(event)
+                return
+            if op in ("open", "close"):
+                self.updates.pop(tab_id, None)
+            self.buffer.append(event)
+
+    def tabs(self):
+        with self.lock:
+            return list(self.state["tabs"])
+
+    def current(self):
+        return self.state["current"]
+
+    def last_closed(self):
+        """Returns the most recently closed tab, or None. Reopening it is recorded as an "open" with `reopened=True`."""
+        with self.lock:
+            return self.state["closed"][-1] if self.state["closed"] else None
+
+    def recently_closed(self, limit=5):
+        """Returns up to `limit` closed tabs, most recent first."""
+        with self.lock:
+            return self.state["closed"][:-limit - 1:-1]
+
+    def flush(self):
+        with self.lock:
+            events, self.buffer = self.buffer, []
+            self.updates = {}
+            self.journal_events += len(events)
+            snapshot = json.dumps(self.state) if self.journal_events >= self.compact_after else None
+        try:
+            if snapshot is not None:
+                self._compact(snapshot)
+            elif events:
+                with open(self.journal_path, 'a') as f:
+                    f.write("".join(json.dumps(event) + "\n" for event in events))
+        except OSError as e:
+            print(f"Error writing session journal: {e}")
+
+    def _compact(self, snapshot):
+        # The snapshot includes every buffered event, so the journal can simply start over.
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, 'w') as f:
+            f.write(snapshot)
+        os.replace(temporary_path, self.path)
+        open(self.journal_path, 'w').close()
+        with self.lock:
+            self.journal_events = 0
+
+    def close(self):
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join(timeout=5.0)
+
+    def _write_loop(self):
+        while not self.stop_event.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+
+def _crash_child(path, interval):
+    """Records a navigation every `interval` seconds until it is killed."""
+    journal = SessionJournal(path)
+    tab_id = journal.new_tab_id()
+    journal.record("open", id=tab_id, index=0, url="https://example.com/0")
+    count = 0
+    while True:
+        count += 1
+        journal.record("navigate", id=tab_id, url=f"https://example.com/{count}", title=repr(time.time()))
+        time.sleep(interval)
+
+
+def run_crash_test(runs=5, interval=0.01):
+    """Kills a process that is journaling with SIGKILL and reports how much state was lost."""
+    losses = []
+    with tempfile.TemporaryDirectory() as directory:
+        for run in range(runs):
+            path = os.path.join(directory, f"session-{run}.json")
+            child = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--crash-child", path, str(interval)])
+            time.sleep(random.uniform(1.0, 3.0))
+            child.send_signal(signal.SIGKILL)
+            killed_at = time.time()
+            child.wait()
+            tabs = load_session(path)["tabs"]
+            last_saved = float(tabs[0]["title"]) if tabs and tabs[0]["title"] else 0.0
+            losses.append(killed_at - last_saved)
+    return {"runs": runs, "max_lost_seconds": max(losses), "mean_lost_seconds": sum(losses) / len(losses)}
+
+
+def run_restore_benchmark(tabs=100, history_bytes=4096, events=5000):
+    """Times rebuilding a session of `tabs` tabs from a snapshot plus a journal of `events` events."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "session.json")
+        journal = SessionJournal(path, compact_after=events * 2)
+        history = "A" * history_bytes
+        ids = []
+        for index in range(tabs):
+            ids.append(journal.new_tab_id())
+            journal.record("open", id=ids[-1], index=index, url=f"https://example.com/{index}")
+        for count in range(events):
+            journal.record("navigate", id=random.choice(ids), url=f"https://example.com/page/{count}",
+                           title=f"Page {count}", history=history)
+        journal.close()
+
+        start = time.perf_counter()
+        state = load_session(path)
+        elapsed = time.perf_counter() - start
+    return {"tabs": len(state["tabs"]), "events": events, "load_ms": elapsed * 1e3}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--crash-child":
+        _crash_child(sys.argv[2], float(sys.argv[3]))
+    else:
+        print(json.dumps({"crash": run_crash_test(), "restore": run_restore_benchmark()}, indent=2))
@@ -0,0 +1,105 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+from ringzauber_paths import data_path
+
+DEFAULT_PROFILE_PATH = data_path('ringzauber_startup_profile.json')
+
+
+class StartupProfiler:
+    """
+    Records how long each phase of startup takes.
+
+    `mark(phase)` closes the phase that began at the previous mark, so phases are contiguous
+    and add up to the time from `started` to the last mark. Marks after `finish()` are ignored,
+    so windows opened later do not add to the profile.
+    """
+    def __init__(self, started=None):
+        self.started = started or time.perf_counter()
+        self.last = self.started
+        self.phases = []
+        self.finished = False
+
+    def mark(self, phase):
+        if self.finished:
+            return
+        now = time.perf_counter()
+        self.phases.append({"phase": phase, "ms": round((now - self.last) * 1e3, 2), "at_ms": round((now - self.started) * 1e3, 2)})
+        self.last = now
+
+    def has(self, phase):
+        return any(entry["phase"] == phase for entry in self.phases)
+
+    def finish(self):
+        self.finished = True
+
+    def report(self):
+        return {"phases": self.phases, "total_ms": self.phases[-1]["at_ms"] if self.phases else 0.0}
+
+    def write(self, path=DEFAULT_PROFILE_PATH):
+        report = self.report()
+        try:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2)
+        except OSError as e:
+            print(f"Error writing startup profile: {e}")
+        for entry in self.phases:
+            print(f"{entry['phase']:<20} {entry['ms']:>9.1f} ms  (at {entry['at_ms']:.1f} ms)")
+
+
+def profile_path_from_args(argv):
+    """Returns the profile path for --profile-startup[=path], or None if the flag is absent."""
+    for argument in argv:
+        if argument == "--profile-startup":
+            return DEFAULT_PROFILE_PATH
+        if argument.startswith("--profile-startup="):
+            return argument.split("=", 1)[1]
+    return None
+
+
+def run_benchmark(runs=5, budget_ms=1500.0, phase="first_paint", timeout=60):
+    """
+    Launches the browser on the offscreen platform `runs` times and checks the median time
+    to `phase` against `budget_ms`.
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ringzauber.py')
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen", QTWEBENGINE_DISABLE_SANDBOX="1")
+    samples = []
+    reports = []
+    with tempfile.TemporaryDirectory() as directory:
+        for run in range(runs):
+            path = os.path.join(directory, f"profile-{run}.json")
+            subprocess.run(
+                [sys.executable, script, f"--profile-startup={path}", "--exit-after-startup"],
+                env=env, timeout=timeout, stdout=subprocess.DEVNULL, check=True
+            )
+            with open(path, 'r') as f:
+                report = json.load(f)
+            reports.append(report)
+            reached = [entry["at_ms"] for entry in report["phases"] if entry["phase"] == phase]
+            samples.append(reached[0] if reached else float("inf"))
+
+    samples.sort()
+    median = samples[len(samples) // 2]
+    phases = {}
+    for report in reports:
+        for entry in report["phases"]:
+            phases.setdefault(entry["phase"], []).append(entry["ms"])
+    return {
+        "runs": runs,
+        "phase": phase,
+        "median_ms": median,
+        "budget_ms": budget_ms,
+        "within_budget": median <= budget_ms,
+        "median_phase_ms": {name: sorted(values)[len(values) // 2] for name, values in phases.items()},
+    }
+
+
+if __name__ == "__main__":
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else 1500.0
+    result = run_benchmark(budget_ms=budget)
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result["within_budget"] else 1)
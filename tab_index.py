@@ -0,0 +1,197 @@
+import re
+import sys
+import json
+import time
+import random
+from collections import Counter
+from history_store import make_snippet
+from ringzauber_stats import percentile
+
+WORD_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return WORD_RE.findall(text.lower())
+
+
+class TabIndex:
+    """
+    An in-memory inverted index over the text of open tabs.
+
+    Each tab is a document under a caller-chosen key. `update` only touches the postings of
+    words that were added to or removed from the tab since its last update, so re-indexing
+    a page after a small DOM change is cheap. Words are also bucketed by their first two
+    letters, so the last word of a query can be matched as a prefix while the user types.
+    At most `max_chars` characters of each tab are kept.
+    """
+    def __init__(self, max_chars=20000, title_weight=5):
+        self.max_chars = max_chars
+        self.title_weight = title_weight
+        self.documents = {}
+        self.postings = {}
+        self.prefixes = {}
+
+    def __len__(self):
+        return len(self.documents)
+
+    def update(self, key, title, url, text):
+        text = text[:self.max_chars]
+        document = self.documents.get(key)
+        if document is not None and document["text"] == text and document["title"] == title and document["url"] == url:
+            return
+        counts = Counter(tokenize(text))
+        for word in tokenize(title):
+            counts[word] += self.title_weight
+        old_counts = document["counts"] if document is not None else {}
+        for word in old_counts.keys() - counts.keys():
+            self.remove_posting(word, key)
+        for word, count in counts.items():
+            if old_counts.get(word) != count:
+                self.add_posting(word, key, count)
+        self.documents[key] = {"title": title, "url": url, "text": text, "lower": text.lower(), "counts": counts}
+
+    def remove(self, key):
+        document = self.documents.pop(key, None)
+        if document is None:
+            return
+        for word in document["counts"]:
+            self.remove_posting(word, key)
+
+    def add_posting(self, word, key, count):
+        posting = self.postings.get(word)
+        if posting is None:
+            posting = self.postings[word] = {}
+            self.prefixes.setdefault(word[:2], set()).add(word)
+        posting[key] = count
+
+    def remove_posting(self, word, key):
+        posting = self.postings.get(word)
+        if posting is None:
+            return
+        posting.pop(key, None)
+        if not posting:
+            del self.postings[word]
+            bucket = self.prefixes.get(word[:2])
+            bucket.discard(word)
+            if not bucket:
+                del self.prefixes[word[:2]]
+
+    def matching_words(self, word, prefix):
+        if not prefix or len(word) < 2:
+            return [word] if word in self.postings else []
+        return [candidate for candidate in self.prefixes.get(word[:2], ()) if candidate.startswith(word)]
+
+    def search(self, text, limit=10, snippets=True):
+        """
+        Returns the tabs containing every word of `text`, the last word as a prefix, best
+        first. Each result has the tab's key, title, url, score and, unless `snippets` is
+        False, a snippet around the first match and the text to find on the page. Without
+        them, `describe` adds both later, for the results that are actually shown.
+        """
+        words = tokenize(text)
+        if not words:
+            return []
+        scores = None
+        found_words = []
+        for position, word in enumerate(words):
+            candidates = self.matching_words(word, prefix=position == len(words) - 1)
+            word_scores = {}
+            for candidate in candidates:
+                for key, count in self.postings[candidate].items():
+                    word_scores[key] = word_scores.get(key, 0) + count
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {key: score + word_scores[key] for key, score in scores.items() if key in word_scores}
+            if not scores:
+                return []
+            found_words.append(word)
+
+        ranked = sorted(scores.items(), key=lambda item: -item[1])[:limit]
+        results = []
+        for key, score in ranked:
+            document = self.documents[key]
+            result = {"key": key, "title": document["title"], "url": document["url"], "score": score,
+                      "query": text, "words": found_words}
+            if snippets:
+                self.describe(result)
+            results.append(result)
+        return results
+
+    def describe(self, result):
+        """Adds the snippet and the text to find on the page to a result of `search` that lacks them."""
+        if "snippet" in result:
+            return result
+        words = result["words"]
+        phrase = " ".join(result["query"].split())
+        document = self.documents.get(result["key"])
+        # The tab may have closed since the search.
+        result["snippet"] = self.snippet(document, words) if document is not None else ""
+        # The whole query if the page has it as typed, otherwise its longest word.
+        in_page = document is not None and phrase.lower() in document["lower"]
+        result["find"] = phrase if in_page else max(words, key=len)
+        return result
+
+    def snippet(self, document, words, width=120):
+        """Returns the text around the first match, found without scanning the page with a regex."""
+        positions = [position for position in (document["lower"].find(word) for word in words) if position >= 0]
+        start = max(0, min(positions) - width // 3) if positions else 0
+        text = document["text"]
+        excerpt = make_snippet(text[start:start + width], words, width)
+        return ("..." if start else "") + excerpt + ("..." if start + width < len(text) else "")
+
+
+def synthetic_page(rng, vocabulary, words=2000):
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+
+def run_benchmark(tabs=100, words_per_tab=2000, queries=1000, visible_rows=6):
+    """Indexes `tabs` synthetic pages, then times queries, a small re-index and a full one."""
+    rng = random.Random(7)
+    vocabulary = [f"{rng.choice('bcdfghklmnprst')}{rng.choice('aeiou')}{rng.choice('bcdfghklmnprst')}{index}"
+                  for index in range(20000)]
+    pages = [synthetic_page(rng, vocabulary, words_per_tab) for _ in range(tabs)]
+    index = TabIndex()
+    started = time.perf_counter()
+    for key, page in enumerate(pages):
+        index.update(key, f"Tab {key}", f"https://example.test/{key}", page)
+    build_ms = (time.perf_counter() - started) * 1e3
+
+    terms = [rng.choice(page.split()) for page in pages for _ in range(10)]
+    samples = {"one word": [], "two words": [], "prefix": [], "with snippets": [], "prefix, first rows described": []}
+    for number in range(queries):
+        term = terms[number % len(terms)]
+        for name, query, snippets in (("one word", term, False), ("two words", f"{term} {rng.choice(terms)}", False),
+                                      ("prefix", term[:3], False), ("with snippets", term[:3], True)):
+            started = time.perf_counter()
+            index.search(query, limit=20, snippets=snippets)
+            samples[name].append((time.perf_counter() - started) * 1e3)
+        # As the search dialog does: twenty results, snippets for the rows on screen.
+        started = time.perf_counter()
+        for result in index.search(term[:3], limit=20, snippets=False)[:visible_rows]:
+            index.describe(result)
+        samples["prefix, first rows described"].append((time.perf_counter() - started) * 1e3)
+
+    # A live page changing a few words, as after a DOM mutation.
+    changed = pages[0].split()
+    changed[:20] = [rng.choice(vocabulary) for _ in range(20)]
+    started = time.perf_counter()
+    index.update(0, "Tab 0", "https://example.test/0", " ".join(changed))
+    small_update_ms = (time.perf_counter() - started) * 1e3
+    started = time.perf_counter()
+    index.update(1, "Tab 1", "https://example.test/1", synthetic_page(rng, vocabulary, words_per_tab))
+    full_update_ms = (time.perf_counter() - started) * 1e3
+
+    return {
+        "tabs": tabs,
+        "words": len(index.postings),
+        "build_ms": build_ms,
+        "small_update_ms": small_update_ms,
+        "full_update_ms": full_update_ms,
+        "queries": {name: {"p50_ms": percentile(values, 0.5), "p95_ms": percentile(values, 0.95)}
+                    for name, values in samples.items()},
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100), indent=2))
@@ -0,0 +1,187 @@
+import time
+import base64
+from PyQt6.QtCore import QObject, QTimer, QByteArray, QDataStream, QIODevice, pyqtSignal
+from PyQt6.QtWebEngineCore import QWebEnginePage
+from process_metrics import read_rss_bytes
+
+LifecycleState = QWebEnginePage.LifecycleState
+
+
+def save_history(view):
+    """Returns a tab's back/forward history as a base64 string."""
+    data = QByteArray()
+    stream = QDataStream(data, QIODevice.OpenModeFlag.WriteOnly)
+    stream << view.history()
+    return base64.b64encode(bytes(data)).decode("ascii")
+
+
+def restore_history(view, encoded):
+    """Restores a history saved by `save_history`, which loads its current entry."""
+    stream = QDataStream(QByteArray(base64.b64decode(encoded)), QIODevice.OpenModeFlag.ReadOnly)
+    stream >> view.history()
+
+
+class TabLifecycleManager(QObject):
+    """
+    Freezes and discards background tabs so that renderer memory stays within a budget.
+
+    Tabs are ranked by when they were last shown. Background tabs are frozen after
+    `freeze_after` seconds and discarded after `discard_after` seconds, and the least
+    recently used tabs are discarded early whenever there are more than `max_live_tabs`
+    live renderers or their combined resident memory exceeds `memory_budget_mb`.
+    A discarded tab keeps its title, URL and scroll position and reloads when shown.
+    """
+    tab_discarded = pyqtSignal(object)
+    tab_restored = pyqtSignal(object)
+
+    def __init__(self, tabs, max_live_tabs=8, memory_budget_mb=1024, freeze_after=30,
+                 discard_after=600, check_interval=5000, parent=None):
+        super().__init__(parent)
+        self.tabs = tabs
+        self.max_live_tabs = max_live_tabs
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.freeze_after = freeze_after
+        self.discard_after = discard_after
+
+        self.last_shown = {}
+        self.pending = {}
+        self.pending_history = {}
+        self.saved_state = {}
+
+        self.tabs.currentChanged.connect(self.on_current_changed)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(check_interval)
+        self.timer.timeout.connect(self.enforce_policy)
+        self.timer.start()
+
+    def register(self, view):
+        """Starts tracking a tab's view."""
+        self.last_shown[view] = time.monotonic()
+        view.loadFinished.connect(lambda ok, view=view: self.on_load_finished(view))
+
+    def add_lazy_tab(self, view, qurl, history=None):
+        """
+        Tracks a view that should only load `qurl` the first time it is shown.
+
+        `history` is a back/forward history from `save_history`, restored instead of loading `qurl`.
+        """
+        self.pending[view] = qurl
+        if history:
+            self.pending_history[view] = history
+        self.register(view)
+        # Never shown yet, so it goes to the back of the LRU order.
+        self.last_shown[view] = 0.0
+
+    def unregister(self, view):
+        self.last_shown.pop(view, None)
+        self.pending.pop(view, None)
+        self.pending_history.pop(view, None)
+        self.saved_state.pop(view, None)
+
+    def is_discarded(self, view):
+        return view in self.pending or view.page().lifecycleState() == LifecycleState.Discarded
+
+    def url_for(self, view):
+        """Returns the URL a tab shows, or will show once it is loaded."""
+        if view in self.pending:
+            return self.pending[view]
+        if view in self.saved_state:
+            return self.saved_state[view]["url"]
+        return view.url()
+
+    def title_for(self, view):
+        if view in self.saved_state:
+            return self.saved_state[view]["title"]
+        return view.title()
+
+    def on_current_changed(self, index):
+        view = self.tabs.widget(index)
+        if view not in self.last_shown:
+            return
+        self.last_shown[view] = time.monotonic()
+
+        if view in self.pending:
+            qurl = self.pending.pop(view)
+            history = self.pending_history.pop(view, None)
+            if history:
+                restore_history(view, history)
+            else:
+                view.setUrl(qurl)
+            self.tab_restored.emit(view)
+        elif view.page().lifecycleState() != LifecycleState.Active:
+            # Setting a discarded page back to Active reloads it from its history.
+            view.page().setLifecycleState(LifecycleState.Active)
+            if view in self.saved_state:
+                self.tab_restored.emit(view)
+
+    def on_load_finished(self, view):
+        state = self.saved_state.pop(view, None)
+        if state and state["scroll"]:
+            x, y = state["scroll"]
+            view.page().runJavaScript(f"window.scrollTo({x}, {y});")
+
+    def freeze(self, view):
+        page = view.page()
+        if page.lifecycleState() == LifecycleState.Active and page.recommendedState() != LifecycleState.Active:
+            page.setLifecycleState(LifecycleState.Frozen)
+
+    def discard(self, view):
+        if view is self.tabs.currentWidget() or self.is_discarded(view):
+            return False
+        page = view.page()
+        if page.recentlyAudible():
+            return False
+
+        scroll = page.scrollPosition()
+        self.saved_state[view] = {
+            "url": view.url(),
+            "title": view.title(),
+            "scroll": (int(scroll.x()), int(scroll.y())),
+        }
+        index = self.tabs.indexOf(view)
+        if index != -1:
+            self.tabs.setTabToolTip(index, view.url().toString())
+        page.setLifecycleState(LifecycleState.Discarded)
+        self.tab_discarded.emit(view)
+        return True
+
+    def renderer_memory(self, views):
+        """Returns the total renderer memory and an estimated share for each view."""
+        by_pid = {}
+        for view in views:
+            pid = view.page().renderProcessPid()
+            if pid > 0:
+                by_pid.setdefault(pid, []).append(view)
+
+        total = 0
+        shares = {}
+        for pid, pid_views in by_pid.items():
+            rss = read_rss_bytes(pid)
+            total += rss
+            for view in pid_views:
+                shares[view] = rss // len(pid_views)
+        return total, shares
+
+    def enforce_policy(self):
+        now = time.monotonic()
+        current = self.tabs.currentWidget()
+        live = [view for view in self.last_shown if not self.is_discarded(view)]
+        background = sorted((view for view in live if view is not current), key=self.last_shown.get)
+
+        for view in list(background):
+            idle = now - self.last_shown[view]
+            if idle >= self.discard_after:
+                if self.discard(view):
+                    background.remove(view)
+            elif idle >= self.freeze_after:
+                self.freeze(view)
+
+        while background and len(background) + 1 > self.max_live_tabs:
+            self.discard(background.pop(0))
+
+        total, shares = self.renderer_memory(background + ([current] if current in self.last_shown else []))
+        while background and total > self.memory_budget:
+            view = background.pop(0)
+            if self.discard(view):
+                total -= shares.get(view, 0)
@@ -0,0 +1,184 @@
+from PyQt6.QtCore import Qt, QObject, QTimer
+from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLineEdit, QListWidget, QListWidgetItem
+from PyQt6.QtWebEngineCore import QWebEnginePage, QWebEngineScript
+from tab_index import TabIndex
+
+LifecycleState = QWebEnginePage.LifecycleState
+WORLD = QWebEngineScript.ScriptWorldId.ApplicationWorld.value
+
+# Marks the page as changed once its DOM has been quiet for a moment after a mutation. Runs
+# in its own JavaScript world, so pages cannot see or disturb it.
+MUTATION_SCRIPT = """
+(() => {
+    if (window.__ringzauberText) return;
+    const state = window.__ringzauberText = {dirty: false, timer: null};
+    new MutationObserver(() => {
+        clearTimeout(state.timer);
+        state.timer = setTimeout(() => { state.dirty = true; }, %d);
+    }).observe(document, {childList: true, subtree: true, characterData: true});
+})();
+"""
+# Returns the page text if it changed since it was last read, otherwise null.
+CHANGED_TEXT_SCRIPT = """
+(() => {
+    const state = window.__ringzauberText;
+    if (state && !state.dirty) return null;
+    if (state) state.dirty = false;
+    return document.body ? document.body.innerText.slice(0, %d) : '';
+})()
+"""
+
+
+class TabSearchIndexer(QObject):
+    """
+    Keeps a `TabIndex` of the visible text of every open tab, in every window.
+
+    A tab is indexed when its page finishes loading. Live tabs are then polled every
+    `poll_interval` ms, and a tab's text is only read back when the page's DOM changed since
+    the last read, which an injected MutationObserver tracks with a `debounce_ms` delay.
+    Discarded and closed tabs are dropped from the index.
+    """
+    def __init__(self, core, max_chars=20000, poll_interval=3000, debounce_ms=1000, parent=None):
+        super().__init__(parent)
+        self.core = core
+        self.max_chars = max_chars
+        self.index = TabIndex(max_chars)
+        self.views = {}
+        self.debounce_ms = debounce_ms
+
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(poll_interval)
+        self.poll_timer.timeout.connect(self.poll)
+
+    def start(self):
+        """Starts tracking changes to pages and polling the tabs whose page changed."""
+        script = QWebEngineScript()
+        script.setName("ringzauber-tab-search")
+        script.setSourceCode(MUTATION_SCRIPT % self.debounce_ms)
+        script.setInjectionPoint(QWebEngineScript.InjectionPoint.DocumentReady)
+        script.setWorldId(WORLD)
+        script.setRunsOnSubFrames(False)
+        self.core.profile.scripts().insert(script)
+        self.poll_timer.start()
+
+    def live_views(self):
+        for window in self.core.windows:
+            for index in range(window.tabs.count()):
+                view = window.tabs.widget(index)
+                if not window.tab_lifecycle.is_discarded(view):
+                    yield view
+
+    def update(self, view, text):
+        """Indexes text read from a view; None means it had not changed."""
+        if text is None:
+            return
+        url = view.url()
+        if url.scheme() not in ("http", "https"):
+            self.remove(view)
+            return
+        self.views[id(view)] = view
+        self.index.update(id(view), view.title(), url.toString(), text)
+
+    def remove(self, view):
+        if self.views.pop(id(view), None) is not None:
+            self.index.remove(id(view))
+
+    def poll(self):
+        live = {id(view): view for view in self.live_views()}
+        for key in [key for key in self.views if key not in live]:
+            self.views.pop(key)
+            self.index.remove(key)
+        for view in live.values():
+            if view.url().scheme() not in ("http", "https") or view.page().lifecycleState() != LifecycleState.Active:
+                continue
+            view.page().runJavaScript(CHANGED_TEXT_SCRIPT % self.max_chars, WORLD,
+                                      lambda text, view=view: self.update(view, text))
+
+    def search(self, text, limit=10, snippets=True):
+        """Returns index results for tabs that are still open, each with its view under "view"."""
+        results = []
+        for result in self.index.search(text, limit, snippets):
+            view = self.views.get(result["key"])
+            if view is not None:
+                result["view"] = view
+                results.append(result)
+        return results
+
+    def show_result(self, result):
+        """Brings the result's tab to the front and highlights the match on its page."""
+        view = result["view"]
+        for window in self.core.windows:
+            index = window.tabs.indexOf(view)
+            if index >= 0:
+                window.tabs.setCurrentIndex(index)
+                window.show()
+                window.raise_()
+                window.activateWindow()
+                view.findText(self.index.describe(result)["find"])
+                return True
+        return False
+
+
+class TabSearchDialog(QDialog):
+    """Searches the text of every open tab as the user types; activating a result jumps to it."""
+    def __init__(self, indexer, parent=None):
+        super().__init__(parent)
+        self.indexer = indexer
+        self.results = {}
+        self.setWindowTitle("Search Tabs")
+        self.resize(640, 420)
+
+        layout = QVBoxLayout(self)
+        self.search_bar = QLineEdit()
+        self.search_bar.setPlaceholderText("Search open tabs")
+        layout.addWidget(self.search_bar)
+        self.result_list = QListWidget()
+        self.result_list.setWordWrap(True)
+        layout.addWidget(self.result_list)
+
+        self.search_bar.textChanged.connect(self.refresh)
+        self.search_bar.returnPressed.connect(self.open_first)
+        self.result_list.itemActivated.connect(self.on_item_activated)
+        self.result_list.verticalScrollBar().valueChanged.connect(self.describe_visible)
+
+    def refresh(self):
+        self.result_list.clear()
+        self.results = {}
+        # Snippets cost more than the search itself, so they are only built for rows on screen.
+        for position, result in enumerate(self.indexer.search(self.search_bar.text(), limit=20, snippets=False)):
+            self.results[position] = result
+            item = QListWidgetItem(f"{result['title'] or result['url']}\n{result['url']}")
+            item.setData(Qt.ItemDataRole.UserRole, position)
+            self.result_list.addItem(item)
+        self.describe_visible()
+
+    def describe_visible(self):
+        """Adds snippets to the results scrolled into view that do not have one yet."""
+        self.result_list.doItemsLayout()
+        viewport = self.result_list.viewport().rect()
+        for row in range(self.result_list.count()):
+            item = self.result_list.item(row)
+            result = self.results.get(item.data(Qt.ItemDataRole.UserRole))
+            if result is None or "snippet" in result or not self.result_list.visualItemRect(item).intersects(viewport):
+                continue
+            self.indexer.index.describe(result)
+            item.setText(f"{result['title'] or result['url']}\n{result['url']}\n{result['snippet']}")
+
+    def open_first(self):
+        if self.result_list.count():
+            self.on_item_activated(self.result_list.item(0))
+
+    def on_item_activated(self, item):
+        result = self.results.get(item.data(Qt.ItemDataRole.UserRole))
+        if result is not None and self.indexer.show_result(result):
+            self.hide()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.describe_visible()
+
+    def showEvent(self, event):
+        self.search_bar.selectAll()
+        self.search_bar.setFocus()
+        self.refresh()
+        super().showEvent(event)
@@ -0,0 +1,271 @@
+import os
+import signal
+from PyQt6.QtCore import Qt, QObject, QTimer, pyqtSignal
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QTableWidget, QTableWidgetItem, QAbstractItemView,
+    QHeaderView, QMessageBox
+)
+from PyQt6.QtWebEngineCore import QWebEnginePage
+from process_metrics import ProcessSampler, export_rows
+from download_manager import format_size
+
+LifecycleState = QWebEnginePage.LifecycleState
+# Bytes the page has transferred so far. Cross-origin resources report 0 unless their server
+# sends Timing-Allow-Origin, so this undercounts pages with many third-party resources.
+NETWORK_SCRIPT = """
+(() => {
+    let total = 0;
+    for (const entry of performance.getEntriesByType('navigation').concat(performance.getEntriesByType('resource'))) {
+        total += entry.transferSize || 0;
+    }
+    return total;
+})()
+"""
+
+
+class TabMetrics(QObject):
+    """
+    Maps every tab of every window to its renderer process and samples what it uses.
+
+    Memory and CPU are read from /proc for each renderer and split evenly between the tabs
+    that share it. Sampling only runs while something watches it, such as the task manager,
+    or while the metrics are exported to `export_path` every `export_interval` ms.
+    `updated` is emitted with the rows of each sample.
+    """
+    updated = pyqtSignal(list)
+
+    def __init__(self, core, interval=2000, export_path=None, export_interval=60000, parent=None):
+        super().__init__(parent)
+        self.core = core
+        self.sampler = ProcessSampler()
+        self.rows = []
+        self.network = {}
+        self.watchers = 0
+        self.export_path = export_path
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.sample)
+
+        self.export_timer = QTimer(self)
+        self.export_timer.setInterval(export_interval)
+        self.export_timer.timeout.connect(self.export)
+
+    def start(self):
+        """Starts exporting the metrics, if they are exported."""
+        if self.export_path:
+            self.export_timer.start()
+
+    def watch(self):
+        self.watchers += 1
+        if not self.timer.isActive():
+            self.timer.start()
+            self.sample()
+
+    def unwatch(self):
+        self.watchers = max(0, self.watchers - 1)
+        if self.watchers == 0:
+            self.timer.stop()
+
+    def tabs(self):
+        """Yields (window number, window, tab index, view) for every tab."""
+        for number, window in enumerate(self.core.windows):
+            for index in range(window.tabs.count()):
+                yield number, window, index, window.tabs.widget(index)
+
+    def state_of(self, window, view):
+        if window.tab_lifecycle.is_discarded(view):
+            return "discarded"
+        if view.page().lifecycleState() == LifecycleState.Frozen:
+            return "frozen"
+        return "active"
+
+    def sample(self):
+        tabs = list(self.tabs())
+        views = {view for number, window, index, view in tabs}
+        self.network = {view: size for view, size in self.network.items() if view in views}
+        pids = {}
+        for number, window, index, view in tabs:
+            pid = view.page().renderProcessPid()
+            if pid > 0:
+                pids[pid] = pids.get(pid, 0) + 1
+        processes = self.sampler.sample(pids)
+
+        rows = []
+        for number, window, index, view in tabs:
+            state = self.state_of(window, view)
+            pid = view.page().renderProcessPid() if state != "discarded" else 0
+            process = processes.get(pid)
+            if process is not None and state == "active":
+                view.page().runJavaScript(NETWORK_SCRIPT, lambda size, view=view: self.on_network_size(view, size))
+            rows.append({
+                "window": number,
+                "tab": index,
+                "title": window.tab_lifecycle.title_for(view),
+                "url": window.tab_lifecycle.url_for(view).toString(),
+                "pid": pid,
+                "state": state,
+                "rss_bytes": process["rss_bytes"] // pids[pid] if process else 0,
+                "cpu_percent": round(process["cpu_percent"] / pids[pid], 1) if process else 0.0,
+                "network_bytes": self.network.get(view, 0),
+                "view": view,
+            })
+        self.rows = rows
+        self.updated.emit(rows)
+        return rows
+
+    def on_network_size(self, view, size):
+        if isinstance(size, (int, float)):
+            self.network[view] = int(size)
+
+    def export(self):
+        rows = self.rows if self.timer.isActive() else self.sample()
+        export_rows(self.export_path, [{key: value for key, value in row.items() if key != "view"} for row in rows])
+
+    def window_of(self, view):
+        for window in self.core.windows:
+            if window.tabs.indexOf(view) >= 0:
+                return window
+        return None
+
+    def freeze(self, view):
+        """Freezes a background tab. The current tab of a window keeps running."""
+        window = self.window_of(view)
+        if window is None or view is window.tabs.currentWidget() or window.tab_lifecycle.is_discarded(view):
+            return False
+        view.page().setLifecycleState(LifecycleState.Frozen)
+        return True
+
+    def discard(self, view):
+        window = self.window_of(view)
+        return window is not None and window.tab_lifecycle.discard(view)
+
+    def tabs_sharing_process(self, view):
+        pid = view.page().renderProcessPid()
+        return [other for number, window, index, other in self.tabs() if pid > 0 and other.page().renderProcessPid() == pid]
+
+    def kill(self, view):
+        """Ends a tab's renderer process, which ends every tab that shares it."""
+        pid = view.page().renderProcessPid()
+        if pid <= 0:
+            return False
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError as e:
+            print(f"Error ending renderer process {pid}: {e}")
+            return False
+        return True
+
+
+class MetricItem(QTableWidgetItem):
+    """A table cell that shows formatted text but sorts by a number."""
+    def __init__(self, text, value):
+        super().__init__(text)
+        self.value = value
+
+    def __lt__(self, other):
+        if isinstance(other, MetricItem):
+            return self.value < other.value
+        return super().__lt__(other)
+
+
+class TaskManagerDialog(QDialog):
+    """Lists every tab with what its renderer uses, refreshed while the dialog is open."""
+    COLUMNS = ("Tab", "Process", "Memory", "CPU", "Network", "State")
+
+    def __init__(self, metrics, parent=None):
+        super().__init__(parent)
+        self.metrics = metrics
+        self.views = {}
+        self.setWindowTitle("Task Manager")
+        self.resize(720, 420)
+
+        layout = QVBoxLayout(self)
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(2, Qt.SortOrder.DescendingOrder)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        for label, handler in (("Freeze", self.freeze_selected), ("Discard", self.discard_selected),
+                               ("End Process", self.kill_selected)):
+            button = QPushButton(label)
+            button.clicked.connect(handler)
+            buttons.addWidget(button)
+        layout.addLayout(buttons)
+
+        self.metrics.updated.connect(self.refresh)
+
+    def refresh(self, rows):
+        if not self.isVisible():
+            return
+        selected = self.selected_view()
+        # Sorting while rows are filled in would move them under our feet.
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(rows))
+        self.views = {}
+        for position, row in enumerate(rows):
+            key = id(row["view"])
+            self.views[key] = row["view"]
+            cells = (
+                MetricItem(row["title"] or row["url"], (row["window"], row["tab"])),
+                MetricItem(str(row["pid"]) if row["pid"] else "-", row["pid"]),
+                MetricItem(format_size(row["rss_bytes"]), row["rss_bytes"]),
+                MetricItem(f"{row['cpu_percent']:.1f}%", row["cpu_percent"]),
+                MetricItem(format_size(row["network_bytes"]), row["network_bytes"]),
+                MetricItem(row["state"], row["state"]),
+            )
+            cells[0].setData(Qt.ItemDataRole.UserRole, key)
+            cells[0].setToolTip(row["url"])
+            for column, cell in enumerate(cells):
+                self.table.setItem(position, column, cell)
+        self.table.setSortingEnabled(True)
+        if selected is not None:
+            for position in range(self.table.rowCount()):
+                if self.views.get(self.table.item(position, 0).data(Qt.ItemDataRole.UserRole)) is selected:
+                    self.table.selectRow(position)
+                    break
+
+    def selected_view(self):
+        items = self.table.selectedItems()
+        if not items:
+            return None
+        item = self.table.item(items[0].row(), 0)
+        return self.views.get(item.data(Qt.ItemDataRole.UserRole)) if item is not None else None
+
+    def freeze_selected(self):
+        view = self.selected_view()
+        if view is not None and self.metrics.freeze(view):
+            self.metrics.sample()
+
+    def discard_selected(self):
+        view = self.selected_view()
+        if view is not None and self.metrics.discard(view):
+            self.metrics.sample()
+
+    def kill_selected(self):
+        view = self.selected_view()
+        if view is None:
+            return
+        shared = len(self.metrics.tabs_sharing_process(view))
+        if shared > 1:
+            answer = QMessageBox.question(self, "End Process", f"This process also runs {shared - 1} other tabs. End all of them?")
+            if answer != QMessageBox.StandardButton.Yes:
+                return
+        if self.metrics.kill(view):
+            self.metrics.sample()
+
+    def showEvent(self, event):
+        self.metrics.watch()
+        super().showEvent(event)
+        self.refresh(self.metrics.rows)
+
+    def hideEvent(self, event):
+        self.metrics.unwatch()
+        super().hideEvent(event)
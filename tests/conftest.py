@@ -0,0 +1,28 @@
+import os
+import sys
+import time
+import tempfile
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+# Keeps the runtime files the modules open on import out of the user's data directory.
+os.environ.setdefault("RINGZAUBER_DATA_DIR", tempfile.mkdtemp(prefix="ringzauber-tests-"))
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    """A QApplication for tests that need Qt; they are skipped where PyQt6 is not installed."""
+    widgets = pytest.importorskip("PyQt6.QtWidgets")
+    return widgets.QApplication.instance() or widgets.QApplication([])
+
+
+def wait_until(app, condition, timeout=10.0):
+    """Runs the Qt event loop until `condition()` is true; returns False if `timeout` passes first."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        app.processEvents()
+        time.sleep(0.01)
+    return True
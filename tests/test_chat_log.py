@@ -0,0 +1,111 @@
+import random
+import pytest
+from chat_log import HeightIndex, ChatLog, LayoutCache
+
+
+def reference_find(heights, offset):
+    """The first row that ends past `offset`, clamped to the last row, by walking the list."""
+    if not heights:
+        return -1
+    end = 0
+    for row, height in enumerate(heights):
+        end += height
+        if end > offset:
+            return row
+    return len(heights) - 1
+
+
+def assert_matches(index, heights):
+    assert index.heights == heights
+    assert len(index) == len(heights)
+    for row in range(len(heights) + 1):
+        assert index.offset(row) == sum(heights[:row]), row
+    assert index.total() == sum(heights)
+    for offset in range(sum(heights) + 3):
+        assert index.find(offset) == reference_find(heights, offset), offset
+
+
+def test_empty_index():
+    index = HeightIndex()
+    assert index.find(0) == -1 and index.total() == 0 and index.offset(0) == 0
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_index_matches_a_plain_list(seed):
+    rng = random.Random(seed)
+    index = HeightIndex()
+    heights = []
+    for _ in range(rng.randint(1, 40)):
+        # Zero-height rows contain no offset, so find has to step over them.
+        height = rng.choice([0, 0, 1, 5, 18, 40])
+        index.append(height)
+        heights.append(height)
+        assert_matches(index, heights)
+
+    for _ in range(30):
+        row = rng.randrange(len(heights))
+        heights[row] = rng.choice([0, 3, 18, 100])
+        index.set(row, heights[row])
+        assert_matches(index, heights)
+
+    heights = [rng.choice([0, 7, 24]) for _ in range(rng.randint(0, 33))]
+    index.rebuild(iter(heights))
+    assert_matches(index, heights)
+    index.append(9)
+    assert_matches(index, heights + [9])
+
+
+def test_find_skips_zero_height_rows():
+    index = HeightIndex()
+    index.rebuild([0, 0, 10, 0, 5, 0])
+    assert [index.find(offset) for offset in (0, 9, 10, 14, 15, 100)] == [2, 2, 4, 4, 5, 5]
+
+
+@pytest.mark.parametrize("length", [1, 23, 24, 100, 1000, 50000])
+def test_reveal_finishes_within_the_frame_budget(length):
+    log = ChatLog(reveal_frames=6, min_step=24)
+    index = log.add("praterich", "x" * length)
+    frames = 0
+    while log.revealing:
+        assert log.reveal() == [index]
+        frames += 1
+    assert frames <= log.reveal_frames
+    assert log.visible_text(index) == "x" * length
+    assert log.reveal() == []
+
+
+def test_appended_text_gets_a_fresh_budget():
+    log = ChatLog(reveal_frames=4, min_step=1)
+    index = log.add("praterich", "a" * 400, open=True)
+    log.reveal()
+    log.reveal()
+    log.append(index, "b" * 4000)
+    frames = 0
+    while log.revealing:
+        log.reveal()
+        frames += 1
+    assert frames <= log.reveal_frames
+    log.close(index)
+    assert log.is_settled(index)
+
+
+def test_heights_are_estimated_from_the_width():
+    log = ChatLog(char_width=10, line_height=20, padding=4)
+    log.width = 100
+    log.add("user", "x" * 25)
+    log.add("user", "short\n\nlines")
+    assert log.heights.heights == [24, 24]
+    log.reveal_all()
+    log.set_metrics(100)
+    assert log.heights.heights == [3 * 20 + 4, 3 * 20 + 4]
+    log.set_metrics(50, char_width=5)
+    assert log.heights[0] == 3 * 20 + 4
+
+
+def test_layout_cache_drops_the_least_recently_used():
+    cache = LayoutCache(capacity=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None and len(cache) == 2
@@ -0,0 +1,45 @@
+import json
+import pytest
+from praterich_ai import CommandStreamParser
+
+
+def stream(text, size=1):
+    parser = CommandStreamParser()
+    seen = []
+    for start in range(0, len(text), size):
+        parser.feed(text[start:start + size])
+        seen.append(parser.take_actions())
+    return parser, seen
+
+
+def test_nested_actions_are_taken_as_each_completes():
+    response = json.dumps({"command": "BATCH", "query": "", "message": "Opening {both}.", "actions": [
+        {"command": "NAVIGATE", "query": "https://a.example/?q={x}", "options": {"tab": {"new": True}, "tags": ["}", "{"]}},
+        {"command": "SEARCH", "query": "quoted \" brace }"},
+    ]})
+    parser, seen = stream(response)
+    taken = [action for actions in seen for action in actions]
+    assert taken == [
+        {"command": "NAVIGATE", "query": "https://a.example/?q={x}"},
+        {"command": "SEARCH", "query": "quoted \" brace }"},
+    ]
+    # The first action is available before the second has arrived.
+    first_seen = next(index for index, actions in enumerate(seen) if actions)
+    assert first_seen < response.index('"SEARCH"')
+    assert parser.result()["message"] == "Opening {both}."
+    assert parser.result()["actions"] == taken
+
+
+@pytest.mark.parametrize("size", [1, 7, 1000])
+def test_actions_without_a_command_are_skipped(size):
+    response = '{"command": "BATCH", "query": "", "actions": [{"note": {"a": 1}}, {"command": "NEW_TAB", "query": 2}]}'
+    parser, seen = stream(response, size)
+    assert [action for actions in seen for action in actions] == [{"command": "NEW_TAB", "query": "2"}]
+
+
+def test_malformed_actions_are_an_error():
+    parser, seen = stream('{"command": "BATCH", "query": "", "actions": ["oops", {"command": "SEARCH", "query": "x"}]}')
+    assert parser.actions_malformed
+    assert not any(seen)
+    with pytest.raises(ValueError):
+        parser.result()
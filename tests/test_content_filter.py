@@ -0,0 +1,128 @@
+import os
+import pytest
+import content_filter
+from content_filter import FilterMatcher, parse_rule, load_matcher
+
+RULES = """! A comment
+[Adblock Plus 2.0]
+||ads.example^
+||tracker.example^$third-party
+/banner-*-ad.
+|https://exact.example/pixel.gif|
+&campaign=
+@@||ads.example/allowed/$script
+@@||trusted.example^$document
+||cdn.example/lib.js$domain=news.example|~shop.news.example
+##.ad-slot
+news.example##.sponsored
+news.example#@#.sponsored
+||popups.example^$popup
+||csp.example^$csp=script-src 'none'
+"""
+
+
+@pytest.fixture
+def matcher():
+    return FilterMatcher.compile(RULES.splitlines())
+
+
+def test_domain_anchor_matches_the_host_and_its_subdomains(matcher):
+    assert matcher.match("https://ads.example/banner.js", "news.example", "script") == "||ads.example^"
+    assert matcher.match("https://cdn.ads.example/x.png", "news.example", "image") == "||ads.example^"
+    assert matcher.match("https://badads.example/x.png", "news.example", "image") is None
+    assert matcher.match("https://news.example/?ref=ads.example", "news.example", "other") is None
+
+
+def test_third_party_option(matcher):
+    assert matcher.match("https://tracker.example/t.js", "news.example", "script") == "||tracker.example^$third-party"
+    assert matcher.match("https://www.tracker.example/t.js", "tracker.example", "script") is None
+
+
+def test_domain_option_limits_the_first_party(matcher):
+    rule = "||cdn.example/lib.js$domain=news.example|~shop.news.example"
+    assert matcher.match("https://cdn.example/lib.js", "news.example", "script") == rule
+    assert matcher.match("https://cdn.example/lib.js", "www.news.example", "script") == rule
+    assert matcher.match("https://cdn.example/lib.js", "shop.news.example", "script") is None
+    assert matcher.match("https://cdn.example/lib.js", "other.example", "script") is None
+
+
+def test_exceptions_and_document_allow_lists(matcher):
+    assert matcher.match("https://ads.example/allowed/a.js", "news.example", "script") is None
+    assert matcher.match("https://ads.example/allowed/a.png", "news.example", "image") == "||ads.example^"
+    # Nothing is blocked on a page of an allow-listed site.
+    assert matcher.match("https://ads.example/banner.js", "trusted.example", "script") is None
+    assert matcher.match("https://ads.example/banner.js", "www.trusted.example", "script") is None
+
+
+def test_wildcards_and_both_end_anchors(matcher):
+    assert matcher.match("https://img.example/banner-300-ad.png", "news.example", "image") == "/banner-*-ad."
+    assert matcher.match("https://exact.example/pixel.gif", "news.example", "image") == "|https://exact.example/pixel.gif|"
+    assert matcher.match("https://exact.example/pixel.gif?x=1", "news.example", "image") is None
+    assert matcher.match("https://shop.example/?id=1&campaign=spring", "news.example", "other") == "&campaign="
+
+
+def test_cosmetic_and_unsupported_rules_are_skipped(matcher):
+    for line in ("##.ad-slot", "news.example##.sponsored", "news.example#@#.sponsored",
+                 "||popups.example^$popup", "||csp.example^$csp=script-src 'none'", "! A comment", "", "$script"):
+        assert parse_rule(line) is None, line
+    assert matcher.match("https://popups.example/", "news.example", "subdocument") is None
+    assert matcher.rule_count == 8
+
+
+def test_parse_rule_reads_types_and_plain_domains():
+    rule, exception, domain, tokens = parse_rule("||ads.example^")
+    assert (exception, domain, tokens) == (False, "ads.example", [])
+    rule, exception, domain, tokens = parse_rule("@@/ads/banner-$image,~third-party")
+    assert exception and domain is None
+    assert rule[content_filter.TYPES] == content_filter.RESOURCE_TYPES["image"]
+    assert rule[content_filter.PARTY] is False
+    assert tokens == ["ads", "banner"]
+
+
+def write_list(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def test_cache_is_reused_until_a_list_changes(tmp_path, monkeypatch):
+    list_path = str(tmp_path / "list.txt")
+    cache_path = str(tmp_path / "filters.cache")
+    write_list(list_path, "||one.example^\n")
+    first = load_matcher([list_path], cache_path)
+    assert os.path.exists(cache_path)
+
+    compiled = []
+    compile_lines = FilterMatcher.compile.__func__
+    monkeypatch.setattr(FilterMatcher, "compile",
+                        classmethod(lambda cls, lines: compiled.append(1) or compile_lines(cls, lines)))
+    cached = load_matcher([list_path], cache_path)
+    assert compiled == []
+    assert cached.state() == first.state()
+    assert cached.match("https://one.example/a.js", "news.example", "script") == "||one.example^"
+
+    # The same size but a newer modification time.
+    write_list(list_path, "||two.example^\n")
+    stat = os.stat(list_path)
+    os.utime(list_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    rebuilt = load_matcher([list_path], cache_path)
+    assert compiled == [1]
+    assert rebuilt.match("https://two.example/a.js", "news.example", "script") == "||two.example^"
+    assert rebuilt.match("https://one.example/a.js", "news.example", "script") is None
+
+    # A different size, with the modification time put back.
+    write_list(list_path, "||two.example^\n||three.example^\n")
+    os.utime(list_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    rebuilt = load_matcher([list_path], cache_path)
+    assert compiled == [1, 1]
+    assert rebuilt.match("https://three.example/a.js", "news.example", "script") == "||three.example^"
+
+
+def test_unreadable_cache_is_rebuilt(tmp_path):
+    list_path = str(tmp_path / "list.txt")
+    cache_path = str(tmp_path / "filters.cache")
+    write_list(list_path, "||one.example^\n")
+    with open(cache_path, 'wb') as f:
+        f.write(b"not marshal data")
+    matcher = load_matcher([list_path], cache_path)
+    assert matcher.match("https://one.example/", "news.example", "other") == "||one.example^"
+    assert load_matcher([list_path], cache_path).rule_count == 1
@@ -0,0 +1,94 @@
+import pytest
+
+pytest.importorskip("PyQt6.QtWebEngineCore")
+
+from download_manager import DownloadManager, DownloadsDialog, SimulatedDownload, DownloadState, run_benchmark
+
+
+@pytest.fixture
+def manager(qapp, tmp_path):
+    manager = DownloadManager(str(tmp_path / "downloads.json"), max_active=2)
+    manager.refresh_timer.stop()
+    yield manager
+    manager.save_timer.stop()
+
+
+def test_downloads_beyond_the_limit_wait_their_turn(manager):
+    downloads = [SimulatedDownload(number, 1000) for number in (1, 2, 3)]
+    for download in downloads:
+        manager.add(download)
+    assert manager.active == {1, 2}
+    assert downloads[2].isPaused() and list(manager.waiting) == [3]
+    manager.flush_changes()
+    assert manager.records[3]["state"] == "Queued"
+
+    downloads[0].advance(1000)
+    assert manager.active == {2, 3}
+    assert not downloads[2].isPaused()
+    manager.flush_changes()
+    assert manager.records[1]["state"] == "Completed"
+    assert manager.records[3]["state"] == "Downloading"
+
+
+def test_changed_carries_only_the_downloads_that_moved(manager):
+    downloads = [SimulatedDownload(number, 1000) for number in (1, 2)]
+    for download in downloads:
+        manager.add(download)
+    emitted = []
+    manager.changed.connect(emitted.append)
+    manager.flush_changes()
+    downloads[1].advance(10)
+    manager.flush_changes()
+    manager.flush_changes()
+    assert emitted == [{1, 2}, {2}]
+    assert manager.records[2]["received"] == 10
+
+    downloads[0].advance(1000)
+    manager.flush_changes()
+    manager.clear_finished()
+    assert emitted[-1] is None and 1 not in manager.records
+
+
+def test_dialog_redraws_only_changed_rows(manager, monkeypatch):
+    manager.max_active = 10
+    downloads = [SimulatedDownload(number, 1000) for number in range(1, 11)]
+    for download in downloads:
+        manager.add(download)
+    dialog = DownloadsDialog(manager)
+    dialog.show()
+    manager.flush_changes()
+    assert dialog.list_widget.count() == 10
+
+    described = []
+    describe = dialog.describe
+    monkeypatch.setattr(dialog, "describe", lambda record: described.append(record["id"]) or describe(record))
+    downloads[4].advance(512)
+    manager.flush_changes()
+    assert described == [5]
+    assert "512 B of 1000 B (51%)" in dialog.items[5].text()
+
+    downloads[0].advance(1000)
+    manager.flush_changes()
+    manager.clear_finished()
+    assert dialog.list_widget.count() == 9 and 1 not in dialog.items
+    dialog.close()
+
+
+def test_unfinished_downloads_are_restored_as_interrupted(manager, tmp_path):
+    downloads = [SimulatedDownload(number, 1000) for number in (1, 2)]
+    for download in downloads:
+        manager.add(download)
+    downloads[0].set_state(DownloadState.DownloadCompleted)
+    manager.flush_changes()
+    manager.save()
+
+    restored = DownloadManager(manager.path)
+    restored.refresh_timer.stop()
+    assert sorted(record["state"] for record in restored.records.values()) == ["Completed", "Interrupted"]
+    assert all(download_id < 0 for download_id in restored.records)
+
+
+def test_benchmark_runs_hundreds_of_downloads(qapp):
+    report = run_benchmark(downloads=200, ticks=3)
+    assert report["rows"] == 200
+    assert report["few_changed_tick_p50_ms"] is not None and report["all_changed_tick_p50_ms"] is not None
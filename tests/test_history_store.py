@@ -0,0 +1,65 @@
+import pytest
+from history_store import HistoryStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.sqlite3"), exact_limit=50)
+    yield store
+    store.close()
+
+
+def fill(store, pages):
+    for url, title, text in pages:
+        store.record_page_text(url, title, text)
+    store.flush(timeout=None)
+    store.count_words()
+
+
+def test_ranks_every_match_not_only_the_newest(store):
+    # The best page was added first, behind more matches than the old 200 ranked candidates.
+    pages = [("https://old.example/", "Zeppelin", "Zeppelin airships and their history.")]
+    pages += [(f"https://new.example/{index}", f"Page {index}", "filler " * 100 + "zeppelin") for index in range(250)]
+    fill(store, pages)
+    store.exact_limit = 10
+    store.count_words()
+    assert "zeppelin" in store.common_words
+    # A common word alone still returns its matches.
+    assert len(store.search("zeppelin", limit=5)) == 5
+
+    store.exact_limit = 300
+    store.count_words()
+    rows = store.search("zeppelin", limit=5)
+    assert rows[0]["url"] == "https://old.example/"
+    assert "[Zeppelin]" in rows[0]["snippet"]
+
+
+def test_common_words_filter_but_do_not_score(store):
+    pages = [(f"https://news.example/{index}", "News", f"news of the day number {index}") for index in range(80)]
+    pages.append(("https://news.example/quasar", "News", "news about a quasar"))
+    pages.append(("https://space.example/quasar", "Quasar", "a quasar without the other word"))
+    fill(store, pages)
+    assert "news" in store.common_words
+    assert store.scoring_terms(["news", "quasar"]) == ['"quasar"*']
+
+    rows = store.search("news quasar")
+    assert [row["url"] for row in rows] == ["https://news.example/quasar"]
+    assert len(store.search("news", limit=10)) == 10
+
+
+def test_prefix_of_last_word_matches(store):
+    fill(store, [("https://a.example/", "Pelican", "pelicans fly low over the water")])
+    assert [row["url"] for row in store.search("pelic")] == ["https://a.example/"]
+    assert store.search("albatross") == []
+
+
+def test_visits_recorded_before_start_are_kept(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    store = HistoryStore(path, start=False)
+    store.record_page_text("https://early.example/", "Early", "recorded before the first paint")
+    assert store.search("early") == []
+    store.close()
+
+    reopened = HistoryStore(path)
+    assert [row["url"] for row in reopened.search("early")] == ["https://early.example/"]
+    reopened.close()
@@ -0,0 +1,81 @@
+import os
+import socket
+import threading
+import pytest
+from conftest import wait_until
+
+pytest.importorskip("PyQt6.QtWebEngineCore")
+
+from PyQt6.QtNetwork import QLocalServer
+from browser_core import InstanceServer, send_to_running_instance, instance_socket_is_stale
+
+
+@pytest.fixture
+def name():
+    return f"ringzauber-test-{os.getpid()}-{threading.get_ident()}"
+
+
+def socket_path(name):
+    """Where QLocalServer puts the socket for `name` on this platform."""
+    server = QLocalServer()
+    assert server.listen(name)
+    path = server.fullServerName()
+    server.close()
+    return path
+
+
+def send_in_background(app, message, name):
+    """Sends from a thread, as a second process would, while this one runs the event loop."""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(send_to_running_instance(message, name=name)))
+    thread.start()
+    assert wait_until(app, lambda: result)
+    thread.join()
+    return result[0]
+
+
+def test_launch_message_is_handed_to_the_running_instance(qapp, name):
+    server = InstanceServer(name=name)
+    received = []
+    server.message_received.connect(received.append)
+    message = {"urls": ["https://example.com/"], "query": None}
+    assert send_in_background(qapp, message, name)
+    assert wait_until(qapp, lambda: received)
+    assert received == [message]
+    server.server.close()
+    assert not send_to_running_instance(message, timeout_ms=200, name=name)
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs a socket file to leave behind")
+def test_stale_socket_is_taken_over(qapp, name):
+    path = socket_path(name)
+    # A socket file nothing listens on, as a crashed instance leaves.
+    stale = socket.socket(socket.AF_UNIX)
+    stale.bind(path)
+    stale.close()
+    assert instance_socket_is_stale(name)
+
+    server = InstanceServer(name=name)
+    assert server.server.isListening()
+    received = []
+    server.message_received.connect(received.append)
+    assert send_in_background(qapp, {"urls": [], "query": "hello"}, name)
+    assert wait_until(qapp, lambda: received)
+    server.server.close()
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs a socket file to leave behind")
+def test_busy_instance_is_not_taken_over(qapp, name):
+    path = socket_path(name)
+    # Listening, but never accepting or acknowledging: a live instance that is busy.
+    busy = socket.socket(socket.AF_UNIX)
+    busy.bind(path)
+    busy.listen(8)
+    try:
+        assert not instance_socket_is_stale(name)
+        server = InstanceServer(name=name)
+        assert not server.server.isListening()
+        assert os.path.exists(path)
+    finally:
+        busy.close()
+        os.unlink(path)
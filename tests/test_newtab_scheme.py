@@ -0,0 +1,89 @@
+import os
+import sys
+import json
+import subprocess
+import pytest
+
+pytest.importorskip("PyQt6.QtWebEngineCore")
+
+from PyQt6.QtCore import QObject, QUrl
+from PyQt6.QtWebEngineCore import QWebEngineUrlRequestJob
+from newtab_scheme import NewTabSchemeHandler, render_shortcuts, NEW_TAB_URL
+
+
+class FakeJob(QObject):
+    """Stands in for a QWebEngineUrlRequestJob, which only WebEngine can create."""
+    def __init__(self, url):
+        super().__init__()
+        self.url = QUrl(url)
+        self.error = None
+        self.mime = None
+        self.body = None
+
+    def requestUrl(self):
+        return self.url
+
+    def fail(self, error):
+        self.error = error
+
+    def reply(self, mime, device):
+        self.mime = mime
+        self.body = bytes(device.readAll())
+
+
+@pytest.fixture
+def handler(qapp):
+    return NewTabSchemeHandler()
+
+
+def test_shortcuts_are_escaped():
+    markup = render_shortcuts([{"url": "https://a.example/?q=<b>", "title": "<script>"}], [])
+    assert "<script>" not in markup
+    assert "&lt;script&gt;" in markup
+    assert "Recently closed" not in markup
+
+
+def test_page_is_served_from_the_latest_snapshot(handler):
+    handler.set_snapshot([{"url": "https://top.example/", "title": "Top"}],
+                         [{"url": "https://closed.example/", "title": "Closed"}])
+    job = FakeJob(NEW_TAB_URL)
+    handler.requestStarted(job)
+    assert job.error is None
+    assert job.mime == b"text/html"
+    assert b"https://top.example/" in job.body and b"https://closed.example/" in job.body
+
+    page = handler.page
+    handler.set_snapshot([{"url": "https://top.example/", "title": "Top"}],
+                         [{"url": "https://closed.example/", "title": "Closed"}])
+    assert handler.page is page
+
+
+def test_unknown_paths_and_hosts_fail(handler):
+    for url in ("ringzauber://newtab/missing.png", "ringzauber://elsewhere/"):
+        job = FakeJob(url)
+        handler.requestStarted(job)
+        assert job.error == QWebEngineUrlRequestJob.Error.UrlNotFound
+        assert job.body is None
+
+
+def test_assets_are_built_once(handler):
+    calls = []
+    handler.builders["/test.bin"] = (b"application/octet-stream", lambda: calls.append(1) or b"data")
+    for _ in range(3):
+        job = FakeJob("ringzauber://newtab/test.bin")
+        handler.requestStarted(job)
+        assert job.body == b"data"
+    assert calls == [1]
+
+
+def test_first_paint_is_within_budget():
+    # The scheme has to be registered before any QApplication exists, so the page is loaded
+    # in a process of its own rather than under this session's qapp.
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "newtab_scheme.py")
+    finished = subprocess.run([sys.executable, script, "50"], capture_output=True, text=True, timeout=300,
+                              env=dict(os.environ, QT_QPA_PLATFORM="offscreen"))
+    assert finished.stdout, finished.stderr
+    result = json.loads(finished.stdout[finished.stdout.index("{"):])
+    assert result["runs"] == 20 and result["budget_ms"] == 50.0
+    assert result["within_budget"], f"first paint p50 {result['first_paint_p50_ms']:.1f} ms"
+    assert finished.returncode == 0
@@ -0,0 +1,105 @@
+import time
+import asyncio
+import threading
+import pytest
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from oodles_crawler import OodlesCrawler
+
+PARAGRAPH = "<p>{} is a page of this little test site, with enough words in it to be read as content.</p>"
+
+SITE = {
+    "index.html": '<html><head><title>Home</title></head><body>{}'
+                  '<a href="a.html">A</a> <a href="b.html#top">B</a> <a href="copy.html">Copy</a>'
+                  '<a href="private/secret.html">Secret</a> <a href="http://elsewhere.invalid/">Away</a>'
+                  '</body></html>'.format(PARAGRAPH.format("Home")),
+    "a.html": "<html><head><title>A</title></head><body>{}<a href='deep.html'>Deeper</a></body></html>".format(PARAGRAPH.format("A")),
+    "b.html": "<html><head><title>B</title></head><body>{}</body></html>".format(PARAGRAPH.format("B")),
+    # The same text as a.html under another URL.
+    "copy.html": "<html><head><title>A</title></head><body>{}<a href='deep.html'>Deeper</a></body></html>".format(PARAGRAPH.format("A")),
+    "deep.html": "<html><head><title>Deep</title></head><body>{}<a href='deeper.html'>Deeper</a></body></html>".format(PARAGRAPH.format("Deep")),
+    "deeper.html": "<html><head><title>Deeper</title></head><body>{}</body></html>".format(PARAGRAPH.format("Deeper")),
+    "private/secret.html": "<html><body>{}</body></html>".format(PARAGRAPH.format("Secret")),
+    "robots.txt": "User-agent: *\nDisallow: /private/\n",
+}
+
+
+class SiteHandler(SimpleHTTPRequestHandler):
+    delay = 0.0
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        try:
+            time.sleep(cls.delay)
+            super().do_GET()
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def site(tmp_path):
+    for name, content in SITE.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    handler = type("Handler", (SiteHandler,), {"active": 0, "peak": 0, "lock": threading.Lock()})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), lambda *args: handler(*args, directory=str(tmp_path)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", handler
+    server.shutdown()
+    server.server_close()
+
+
+def crawl(crawler, url):
+    return asyncio.run(crawler.crawl(url))
+
+
+def test_crawls_the_site_within_its_depth_budget(site):
+    base, handler = site
+    pages = crawl(OodlesCrawler(max_depth=2, summarize=lambda text: None), f"{base}/index.html")
+    titles = sorted(page["title"] for page in pages)
+    # copy.html repeats a.html, private/ is disallowed by robots.txt and deeper.html is three links away.
+    assert titles == ["A", "B", "Deep", "Home"]
+    assert all(page["url"].startswith(base) for page in pages)
+
+
+def test_stops_at_max_pages(site):
+    base, handler = site
+    pages = crawl(OodlesCrawler(max_pages=2, max_depth=3, summarize=lambda text: None), f"{base}/index.html")
+    assert len(pages) == 2
+
+
+def test_fetches_at_most_per_host_pages_at_once(site):
+    base, handler = site
+    handler.delay = 0.1
+    crawl(OodlesCrawler(max_depth=3, concurrency=8, per_host=2, summarize=lambda text: None), f"{base}/index.html")
+    assert handler.peak <= 2
+
+
+def test_summarises_chunks_in_parallel_then_merges_them(site):
+    base, handler = site
+    prompts = []
+
+    async def summarize(prompt):
+        prompts.append(prompt)
+        await asyncio.sleep(0)
+        return f"summary {len(prompts)}"
+
+    progress = []
+    crawler = OodlesCrawler(max_depth=2, chunk_chars=200, summarize=summarize, progress=progress.append)
+    summary = asyncio.run(crawler.run(f"{base}/index.html"))
+
+    assert len(prompts) > 2
+    assert "Combine them into one summary" in prompts[-1]
+    assert summary == f"summary {len(prompts)}"
+    assert any("summarised" in message for message in progress)
@@ -0,0 +1,89 @@
+import os
+import json
+import pytest
+from page_context import (
+    extract_page_context, chunk_blocks, split_sentences, split_text, build_page_prompt, estimate_tokens, run_benchmark
+)
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "pages")
+PAGES = sorted(name[:-5] for name in os.listdir(FIXTURE_DIR) if name.endswith(".html"))
+
+
+def load_page(name):
+    with open(os.path.join(FIXTURE_DIR, f"{name}.html"), encoding="utf-8") as f:
+        html = f.read()
+    with open(os.path.join(FIXTURE_DIR, f"{name}.json"), encoding="utf-8") as f:
+        expected = json.load(f)
+    return extract_page_context(html, f"https://example.com/{name}"), expected
+
+
+@pytest.mark.parametrize("name", PAGES)
+def test_fixture_pages(name):
+    context, expected = load_page(name)
+    assert context["title"] == expected["title"]
+    assert context["outline"] == expected["outline"]
+    chunks = chunk_blocks(context["blocks"], expected["chunk_tokens"])
+    assert chunks == expected["chunks"]
+    for chunk in chunks:
+        assert estimate_tokens(chunk) <= expected["chunk_tokens"]
+        lines = chunk.split("\n")
+        # A heading never ends a chunk and never appears twice in one.
+        assert lines[-1] not in context["outline"]
+        assert len(set(lines)) == len(lines)
+
+
+@pytest.mark.parametrize("name", PAGES)
+def test_fixture_pages_drop_furniture(name):
+    context, _ = load_page(name)
+    text = "\n".join(block["text"] for block in context["blocks"])
+    for furniture in ("cookies", "Copyright", "Related", "Share on social", "Docs / Guides", "Configure"):
+        assert furniture not in text
+
+
+def test_sentences_do_not_break_after_abbreviations():
+    text = "Dr. Smith met Mr. Jones at 3 p.m. on Jan. 5. They discussed e.g. the budget! Was it \"enough?\" Nobody knew."
+    assert split_sentences(text) == [
+        "Dr. Smith met Mr. Jones at 3 p.m. on Jan. 5.",
+        "They discussed e.g. the budget!",
+        "Was it \"enough?\"",
+        "Nobody knew.",
+    ]
+
+
+def test_only_overlong_sentences_are_cut_between_words():
+    long_sentence = "Long " + " ".join(["word"] * 100) + "."
+    pieces = split_text(f"Short one. {long_sentence} Short two.", 20)
+    assert pieces[0] == "Short one." and pieces[-1] == "Short two."
+    assert all(estimate_tokens(piece) <= 20 for piece in pieces)
+    assert " ".join(pieces[1:-1]) == long_sentence
+
+
+def test_blocks_are_split_only_between_sentences():
+    sentences = [f"Sentence number {index} is here." for index in range(30)]
+    blocks = [{"kind": "h2", "text": "Section"}, {"kind": "p", "text": " ".join(sentences)}]
+    chunks = chunk_blocks(blocks, 60)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        heading, text = chunk.split("\n")
+        assert heading == "Section"
+        assert set(split_sentences(text)) <= set(sentences)
+    assert " ".join(chunk.split("\n")[1] for chunk in chunks) == " ".join(sentences)
+
+
+def test_prompt_gives_a_carried_heading_once():
+    context, expected = load_page("article")
+    prompt = build_page_prompt(context, "Who flew the Graf Zeppelin?", max_tokens=2000, chunk_tokens=80)
+    content = prompt.split("Content:\n", 1)[1]
+    assert content.count("The early years") == 1
+    assert "LZ 127" in content and "Hindenburg" in content
+
+
+def test_benchmark_reads_the_fixtures():
+    report = run_benchmark(FIXTURE_DIR)
+    assert report["pages"] == len(PAGES)
+    assert report["mean_content_tokens"] < report["mean_visible_text_tokens"]
+    # Each fixture has a .txt reference of its main content.
+    assert all("content_precision" in entry for entry in report["results"])
+    assert report["mean_content_precision"] >= 0.95
+    assert report["mean_content_precision"] > report["mean_visible_text_precision"]
+    assert report["mean_content_recall"] >= 0.95
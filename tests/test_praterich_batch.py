@@ -0,0 +1,118 @@
+import pytest
+from conftest import wait_until
+
+pytest.importorskip("PyQt6.QtWidgets")
+
+from PyQt6.QtCore import pyqtSignal
+from PyQt6.QtWidgets import QTabWidget, QWidget
+from praterich_batch import ActionBatch
+
+
+class StubView(QWidget):
+    loadFinished = pyqtSignal(bool)
+
+    def __init__(self, url):
+        super().__init__()
+        self.url = url
+
+
+class StubTracer:
+    def record(self, trace_id, name, started):
+        pass
+
+
+class StubBrowser:
+    """Just enough of the browser for a batch: tabs, a tracer and the actions it performs."""
+
+    def __init__(self):
+        self.tabs = QTabWidget()
+        self.tracer = StubTracer()
+        self.performed = []
+        self.open_tab("home")
+
+    def open_tab(self, url):
+        view = StubView(url)
+        self.tabs.setCurrentIndex(self.tabs.addTab(view, url))
+        return view
+
+    def perform_praterich_action(self, action):
+        command, query = action["command"], action["query"]
+        self.performed.append((command, query, self.tabs.currentWidget().url))
+        if command == "NAVIGATE":
+            self.open_tab(query)
+        elif command == "NEW_TAB":
+            for _ in range(int(query or 1)):
+                self.open_tab("newtab")
+
+
+@pytest.fixture
+def browser(qapp):
+    return StubBrowser()
+
+
+def finished(batch):
+    done = []
+    batch.finished.connect(lambda: done.append(True))
+    return done
+
+
+def test_page_command_waits_for_the_load_it_depends_on(browser):
+    batch = ActionBatch(browser)
+    done = finished(batch)
+    batch.add([{"command": "NAVIGATE", "query": "a"}, {"command": "FIND_ON_PAGE", "query": "x"}])
+    batch.close()
+    assert [step[0] for step in browser.performed] == ["NAVIGATE"]
+    assert batch.load_timer.isActive() and not done
+
+    view = browser.tabs.currentWidget()
+    view.loadFinished.emit(True)
+    assert browser.performed[-1] == ("FIND_ON_PAGE", "x", "a")
+    assert done and not batch.load_timer.isActive()
+    assert not batch.loading
+
+
+def test_actions_that_do_not_need_the_page_run_straight_away(browser):
+    batch = ActionBatch(browser)
+    done = finished(batch)
+    batch.add([{"command": "NAVIGATE", "query": "a"}, {"command": "NAVIGATE", "query": "b"}])
+    batch.close()
+    assert [step[1] for step in browser.performed] == ["a", "b"]
+    assert done and len(batch.loading) == 2
+
+
+def test_a_load_that_never_finishes_times_out(qapp, browser):
+    assert ActionBatch(browser).load_timer.interval() == 15000
+    batch = ActionBatch(browser, load_timeout=50)
+    done = finished(batch)
+    batch.add([{"command": "NAVIGATE", "query": "a"}, {"command": "EDIT_PAGE", "query": "x"}])
+    batch.close()
+    assert not done
+    assert wait_until(qapp, lambda: done, timeout=5.0)
+    assert browser.performed[-1] == ("EDIT_PAGE", "x", "a")
+
+
+def test_every_tab_new_tab_opens_can_be_switched_to(browser):
+    batch = ActionBatch(browser)
+    batch.add([
+        {"command": "NEW_TAB", "query": "3"},
+        {"command": "NAVIGATE", "query": "a"},
+        {"command": "SWITCH_TAB", "query": "opened:2"},
+    ])
+    assert len(batch.opened) == 4
+    assert browser.tabs.currentWidget() is batch.opened[1]
+    assert batch.opened[3].url == "a"
+
+    batch.add([{"command": "SWITCH_TAB", "query": "opened:4"}])
+    assert browser.tabs.currentWidget().url == "a"
+    # Switches to opened tabs are handled by the batch, never by the browser.
+    assert [step[0] for step in browser.performed] == ["NEW_TAB", "NAVIGATE"]
+
+
+def test_switch_to_a_tab_the_batch_did_not_open_is_skipped(browser, capsys):
+    batch = ActionBatch(browser)
+    done = finished(batch)
+    batch.add([{"command": "NEW_TAB", "query": ""}, {"command": "SWITCH_TAB", "query": "opened:5"}])
+    batch.close()
+    assert done and len(batch.opened) == 1
+    assert browser.tabs.currentWidget() is batch.opened[0]
+    assert "opened tab 5, but it opened 1" in capsys.readouterr().out
@@ -0,0 +1,66 @@
+import sqlite3
+import praterich_cache
+from praterich_cache import ResponseCache, make_cache_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def test_keys_ignore_case_spacing_and_trailing_punctuation():
+    assert make_cache_key("  Go   Back! ", "instruction", "model") == make_cache_key("go back", "instruction", "model")
+    assert make_cache_key("go back", "instruction", "model") != make_cache_key("go back", "instruction", "other")
+
+
+def test_entries_survive_a_restart_through_the_disk_tier(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    ResponseCache(path).put("key", {"command": "RELOAD"})
+
+    cache = ResponseCache(path)
+    assert cache.get("key") == {"command": "RELOAD"}
+    assert cache.stats["disk_hits"] == 1
+    assert cache.get("key") == {"command": "RELOAD"}
+    assert cache.stats["memory_hits"] == 1
+
+
+def test_an_entry_expires_after_its_own_ttl(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(praterich_cache.time, "time", clock.time)
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ResponseCache(path, ttl=7 * 24 * 3600)
+    cache.put("command", "reload")
+    cache.put("text", "an answer", ttl=60)
+
+    clock.now += 61
+    assert cache.get("text") is None
+    assert ResponseCache(path).get("text") is None
+    assert cache.get("command") == "reload"
+
+
+def test_disk_tier_keeps_the_newest_entries(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ResponseCache(path, memory_entries=2, disk_entries=3)
+    for number in range(5):
+        cache.put(f"key{number}", number)
+    assert len(cache.memory) == 2
+
+    cache = ResponseCache(path)
+    assert [cache.get(f"key{number}") for number in range(5)] == [None, None, 2, 3, 4]
+
+
+def test_a_cache_written_before_per_entry_ttls_is_replaced(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)")
+    db.execute("INSERT INTO responses VALUES ('key', '1', 0)")
+    db.commit()
+    db.close()
+
+    cache = ResponseCache(path)
+    assert cache.get("key") is None
+    cache.put("key", 2)
+    assert ResponseCache(path).get("key") == 2
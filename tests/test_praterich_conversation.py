@@ -0,0 +1,152 @@
+import json
+import urllib.request
+import pytest
+from fake_model_server import FakeModelServer
+from page_context import estimate_tokens
+from praterich_conversation import ConversationSession, SUMMARY_PREFIX, SUMMARY_REPLY, summarize_turn, request_tokens
+
+
+def answer(session, user_query, command="SEARCH", query="", message="Certainly.", actions=()):
+    turn = session.begin(user_query)
+    turn.update(command=command, query=query or user_query, message=message, actions=list(actions))
+    return session.commit(turn)
+
+
+def test_turns_are_sent_as_exchanges():
+    session = ConversationSession()
+    answer(session, "open two tabs", command="BATCH", message="Very good.",
+           actions=[{"command": "NEW_TAB", "query": "2"}, {"command": "SWITCH_TAB", "query": "opened:1"}])
+    session.record("go back", {"command": "GO_BACK"})
+    history = session.history()
+    assert [content["role"] for content in history] == ["user", "model", "user", "model"]
+    assert history[0]["parts"][0]["text"] == "open two tabs"
+    assert json.loads(history[1]["parts"][0]["text"]) == {
+        "command": "BATCH", "query": "open two tabs",
+        "actions": [{"command": "NEW_TAB", "query": "2"}, {"command": "SWITCH_TAB", "query": "opened:1"}],
+        "message": "Very good.",
+    }
+    assert json.loads(history[3]["parts"][0]["text"]) == {"command": "GO_BACK", "query": "", "message": ""}
+
+
+def test_history_handed_out_is_not_changed_by_later_turns():
+    session = ConversationSession()
+    answer(session, "first")
+    history = session.history()
+    assert session.history() is history
+    answer(session, "second")
+    assert len(history) == 2 and len(session.history()) == 4
+
+
+def test_oldest_turns_are_summarized_past_max_turns():
+    session = ConversationSession(max_turns=3, keep_recent=2, token_budget=10000)
+    for number in range(5):
+        answer(session, f"search for thing {number}")
+    assert [turn["user"] for turn in session.turns] == ["search for thing 2", "search for thing 3", "search for thing 4"]
+    assert session.summary == ["- search for thing 0 -> SEARCH search for thing 0",
+                               "- search for thing 1 -> SEARCH search for thing 1"]
+    assert session.compactions == 2
+
+    history = session.history()
+    assert history[0]["parts"][0]["text"] == SUMMARY_PREFIX + "\n".join(session.summary)
+    assert history[1]["parts"][0]["text"] == SUMMARY_REPLY
+    assert len(history) == 2 + 2 * 3
+
+
+def test_token_budget_compacts_but_keeps_the_recent_turns():
+    session = ConversationSession(max_turns=100, token_budget=120, keep_recent=2, summary_budget=10000)
+    for number in range(10):
+        answer(session, f"question {number} " + "padding " * 20, message="An answer. " * 10)
+        assert len(session) <= 2 or session.tokens() <= session.token_budget
+    assert len(session) >= 2
+    assert session.tokens() == sum(turn["tokens"] for turn in session.turns) + session.summary_tokens
+    # Two turns are over budget on their own; they stay whole anyway.
+    session = ConversationSession(token_budget=1, keep_recent=2)
+    for number in range(3):
+        answer(session, f"question {number}")
+    assert len(session) == 2 and len(session.summary) == 1
+
+
+def test_summaries_are_trimmed_from_the_oldest():
+    session = ConversationSession(max_turns=1, keep_recent=1, summary_budget=30)
+    for number in range(20):
+        answer(session, f"search for item number {number}")
+    assert session.summary[-1].startswith("- search for item number 18 ")
+    assert session.summary_tokens == sum(estimate_tokens(line) for line in session.summary)
+    assert session.summary_tokens <= session.summary_budget
+    assert len(session.summary) < 19 and session.compactions == 19
+
+
+def test_summary_lines_leave_out_the_message():
+    turn = {"user": "find the docs", "command": "NAVIGATE", "query": "https://docs.python.org/3/", "actions": [],
+            "message": "Here they are. " * 20}
+    assert summarize_turn(turn) == "- find the docs -> NAVIGATE https://docs.python.org/3/"
+    turn["actions"] = [{"command": "SEARCH", "query": "asyncio " * 10}, {"command": "CLOSE_TAB"}]
+    assert summarize_turn(turn) == "- find the docs -> SEARCH asyncio asyncio asyncio asyncio async...; CLOSE_TAB"
+
+
+def test_turn_begun_before_a_new_chat_is_dropped():
+    session = ConversationSession(max_turns=1, keep_recent=1)
+    answer(session, "one")
+    answer(session, "two")
+    pending = session.begin("still streaming")
+    history = session.history()
+    session.reset()
+    pending.update(command="SEARCH", query="late", message="Too late.")
+    assert not session.commit(pending)
+    assert len(session) == 0 and session.summary == [] and session.tokens() == 0
+    assert session.history() == [] and len(history) == 4
+
+    assert answer(session, "fresh start")
+    assert [content["parts"][0]["text"] for content in session.history()][0] == "fresh start"
+
+
+def test_request_tokens_counts_contents_and_inline_instruction():
+    body = {"contents": [{"role": "user", "parts": [{"text": "a" * 40}]},
+                         {"role": "model", "parts": [{"text": "b" * 8}, {"inlineData": {}}]}],
+            "systemInstruction": {"parts": [{"text": "c" * 400}]}}
+    assert request_tokens(body) == 10 + 2 + 100
+    body.pop("systemInstruction")
+    body["cachedContent"] = "cachedContents/fake-1"
+    assert request_tokens(body) == 12
+
+
+def test_fake_server_sees_the_history_tokens():
+    session = ConversationSession()
+    for number in range(6):
+        answer(session, f"search for topic {number}", message="Certainly, here it is. " * 4)
+    contents = session.history() + [{"role": "user", "parts": [{"text": "open the first one"}]}]
+    expected = session.tokens() + estimate_tokens("open the first one")
+    if session.summary:
+        expected += estimate_tokens(SUMMARY_PREFIX + "\n".join(session.summary)) + estimate_tokens(SUMMARY_REPLY)
+
+    server = FakeModelServer().start()
+    try:
+        request = urllib.request.Request(f"{server.base_url}/v1beta/models/fake:generateContent",
+                                         data=json.dumps({"contents": contents}).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request) as response:
+            json.loads(response.read())
+    finally:
+        server.stop()
+    assert request_tokens(server.requests[0]["body"]) == expected
+    assert server.requests[0]["text"] == "open the first one"
+
+
+def test_cached_instruction_sends_fewer_tokens_than_before(monkeypatch):
+    pytest.importorskip("google.genai")
+    import praterich_ai
+    from praterich_conversation import run_benchmark
+    monkeypatch.setattr(praterich_ai, "_client", None)
+    monkeypatch.setattr(praterich_ai.instruction_cache, "enabled", praterich_ai.instruction_cache.enabled)
+    monkeypatch.setenv("PRATERICH_BASE_URL", "")
+    monkeypatch.setenv("PRATERICH_API_KEY", "fake-key")
+
+    results = run_benchmark(turns=30)
+    stateless, inline, cached = results["stateless"], results["history_inline"], results["history_cached"]
+    # The history costs tokens of its own; caching the instruction has to more than make up for it.
+    assert inline["tokens_per_turn_mean"] > stateless["tokens_per_turn_mean"]
+    assert cached["tokens_per_turn_mean"] < stateless["tokens_per_turn_mean"]
+    assert cached["tokens_last_turn"] < results["instruction_tokens"]
+    assert cached["tokens_first_turn"] < inline["tokens_first_turn"]
+    assert cached["compactions"] > 0
+    assert stateless["tokens_max_turn"] - stateless["tokens_first_turn"] < 50
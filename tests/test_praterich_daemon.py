@@ -0,0 +1,88 @@
+import os
+import stat
+import asyncio
+import pytest
+from praterich_client import make_socket_directory, check_socket_owner, PraterichClient
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "getuid"), reason="Unix sockets and owners only")
+
+
+def test_socket_directory_is_created_private(tmp_path):
+    path = tmp_path / "run" / "praterich.sock"
+    make_socket_directory(str(path))
+    assert stat.S_IMODE(os.stat(path.parent).st_mode) == 0o700
+    # An existing directory of the user's is reused.
+    make_socket_directory(str(path))
+
+
+def test_shared_or_linked_directories_are_refused(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+    with pytest.raises(PermissionError):
+        make_socket_directory(str(shared / "praterich.sock"))
+
+    private = tmp_path / "private"
+    private.mkdir(mode=0o700)
+    (tmp_path / "link").symlink_to(private)
+    with pytest.raises(PermissionError):
+        make_socket_directory(str(tmp_path / "link" / "praterich.sock"))
+
+
+def test_daemon_socket_is_private_from_the_start(tmp_path):
+    from praterich_daemon import PraterichDaemon
+    path = str(tmp_path / "run" / "praterich.sock")
+    daemon = PraterichDaemon(path)
+
+    def ask_for_stats():
+        with PraterichClient(path, timeout=5.0) as client:
+            return next(client.request("stats"))
+
+    async def exercise():
+        ready = asyncio.Event()
+        serving = asyncio.ensure_future(daemon.serve(ready=ready.set))
+        await ready.wait()
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+        reply = await asyncio.get_running_loop().run_in_executor(None, ask_for_stats)
+        daemon.stop()
+        await serving
+        return mode, reply
+
+    mode, reply = asyncio.run(exercise())
+    assert mode & 0o077 == 0
+    assert reply["result"]["pid"] == os.getpid()
+    assert not os.path.exists(path)
+
+
+def test_client_refuses_a_socket_of_another_user(tmp_path, monkeypatch):
+    import praterich_client
+    path = tmp_path / "praterich.sock"
+    path.touch()
+    check_socket_owner(str(path))
+    monkeypatch.setattr(praterich_client, "UID", os.getuid() + 1)
+    with pytest.raises(PermissionError):
+        PraterichClient(str(path))
+
+
+def test_oversized_request_gets_an_error_and_the_connection_survives(tmp_path):
+    from praterich_daemon import PraterichDaemon
+    path = str(tmp_path / "run" / "praterich.sock")
+    daemon = PraterichDaemon(path, max_request_bytes=4096)
+
+    def ask():
+        with PraterichClient(path, timeout=5.0) as client:
+            too_long = list(client.request("text", "highlighted text " * 5000))
+            return too_long, next(client.request("stats"))
+
+    async def exercise():
+        ready = asyncio.Event()
+        serving = asyncio.ensure_future(daemon.serve(ready=ready.set))
+        await ready.wait()
+        replies = await asyncio.get_running_loop().run_in_executor(None, ask)
+        daemon.stop()
+        await serving
+        return replies
+
+    too_long, stats = asyncio.run(exercise())
+    assert too_long == [{"id": 1, "error": "The request is longer than 4096 bytes."}]
+    assert stats["id"] == 2 and stats["result"]["requests"] == 0
@@ -0,0 +1,31 @@
+import os
+import json
+import pytest
+from praterich_intents import match_intent, run_benchmark, MAX_NEW_TABS
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "intent_corpus.jsonl")
+
+with open(CORPUS_PATH) as f:
+    CORPUS = [json.loads(line) for line in f if line.strip()]
+
+
+@pytest.mark.parametrize("example", CORPUS, ids=[example["utterance"] for example in CORPUS])
+def test_corpus_example(example):
+    result = match_intent(example["utterance"])
+    if example["command"] is None:
+        assert result is None
+    else:
+        assert result is not None and result["command"] == example["command"]
+        if "query" in example:
+            assert result["query"] == example["query"]
+
+
+def test_tab_counts_over_the_cap_go_to_the_model():
+    assert match_intent(f"new {MAX_NEW_TABS} tabs")["query"] == str(MAX_NEW_TABS)
+    assert match_intent(f"new {MAX_NEW_TABS + 1} tabs") is None
+
+
+def test_benchmark_reports_no_false_positives():
+    report = run_benchmark(CORPUS_PATH, repeat=1)
+    assert report["false_positives"] == 0
+    assert report["accuracy"] == 1.0
@@ -0,0 +1,161 @@
+import asyncio
+import pytest
+from praterich_router import BackendUnavailable, CircuitBreaker, DeadlineExceeded, ModelRouter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker(threshold=2, reset_after=10.0, clock=clock)
+
+
+def open_circuit(breaker, clock):
+    breaker.record_failure()
+    breaker.record_failure()
+    clock.now += 10.0
+
+
+def test_one_probe_after_the_reset_then_closed(breaker, clock):
+    assert breaker.check() is False
+    breaker.record_failure()
+    breaker.record_failure()
+    with pytest.raises(BackendUnavailable):
+        breaker.check()
+
+    clock.now += 10.0
+    assert breaker.state == "half_open"
+    assert breaker.check() is True
+    with pytest.raises(BackendUnavailable):
+        breaker.check()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_failed_probe_opens_the_circuit_again(breaker, clock):
+    open_circuit(breaker, clock)
+    assert breaker.check() is True
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def router_with(breaker, **options):
+    options = dict({"hedge": False}, **options)
+    return ModelRouter("fast-model", "full-model", breaker=breaker, **options)
+
+
+def test_cancelled_stream_probe_lets_the_next_request_probe(breaker, clock):
+    open_circuit(breaker, clock)
+    router = router_with(breaker)
+
+    async def hang(model):
+        await asyncio.sleep(60)
+        yield "never"
+
+    async def consume():
+        async for _ in router.stream("full", hang):
+            pass
+
+    async def cancel_probe():
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_probe())
+    assert router.stats["failed"] == 0
+    assert breaker.failures == 2 and breaker.state == "half_open"
+    assert breaker.check() is True
+
+
+def test_iterate_closed_early_releases_the_probe(breaker, clock):
+    open_circuit(breaker, clock)
+    router = router_with(breaker)
+    chunks = router.iterate("fast", lambda model: iter(["one", "two"]))
+    assert next(chunks) == "one"
+    chunks.close()
+    assert router.stats["failed"] == 0
+    assert breaker.check() is True
+
+
+def test_interrupted_call_releases_only_its_own_probe(breaker, clock):
+    open_circuit(breaker, clock)
+    router = router_with(breaker)
+
+    def interrupted(model):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        router.call("fast", interrupted)
+    assert breaker.check() is True
+    breaker.record_success()
+
+    def interrupted_while_another_probes(model):
+        open_circuit(breaker, clock)
+        assert breaker.check() is True
+        raise KeyboardInterrupt
+
+    # This request was let through while the circuit was closed, so the probe is not its own.
+    with pytest.raises(KeyboardInterrupt):
+        router.call("fast", interrupted_while_another_probes)
+    assert breaker.probing
+    with pytest.raises(BackendUnavailable):
+        breaker.check()
+
+
+def attempts_of(*behaviours):
+    """A `start` whose n-th call waits behaviours[n][0] seconds, then raises or yields behaviours[n][1]."""
+    started = []
+
+    def start(model):
+        delay, outcome = behaviours[len(started)]
+        started.append(model)
+
+        async def chunks():
+            await asyncio.sleep(delay)
+            if isinstance(outcome, Exception):
+                raise outcome
+            yield outcome
+        return chunks()
+    return start, started
+
+
+def collect(router, start):
+    async def run():
+        return [chunk async for chunk in router.stream("full", start)]
+    return asyncio.run(run())
+
+
+def test_slow_call_is_hedged_and_the_hedge_wins(breaker):
+    router = router_with(breaker, hedge=True, initial_hedge_delay=0.05)
+    start, started = attempts_of((1.0, "slow"), (0.0, "fast"))
+    assert collect(router, start) == ["fast"]
+    assert started == ["full-model", "full-model"]
+    assert router.stats["hedged"] == 1 and router.stats["hedge_wins"] == 1
+
+
+def test_failed_first_attempt_is_retried_by_the_hedge(breaker):
+    router = router_with(breaker, hedge=True, initial_hedge_delay=5.0)
+    start, started = attempts_of((0.0, RuntimeError("503")), (0.0, "retried"))
+    assert collect(router, start) == ["retried"]
+    assert len(started) == 2 and breaker.failures == 0
+
+
+def test_first_token_deadline_counts_as_a_failure(breaker):
+    router = router_with(breaker, first_token_deadline=0.05)
+    start, _ = attempts_of((1.0, "late"),)
+    with pytest.raises(DeadlineExceeded):
+        collect(router, start)
+    assert router.stats["deadline_exceeded"] == 1 and breaker.failures == 1
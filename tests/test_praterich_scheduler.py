@@ -0,0 +1,45 @@
+import asyncio
+import json
+import pytest
+from conftest import wait_until
+
+pytest.importorskip("PyQt6.QtCore")
+
+import praterich_scheduler
+from praterich_scheduler import PraterichScheduler
+
+
+async def fake_stream(query, mode="command", use_cache=True, history=None):
+    await asyncio.sleep(0.05)
+    yield json.dumps({"command": "SEARCH", "query": query, "message": "Certainly."})
+
+
+@pytest.fixture
+def scheduler(qapp, monkeypatch):
+    monkeypatch.setattr(praterich_scheduler, "astream_praterich_response", fake_stream)
+    scheduler = PraterichScheduler()
+    yield scheduler
+    scheduler.shutdown()
+
+
+def test_superseded_request_is_dropped_and_then_forgotten(qapp, scheduler):
+    finished, retired = [], []
+    scheduler.finished.connect(lambda request_id, text: finished.append(request_id))
+    scheduler.retired.connect(retired.append)
+
+    first = scheduler.submit("cats", channel="panel")
+    second = scheduler.submit("dogs", channel="panel")
+    assert not scheduler.is_current(first)
+    assert wait_until(qapp, lambda: {first, second} <= set(retired))
+
+    assert finished == [second]
+    assert not scheduler.cancelled
+    assert not scheduler.channels
+
+
+def test_many_cancelled_requests_leave_nothing_behind(qapp, scheduler):
+    retired = []
+    scheduler.retired.connect(retired.append)
+    ids = [scheduler.submit(f"query {number}", channel="panel") for number in range(50)]
+    assert wait_until(qapp, lambda: len(retired) == len(ids))
+    assert not scheduler.cancelled
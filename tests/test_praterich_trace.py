@@ -0,0 +1,31 @@
+import json
+import pytest
+
+pytest.importorskip("PyQt6.QtWidgets")
+
+from praterich_trace import Tracer
+
+
+def test_close_writes_the_last_spans(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(str(path), flush_interval=3600)
+    trace_id = tracer.start_trace("panel", "zoom in")
+    tracer.set_command(trace_id, "ZOOM_IN")
+    with tracer.span(trace_id, "dispatch"):
+        pass
+    tracer.end_trace(trace_id)
+    tracer.close()
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [record["stage"] for record in records] == ["dispatch", "total"]
+    assert records[1]["command"] == "ZOOM_IN"
+
+
+def test_without_a_file_spans_are_not_queued():
+    tracer = Tracer(None)
+    for number in range(1000):
+        trace_id = tracer.start_trace("panel", f"query {number}")
+        tracer.end_trace(trace_id)
+    assert not tracer.pending
+    assert not tracer.unwritten
+    assert tracer.stats()["UNKNOWN"]["count"] == 500
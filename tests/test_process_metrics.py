@@ -0,0 +1,85 @@
+import io
+import os
+import json
+import pytest
+import process_metrics
+from process_metrics import ProcessSampler, read_cpu_ticks, read_rss_bytes, prometheus_text, escape_label, export_rows
+
+has_proc = pytest.mark.skipif(not os.path.exists("/proc/self/stat"), reason="needs /proc")
+
+ROW = {"window": 1, "tab": 2, "pid": 4242, "url": "https://example.com/", "rss_bytes": 1048576,
+       "cpu_percent": 12.5, "network_bytes": 2048}
+
+
+def stat_line(command, utime, stime):
+    fields = ["S", "1", "100", "100", "0", "-1", "4194304", "10", "0", "0", "0", str(utime), str(stime), "0", "0"]
+    return f"4242 ({command}) " + " ".join(fields) + "\n"
+
+
+@pytest.mark.parametrize("command", ["QtWebEngineProc", "Web Content", "x) S 1 (y", "((odd))"])
+def test_cpu_ticks_skip_the_command_name(monkeypatch, command):
+    monkeypatch.setattr(process_metrics, "open", lambda path: io.StringIO(stat_line(command, 31, 11)), raising=False)
+    assert read_cpu_ticks(4242) == 42
+
+
+def test_unreadable_or_short_stat_is_not_a_sample(monkeypatch):
+    monkeypatch.setattr(process_metrics, "open", lambda path: io.StringIO("4242 (cut) S 1 2\n"), raising=False)
+    assert read_cpu_ticks(4242) is None
+
+    def missing(path):
+        raise FileNotFoundError(path)
+    monkeypatch.setattr(process_metrics, "open", missing, raising=False)
+    assert read_cpu_ticks(4242) is None
+    assert read_rss_bytes(4242) == 0
+    assert ProcessSampler().sample([4242]) == {}
+
+
+@has_proc
+def test_sampling_this_process():
+    pid = os.getpid()
+    sampler = ProcessSampler()
+    first = sampler.sample([pid])
+    assert first[pid]["cpu_percent"] == 0.0
+    assert first[pid]["rss_bytes"] > 1024 * 1024
+
+    sum(i * i for i in range(200000))
+    second = sampler.sample([pid])
+    assert second[pid]["cpu_percent"] >= 0.0
+    assert set(sampler.previous) == {pid}
+
+
+def test_label_values_are_escaped():
+    assert escape_label('say "hi"\\now\nplease') == 'say \\"hi\\"\\\\now\\nplease'
+    text = prometheus_text([dict(ROW, url='https://example.com/?q="a\\b"\n')])
+    assert 'url="https://example.com/?q=\\"a\\\\b\\"\\n"' in text
+    assert text.count("\n") == 3 * 3
+
+
+def test_prom_file_holds_only_the_latest_sample(tmp_path):
+    path = str(tmp_path / "tabs.prom")
+    export_rows(path, [ROW])
+    export_rows(path, [dict(ROW, rss_bytes=2097152)])
+    with open(path) as f:
+        lines = f.read().splitlines()
+    assert not os.path.exists(f"{path}.tmp")
+    series = [line for line in lines if not line.startswith("#")]
+    assert series == [
+        'ringzauber_tab_rss_bytes{window="1",tab="2",pid="4242",url="https://example.com/"} 2097152',
+        'ringzauber_tab_cpu_percent{window="1",tab="2",pid="4242",url="https://example.com/"} 12.5',
+        'ringzauber_tab_network_bytes{window="1",tab="2",pid="4242",url="https://example.com/"} 2048',
+    ]
+    assert "# TYPE ringzauber_tab_rss_bytes gauge" in lines
+
+
+def test_jsonl_file_gets_a_line_per_sample(tmp_path):
+    path = str(tmp_path / "tabs.jsonl")
+    export_rows(path, [ROW], timestamp=1.0)
+    export_rows(path, [], timestamp=2.0)
+    with open(path) as f:
+        samples = [json.loads(line) for line in f]
+    assert samples == [{"time": 1.0, "tabs": [ROW]}, {"time": 2.0, "tabs": []}]
+
+
+def test_export_errors_are_reported_not_raised(tmp_path, capsys):
+    export_rows(str(tmp_path / "missing" / "tabs.jsonl"), [ROW])
+    assert "Error exporting tab metrics" in capsys.readouterr().out
@@ -0,0 +1,89 @@
+import json
+import urllib.request
+import pytest
+from praterich_intents import match_intent
+from replay_benchmark import DEFAULT_TRACE_PATH, FixtureServer, load_trace, check_step, compare, run_suite
+
+
+@pytest.fixture
+def steps():
+    return load_trace(DEFAULT_TRACE_PATH, "http://fixtures.test")
+
+
+def test_trace_substitutes_the_fixture_address(steps):
+    assert steps[0] == {"navigate": "http://fixtures.test/page/0", "label": "navigate fixture"}
+    batch = next(step for step in steps if step["label"] == "model batch")
+    assert [action["query"] for action in batch["reply"]["actions"]][:2] == [
+        "http://fixtures.test/page/2", "http://fixtures.test/page/3"
+    ]
+
+
+def test_model_steps_are_not_matched_locally(steps):
+    # A reply the browser never asks for would time the local matcher, not the model.
+    for step in steps:
+        if "reply" in step:
+            assert match_intent(step["command"]) is None, step["command"]
+        elif "command" in step:
+            assert match_intent(step["command"]) is not None, step["command"]
+
+
+def test_batch_actions_are_ones_a_batch_can_run(steps):
+    for step in steps:
+        for action in step.get("reply", {}).get("actions", []):
+            if action["command"] == "NEW_TAB":
+                int(action["query"] or 1)
+            elif action["command"] == "SWITCH_TAB":
+                assert action["query"].startswith("opened:")
+
+
+def test_check_step_reports_missing_requests_and_actions(steps):
+    navigate = next(step for step in steps if step["label"] == "model navigate")
+    url = "http://fixtures.test/page/1"
+    assert check_step(navigate, [navigate["command"]], ["NAVIGATE"], 1, url) == []
+    problems = check_step(navigate, [], ["NONE"], 0, "http://fixtures.test/page/0")
+    assert problems == [
+        "model navigate: never reached the model",
+        "model navigate: performed ['NONE'] instead of ['NAVIGATE']",
+        "model navigate: added 0 tabs instead of 1",
+        "model navigate: ended on http://fixtures.test/page/0 instead of http://fixtures.test/page/1",
+    ]
+
+    local = next(step for step in steps if step["label"] == "local new tab")
+    assert check_step(local, [local["command"]], ["NEW_TAB"], 1, "") == [
+        "local new tab: was sent to the model instead of being matched locally"
+    ]
+
+
+def test_missing_baseline_fails_without_running(tmp_path):
+    result = run_suite(baseline_path=str(tmp_path / "missing.json"))
+    assert not result["passed"] and result["runs"] == 0
+    assert "--update-baseline" in result["regressions"][0]
+    assert not (tmp_path / "missing.json").exists()
+
+
+def test_compare_allows_tolerance_and_slack():
+    baseline = {"chat p50_ms": 100.0, "tabs_opened_per_s": 10.0, "rss_per_tab_mb": 50.0}
+    assert compare({"chat p50_ms": 125.0, "tabs_opened_per_s": 8.5, "rss_per_tab_mb": 59.0}, baseline) == []
+    assert len(compare({"chat p50_ms": 140.0, "tabs_opened_per_s": 7.0, "rss_per_tab_mb": 61.0}, baseline)) == 3
+
+
+def test_fixture_server_serves_pages():
+    server = FixtureServer(paragraphs=3).start()
+    try:
+        with urllib.request.urlopen(f"{server.base_url}/page/4") as response:
+            body = response.read().decode("utf-8")
+        assert "<title>Fixture 4</title>" in body and "Paragraph 2 of fixture page 4" in body
+        assert 'href="/page/3"' in body and 'href="/page/5"' in body
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{server.base_url}/missing")
+    finally:
+        server.stop()
+
+
+def test_replay_runs_every_step(tmp_path):
+    pytest.importorskip("PyQt6.QtWebEngineWidgets")
+    baseline_path = tmp_path / "baseline.json"
+    result = run_suite(baseline_path=str(baseline_path), runs=1, update_baseline=True)
+    assert result["failed_steps"] == []
+    metrics = json.loads(baseline_path.read_text())
+    assert metrics["model_requests"] >= 5 + 3 + 3 + 3 + 3 * 2
@@ -0,0 +1,14 @@
+from ringzauber_stats import percentile
+
+
+def test_nearest_rank_of_unsorted_samples():
+    samples = [5, 1, 4, 2, 3, 10, 9, 8, 7, 6]
+    assert percentile(samples, 0.5) == 6
+    assert percentile(samples, 0.95) == 10
+    assert percentile(samples, 1.0) == 10
+    assert percentile(samples, 0.0) == 1
+
+
+def test_empty_samples_give_the_default():
+    assert percentile([], 0.5) is None
+    assert percentile((value for value in ()), 0.95, 0.0) == 0.0
@@ -0,0 +1,51 @@
+import json
+from session_store import SessionJournal, load_session, run_crash_test
+
+
+def journal_lines(path):
+    with open(f"{path}.journal") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_navigations_and_titles_are_coalesced_per_flush(tmp_path):
+    path = str(tmp_path / "session.json")
+    journal = SessionJournal(path, flush_interval=3600)
+    tab_id = journal.new_tab_id()
+    journal.record("open", id=tab_id, index=0, url="https://example.com/")
+    for count in range(5):
+        journal.record("navigate", id=tab_id, url=f"https://example.com/{count}", title="", history="A" * 1000)
+        journal.record("title", id=tab_id, title=f"Page {count}")
+    journal.record("select", id=tab_id)
+    journal.flush()
+
+    assert [event["op"] for event in journal_lines(path)] == ["open", "navigate", "select"]
+    journal.record("title", id=tab_id, title="Renamed")
+    journal.record("title", id=tab_id, title="Renamed again")
+    journal.close()
+
+    events = journal_lines(path)
+    assert [event["op"] for event in events] == ["open", "navigate", "select", "title"]
+    assert "history" not in events[-1]
+    tab = load_session(path)["tabs"][0]
+    assert tab == {"id": tab_id, "url": "https://example.com/4", "title": "Renamed again", "history": "A" * 1000}
+    assert load_session(path)["current"] == tab_id
+
+
+def test_closed_tab_is_not_updated_by_an_earlier_navigation(tmp_path):
+    path = str(tmp_path / "session.json")
+    journal = SessionJournal(path, flush_interval=3600)
+    journal.record("open", id=1, index=0, url="https://a.example/")
+    journal.record("navigate", id=1, url="https://b.example/", title="B")
+    journal.record("close", id=1)
+    journal.record("navigate", id=1, url="https://c.example/", title="C")
+    journal.close()
+
+    state = load_session(path)
+    assert state["tabs"] == []
+    assert state["closed"][-1]["url"] == "https://b.example/"
+
+
+def test_session_survives_kill_9():
+    # The journal is written every half second, so little more than that is lost.
+    result = run_crash_test(runs=2)
+    assert result["max_lost_seconds"] < 1.0
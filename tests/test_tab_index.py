@@ -0,0 +1,29 @@
+from tab_index import TabIndex
+
+
+def make_index():
+    index = TabIndex()
+    index.update("a", "Pelicans", "https://a.example/", "Seabirds. " * 30 + "Pelicans fly low over the water.")
+    index.update("b", "Gulls", "https://b.example/", "Gulls and pelicans share the harbour.")
+    return index
+
+
+def test_snippets_are_built_when_a_result_is_described():
+    index = make_index()
+    results = index.search("pelic", snippets=False)
+    assert [result["key"] for result in results] == ["a", "b"]
+    assert "snippet" not in results[0] and "find" not in results[0]
+
+    described = index.describe(results[0])
+    assert described is results[0]
+    assert "[Pelicans]" in described["snippet"] and described["snippet"].startswith("...")
+    assert described["find"] == "pelic"
+    assert index.describe(described)["snippet"] == described["snippet"]
+    assert index.search("pelic")[0]["snippet"] == described["snippet"]
+
+
+def test_describing_a_closed_tab_still_gives_text_to_find():
+    index = make_index()
+    result = index.search("gulls harbour", snippets=False)[0]
+    index.remove("b")
+    assert index.describe(result) == dict(result, snippet="", find="harbour")
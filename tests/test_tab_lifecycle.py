@@ -0,0 +1,91 @@
+import os
+import pytest
+from conftest import wait_until
+
+pytest.importorskip("PyQt6.QtWebEngineWidgets")
+os.environ.setdefault("QTWEBENGINE_DISABLE_SANDBOX", "1")
+
+from PyQt6.QtCore import QUrl
+from PyQt6.QtWidgets import QTabWidget
+from PyQt6.QtWebEngineWidgets import QWebEngineView
+from tab_lifecycle import TabLifecycleManager
+
+TABS = 12
+MAX_LIVE_TABS = 4
+MEMORY_BUDGET_MB = 768
+
+
+def page_url(number):
+    # A few hundred kilobytes of text, so each renderer holds more than an empty page.
+    return QUrl("data:text/html," + f"<h1>Tab {number}</h1>" + "<p>Rather a lot of text.</p>" * 5000)
+
+
+@pytest.fixture
+def tabs(qapp):
+    widget = QTabWidget()
+    widget.resize(800, 600)
+    widget.show()
+    yield widget
+    for index in range(widget.count()):
+        widget.widget(index).deleteLater()
+    widget.deleteLater()
+    qapp.processEvents()
+
+
+def open_tabs(qapp, tabs, manager):
+    loaded = set()
+    for number in range(TABS):
+        view = QWebEngineView()
+        view.loadFinished.connect(lambda ok, view=view: loaded.add(view))
+        tabs.addTab(view, f"Tab {number}")
+        view.setUrl(page_url(number))
+        manager.register(view)
+        tabs.setCurrentIndex(number)
+    assert wait_until(qapp, lambda: len(loaded) == TABS, timeout=60)
+
+
+def test_open_tabs_stay_under_memory_budget(qapp, tabs):
+    manager = TabLifecycleManager(tabs, max_live_tabs=MAX_LIVE_TABS, memory_budget_mb=MEMORY_BUDGET_MB,
+                                  check_interval=3600 * 1000)
+    open_tabs(qapp, tabs, manager)
+    views = [tabs.widget(index) for index in range(tabs.count())]
+
+    manager.enforce_policy()
+    qapp.processEvents()
+
+    live = [view for view in views if not manager.is_discarded(view)]
+    assert len(live) <= MAX_LIVE_TABS
+    assert tabs.currentWidget() in live
+    total, shares = manager.renderer_memory(live)
+    assert total <= MEMORY_BUDGET_MB * 1024 * 1024
+
+
+def test_discarded_tab_keeps_title_and_url_and_reloads_when_shown(qapp, tabs):
+    manager = TabLifecycleManager(tabs, max_live_tabs=1, check_interval=3600 * 1000)
+    open_tabs(qapp, tabs, manager)
+    first = tabs.widget(0)
+    url = first.url()
+
+    manager.enforce_policy()
+    assert manager.is_discarded(first)
+    assert manager.url_for(first) == url
+    assert manager.title_for(first)
+
+    tabs.setCurrentIndex(0)
+    assert wait_until(qapp, lambda: not manager.is_discarded(first))
+
+
+def test_lazy_tab_loads_only_when_first_shown(qapp, tabs):
+    manager = TabLifecycleManager(tabs, check_interval=3600 * 1000)
+    tabs.addTab(QWebEngineView(), "Current")
+    lazy = QWebEngineView()
+    tabs.addTab(lazy, "Lazy")
+    manager.add_lazy_tab(lazy, page_url(1))
+    qapp.processEvents()
+
+    assert lazy.url().isEmpty()
+    assert manager.url_for(lazy) == page_url(1)
+
+    tabs.setCurrentIndex(1)
+    assert not manager.is_discarded(lazy)
+    assert lazy.url() == page_url(1)
@@ -0,0 +1,92 @@
+import sys
+import math
+import wave
+import array
+import pytest
+import voice_pipeline
+from voice_pipeline import (
+    SAMPLE_RATE, FRAME_MS, FRAME_SAMPLES, NoiseCalibration, Endpointer, RecognizerBackend,
+    create_backend, recognize_utterance, run_benchmark
+)
+
+
+def tone(ms, level, frequency=220):
+    """16-bit mono samples of a sine at `level`; level 0 is silence with a little hiss."""
+    count = SAMPLE_RATE * ms // 1000
+    samples = array.array('h', (
+        int(level * math.sin(2 * math.pi * frequency * index / SAMPLE_RATE)) + (index * 7919 % 41 - 20)
+        for index in range(count)
+    ))
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return samples.tobytes()
+
+
+def frames_of(audio):
+    step = FRAME_SAMPLES * 2
+    return [audio[offset:offset + step] for offset in range(0, len(audio) - step + 1, step)]
+
+
+class CountingBackend(RecognizerBackend):
+    """Names the number of frames it was given, with a partial every ten frames."""
+    def start(self):
+        self.frames = 0
+
+    def accept(self, frame):
+        self.frames += 1
+        return f"{self.frames // 10} tens" if self.frames >= 10 else None
+
+    def finish(self):
+        return f"heard {self.frames} frames"
+
+
+def test_utterance_is_cut_at_the_end_of_speech():
+    frames = frames_of(tone(600, 0) + tone(900, 8000) + tone(1500, 0))
+    backend = CountingBackend()
+    partials = []
+    endpointer = Endpointer(NoiseCalibration(path=None), end_ms=450)
+    result = recognize_utterance(iter(frames), endpointer, backend, on_partial=partials.append)
+
+    speech_frames = 900 // FRAME_MS
+    assert result["speech_start"] == 600 // FRAME_MS + endpointer.start_frames - 1
+    assert result["speech_end"] == 1500 // FRAME_MS + endpointer.end_frames - 1
+    # The pre-roll before the start decision reaches the backend too.
+    assert backend.frames >= speech_frames
+    assert result["text"] == f"heard {backend.frames} frames"
+    # Each partial is reported once, when it changes.
+    assert partials[0] == "1 tens" and len(partials) == len(set(partials))
+
+
+def test_silence_gives_up_after_the_wait():
+    frames = frames_of(tone(3000, 0))
+    result = recognize_utterance(iter(frames), Endpointer(NoiseCalibration(path=None)), CountingBackend(),
+                                 wait_ms=1000)
+    assert result == {"text": "", "speech_start": None, "speech_end": None, "finish_ms": 0.0}
+
+
+def test_google_is_the_default_and_vosk_falls_back(monkeypatch):
+    monkeypatch.setitem(voice_pipeline.BACKENDS, "google", lambda config: CountingBackend())
+    assert isinstance(create_backend({}), CountingBackend)
+    # vosk is not importable here, or its model is missing; either way Google takes over.
+    monkeypatch.setitem(sys.modules, "vosk", None)
+    assert isinstance(create_backend({"voice_backend": "vosk"}), CountingBackend)
+    with pytest.raises(ValueError):
+        create_backend({"voice_backend": "nonsense"})
+
+
+def test_benchmark_replays_wav_fixtures(tmp_path, monkeypatch):
+    monkeypatch.setitem(voice_pipeline.BACKENDS, "google", lambda config: CountingBackend())
+    with wave.open(str(tmp_path / "command.wav"), 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(tone(300, 0) + tone(600, 6000) + tone(900, 0))
+    frames = 1800 // FRAME_MS
+    (tmp_path / "command.txt").write_text("heard 999 frames\n")
+
+    report = run_benchmark(str(tmp_path))
+    assert report["files"] == 1
+    entry = report["results"][0]
+    assert entry["audio_ms"] == frames * FRAME_MS
+    assert entry["endpoint_delay_ms"] == 450
+    assert entry["word_error_rate"] == pytest.approx(1 / 3)
@@ -0,0 +1,154 @@
+import sys
+import json
+import time
+from collections import deque
+from PyQt6.QtCore import Qt, QObject, QTimer, QUrl, QSize
+from tab_lifecycle import read_rss_bytes
+
+
+def render_offscreen(view, size):
+    """Lays out and paints a view that is not in any window, so its page is ready to show."""
+    # Only a top-level widget can be painted off screen; adding it as a tab reparents it.
+    view.setParent(None)
+    view.setAttribute(Qt.WidgetAttribute.WA_DontShowOnScreen, True)
+    view.resize(size)
+    view.show()
+
+
+def detach_offscreen(view):
+    view.hide()
+    view.setAttribute(Qt.WidgetAttribute.WA_DontShowOnScreen, False)
+
+
+class ViewPool(QObject):
+    """
+    Keeps a few web views with the new-tab page already loaded and painted.
+
+    `take()` hands one out immediately. The pool is refilled one view at a time once the
+    browser has been idle for `idle_delay` ms, and stops growing while the renderers of
+    its views use more than `memory_cap_mb`.
+    """
+    def __init__(self, create_view, home_url, size=2, memory_cap_mb=256, view_size=QSize(1024, 768),
+                 idle_delay=1000, parent=None):
+        super().__init__(parent)
+        self.create_view = create_view
+        self.home_url = home_url
+        self.size = size
+        self.memory_cap = memory_cap_mb * 1024 * 1024
+        self.view_size = view_size
+        self.ready = deque()
+        self.warming = None
+
+        self.refill_timer = QTimer(self)
+        self.refill_timer.setSingleShot(True)
+        self.refill_timer.setInterval(idle_delay)
+        self.refill_timer.timeout.connect(self.warm_next)
+        if size > 0:
+            self.refill_timer.start()
+
+    def take(self):
+        """Returns a warm view detached from the pool, or None if none is ready."""
+        self.refill_timer.start()
+        if not self.ready:
+            return None
+        view = self.ready.popleft()
+        detach_offscreen(view)
+        return view
+
+    def memory_used(self):
+        pids = {view.page().renderProcessPid() for view in self.ready}
+        return sum(read_rss_bytes(pid) for pid in pids if pid > 0)
+
+    def warm_next(self):
+        if self.warming is not None or len(self.ready) >= self.size:
+            return
+        if self.ready and self.memory_used() > self.memory_cap:
+            return
+        view = self.warming = self.create_view()
+        view.loadFinished.connect(lambda ok, view=view: self.on_warmed(view, ok))
+        render_offscreen(view, self.view_size)
+        view.setUrl(self.home_url)
+
+    def on_warmed(self, view, ok):
+        if view is not self.warming:
+            return
+        view.loadFinished.disconnect()
+        self.warming = None
+        if not ok:
+            view.deleteLater()
+            return
+        self.ready.append(view)
+        # Refill after another idle pause rather than back to back.
+        if len(self.ready) < self.size:
+            self.refill_timer.start()
+
+    def clear(self):
+        while self.ready:
+            self.ready.popleft().deleteLater()
+        if self.warming is not None:
+            self.warming.deleteLater()
+            self.warming = None
+
+
+def run_benchmark(runs=10):
+    """Times new-tab-to-interactive for a freshly created view and for one taken from a warm pool."""
+    from PyQt6.QtWidgets import QApplication, QTabWidget
+    from PyQt6.QtWebEngineCore import QWebEngineProfile
+    from PyQt6.QtWebEngineWidgets import QWebEngineView
+    from newtab_scheme import register_scheme, NewTabSchemeHandler, NEW_TAB_SCHEME, NEW_TAB_URL
+
+    register_scheme()
+    app = QApplication.instance() or QApplication(sys.argv)
+    handler = NewTabSchemeHandler()
+    QWebEngineProfile.defaultProfile().installUrlSchemeHandler(NEW_TAB_SCHEME, handler)
+    tabs = QTabWidget()
+    tabs.resize(1024, 768)
+    tabs.show()
+    home_url = QUrl(NEW_TAB_URL)
+
+    def wait_until(predicate, timeout=20.0):
+        deadline = time.perf_counter() + timeout
+        while not predicate() and time.perf_counter() < deadline:
+            app.processEvents()
+            time.sleep(0.001)
+
+    def time_to_interactive(get_view, load):
+        """Gets a view, adds it as a tab and waits until its page answers a script call."""
+        answered = []
+        start = time.perf_counter()
+        view = get_view()
+        tabs.setCurrentIndex(tabs.addTab(view, "New Tab"))
+        if load:
+            loaded = []
+            view.loadFinished.connect(lambda ok: loaded.append(ok))
+            view.setUrl(home_url)
+            wait_until(lambda: loaded)
+        view.page().runJavaScript("document.readyState", lambda state: answered.append(state))
+        wait_until(lambda: answered)
+        return (time.perf_counter() - start) * 1e3
+
+    cold = [time_to_interactive(QWebEngineView, load=True) for _ in range(runs)]
+
+    pool = ViewPool(QWebEngineView, home_url, size=runs, memory_cap_mb=4096, idle_delay=0)
+    wait_until(lambda: len(pool.ready) >= runs, timeout=60.0)
+    pool.refill_timer.stop()
+    warm = []
+    while pool.ready:
+        warm.append(time_to_interactive(pool.take, load=False))
+        pool.refill_timer.stop()
+    if not warm:
+        raise RuntimeError("The pool did not warm any views.")
+
+    cold.sort()
+    warm.sort()
+    return {
+        "runs": runs,
+        "cold_p50_ms": cold[len(cold) // 2],
+        "warm_p50_ms": warm[len(warm) // 2],
+        "cold_max_ms": cold[-1],
+        "warm_max_ms": warm[-1],
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(run_benchmark(), indent=2))
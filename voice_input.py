@@ -1,29 +1,78 @@
-import speech_recognition as sr
+import threading
 from PyQt6.QtCore import QThread, pyqtSignal
+from voice_pipeline import (
+    SAMPLE_RATE, FRAME_SAMPLES, DEFAULT_CALIBRATION_PATH, NoiseCalibration, Endpointer,
+    create_backend, recognize_utterance
+)
 
-class VoiceRecognitionThread(QThread):
-    # This signal will carry the transcribed text or an error message.
-    finished = pyqtSignal(str) 
 
-    def __init__(self, parent=None):
+class VoicePipeline(QThread):
+    """
+    Keeps the microphone and the recognizer open for the life of the browser.
+
+    `listen()` arms the pipeline for one utterance. While the user speaks, partial
+    transcripts are emitted as `partial`; the transcript is emitted as `final` as soon as
+    the endpointer hears the speech end. The microphone stream is stopped between
+    utterances, and the noise calibration is kept between runs.
+    """
+    partial = pyqtSignal(str)
+    final = pyqtSignal(str)
+    error = pyqtSignal(str)
+
+    def __init__(self, config, parent=None):
         super().__init__(parent)
-        self.recognizer = sr.Recognizer()
+        self.config = config
+        self.armed = threading.Event()
+        self.stopping = False
+
+    def listen(self):
+        self.armed.set()
+        if not self.isRunning():
+            self.start()
+
+    def stop(self):
+        self.stopping = True
+        self.armed.set()
+        self.wait(2000)
+
+    def frames(self, stream):
+        while not self.stopping:
+            yield stream.read(FRAME_SAMPLES, exception_on_overflow=False)
 
     def run(self):
-        """
-        Listens to the microphone and transcribes the speech.
-        """
         try:
-            with sr.Microphone() as source:
-                print("Listening...")
-                # Adjust for ambient noise before listening.
-                self.recognizer.adjust_for_ambient_noise(source)
-                audio = self.recognizer.listen(source, timeout=5)
-                text = self.recognizer.recognize_google(audio)
-                self.finished.emit(text)
-        except sr.UnknownValueError:
-            self.finished.emit("Could not understand audio")
-        except sr.RequestError as e:
-            self.finished.emit(f"Speech recognition error: {e}")
+            import pyaudio
+            # Loading a model is the slow part, so it happens once per process.
+            backend = create_backend(self.config)
+            audio = pyaudio.PyAudio()
+            stream = audio.open(format=pyaudio.paInt16, channels=1, rate=SAMPLE_RATE, input=True,
+                                frames_per_buffer=FRAME_SAMPLES, start=False)
+        except Exception as e:
+            self.error.emit(f"Voice input is not available: {e}")
+            return
+
+        calibration = NoiseCalibration(self.config.get("voice_calibration_file", DEFAULT_CALIBRATION_PATH))
+        endpointer = Endpointer(calibration, end_ms=self.config.get("voice_end_ms", 450))
+        try:
+            while True:
+                self.armed.wait()
+                if self.stopping:
+                    break
+                stream.start_stream()
+                try:
+                    result = recognize_utterance(self.frames(stream), endpointer, backend, on_partial=self.partial.emit)
+                finally:
+                    stream.stop_stream()
+                    self.armed.clear()
+                calibration.save()
+                if self.stopping:
+                    break
+                if result["text"]:
+                    self.final.emit(result["text"])
+                else:
+                    self.error.emit("Could not understand audio")
         except Exception as e:
-            self.finished.emit(f"An unexpected error occurred: {e}")
\ No newline at end of file
+            self.error.emit(f"Speech recognition error: {e}")
+        finally:
+            stream.close()
+            audio.terminate()
@@ -0,0 +1,328 @@
+import os
+import sys
+import json
+import math
+import time
+import wave
+import array
+from collections import deque
+from ringzauber_paths import data_path
+from ringzauber_stats import percentile
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+DEFAULT_CALIBRATION_PATH = data_path('ringzauber_voice.json')
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vosk-model')
+
+
+def frame_energy(frame):
+    """Returns the RMS level of a frame of 16-bit little-endian mono samples."""
+    samples = array.array('h', frame)
+    if sys.byteorder == "big":
+        samples.byteswap()
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(sample * sample for sample in samples) / len(samples))
+
+
+class NoiseCalibration:
+    """
+    The ambient noise level, learned from frames without speech and kept between runs,
+    so listening starts at once instead of measuring the room first.
+    """
+    def __init__(self, path=DEFAULT_CALIBRATION_PATH, floor=200.0, adapt=0.05):
+        self.path = path
+        self.floor = floor
+        self.adapt = adapt
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self.floor = float(json.load(f)["noise_floor"])
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"Error reading voice calibration: {e}")
+
+    def update(self, energy):
+        self.floor += self.adapt * (energy - self.floor)
+
+    def save(self):
+        if not self.path:
+            return
+        temporary_path = f"{self.path}.tmp"
+        try:
+            with open(temporary_path, 'w') as f:
+                json.dump({"noise_floor": self.floor}, f)
+            os.replace(temporary_path, self.path)
+        except OSError as e:
+            print(f"Error saving voice calibration: {e}")
+
+
+class Endpointer:
+    """
+    Finds where an utterance starts and ends from frame energies.
+
+    Speech starts after `start_ms` of frames louder than `ratio` times the noise floor, and
+    ends after `end_ms` of quieter frames. Quiet frames outside speech keep the noise floor
+    up to date.
+    """
+    def __init__(self, calibration, ratio=3.0, start_ms=90, end_ms=450, min_level=100.0, frame_ms=FRAME_MS):
+        self.calibration = calibration
+        self.ratio = ratio
+        self.min_level = min_level
+        self.start_frames = max(1, start_ms // frame_ms)
+        self.end_frames = max(1, end_ms // frame_ms)
+        self.reset()
+
+    def reset(self):
+        self.in_speech = False
+        self.voiced_run = 0
+        self.quiet_run = 0
+
+    def process(self, energy):
+        """Returns "start" or "end" on the frame where speech starts or ends, otherwise None."""
+        voiced = energy > max(self.calibration.floor * self.ratio, self.min_level)
+        if not self.in_speech:
+            if voiced:
+                self.voiced_run += 1
+                if self.voiced_run >= self.start_frames:
+                    self.in_speech = True
+                    self.quiet_run = 0
+                    return "start"
+            else:
+                self.voiced_run = 0
+                self.calibration.update(energy)
+            return None
+        if voiced:
+            self.quiet_run = 0
+            return None
+        self.quiet_run += 1
+        if self.quiet_run >= self.end_frames:
+            self.reset()
+            return "end"
+        return None
+
+
+class RecognizerBackend:
+    """
+    A speech recognizer fed one utterance at a time. `accept(frame)` returns the transcript
+    so far when the backend can produce partial results, and `finish()` the final one.
+    """
+    def start(self):
+        pass
+
+    def accept(self, frame):
+        return None
+
+    def finish(self):
+        return ""
+
+
+class VoskBackend(RecognizerBackend):
+    """Recognizes offline with a Vosk model, with partial results while the user speaks. Needs vosk and a model."""
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, sample_rate=SAMPLE_RATE):
+        import vosk
+        vosk.SetLogLevel(-1)
+        self.vosk = vosk
+        self.model = vosk.Model(model_path)
+        self.sample_rate = sample_rate
+        self.recognizer = None
+        self.parts = []
+
+    def start(self):
+        self.recognizer = self.vosk.KaldiRecognizer(self.model, self.sample_rate)
+        self.parts = []
+
+    def accept(self, frame):
+        if self.recognizer.AcceptWaveform(frame):
+            # Vosk ended a phrase on its own; keep it and start on the next one.
+            self.parts.append(json.loads(self.recognizer.Result()).get("text", ""))
+            return " ".join(part for part in self.parts if part)
+        partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+        return " ".join(part for part in self.parts + [partial] if part)
+
+    def finish(self):
+        self.parts.append(json.loads(self.recognizer.FinalResult()).get("text", ""))
+        return " ".join(part for part in self.parts if part)
+
+
+class GoogleBackend(RecognizerBackend):
+    """Sends the finished utterance to Google's web recognizer. Needs the network and has no partials."""
+    def __init__(self, sample_rate=SAMPLE_RATE):
+        import speech_recognition as sr
+        self.sr = sr
+        self.recognizer = sr.Recognizer()
+        self.sample_rate = sample_rate
+        self.frames = []
+
+    def start(self):
+        self.frames = []
+
+    def accept(self, frame):
+        self.frames.append(frame)
+        return None
+
+    def finish(self):
+        audio = self.sr.AudioData(b"".join(self.frames), self.sample_rate, 2)
+        try:
+            return self.recognizer.recognize_google(audio)
+        except self.sr.UnknownValueError:
+            return ""
+
+
+BACKENDS = {
+    "vosk": lambda config: VoskBackend(config.get("voice_model_path", DEFAULT_MODEL_PATH)),
+    "google": lambda config: GoogleBackend(),
+}
+
+
+def create_backend(config):
+    """
+    Builds the recognizer named by the "voice_backend" config key. Google's recognizer is the
+    default. "vosk" runs offline once the vosk package and a model are installed, and falls
+    back to Google when either cannot be loaded.
+    """
+    name = config.get("voice_backend", "google")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown voice backend: {name}")
+    try:
+        return BACKENDS[name](config)
+    except Exception as e:
+        if name == "google":
+            raise
+        print(f"Error loading the {name} voice backend, using Google instead: {e}")
+        return BACKENDS["google"](config)
+
+
+def recognize_utterance(frames, endpointer, backend, on_partial=None, wait_ms=5000, max_ms=15000,
+                        pre_roll_ms=300, frame_ms=FRAME_MS):
+    """
+    Reads `frames` until one utterance has been spoken and recognized.
+
+    Frames are only passed to the backend once speech has started, together with the last
+    `pre_roll_ms` before it so the first word is not clipped. `on_partial` is called with
+    each new partial transcript. Gives up if no speech starts within `wait_ms`.
+
+    Returns a dict with the transcript in "text" (empty if nothing was heard), the frame
+    index at which speech ended and how long the backend took to finish.
+    """
+    pre_roll = deque(maxlen=max(1, pre_roll_ms // frame_ms))
+    started_at = None
+    last_partial = None
+    ended_at = None
+    index = -1
+    endpointer.reset()
+    for index, frame in enumerate(frames):
+        event = endpointer.process(frame_energy(frame))
+        if started_at is None:
+            if event != "start":
+                pre_roll.append(frame)
+                if (index + 1) * frame_ms >= wait_ms:
+                    break
+                continue
+            started_at = index
+            backend.start()
+            pending = list(pre_roll) + [frame]
+        else:
+            pending = [frame]
+        for chunk in pending:
+            partial = backend.accept(chunk)
+            if partial and partial != last_partial and on_partial is not None:
+                last_partial = partial
+                on_partial(partial)
+        if event == "end" or (index - started_at) * frame_ms >= max_ms:
+            ended_at = index
+            break
+
+    if started_at is None:
+        return {"text": "", "speech_start": None, "speech_end": None, "finish_ms": 0.0}
+    if ended_at is None:
+        ended_at = index
+    finish_started = time.perf_counter()
+    text = backend.finish()
+    return {
+        "text": text.strip(),
+        "speech_start": started_at,
+        "speech_end": ended_at,
+        "finish_ms": (time.perf_counter() - finish_started) * 1e3,
+    }
+
+
+def read_wav_frames(path, frame_samples=FRAME_SAMPLES):
+    """Splits a 16 kHz mono 16-bit WAV file into frames."""
+    with wave.open(path, 'rb') as f:
+        if f.getframerate() != SAMPLE_RATE or f.getnchannels() != 1 or f.getsampwidth() != 2:
+            raise ValueError(f"{path} must be {SAMPLE_RATE} Hz mono 16-bit audio")
+        data = f.readframes(f.getnframes())
+    step = frame_samples * 2
+    return [data[offset:offset + step] for offset in range(0, len(data) - step + 1, step)]
+
+
+def word_error_rate(reference, hypothesis):
+    reference = reference.lower().split()
+    hypothesis = hypothesis.lower().split()
+    previous = list(range(len(hypothesis) + 1))
+    for i, word in enumerate(reference, 1):
+        current = [i]
+        for j, other in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (word != other)))
+        previous = current
+    return previous[-1] / len(reference) if reference else float(bool(hypothesis))
+
+
+def run_benchmark(fixture_dir, config=None, end_ms=450):
+    """
+    Replays every WAV file in `fixture_dir` through the endpointer and recognizer, with the
+    expected transcript read from the .txt file of the same name.
+
+    The latency is what the user waits for after they stop speaking: the endpointing delay
+    from the last voiced frame to the end decision, plus the backend's time to finish.
+    """
+    backend = create_backend(config or {})
+    results = []
+    for name in sorted(os.listdir(fixture_dir)):
+        if not name.endswith(".wav"):
+            continue
+        path = os.path.join(fixture_dir, name)
+        transcript_path = os.path.splitext(path)[0] + ".txt"
+        expected = open(transcript_path).read().strip() if os.path.exists(transcript_path) else None
+        frames = read_wav_frames(path)
+        endpointer = Endpointer(NoiseCalibration(path=None), end_ms=end_ms)
+        partials = []
+        started = time.perf_counter()
+        result = recognize_utterance(iter(frames), endpointer, backend, on_partial=partials.append,
+                                     wait_ms=len(frames) * FRAME_MS)
+        processing_ms = (time.perf_counter() - started) * 1e3
+        entry = {
+            "file": name,
+            "text": result["text"],
+            "partials": len(partials),
+            "audio_ms": len(frames) * FRAME_MS,
+            "real_time_factor": processing_ms / max(1, len(frames) * FRAME_MS),
+            "endpoint_delay_ms": endpointer.end_frames * FRAME_MS if result["speech_end"] is not None else None,
+            "finish_ms": result["finish_ms"],
+        }
+        if entry["endpoint_delay_ms"] is not None:
+            entry["latency_ms"] = entry["endpoint_delay_ms"] + entry["finish_ms"]
+        if expected is not None:
+            entry["word_error_rate"] = word_error_rate(expected, result["text"])
+        results.append(entry)
+
+    latencies = sorted(entry["latency_ms"] for entry in results if "latency_ms" in entry)
+    errors = [entry["word_error_rate"] for entry in results if "word_error_rate" in entry]
+    return {
+        "files": len(results),
+        "latency_p50_ms": percentile(latencies, 0.5),
+        "latency_max_ms": latencies[-1] if latencies else None,
+        "mean_word_error_rate": sum(errors) / len(errors) if errors else None,
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python voice_pipeline.py FIXTURE_DIR [google|vosk] [model_path]")
+        sys.exit(2)
+    config = {"voice_backend": sys.argv[2] if len(sys.argv) > 2 else "google"}
+    if len(sys.argv) > 3:
+        config["voice_model_path"] = sys.argv[3]
+    print(json.dumps(run_benchmark(sys.argv[1], config), indent=2))